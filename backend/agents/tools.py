@@ -1,18 +1,26 @@
 from __future__ import annotations
 
 from collections import defaultdict
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional
 
 from pydantic import BaseModel, ValidationError, model_validator
 from sqlmodel import Session, select
 
 from app.models.item import Item, ItemType
+from app.db.bulk import bulk_insert
 from app.db.session import engine
 from app.services import crud
+from app.services.similarity import find_duplicates
 
 
 # Utility --------------------------------------------------------------
 
+SessionFactory = Callable[[], Session]
+
+
+def default_session() -> Session:
+    return Session(engine)
+
 
 def model_to_dict(model: Any) -> Dict[str, Any]:
     if hasattr(model, "model_dump"):
@@ -33,6 +41,8 @@ ALLOWED_PARENTS: Dict[ItemType, Optional[set[ItemType]]] = {
 
 
 class GetItemInput(BaseModel):
+    """Fetch one item, by id or by (type, title, project_id)."""
+
     id: Optional[int] = None
     type: Optional[ItemType] = None
     title: Optional[str] = None
@@ -50,6 +60,8 @@ class GetItemInput(BaseModel):
 
 
 class ListItemsInput(BaseModel):
+    """List a project's items, optionally filtered by type or a title substring."""
+
     project_id: int
     type: Optional[ItemType] = None
     query: Optional[str] = None
@@ -58,15 +70,21 @@ class ListItemsInput(BaseModel):
 
 
 class DeleteItemInput(BaseModel):
+    """Delete an item and everything below it."""
+
     id: int
 
 
 class MoveItemInput(BaseModel):
+    """Move an item under a new parent of an allowed type."""
+
     id: int
     new_parent_id: int
 
 
 class SummarizeProjectInput(BaseModel):
+    """Outline a project's item tree down to ``depth`` levels, with counts per type."""
+
     project_id: int
     depth: int = 3
 
@@ -77,22 +95,33 @@ class FeatureCreate(BaseModel):
 
 
 class BulkCreateFeaturesInput(BaseModel):
+    """Create features under an epic or capability, skipping titles that already exist there.
+
+    With dedup, also skip features that are near duplicates of existing features
+    in the project or of each other.
+    """
+
     project_id: int
     parent_id: int
     items: List[FeatureCreate]
+    dedup: bool = False
 
 
 # Handlers -------------------------------------------------------------
 
 
-def handle_get_item(payload: Dict[str, Any], run_id: int = 0) -> Dict[str, Any]:
+def handle_get_item(
+    payload: Dict[str, Any],
+    run_id: int = 0,
+    session_factory: SessionFactory = default_session,
+) -> Dict[str, Any]:
     crud.record_run_step(run_id, "tool:get_item", payload)
     try:
         data = GetItemInput(**payload)
     except ValidationError as e:
         return {"ok": False, "error": str(e)}
 
-    with Session(engine) as db:
+    with session_factory() as db:
         if data.id is not None:
             item = db.get(Item, data.id)
         else:
@@ -107,14 +136,18 @@ def handle_get_item(payload: Dict[str, Any], run_id: int = 0) -> Dict[str, Any]:
     return {"ok": True, "result": model_to_dict(item)}
 
 
-def handle_list_items(payload: Dict[str, Any], run_id: int = 0) -> Dict[str, Any]:
+def handle_list_items(
+    payload: Dict[str, Any],
+    run_id: int = 0,
+    session_factory: SessionFactory = default_session,
+) -> Dict[str, Any]:
     crud.record_run_step(run_id, "tool:list_items", payload)
     try:
         data = ListItemsInput(**payload)
     except ValidationError as e:
         return {"ok": False, "error": str(e)}
 
-    with Session(engine) as db:
+    with session_factory() as db:
         stmt = select(Item).where(Item.project_id == data.project_id)
         if data.type:
             stmt = stmt.where(Item.type == data.type)
@@ -147,14 +180,18 @@ def _collect_descendants(db: Session, item_id: int) -> List[Item]:
     return items
 
 
-def handle_delete_item(payload: Dict[str, Any], run_id: int = 0) -> Dict[str, Any]:
+def handle_delete_item(
+    payload: Dict[str, Any],
+    run_id: int = 0,
+    session_factory: SessionFactory = default_session,
+) -> Dict[str, Any]:
     crud.record_run_step(run_id, "tool:delete_item", payload)
     try:
         data = DeleteItemInput(**payload)
     except ValidationError as e:
         return {"ok": False, "error": str(e)}
 
-    with Session(engine) as db:
+    with session_factory() as db:
         item = db.get(Item, data.id)
         if not item:
             return {"ok": False, "error": "item not found"}
@@ -175,14 +212,18 @@ def _is_descendant(db: Session, ancestor_id: int, descendant_id: int) -> bool:
     return False
 
 
-def handle_move_item(payload: Dict[str, Any], run_id: int = 0) -> Dict[str, Any]:
+def handle_move_item(
+    payload: Dict[str, Any],
+    run_id: int = 0,
+    session_factory: SessionFactory = default_session,
+) -> Dict[str, Any]:
     crud.record_run_step(run_id, "tool:move_item", payload)
     try:
         data = MoveItemInput(**payload)
     except ValidationError as e:
         return {"ok": False, "error": str(e)}
 
-    with Session(engine) as db:
+    with session_factory() as db:
         item = db.get(Item, data.id)
         new_parent = db.get(Item, data.new_parent_id)
         if not item or not new_parent:
@@ -202,7 +243,9 @@ def handle_move_item(payload: Dict[str, Any], run_id: int = 0) -> Dict[str, Any]
 
 
 def handle_summarize_project(
-    payload: Dict[str, Any], run_id: int = 0
+    payload: Dict[str, Any],
+    run_id: int = 0,
+    session_factory: SessionFactory = default_session,
 ) -> Dict[str, Any]:
     crud.record_run_step(run_id, "tool:summarize_project", payload)
     try:
@@ -210,7 +253,7 @@ def handle_summarize_project(
     except ValidationError as e:
         return {"ok": False, "error": str(e)}
 
-    with Session(engine) as db:
+    with session_factory() as db:
         items = db.exec(select(Item).where(Item.project_id == data.project_id)).all()
     counts = {t.value: 0 for t in ItemType}
     by_parent: Dict[Optional[int], List[Item]] = defaultdict(list)
@@ -232,7 +275,9 @@ def handle_summarize_project(
 
 
 def handle_bulk_create_features(
-    payload: Dict[str, Any], run_id: int = 0
+    payload: Dict[str, Any],
+    run_id: int = 0,
+    session_factory: SessionFactory = default_session,
 ) -> Dict[str, Any]:
     crud.record_run_step(run_id, "tool:bulk_create_features", payload)
     try:
@@ -240,7 +285,7 @@ def handle_bulk_create_features(
     except ValidationError as e:
         return {"ok": False, "error": str(e)}
 
-    with Session(engine) as db:
+    with session_factory() as db:
         parent = db.get(Item, data.parent_id)
         if not parent:
             return {"ok": False, "error": "parent not found"}
@@ -256,29 +301,45 @@ def handle_bulk_create_features(
                 )
             ).all()
         }
-        created: List[Item] = []
+        rows: List[Dict[str, Any]] = []
+        seen = set(existing_titles)
         for feature in data.items:
-            if feature.title in existing_titles or any(
-                c.title == feature.title for c in created
-            ):
+            if feature.title in seen:
                 continue
-            item = Item(
-                project_id=data.project_id,
-                type=ItemType.FEATURE,
-                title=feature.title,
-                description=feature.description,
-                parent_id=parent.id,
+            seen.add(feature.title)
+            rows.append(
+                {
+                    "project_id": data.project_id,
+                    "type": ItemType.FEATURE,
+                    "title": feature.title,
+                    "description": feature.description,
+                    "status": "draft",
+                    "parent_id": parent.id,
+                }
+            )
+        skipped: List[str] = []
+        if data.dedup:
+            duplicates = find_duplicates(
+                db,
+                data.project_id,
+                "item_feature",
+                [(row["title"], row["description"]) for row in rows],
             )
-            db.add(item)
-            db.flush()
-            created.append(item)
+            skipped = [row["title"] for row, dup in zip(rows, duplicates) if dup is not None]
+            rows = [row for row, dup in zip(rows, duplicates) if dup is None]
+        ids = bulk_insert(db, Item, rows)
         db.commit()
-        for item in created:
-            db.refresh(item)
-    return {
+        created: List[Item] = []
+        if ids:
+            by_id = {i.id: i for i in db.exec(select(Item).where(Item.id.in_(ids))).all()}
+            created = [by_id[i] for i in ids]
+    response = {
         "ok": True,
         "result": [model_to_dict(i) for i in created],
     }
+    if data.dedup:
+        response["skipped_duplicates"] = skipped
+    return response
 
 
 HANDLERS = {
@@ -289,3 +350,28 @@ HANDLERS = {
     "summarize_project": handle_summarize_project,
     "bulk_create_features": handle_bulk_create_features,
 }
+
+INPUT_MODELS: Dict[str, type[BaseModel]] = {
+    "get_item": GetItemInput,
+    "list_items": ListItemsInput,
+    "delete_item": DeleteItemInput,
+    "move_item": MoveItemInput,
+    "summarize_project": SummarizeProjectInput,
+    "bulk_create_features": BulkCreateFeaturesInput,
+}
+
+
+def tool_definitions() -> List[Dict[str, Any]]:
+    """``HANDLERS`` as OpenAI ``tools``, with parameters from the input models."""
+    tools = []
+    for name in HANDLERS:
+        schema = INPUT_MODELS[name].model_json_schema()
+        schema.pop("title", None)
+        description = schema.pop("description", "")
+        tools.append(
+            {
+                "type": "function",
+                "function": {"name": name, "description": description, "parameters": schema},
+            }
+        )
+    return tools
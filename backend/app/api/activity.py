@@ -0,0 +1,68 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlmodel import Session
+
+from app.api.deps import get_db, get_current_user
+from app.api.jobs import get_owned_project
+from app.models.user import User
+from app.schemas.activity import ActivityArchiveStats, ActivityPageRead
+from app.services.activity import flush_activities
+from app.services.activity_history import (
+    MAX_PAGE_SIZE,
+    archive_stats,
+    list_activity,
+    list_archived_activity,
+)
+
+router = APIRouter(tags=["Activity"])
+
+
+@router.get("/activity", response_model=ActivityPageRead)
+def list_my_activity(
+    type: Optional[List[str]] = Query(None, description="Only these activity types"),
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fresh: bool = False,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Activity across the current user's projects, newest first."""
+    if fresh:
+        flush_activities()
+    return list_activity(db, owner_id=current_user.id, types=type, limit=limit, cursor=cursor)
+
+
+@router.get("/projects/{project_id}/activity", response_model=ActivityPageRead)
+def list_project_activity(
+    project_id: int,
+    type: Optional[List[str]] = Query(None, description="Only these activity types"),
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    archived: bool = Query(False, description="Read entries moved out by retention"),
+    fresh: bool = False,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """A project's activity, newest first.
+
+    ``archived=true`` pages through the entries retention has moved into
+    archive segments instead; they are older than every entry still in the
+    hot table.
+    """
+    get_owned_project(db, project_id, current_user)
+    if archived:
+        return list_archived_activity(db, project_id, types=type, limit=limit, cursor=cursor)
+    if fresh:
+        flush_activities(project_id)
+    return list_activity(db, project_id=project_id, types=type, limit=limit, cursor=cursor)
+
+
+@router.get("/projects/{project_id}/activity/archive", response_model=ActivityArchiveStats)
+def read_activity_archive_stats(
+    project_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    get_owned_project(db, project_id, current_user)
+    return archive_stats(db, project_id)
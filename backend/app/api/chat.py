@@ -1,24 +1,35 @@
+import asyncio
 import json
 import re
-from fastapi import APIRouter, Depends, HTTPException, Request as FastAPIRequest
+from dataclasses import asdict
+from typing import List, Optional, Sequence
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel # Field is not used directly here, but good to have if models evolve
-from sqlmodel import Session, select
-import openai
-import httpx # For making internal API calls
+from sqlmodel import Session
 
-from app.api.deps import get_db, get_current_user
+from app.api.deps import get_db, get_current_user, llm_rate_limit
 from app.models.activity import Activity
 from app.models.project import Project
 from app.models.user import User
 from app.core.config import get_settings
-from app.schemas.requirements import RequirementCreate
-
-settings = get_settings()
-if settings.openai_api_key:
-    openai.api_key = settings.openai_api_key
-else:
-    # This should ideally be caught by main.py's startup check
-    print("Warning: OPENAI_API_KEY not found. OpenAI calls may fail.")
+from app.core.sse import SSE_HEADERS, format_sse
+from app.services.activity import flush_activities, log_activity
+from app.services.activity_history import MAX_PAGE_SIZE, list_activity
+from app.services.items import ITEM_KINDS, create_item
+from app.core.metrics import llm_cache_lookups
+from app.services.conversation import (
+    ConversationMemory,
+    compact_conversation_task,
+    load_memory,
+)
+from app.services.chat_agent import ToolCallRecord, run_chat_agent
+from app.services.llm import create_chat_completion, stream_chat_completion
+from app.services.llm_providers import llm_configured
+from app.services.prompt_cache import SimilarPromptCache, get_similar_prompt_cache
+from app.services.spec_markdown import render_markdown
+from app.services.validation import validate_hierarchy
 
 router = APIRouter(tags=["Chat"], prefix="")
 
@@ -27,45 +38,17 @@ class AISuggestedRequirement(BaseModel):
     title: str
     description: str | None = None
 
+class AISuggestedItem(AISuggestedRequirement):
+    parent_id: int | None = None # Required for everything below a requirement
+    acceptance_criteria: str | None = None # User stories
+    steps: str | None = None # Use cases
+
 class AIAction(BaseModel):
     action: str # e.g., "create_requirement"
-    data: AISuggestedRequirement # Assuming data will always be for a requirement for now
+    data: AISuggestedItem
 
-# --- Helper to call internal CRUD API ---
-async def call_internal_create_requirement(
-    requirement_data: RequirementCreate,
-    fastapi_request: FastAPIRequest
-):
-    token = fastapi_request.headers.get("authorization") # e.g., "Bearer <token>"
-    base_url = str(fastapi_request.base_url).rstrip('/')
-    create_req_url = f"{base_url}/api/v1/requirements/"
-
-    async with httpx.AsyncClient() as client:
-        headers = {}
-        if token:
-            headers["Authorization"] = token
-
-        try:
-            # Use .model_dump() for Pydantic v2, .dict() for v1
-            payload = requirement_data.model_dump() if hasattr(requirement_data, "model_dump") else requirement_data.dict()
-            response = await client.post(
-                create_req_url,
-                json=payload,
-                headers=headers
-            )
-            response.raise_for_status() # Raises HTTPStatusError for 4xx/5xx responses
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            print(f"Internal API call failed: {e.response.status_code} - {e.response.text}")
-            return {"error": "Failed to create item internally via API", "status_code": e.response.status_code, "detail": e.response.text}
-        except Exception as e:
-            print(f"Internal API call general error: {e}")
-            return {"error": "Failed to create item internally via API", "detail": str(e)}
-
-def log_activity(db: Session, project_id: int, type_: str, content: str):
-    activity = Activity(project_id=project_id, type=type_, content=content)
-    db.add(activity)
-    db.commit()
+# Action name -> item kind understood by app.services.items.create_item
+AI_CREATE_ACTIONS = {f"create_{kind}": kind for kind in ITEM_KINDS}
 
 def parse_ai_response_for_action(text: str) -> AIAction | None:
     try:
@@ -74,141 +57,378 @@ def parse_ai_response_for_action(text: str) -> AIAction | None:
         if match:
             json_str = match.group(1)
             data = json.loads(json_str)
-            if isinstance(data, dict) and data.get("action") == "create_requirement" and isinstance(data.get("data"), dict):
-                # Validate data part for AISuggestedRequirement
-                suggested_req_data = AISuggestedRequirement(**data["data"])
-                return AIAction(action="create_requirement", data=suggested_req_data)
+            if isinstance(data, dict) and data.get("action") in AI_CREATE_ACTIONS and isinstance(data.get("data"), dict):
+                # Validate data part for AISuggestedItem
+                return AIAction(action=data["action"], data=AISuggestedItem(**data["data"]))
     except json.JSONDecodeError:
         print(f"JSONDecodeError parsing AI response: {text}")
     except Exception as e: # Catch Pydantic validation errors or other issues
         print(f"Error parsing AI action from text '{text[:100]}...': {e}")
     return None
 
-@router.post("/chat")
-async def chat(
-    fastapi_request: FastAPIRequest, # For base_url and headers
-    project_id: int,
-    message: str, # Expecting this as a query parameter as per original endpoint
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
+CHAT_MODEL = "gpt-3.5-turbo"
+
+SYSTEM_PROMPT = (
+    "You are an expert Business Analyst assistant. Your goal is to help users define and structure functional items "
+    "like Requirements, Epics, Features, User Stories, and Use Cases.\n"
+    "When a user asks you to create a functional item, or if you infer it from the conversation, "
+    "respond with the item's details formatted as a JSON object within triple backticks (```json ... ```).\n"
+    "The JSON object should have an \"action\" field (e.g., \"create_requirement\") and a \"data\" field.\n"
+    "For example, to create a requirement:\n"
+    "```json\n"
+    "{\n"
+    "  \"action\": \"create_requirement\",\n"
+    "  \"data\": {\n"
+    "    \"title\": \"User Login\",\n"
+    "    \"description\": \"As a user, I want to be able to log in to the system securely.\"\n"
+    "  }\n"
+    "}\n"
+    "```\n"
+    "The supported actions are create_requirement, create_epic, create_feature, create_user_story and create_use_case. "
+    "Every item except a requirement needs \"parent_id\", the id of its parent (requirement -> epic -> feature -> "
+    "user story -> use case). User stories may carry \"acceptance_criteria\" and use cases \"steps\".\n"
+    "Ensure the data fields match the expected structure for the item type.\n"
+    "For other interactions, provide helpful textual responses."
+)
+
+ACTION_FENCE_OPEN = "```json"
+ACTION_FENCE_CLOSE = "```"
+
+
+class ActionBlockDetector:
+    """Accumulates a streamed reply and parses the ```json action block as soon as it closes.
+
+    Each ``feed`` only scans the new tail of the text (plus a fence-length
+    overlap for fences split across chunks), so detection stays linear in the
+    reply length.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.block_closed = False
+        self.action: AIAction | None = None
+        self._open_at: int | None = None
+        self._scanned = 0
+
+    def feed(self, delta: str) -> AIAction | None:
+        self.text += delta
+        if self.block_closed:
+            return None
+        if self._open_at is None:
+            start = max(0, self._scanned - len(ACTION_FENCE_OPEN) + 1)
+            idx = self.text[start:].lower().find(ACTION_FENCE_OPEN)
+            self._scanned = len(self.text)
+            if idx == -1:
+                return None
+            self._open_at = start + idx
+            self._scanned = self._open_at + len(ACTION_FENCE_OPEN)
+        start = max(
+            self._open_at + len(ACTION_FENCE_OPEN),
+            self._scanned - len(ACTION_FENCE_CLOSE) + 1,
+        )
+        end = self.text.find(ACTION_FENCE_CLOSE, start)
+        self._scanned = len(self.text)
+        if end == -1:
+            return None
+        self.block_closed = True
+        self.action = parse_ai_response_for_action(
+            self.text[self._open_at:end + len(ACTION_FENCE_CLOSE)]
+        )
+        return self.action
+
 
+def build_chat_messages(message: str, memory: ConversationMemory | None = None) -> list[dict]:
+    history = memory.messages() if memory else []
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        *history,
+        {"role": "user", "content": message}
+    ]
+
+
+def chat_memory(
+    db: Session, project_id: int, background_tasks: BackgroundTasks
+) -> ConversationMemory | None:
+    """Load the project's conversation memory and schedule its compaction."""
+    if not get_settings().chat_memory_enabled:
+        return None
+    memory = load_memory(db, project_id)
+    # Runs after the response, so summarising never delays the reply.
+    background_tasks.add_task(compact_conversation_task, project_id, CHAT_MODEL)
+    return memory
+
+
+def get_chat_project(db: Session, project_id: int, current_user: User) -> Project:
     project = db.get(Project, project_id)
     if not project or project.owner_id != current_user.id:
         raise HTTPException(status_code=404, detail="Project not found or not authorized")
-
-    if not openai.api_key:
+    if not llm_configured():
         raise HTTPException(status_code=500, detail="OpenAI API key not configured")
+    return project
 
-    system_prompt = (
-        "You are an expert Business Analyst assistant. Your goal is to help users define and structure functional items "
-        "like Requirements, Epics, Features, User Stories, and Use Cases.\n"
-        "When a user asks you to create a functional item, or if you infer it from the conversation, "
-        "respond with the item's details formatted as a JSON object within triple backticks (```json ... ```).\n"
-        "The JSON object should have an \"action\" field (e.g., \"create_requirement\") and a \"data\" field.\n"
-        "For example, to create a requirement:\n"
-        "```json\n"
-        "{\n"
-        "  \"action\": \"create_requirement\",\n"
-        "  \"data\": {\n"
-        "    \"title\": \"User Login\",\n"
-        "    \"description\": \"As a user, I want to be able to log in to the system securely.\"\n"
-        "  }\n"
-        "}\n"
-        "```\n"
-        "Ensure the data fields match the expected structure for the item type.\n"
-        "For other interactions, provide helpful textual responses."
-    )
 
+def similar_cached_reply(
+    endpoint: str,
+    project_id: int,
+    message: str,
+    cache: bool,
+    memory: ConversationMemory | None = None,
+) -> tuple[SimilarPromptCache | None, str | None]:
+    """Look ``message`` up in the project's near-duplicate cache, when enabled.
+
+    Replies are keyed on the prompt alone, so the cache is only used for
+    prompts sent without conversation history.
+    """
+    similar_cache = get_similar_prompt_cache() if cache else None
+    if similar_cache is None or (memory is not None and memory.messages()):
+        return None, None
+    reply = similar_cache.lookup(project_id, message)
+    llm_cache_lookups.inc(endpoint, "similar_hit" if reply is not None else "similar_miss")
+    return similar_cache, reply
 
-    messages_for_ai = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": message}
-    ]
 
-    ai_text_reply = ""
-    created_item_info = None
+def store_similar_reply(
+    similar_cache: SimilarPromptCache | None, project_id: int, message: str, reply: str
+) -> None:
+    # A replayed action block would create its item again.
+    if similar_cache is not None and ACTION_FENCE_OPEN not in reply.lower():
+        similar_cache.store(project_id, message, reply)
 
-    try:
-        client = openai.AsyncOpenAI()
-        completion = await client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=messages_for_ai
-        )
-        if completion.choices and completion.choices[0].message and completion.choices[0].message.content:
-            ai_text_reply = completion.choices[0].message.content.strip()
-        else:
-            ai_text_reply = "No substantive response from AI."
 
-    except Exception as e:
-        print(f"OpenAI API call failed: {e}")
-        # Consider logging the full error `e` for better diagnostics
-        raise HTTPException(status_code=500, detail=f"Failed to get response from AI: {str(e)[:100]}") # Truncate long errors
+async def finalize_chat_reply(
+    db: Session,
+    project_id: int,
+    message: str,
+    ai_text_reply: str,
+    parsed_action: AIAction | None,
+    tool_calls: Sequence[ToolCallRecord] = (),
+) -> dict | None:
+    """Log the exchange and carry out the action the AI proposed, if any.
+
+    The item is created in-process in this request's session; activity
+    entries go through ``log_activity`` and add no commits of their own.
+    Tool calls the model already made are logged as ``ai_tool_<name>``.
+    """
+    created_item_info = None
 
     log_activity(db, project_id, "chat_message_user", message)
+    for call in tool_calls:
+        outcome = {"arguments": call.arguments, "ok": bool(call.result.get("ok"))}
+        if not outcome["ok"]:
+            outcome["error"] = call.result.get("error")
+        log_activity(db, project_id, f"ai_tool_{call.name}", json.dumps(outcome, default=str))
     log_activity(db, project_id, "chat_message_ai", ai_text_reply)
 
-    parsed_action = parse_ai_response_for_action(ai_text_reply)
+    if parsed_action and parsed_action.action in AI_CREATE_ACTIONS:
+        kind = AI_CREATE_ACTIONS[parsed_action.action]
+        suggestion = parsed_action.data
+        print(f"AI suggested creating {kind}: {suggestion.title}")
+        try:
+            item = create_item(
+                db,
+                project_id,
+                kind,
+                suggestion.model_dump(exclude={"parent_id"}, exclude_none=True),
+                parent_id=suggestion.parent_id,
+                commit=False,
+            )
+        except HTTPException as e:
+            # create_item validates before adding anything, so there is nothing to undo.
+            error_msg = json.dumps({"status_code": e.status_code, "detail": e.detail})
+            log_activity(db, project_id, f"ai_create_{kind}_failed", error_msg)
+            print(f"Failed to create {kind} suggested by AI: {error_msg}")
+        else:
+            item_data = item.model_dump()
+            created_item_info = {"type": kind, "data": item_data}
+            log_activity(db, project_id, f"ai_created_{kind}", json.dumps(item_data), commit=False)
+            db.commit()  # the item, plus its activity entry when not written behind
 
-    if parsed_action and parsed_action.action == "create_requirement":
-        # Ensure data is of type AISuggestedRequirement (already handled by Pydantic in AIAction)
-        requirement_to_create = RequirementCreate(
-            title=parsed_action.data.title,
-            description=parsed_action.data.description,
-            project_id=project_id, # from the current context
-            is_active=True # Default value
-        )
-        print(f"AI suggested creating requirement: {requirement_to_create.title}")
+    return created_item_info
 
-        # Attempt to create the requirement via internal API call
-        internal_creation_result = await call_internal_create_requirement(requirement_to_create, fastapi_request)
 
-        if internal_creation_result and not internal_creation_result.get("error"):
-            created_item_info = {"type": "requirement", "data": internal_creation_result}
-            log_activity(db, project_id, "ai_created_requirement", json.dumps(internal_creation_result))
-            # Optionally append to ai_text_reply to confirm creation in chat
-            # ai_text_reply += f"\n\n(System: Successfully created requirement '{requirement_to_create.title}')"
-        else:
-            error_msg = json.dumps(internal_creation_result or {"detail": "Unknown internal error"})
-            log_activity(db, project_id, "ai_create_requirement_failed", error_msg)
-            print(f"Failed to create requirement via internal API: {error_msg}")
-            # Optionally append to ai_text_reply to inform user of failure
-            # detail = internal_creation_result.get('detail', 'failed to process suggestion') if internal_creation_result else 'failed'
-            # ai_text_reply += f"\n\n(System: AI suggested creating '{requirement_to_create.title}', but it could not be processed: {detail})"
+@router.post("/chat", dependencies=[Depends(llm_rate_limit)])
+async def chat(
+    project_id: int,
+    message: str, # Expecting this as a query parameter as per original endpoint
+    background_tasks: BackgroundTasks,
+    cache: bool = True, # False forces a fresh reply instead of a cached one
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    get_chat_project(db, project_id, current_user)
+    memory = chat_memory(db, project_id, background_tasks)
+    messages_for_ai = build_chat_messages(message, memory)
+    similar_cache, ai_text_reply = similar_cached_reply("chat", project_id, message, cache, memory)
+    tool_calls: list[ToolCallRecord] = []
+
+    if ai_text_reply is None:
+        try:
+            # Tool calls run in sessions of their own on the request's database.
+            agent_reply = await run_chat_agent(
+                complete=create_chat_completion,
+                endpoint="chat",
+                model=CHAT_MODEL,
+                messages=messages_for_ai,
+                project_id=project_id,
+                user_id=current_user.id,
+                cache=cache,
+                session_factory=lambda: Session(db.get_bind()),
+            )
+            tool_calls = agent_reply.tool_calls
+            ai_text_reply = agent_reply.text or "No substantive response from AI."
+
+        except HTTPException: # Admission control: 503 with Retry-After when saturated
+            raise
+        except Exception as e:
+            print(f"OpenAI API call failed: {e}")
+            # Consider logging the full error `e` for better diagnostics
+            raise HTTPException(status_code=500, detail=f"Failed to get response from AI: {str(e)[:100]}") # Truncate long errors
+
+        # A reply that depended on tool calls is not reusable for another prompt.
+        if not tool_calls:
+            store_similar_reply(similar_cache, project_id, message, ai_text_reply)
+
+    created_item_info = await finalize_chat_reply(
+        db, project_id, message, ai_text_reply,
+        parse_ai_response_for_action(ai_text_reply),
+        tool_calls,
+    )
+    return {
+        "reply": ai_text_reply,
+        "created_item": created_item_info,
+        "tool_calls": [call.as_dict() for call in tool_calls],
+    }
+
+
+@router.post("/chat/stream", dependencies=[Depends(llm_rate_limit)])
+async def chat_stream(
+    project_id: int,
+    message: str,
+    background_tasks: BackgroundTasks,
+    cache: bool = True,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Server-Sent Events variant of ``/chat``.
+
+    Emits ``token`` events (``{"delta": str}``) as the model produces them,
+    then ``created_item`` if the reply's action block created an item, then
+    ``done`` with the full reply. Upstream failures end the stream with an
+    ``error`` event.
+    """
+    get_chat_project(db, project_id, current_user)
+    memory = chat_memory(db, project_id, background_tasks)
+    messages_for_ai = build_chat_messages(message, memory)
+    similar_cache, cached_reply = similar_cached_reply(
+        "chat_stream", project_id, message, cache, memory
+    )
 
+    async def events():
+        detector = ActionBlockDetector()
+        if cached_reply is not None:
+            detector.feed(cached_reply)
+            yield format_sse("token", {"delta": cached_reply})
+        else:
+            try:
+                async for delta in stream_chat_completion(
+                    endpoint="chat_stream", model=CHAT_MODEL, messages=messages_for_ai,
+                    cache=cache, project_id=project_id, user_id=current_user.id,
+                ):
+                    detector.feed(delta)
+                    yield format_sse("token", {"delta": delta})
+            except HTTPException as e:
+                yield format_sse("error", {
+                    "detail": e.detail,
+                    "retry_after": (e.headers or {}).get("Retry-After"),
+                })
+                return
+            except Exception as e:
+                print(f"OpenAI streaming call failed: {e}")
+                yield format_sse("error", {"detail": f"Failed to get response from AI: {str(e)[:100]}"})
+                return
+
+        ai_text_reply = detector.text.strip() or "No substantive response from AI."
+        if cached_reply is None:
+            store_similar_reply(similar_cache, project_id, message, ai_text_reply)
+        parsed_action = (
+            detector.action if detector.block_closed
+            else parse_ai_response_for_action(ai_text_reply)
+        )
+        created_item_info = await finalize_chat_reply(
+            db, project_id, message, ai_text_reply, parsed_action
+        )
+        if created_item_info:
+            yield format_sse("created_item", created_item_info)
+        yield format_sse("done", {"reply": ai_text_reply})
 
-    return {"reply": ai_text_reply, "created_item": created_item_info}
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
 
 
 
 @router.post("/projects/{project_id}/generate")
-async def generate_specs(project_id: int, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    """Return generated specifications as Markdown.
+async def generate_specs(
+    project_id: int,
+    stream: bool = False, # True streams text/markdown instead of JSON
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    """Render the project's requirement hierarchy as Markdown.
 
-    The response body is ``{"markdown": str}``.
+    The response body is ``{"markdown": str}``, or the Markdown itself with
+    ``stream=true``. Renders are cached per hierarchy version and subtree
+    (see ``app.services.spec_markdown``).
     """
     project = db.get(Project, project_id)
     if not project or project.owner_id != current_user.id:
         raise HTTPException(status_code=404, detail="Project not found or not authorized")
-    md = "# Stub Specs\n- Spec 1 (from stub, now async)\n- Spec 2 (from stub, now async)"
-    log_activity(db, project_id, "spec_generate_stub", "generate")
+    log_activity(db, project_id, "spec_generate", "generate")
+    if stream:
+        # A sync iterator: Starlette pulls it from the threadpool.
+        return StreamingResponse(
+            render_markdown(db, project), media_type="text/markdown; charset=utf-8"
+        )
+    md = await asyncio.to_thread(lambda: "".join(render_markdown(db, project)))
     return {"markdown": md}
 
 
 @router.post("/projects/{project_id}/validate")
-async def validate_project(project_id: int, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+async def validate_project(
+    project_id: int,
+    full: bool = False, # True rescans the whole hierarchy
+    limit: int = Query(100, ge=0, le=1000),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    """Check the project's requirement hierarchy against the validation rules.
 
+    Only nodes changed since the previous run are re-checked (see
+    ``app.services.validation``). ``errors`` lists up to ``limit`` issues;
+    ``counts`` gives the totals per rule.
+    """
     project = db.get(Project, project_id)
     if not project or project.owner_id != current_user.id:
         raise HTTPException(status_code=404, detail="Project not found or not authorized")
-    log_activity(db, project_id, "validate_project_stub", "validate") # Changed type for clarity
-    return {"complete": True, "errors": []}
+    report = await asyncio.to_thread(validate_hierarchy, db, project_id, full=full, limit=limit)
+    log_activity(
+        db, project_id, "validate_project",
+        json.dumps({"issues": report.issue_count, "checked": report.checked, "full": report.full}),
+    )
+    return asdict(report)
 
 
 @router.get("/ai-activity/sessions", response_model=list[Activity])
-async def get_ai_activity(db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    # Consider filtering by project_id or current_user.id for non-admin users
+async def get_ai_activity(
+    fresh: bool = False,
+    type: Optional[List[str]] = Query(None),
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    """Latest activity across the current user's projects.
 
-    statement = select(Activity).order_by(Activity.timestamp.desc()).limit(10)
-    activities = db.exec(statement).all()
-    return activities
+    Kept for existing clients; ``/api/v1/activity`` pages further back.
+    """
+    if fresh:
+        # Read-your-writes: include entries still queued in the write-behind buffer.
+        await asyncio.to_thread(flush_activities)
+    return list_activity(db, owner_id=current_user.id, types=type, limit=limit).items
@@ -36,3 +36,10 @@ def get_current_user(
         raise credentials_exception
 
     return user
+
+
+def llm_rate_limit(current_user: User = Depends(get_current_user)) -> None:
+    """Charge the caller's LLM request bucket; raises 429 when it is empty."""
+    from app.services.admission import get_admission_controller
+
+    get_admission_controller().charge(current_user.id)
@@ -0,0 +1,136 @@
+import asyncio
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+from sqlmodel import Session, select
+
+from app.api.deps import get_db, get_current_user, llm_rate_limit
+from app.core.config import get_settings
+from app.core.sse import SSE_HEADERS, format_sse
+from app.models.job import Job
+from app.models.project import Project
+from app.models.user import User
+from app.schemas.job import JobRead, JobResult, SpecGenerationJobCreate
+from app.services.jobs import TERMINAL_STATUSES, request_cancel, submit_job
+
+router = APIRouter(prefix="/projects/{project_id}/jobs", tags=["Jobs"])
+
+
+def get_owned_project(db: Session, project_id: int, current_user: User) -> Project:
+    project = db.get(Project, project_id)
+    if not project or project.owner_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Project not found or not authorized")
+    return project
+
+
+def get_project_job(db: Session, project_id: int, job_id: int, current_user: User) -> Job:
+    get_owned_project(db, project_id, current_user)
+    job = db.get(Job, job_id)
+    if not job or job.project_id != project_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.post(
+    "/generate-specifications",
+    response_model=JobRead,
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(llm_rate_limit)],
+)
+def submit_spec_generation(
+    *,
+    project_id: int,
+    job_in: SpecGenerationJobCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Queue AI specification generation followed by their import."""
+    get_owned_project(db, project_id, current_user)
+    return submit_job(
+        db, project_id, current_user.id, "generate_specifications", job_in.model_dump()
+    )
+
+
+@router.get("/", response_model=list[JobRead])
+def list_jobs(
+    *,
+    project_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    get_owned_project(db, project_id, current_user)
+    return db.exec(
+        select(Job).where(Job.project_id == project_id).order_by(Job.id.desc())
+    ).all()
+
+
+@router.get("/{job_id}", response_model=JobRead)
+def read_job(
+    *,
+    project_id: int,
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    return get_project_job(db, project_id, job_id, current_user)
+
+
+@router.get("/{job_id}/result", response_model=JobResult)
+def read_job_result(
+    *,
+    project_id: int,
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    job = get_project_job(db, project_id, job_id, current_user)
+    if job.status not in TERMINAL_STATUSES:
+        raise HTTPException(status_code=409, detail=f"Job is still {job.status}")
+    if job.status != "succeeded":
+        raise HTTPException(status_code=409, detail=job.error or f"Job {job.status}")
+    return JobResult(id=job.id, status=job.status, result=json.loads(job.result or "null"))
+
+
+@router.post("/{job_id}/cancel", response_model=JobRead)
+def cancel_job(
+    *,
+    project_id: int,
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    job = get_project_job(db, project_id, job_id, current_user)
+    if job.status in TERMINAL_STATUSES:
+        raise HTTPException(status_code=409, detail=f"Job already {job.status}")
+    return request_cancel(db, job)
+
+
+@router.get("/{job_id}/events")
+async def job_events(
+    *,
+    project_id: int,
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Server-Sent Events stream of ``status`` events until the job finishes."""
+    job = get_project_job(db, project_id, job_id, current_user)
+    interval = get_settings().job_poll_interval
+
+    def snapshot() -> dict:
+        db.refresh(job)
+        return JobRead.model_validate(job).model_dump(mode="json")
+
+    async def events():
+        last = None
+        while True:
+            current = await asyncio.to_thread(snapshot)
+            if current != last:
+                yield format_sse("status", current)
+                last = current
+            if current["status"] in TERMINAL_STATUSES:
+                return
+            await asyncio.sleep(interval)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
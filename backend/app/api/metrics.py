@@ -0,0 +1,57 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.core.metrics import registry
+from app.db.session import engine
+from app.services.llm_cache import get_response_cache
+
+router = APIRouter(tags=["Metrics"])
+
+
+def _db_pool_samples():
+    pool = engine.pool
+    for state, getter in (
+        ("size", "size"),
+        ("checked_out", "checkedout"),
+        ("overflow", "overflow"),
+        ("checked_in", "checkedin"),
+    ):
+        if hasattr(pool, getter):
+            yield (state,), getattr(pool, getter)()
+
+
+def _threadpool_samples():
+    from anyio.to_thread import current_default_thread_limiter
+
+    limiter = current_default_thread_limiter()
+    yield ("limit",), limiter.total_tokens
+    yield ("busy",), limiter.borrowed_tokens
+    yield ("waiting",), limiter.statistics().tasks_waiting
+
+
+def _llm_cache_samples():
+    cache = get_response_cache()
+    if cache is not None:
+        yield ("memory",), cache.memory_size()
+
+
+registry.register_callback_gauge(
+    "db_pool_connections", "Database connection pool usage.", _db_pool_samples, ("state",)
+)
+registry.register_callback_gauge(
+    "threadpool_workers",
+    "Worker threads running sync endpoints and dependencies.",
+    _threadpool_samples,
+    ("state",),
+)
+registry.register_callback_gauge(
+    "llm_cache_entries", "Entries held by the in-process LLM cache tier.", _llm_cache_samples, ("tier",)
+)
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    # Rendered on the event loop so the threadpool limiter can be inspected.
+    return PlainTextResponse(
+        registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -1,9 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+from dataclasses import asdict
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from sqlmodel import Session, select
 
-from app.api.deps import get_db, get_current_user
+from app.api.deps import get_db, get_current_user, llm_rate_limit
+from app.core.sse import SSE_HEADERS, format_sse
+from app.db.similarity_index import INDEXED_KINDS
+from app.models.project import Project
 from app.models.requirements import Requirement, Epic, Feature, UserStory, UseCase
 from app.models.user import User
+from app.services.items import create_item
+from app.services.similarity import find_similar
+from app.services.ai_spec_service import AISpecService
+from app.services.usage import usage_scope
+from app.services.llm_providers import llm_configured
+from app.services.spec_import import (
+    create_spec_requirement,
+    import_specifications,
+    insert_epics,
+)
 from app.schemas.requirements import (
     RequirementCreate,
     RequirementRead,
@@ -20,6 +38,8 @@ from app.schemas.requirements import (
     UseCaseCreate,
     UseCaseRead,
     UseCaseUpdate,
+    AISpecEpic,
+    AISpecGenerateRequest,
     AISpecImportRequest,
 )
 
@@ -47,13 +67,7 @@ def create_requirement(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    data = requirement_in.dict()
-    data["project_id"] = project_id
-    req = Requirement(**data)
-    db.add(req)
-    db.commit()
-    db.refresh(req)
-    return req
+    return create_item(db, project_id, "requirement", requirement_in.dict())
 
 
 @router.get("/requirements/{req_id}", response_model=RequirementRead)
@@ -131,13 +145,7 @@ def create_epic(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    data = epic_in.dict()
-    data.update({"project_id": project_id, "parent_req_id": req_id})
-    epic = Epic(**data)
-    db.add(epic)
-    db.commit()
-    db.refresh(epic)
-    return epic
+    return create_item(db, project_id, "epic", epic_in.dict(), parent_id=req_id)
 
 
 @router.get("/requirements/{req_id}/epics/{epic_id}", response_model=EpicRead)
@@ -229,13 +237,7 @@ def create_feature(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    data = feature_in.dict()
-    data.update({"project_id": project_id, "parent_epic_id": epic_id})
-    feature = Feature(**data)
-    db.add(feature)
-    db.commit()
-    db.refresh(feature)
-    return feature
+    return create_item(db, project_id, "feature", feature_in.dict(), parent_id=epic_id)
 
 
 @router.get(
@@ -353,13 +355,9 @@ def create_story(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    data = story_in.dict()
-    data.update({"project_id": project_id, "parent_feature_id": feature_id})
-    story = UserStory(**data)
-    db.add(story)
-    db.commit()
-    db.refresh(story)
-    return story
+    return create_item(
+        db, project_id, "user_story", story_in.dict(), parent_id=feature_id
+    )
 
 
 @router.get(
@@ -481,13 +479,9 @@ def create_usecase(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    data = usecase_in.dict()
-    data.update({"project_id": project_id, "parent_story_id": story_id})
-    use_case = UseCase(**data)
-    db.add(use_case)
-    db.commit()
-    db.refresh(use_case)
-    return use_case
+    return create_item(
+        db, project_id, "use_case", usecase_in.dict(), parent_id=story_id
+    )
 
 
 @router.get(
@@ -576,6 +570,33 @@ def delete_usecase(
     return None
 
 
+# -- Near duplicates --
+@router.get("/similar")
+def find_similar_items(
+    *,
+    project_id: int,
+    text: str = Query(..., min_length=1),
+    kind: list[str] = Query(["feature", "user_story"]),
+    threshold: Optional[float] = Query(None, ge=0, le=1),
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Features and user stories whose title and description resemble ``text``."""
+    project = db.get(Project, project_id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    if project.owner_id != current_user.id:
+        raise HTTPException(
+            status_code=403, detail="User does not have access to this project"
+        )
+    unknown = sorted(set(kind) - set(INDEXED_KINDS))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown kind(s): {', '.join(unknown)}")
+    matches = find_similar(db, project_id, text, kind, threshold=threshold, limit=limit)
+    return [asdict(match) for match in matches]
+
+
 # -- Import AI Specifications --
 @router.post("/import-specifications", status_code=201)
 def import_ai_specifications(
@@ -593,77 +614,8 @@ def import_ai_specifications(
             status_code=403, detail="User does not have access to this project"
         )
 
-    created_counts = {"requirements": 0, "epics": 0, "features": 0, "user_stories": 0}
-
     try:
-        timestamp = datetime.datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S UTC")
-        parent_req_title = f"{specs_in.requirement_title} - {timestamp}"
-
-        db_requirement = Requirement.from_orm(
-            RequirementCreate(
-                title=parent_req_title,
-                description=specs_in.requirement_description,
-                project_id=project_id,
-                is_active=True,
-            )
-        )
-        db.add(db_requirement)
-        db.flush()
-        db.refresh(db_requirement)
-        created_counts["requirements"] += 1
-
-        for epic_data in specs_in.epics:
-            db_epic = Epic.from_orm(
-                EpicCreate(
-                    title=epic_data.title,
-                    description=epic_data.description,
-                    project_id=project_id,
-                    parent_req_id=db_requirement.id,
-                    is_active=True,
-                )
-            )
-            db.add(db_epic)
-            db.flush()
-            db.refresh(db_epic)
-            created_counts["epics"] += 1
-
-            for feature_data in epic_data.features:
-                db_feature = Feature.from_orm(
-                    FeatureCreate(
-                        title=feature_data.title,
-                        description=feature_data.description,
-                        project_id=project_id,
-                        parent_epic_id=db_epic.id,
-                        is_active=True,
-                    )
-                )
-                db.add(db_feature)
-                db.flush()
-                db.refresh(db_feature)
-                created_counts["features"] += 1
-
-                for story_text in feature_data.user_stories:
-                    story_title = (
-                        story_text[:255] if len(story_text) > 255 else story_text
-                    )
-                    db_user_story = UserStory.from_orm(
-                        UserStoryCreate(
-                            title=story_title,
-                            description=story_text,
-                            project_id=project_id,
-                            parent_feature_id=db_feature.id,
-                            is_active=True,
-                        )
-                    )
-                    db.add(db_user_story)
-                    created_counts["user_stories"] += 1
-
-        db.commit()
-        return {
-            "message": "Specifications imported successfully",
-            "created_counts": created_counts,
-            "parent_requirement_id": db_requirement.id,
-        }
+        return import_specifications(db, project_id, specs_in)
     except Exception as e:
         db.rollback()
         print(f"Error during specification import, transaction rolled back: {e}")
@@ -671,3 +623,92 @@ def import_ai_specifications(
             status_code=500,
             detail=f"An error occurred during specification import: {str(e)}",
         )
+
+
+# -- Generate AI Specifications (streamed) --
+@router.post("/generate-specifications/stream", dependencies=[Depends(llm_rate_limit)])
+async def stream_ai_specifications(
+    *,
+    project_id: int,
+    spec_in: AISpecGenerateRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Server-Sent Events: generate specifications, importing each epic as it completes.
+
+    Emits ``requirement`` (``{"id", "title"}``) when the first epic arrives
+    and its parent requirement is created, then ``epic`` (``{"index",
+    "epic_id", "epic", "created_counts"}``) once each epic and its features
+    and stories are committed, then ``done`` with the totals. A failure ends
+    the stream with ``error``; epics already sent stay imported.
+    """
+    project = db.get(Project, project_id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    if project.owner_id != current_user.id:
+        raise HTTPException(
+            status_code=403, detail="User does not have access to this project"
+        )
+    if not llm_configured():
+        raise HTTPException(status_code=500, detail="OpenAI API key not configured")
+    name, description = project.name, project.description or ""
+
+    async def events():
+        requirement_id = None
+        counts = {"requirements": 0, "epics": 0, "features": 0, "user_stories": 0}
+
+        def import_epic(epic: AISpecEpic) -> int:
+            # Each epic is its own transaction, so a later failure keeps it.
+            nonlocal requirement_id
+            try:
+                if requirement_id is None:
+                    created = create_spec_requirement(
+                        db, project_id, spec_in.requirement_title, spec_in.requirement_description
+                    )
+                else:
+                    created = requirement_id
+                inserted = insert_epics(db, project_id, created, [epic])
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            if requirement_id is None:
+                requirement_id = created
+                counts["requirements"] = 1
+            for key, value in inserted["counts"].items():
+                counts[key] += value
+            return inserted["epic_ids"][0]
+
+        try:
+            stream = AISpecService().stream_specifications(
+                name, description, spec_in.project_goals, use_cache=spec_in.use_cache
+            )
+            index = 0
+            # Set in here: the generator runs after the endpoint has returned.
+            with usage_scope(project_id, current_user.id):
+                async for epic in stream:
+                    first = requirement_id is None
+                    epic_id = await asyncio.to_thread(import_epic, epic)
+                    if first:
+                        yield format_sse("requirement", {"id": requirement_id, "title": spec_in.requirement_title})
+                    yield format_sse("epic", {
+                        "index": index,
+                        "epic_id": epic_id,
+                        "epic": epic.model_dump(),
+                        "created_counts": counts,
+                    })
+                    index += 1
+        except Exception as e:
+            status_code = e.status_code if isinstance(e, HTTPException) else 500
+            detail = e.detail if isinstance(e, HTTPException) else f"Specification import failed: {e}"
+            print(f"Streamed specification generation stopped after {counts['epics']} epics: {detail}")
+            yield format_sse("error", {
+                "status_code": status_code,
+                "detail": detail,
+                "parent_requirement_id": requirement_id,
+                "created_counts": counts,
+            })
+            return
+        yield format_sse("done", {"parent_requirement_id": requirement_id, "created_counts": counts})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlmodel import Session
+
+from app.api.deps import get_db, get_current_user
+from app.api.jobs import get_owned_project
+from app.models.user import User
+from app.schemas.usage import TokenBudgetStatus, TokenBudgetUpdate, UsageReport
+from app.services.usage import budget_status, flush_usage, invalidate_budget, usage_series
+
+router = APIRouter(tags=["Usage"])
+
+Bucket = Literal["hour", "day", "month"]
+
+
+def _report(
+    db: Session,
+    start: Optional[datetime],
+    end: Optional[datetime],
+    bucket: str,
+    group_by: Optional[str],
+    fresh: bool,
+    **scope,
+) -> dict:
+    end = end or datetime.utcnow()
+    start = start or end - timedelta(days=7)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    if fresh:
+        flush_usage()
+    points = usage_series(db, start=start, end=end, bucket=bucket, group_by=group_by, **scope)
+    return {"bucket": bucket, "start": start, "end": end, "group_by": group_by, "points": points}
+
+
+@router.get("/usage", response_model=UsageReport)
+def read_my_usage(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    bucket: Bucket = "day",
+    group_by: Optional[Literal["project", "endpoint", "model"]] = None,
+    fresh: bool = Query(False, description="Include calls not yet written"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """LLM usage of the current user across projects (UTC buckets; default: last 7 days)."""
+    return _report(db, start, end, bucket, group_by, fresh, user_id=current_user.id)
+
+
+@router.get("/projects/{project_id}/usage", response_model=UsageReport)
+def read_project_usage(
+    project_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    bucket: Bucket = "day",
+    group_by: Optional[Literal["user", "endpoint", "model"]] = None,
+    fresh: bool = Query(False, description="Include calls not yet written"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    get_owned_project(db, project_id, current_user)
+    return _report(db, start, end, bucket, group_by, fresh, project_id=project_id)
+
+
+@router.get("/projects/{project_id}/usage/budget", response_model=TokenBudgetStatus)
+def read_token_budget(
+    project_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    project = get_owned_project(db, project_id, current_user)
+    flush_usage()
+    return budget_status(db, project)
+
+
+@router.put("/projects/{project_id}/usage/budget", response_model=TokenBudgetStatus)
+def update_token_budget(
+    project_id: int,
+    budget_in: TokenBudgetUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Set the project's monthly token budget (``null`` for none)."""
+    project = get_owned_project(db, project_id, current_user)
+    project.token_budget = budget_in.token_budget
+    db.add(project)
+    db.commit()
+    db.refresh(project)
+    invalidate_budget(project_id)
+    return budget_status(db, project)
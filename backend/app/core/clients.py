@@ -0,0 +1,77 @@
+"""App-scoped clients for outbound services.
+
+One pooled ``httpx.AsyncClient`` (keep-alive, bounded connections, explicit
+timeouts) backs every outbound call, including the OpenAI SDK, so requests
+reuse warm TCP/TLS connections instead of paying a handshake each time.
+Getters build the clients on first use, which keeps importing the app cheap;
+the application lifespan calls ``start_clients`` to build them before the
+first request and ``close_clients`` to release the pool on shutdown.
+"""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from app.core.config import get_settings
+
+if TYPE_CHECKING:
+    import httpx
+    from openai import AsyncOpenAI
+
+_http_client: "httpx.AsyncClient | None" = None
+_openai_client: "AsyncOpenAI | None" = None
+
+
+def http_client_options() -> dict:
+    import httpx
+
+    settings = get_settings()
+    return {
+        "limits": httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+            keepalive_expiry=settings.http_keepalive_expiry,
+        ),
+        "timeout": httpx.Timeout(
+            settings.http_read_timeout, connect=settings.http_connect_timeout
+        ),
+    }
+
+
+def get_http_client() -> "httpx.AsyncClient":
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        import httpx
+
+        _http_client = httpx.AsyncClient(**http_client_options())
+    return _http_client
+
+
+def get_openai_client() -> "AsyncOpenAI":
+    global _openai_client
+    if _openai_client is None:
+        from openai import AsyncOpenAI
+
+        settings = get_settings()
+        _openai_client = AsyncOpenAI(
+            api_key=settings.openai_api_key,
+            base_url=settings.openai_base_url,
+            max_retries=settings.openai_max_retries,
+            http_client=get_http_client(),
+        )
+    return _openai_client
+
+
+def start_clients() -> None:
+    get_http_client()
+    if get_settings().openai_api_key:
+        get_openai_client()
+
+
+async def close_clients() -> None:
+    global _http_client, _openai_client
+    if _openai_client is not None:
+        await _openai_client.close()
+        _openai_client = None
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
@@ -0,0 +1,327 @@
+"""Minimal in-process Prometheus metrics.
+
+Each labelled series is created once, the first time its label values are
+seen, and then updated in place: counters and gauges hold a float, histograms
+a preallocated list of bucket counts. Recording a sample therefore allocates
+nothing, and the text exposition format is only built when ``/metrics`` is
+scraped. Label values must come from bounded sets (route templates, model
+names, exception class names), never from raw user input.
+"""
+from __future__ import annotations
+
+from bisect import bisect_left
+from time import perf_counter
+from typing import Callable, Iterable
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> list[str]:
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}"
+            for k, v in self._values.items()
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = value
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class CallbackGauge(_Metric):
+    """Gauge whose samples are computed at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], Iterable[tuple[tuple[str, ...], float]]],
+        labelnames: Iterable[str] = (),
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def render(self) -> list[str]:
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}"
+            for k, v in self.callback()
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [count per bucket..., +Inf count, sum]
+        self._series: dict[tuple[str, ...], list[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series.setdefault(labels, [0] * (len(self.buckets) + 1) + [0.0])
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return int(sum(series[:-1])) if series else 0
+
+    def render(self) -> list[str]:
+        lines = self.header()
+        for labels, series in self._series.items():
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += n
+                le = _format_labels(self.labelnames, labels, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            base = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{base} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{base} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_callback_gauge(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], Iterable[tuple[tuple[str, ...], float]]],
+        labelnames: Iterable[str] = (),
+    ) -> CallbackGauge:
+        return self.register(CallbackGauge(name, documentation, callback, labelnames))
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# HTTP ------------------------------------------------------------------
+
+http_requests = registry.counter(
+    "http_requests_total", "HTTP requests handled.", ("method", "route", "status")
+)
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency.", ("method", "route")
+)
+http_in_flight = registry.gauge("http_requests_in_flight", "HTTP requests being served.")
+
+# LLM -------------------------------------------------------------------
+
+llm_request_duration = registry.histogram(
+    "llm_request_duration_seconds",
+    "Latency of upstream LLM calls.",
+    ("endpoint", "model"),
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0, 120.0),
+)
+llm_time_to_first_token = registry.histogram(
+    "llm_time_to_first_token_seconds",
+    "Delay before the first streamed token of an LLM call.",
+    ("endpoint", "model"),
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0),
+)
+llm_tokens = registry.counter(
+    "llm_tokens_total", "Tokens consumed by LLM calls.", ("endpoint", "model", "kind")
+)
+llm_errors = registry.counter(
+    "llm_errors_total", "Failed LLM calls.", ("endpoint", "model", "error")
+)
+llm_coalesced = registry.counter(
+    "llm_coalesced_total",
+    "LLM calls answered by joining an identical call already in flight.",
+    ("endpoint",),
+)
+llm_retries = registry.counter(
+    "llm_retries_total", "LLM requests retried after a transient error.", ("endpoint", "error")
+)
+llm_hedges = registry.counter(
+    "llm_hedges_total",
+    "Hedged LLM requests: fired after the hedge delay, and won the race.",
+    ("endpoint", "outcome"),
+)
+llm_budget_exhausted = registry.counter(
+    "llm_budget_exhausted_total",
+    "LLM calls abandoned because their latency budget ran out.",
+    ("endpoint",),
+)
+llm_admission_active = registry.gauge(
+    "llm_admission_active", "Upstream LLM calls holding a concurrency slot."
+)
+llm_admission_queue_depth = registry.gauge(
+    "llm_admission_queue_depth", "LLM calls waiting for a concurrency slot.", ("priority",)
+)
+llm_admission_wait = registry.histogram(
+    "llm_admission_wait_seconds",
+    "Time LLM calls spent queued for a concurrency slot.",
+    ("priority",),
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+llm_admission_rejected = registry.counter(
+    "llm_admission_rejected_total",
+    "LLM requests refused by admission control (user_rate, queue_full, queue_timeout).",
+    ("reason",),
+)
+llm_cache_lookups = registry.counter(
+    "llm_cache_lookups_total",
+    "LLM response cache lookups by result (memory_hit, disk_hit, miss, bypass,"
+    " similar_hit, similar_miss).",
+    ("endpoint", "result"),
+)
+write_behind_pending = registry.gauge(
+    "write_behind_pending_rows", "Rows queued in a write-behind buffer.", ("buffer",)
+)
+write_behind_flush_duration = registry.histogram(
+    "write_behind_flush_duration_seconds", "Duration of write-behind flushes.", ("buffer",)
+)
+write_behind_rows = registry.counter(
+    "write_behind_rows_total",
+    "Rows leaving a write-behind buffer by result (written, dropped).",
+    ("buffer", "result"),
+)
+activity_archived_rows = registry.counter(
+    "activity_archived_rows_total", "Activity rows moved into archive segments by retention."
+)
+chat_tool_calls = registry.counter(
+    "chat_tool_calls_total",
+    "Tool calls made by the /chat agent by result (ok, error, rejected).",
+    ("tool", "result"),
+)
+chat_agent_steps = registry.histogram(
+    "chat_agent_steps",
+    "Model turns per /chat agent run.",
+    buckets=(1, 2, 3, 4, 6, 8, 12),
+)
+chat_agent_stopped = registry.counter(
+    "chat_agent_stopped_total",
+    "/chat agent runs cut short by a limit (max_steps, time_limit).",
+    ("reason",),
+)
+validation_duration = registry.histogram(
+    "validation_duration_seconds", "Project validation runs by mode (full, incremental).", ("mode",)
+)
+validation_nodes_checked = registry.counter(
+    "validation_nodes_checked_total", "Hierarchy nodes evaluated by project validation.", ("mode",)
+)
+spec_markdown_cache_lookups = registry.counter(
+    "spec_markdown_cache_lookups_total",
+    "Rendered specification cache lookups by level (document, fragment) and result (hit, miss).",
+    ("level", "result"),
+)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency and in-flight requests."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = "500"
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        http_in_flight.inc()
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = perf_counter() - start
+            http_in_flight.dec()
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "<unmatched>"
+            method = scope.get("method", "")
+            http_request_duration.observe(elapsed, method, template)
+            http_requests.inc(method, template, status)
@@ -0,0 +1,10 @@
+"""Helpers for ``text/event-stream`` responses."""
+import json
+from typing import Any
+
+# Disable proxy buffering (nginx) so events reach the browser as they are sent.
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def format_sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+from typing import Any, Sequence, Type
+
+from sqlalchemy import insert, select
+from sqlmodel import Session, SQLModel
+
+from app.db.change_tracking import record_inserted
+from app.db.similarity_index import index_inserted
+
+
+def insert_strategy(db: Session) -> str:
+    """Pick how ``bulk_insert`` talks to the bound dialect.
+
+    - ``"sqlite"``: one ``executemany`` followed by reading back the trailing
+      rowids. SQLite can only honour ordered ``RETURNING`` one row per
+      statement, but ``INTEGER PRIMARY KEY`` rows inserted while we hold the
+      write lock get contiguous ``max(id) + 1`` ids. Rows carrying their own
+      ``id`` are returned as given, and ids read back that are not the
+      contiguous tail the rows must have received (a rowid that reached its
+      maximum makes SQLite pick random ones) raise instead of being mismatched.
+    - ``"returning"``: ordered multi-row ``INSERT ... RETURNING id`` batches
+      (PostgreSQL).
+    - ``"orm"``: add the objects and flush once, for dialects without either.
+    """
+    dialect = db.get_bind().dialect
+    if dialect.name == "sqlite":
+        return "sqlite"
+    if (
+        dialect.insert_executemany_returning
+        and dialect.insert_executemany_returning_sort_by_parameter_order
+    ):
+        return "returning"
+    return "orm"
+
+
+def bulk_insert(
+    db: Session, model: Type[SQLModel], rows: Sequence[dict[str, Any]]
+) -> list[int]:
+    """Insert ``rows`` into ``model``'s table and return their ids in order.
+
+    Every row must carry the same keys. Runs inside the caller's
+    transaction; nothing is committed. Requirement-hierarchy rows are
+    reported to change tracking (``app.db.change_tracking``), features and
+    stories to the near-duplicate index (``app.db.similarity_index``).
+    """
+    if not rows:
+        return []
+    strategy = insert_strategy(db)
+    if strategy == "sqlite":
+        table = model.__table__
+        db.execute(insert(table), list(rows))
+        if "id" in rows[0]:
+            ids = [row["id"] for row in rows]
+        else:
+            ids = list(
+                db.execute(
+                    select(table.c.id).order_by(table.c.id.desc()).limit(len(rows))
+                ).scalars()
+            )
+            ids.reverse()
+            if len(ids) != len(rows) or ids[-1] - ids[0] != len(rows) - 1:
+                raise RuntimeError(
+                    f"{table.name}: inserted rows did not get contiguous ids, cannot map them"
+                )
+        record_inserted(db, model, rows, ids)
+        index_inserted(db, model, rows, ids)
+        return ids
+    if strategy == "returning":
+        stmt = insert(model).returning(model.id, sort_by_parameter_order=True)
+        ids = list(db.execute(stmt, list(rows)).scalars())
+        record_inserted(db, model, rows, ids)
+        index_inserted(db, model, rows, ids)
+        return ids
+    objects = [model(**row) for row in rows]
+    db.add_all(objects)
+    db.flush()
+    return [obj.id for obj in objects]
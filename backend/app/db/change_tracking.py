@@ -0,0 +1,135 @@
+"""Change tracking for the requirement hierarchy.
+
+Incremental validation (``app.services.validation``) re-checks only the nodes
+written since a project was last validated. To know which, every flush that
+inserts, updates or deletes a ``Requirement``, ``Epic``, ``Feature``,
+``UserStory`` or ``UseCase`` appends ``HierarchyChange`` rows in the same
+transaction (a session ``after_flush`` hook), so a change is recorded exactly
+when it commits. Core bulk inserts bypass the ORM; ``bulk_insert`` reports
+their rows through ``record_inserted``.
+
+Only projects that have been validated once (they have a
+``ValidationState``) are tracked: until then there is nothing to keep
+incremental, and the first validation scans everything anyway.
+
+Independently of that, the first such write in a transaction bumps
+``Project.hierarchy_version`` for every project it touches, which is what the
+Markdown renderer (``app.services.spec_markdown``) keys its cache on.
+"""
+from __future__ import annotations
+
+from itertools import chain
+from typing import Any, Optional, Sequence
+
+from sqlalchemy import event, insert, inspect, select, update
+from sqlalchemy.orm import Session
+
+from app.models.project import Project
+from app.models.requirements import Epic, Feature, Requirement, UseCase, UserStory
+from app.models.validation import HierarchyChange, ValidationState
+
+# model -> (kind, parent id column); kinds match app.services.items.ITEM_KINDS
+TRACKED: dict[type, tuple[str, Optional[str]]] = {
+    Requirement: ("requirement", None),
+    Epic: ("epic", "parent_req_id"),
+    Feature: ("feature", "parent_epic_id"),
+    UserStory: ("user_story", "parent_feature_id"),
+    UseCase: ("use_case", "parent_story_id"),
+}
+
+
+def _tracked(session: Session, project_ids: set[int]) -> set[int]:
+    # Looked up once per project and transaction, not once per flush.
+    known: dict[int, bool] = session.info.setdefault("validation_tracked", {})
+    unknown = project_ids - known.keys()
+    if unknown:
+        found = set(
+            session.connection().execute(
+                select(ValidationState.project_id).where(ValidationState.project_id.in_(unknown))
+            ).scalars()
+        )
+        known.update((project_id, project_id in found) for project_id in unknown)
+    return {project_id for project_id in project_ids if known[project_id]}
+
+
+def _bump_versions(session: Session, project_ids: set[int]) -> None:
+    # Once per project and transaction: the version names a committed state.
+    bumped: set[int] = session.info.setdefault("hierarchy_bumped", set())
+    pending = project_ids - bumped
+    if pending:
+        session.connection().execute(
+            update(Project.__table__)
+            .where(Project.__table__.c.id.in_(pending))
+            .values(hierarchy_version=Project.__table__.c.hierarchy_version + 1)
+        )
+        bumped |= pending
+
+
+def has_uncommitted_writes(session: Session, project_id: int) -> bool:
+    """Whether ``session``'s open transaction has written the project's hierarchy."""
+    return project_id in session.info.get("hierarchy_bumped", ())
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _forget_tracked(session: Session, transaction: Any) -> None:
+    session.info.pop("validation_tracked", None)
+    session.info.pop("hierarchy_bumped", None)
+
+
+def _write(session: Session, rows: list[dict[str, Any]]) -> None:
+    project_ids = {row["project_id"] for row in rows}
+    _bump_versions(session, project_ids)
+    tracked = _tracked(session, project_ids)
+    rows = [row for row in rows if row["project_id"] in tracked]
+    if rows:
+        session.connection().execute(insert(HierarchyChange.__table__), rows)
+
+
+def _change(obj: Any, kind: str, parent_id: Optional[int]) -> dict[str, Any]:
+    return {"project_id": obj.project_id, "kind": kind, "node_id": obj.id, "parent_id": parent_id}
+
+
+@event.listens_for(Session, "after_flush")
+def _record_flush(session: Session, flush_context: Any) -> None:
+    # Runs before the new/dirty/deleted sets and attribute history are reset.
+    rows = []
+    for obj in chain(session.new, session.deleted):
+        if (spec := TRACKED.get(type(obj))) is not None:
+            kind, field = spec
+            rows.append(_change(obj, kind, getattr(obj, field) if field else None))
+    for obj in session.dirty:
+        spec = TRACKED.get(type(obj))
+        if spec is None or not session.is_modified(obj, include_collections=False):
+            continue
+        kind, field = spec
+        parent_id = getattr(obj, field) if field else None
+        rows.append(_change(obj, kind, parent_id))
+        if field:
+            # A move changes the old parent (and its children's siblings) too.
+            for old in inspect(obj).attrs[field].history.deleted:
+                if old is not None and old != parent_id:
+                    rows.append(_change(obj, kind, old))
+    if rows:
+        _write(session, rows)
+
+
+def record_inserted(
+    db: Session, model: type, rows: Sequence[dict[str, Any]], ids: Sequence[int]
+) -> None:
+    """Record rows inserted with Core statements, which the flush hook does not see."""
+    spec = TRACKED.get(model)
+    if spec is None or not ids:
+        return
+    kind, field = spec
+    _write(
+        db,
+        [
+            {
+                "project_id": row["project_id"],
+                "kind": kind,
+                "node_id": node_id,
+                "parent_id": row.get(field) if field else None,
+            }
+            for row, node_id in zip(rows, ids)
+        ],
+    )
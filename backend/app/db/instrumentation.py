@@ -0,0 +1,159 @@
+"""Per-request SQL query counting and timing.
+
+SQLAlchemy cursor events feed a ``QueryStats`` bound to the current request
+through a context variable (FastAPI copies the context into the threadpool
+that runs sync endpoints, so every query a request issues lands in the same
+object). ``QueryTimingMiddleware`` reports the totals in a ``Server-Timing``
+header and in the logs, and flags statements repeated at least
+``sql_n_plus_one_threshold`` times as N+1 suspects.
+
+Tests can assert on query counts directly::
+
+    with assert_max_queries(5):
+        client.get("/projects/1")
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    duration: float = 0.0
+    statements: Counter = field(default_factory=Counter)
+
+    def record(self, statement: str, elapsed: float) -> None:
+        self.count += 1
+        self.duration += elapsed
+        self.statements[statement] += 1
+
+    def n_plus_one_suspects(self, threshold: int) -> list[tuple[str, int]]:
+        """Statements executed at least ``threshold`` times, most frequent first."""
+        if threshold <= 0:
+            return []
+        return [(s, n) for s, n in self.statements.most_common() if n >= threshold]
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.duration * 1000:.2f};desc="{self.count} queries"'
+
+
+_current: ContextVar[QueryStats | None] = ContextVar("sql_query_stats", default=None)
+_captures: list[QueryStats] = []
+_captures_lock = threading.Lock()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    stats = _current.get()
+    if stats is not None:
+        stats.record(statement, elapsed)
+    if _captures:
+        with _captures_lock:
+            for captured in _captures:
+                captured.record(statement, elapsed)
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """Collect the queries issued from the current context (one request)."""
+    stats = QueryStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def capture_queries() -> Iterator[QueryStats]:
+    """Collect every query issued by any thread while the block runs."""
+    stats = QueryStats()
+    with _captures_lock:
+        _captures.append(stats)
+    try:
+        yield stats
+    finally:
+        with _captures_lock:
+            _captures.remove(stats)
+
+
+@contextmanager
+def assert_max_queries(limit: int) -> Iterator[QueryStats]:
+    with capture_queries() as stats:
+        yield stats
+    if stats.count > limit:
+        top = "\n".join(f"  {n}x {s}" for s, n in stats.statements.most_common(5))
+        raise AssertionError(
+            f"expected at most {limit} queries, got {stats.count}:\n{top}"
+        )
+
+
+class QueryTimingMiddleware:
+    """ASGI middleware exposing per-request query stats."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries() as stats:
+
+            async def send_with_timing(message):
+                if message["type"] == "http.response.start" and stats.count:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", stats.server_timing().encode()))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_timing)
+            finally:
+                if stats.count:
+                    _log_request(scope, stats)
+
+
+def _log_request(scope, stats: QueryStats) -> None:
+    path = scope.get("path", "")
+    logger.info(
+        "%s %s: %d queries in %.1f ms",
+        scope.get("method"),
+        path,
+        stats.count,
+        stats.duration * 1000,
+    )
+    threshold = get_settings().sql_n_plus_one_threshold
+    for statement, n in stats.n_plus_one_suspects(threshold):
+        logger.warning(
+            "Possible N+1 on %s %s: %d executions of %s",
+            scope.get("method"),
+            path,
+            n,
+            " ".join(statement.split())[:200],
+        )
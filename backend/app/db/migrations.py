@@ -0,0 +1,215 @@
+"""Ordered, idempotent schema migrations tracked in a ``schema_version`` table.
+
+Startup reads the recorded version with a single ``SELECT``; when it matches
+``LATEST_VERSION`` nothing else runs, so warm restarts skip all DDL and
+inspection. Otherwise each pending migration is applied in its own
+transaction together with the version bump. Every migration must be safe to
+re-run against a database that already has its changes (``IF NOT EXISTS``,
+column checks), because databases created by older releases through
+``create_all`` may already contain some of them.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Callable
+
+from sqlalchemy import Column, Integer, MetaData, Table, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlmodel import SQLModel
+
+schema_metadata = MetaData()
+schema_version = Table(
+    "schema_version",
+    schema_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("version", Integer, nullable=False),
+)
+
+# Arbitrary key for pg_advisory_xact_lock so concurrent workers migrate once.
+_PG_LOCK_KEY = 4_186_026
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    description: str
+    apply: Callable[[Connection], None]
+
+
+# Helpers --------------------------------------------------------------
+
+
+def create_index(
+    conn: Connection, name: str, table: str, columns: list[str]
+) -> None:
+    cols = ", ".join(columns)
+    conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({cols})"))
+
+
+def add_column(conn: Connection, table: str, name: str, ddl: str) -> None:
+    """Add ``name`` to ``table`` unless it already exists."""
+    existing = {c["name"] for c in inspect(conn).get_columns(table)}
+    if name not in existing:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+
+
+def create_table(conn: Connection, name: str) -> None:
+    """Create the model table ``name`` unless it already exists."""
+    _import_models()
+    SQLModel.metadata.tables[name].create(conn, checkfirst=True)
+
+
+def _import_models() -> None:
+    # Registers every table on SQLModel.metadata.
+    import app.models  # noqa: F401
+
+
+# Migrations -----------------------------------------------------------
+
+
+def _baseline(conn: Connection) -> None:
+    _import_models()
+    SQLModel.metadata.create_all(conn)
+
+
+def _foreign_key_indexes(conn: Connection) -> None:
+    create_index(conn, "ix_requirement_project_id", "requirement", ["project_id"])
+    create_index(conn, "ix_epic_project_id", "epic", ["project_id"])
+    create_index(conn, "ix_epic_parent_req_id", "epic", ["parent_req_id"])
+    create_index(conn, "ix_feature_project_id", "feature", ["project_id"])
+    create_index(conn, "ix_feature_parent_epic_id", "feature", ["parent_epic_id"])
+    create_index(conn, "ix_userstory_project_id", "userstory", ["project_id"])
+    create_index(
+        conn, "ix_userstory_parent_feature_id", "userstory", ["parent_feature_id"]
+    )
+    create_index(conn, "ix_usecase_project_id", "usecase", ["project_id"])
+    create_index(conn, "ix_usecase_parent_story_id", "usecase", ["parent_story_id"])
+    create_index(conn, "ix_item_project_id", "item", ["project_id"])
+    create_index(conn, "ix_item_parent_id", "item", ["parent_id"])
+    create_index(conn, "ix_project_owner_id", "project", ["owner_id"])
+    create_index(conn, "ix_activity_project_id", "activity", ["project_id"])
+
+
+def _conversation_summary(conn: Connection) -> None:
+    create_table(conn, "conversationsummary")
+
+
+def _jobs(conn: Connection) -> None:
+    create_table(conn, "job")
+    create_index(conn, "ix_job_project_id", "job", ["project_id"])
+    create_index(conn, "ix_job_status", "job", ["status"])
+
+
+def _activity_history(conn: Connection) -> None:
+    create_index(
+        conn,
+        "ix_activity_project_id_timestamp",
+        "activity",
+        ["project_id", "timestamp", "id"],
+    )
+    create_table(conn, "activityarchive")
+    create_index(conn, "ix_activityarchive_project_id", "activityarchive", ["project_id"])
+
+
+def _llm_usage(conn: Connection) -> None:
+    create_table(conn, "llmusage")
+    create_table(conn, "usagerollup")
+    create_index(
+        conn, "ix_llmusage_project_id_created_at", "llmusage", ["project_id", "created_at"]
+    )
+    create_index(conn, "ix_usagerollup_user_id_bucket", "usagerollup", ["user_id", "bucket"])
+    add_column(conn, "project", "token_budget", "INTEGER")
+
+
+def _incremental_validation(conn: Connection) -> None:
+    create_table(conn, "hierarchychange")
+    create_table(conn, "validationstate")
+    create_table(conn, "validationissue")
+    create_index(
+        conn, "ix_hierarchychange_project_id_id", "hierarchychange", ["project_id", "id"]
+    )
+    create_index(
+        conn,
+        "ix_validationissue_project_id_kind_node_id",
+        "validationissue",
+        ["project_id", "kind", "node_id"],
+    )
+
+
+def _hierarchy_version(conn: Connection) -> None:
+    add_column(conn, "project", "hierarchy_version", "INTEGER NOT NULL DEFAULT 0")
+
+
+def _similarity_index(conn: Connection) -> None:
+    from app.db.similarity_index import reindex
+
+    create_table(conn, "similaritybucket")
+    create_index(
+        conn,
+        "ix_similaritybucket_project_id_kind_bucket",
+        "similaritybucket",
+        ["project_id", "kind", "bucket"],
+    )
+    create_index(
+        conn, "ix_similaritybucket_kind_node_id", "similaritybucket", ["kind", "node_id"]
+    )
+    reindex(conn)
+
+
+MIGRATIONS: list[Migration] = [
+    Migration(1, "baseline tables", _baseline),
+    Migration(2, "foreign key indexes", _foreign_key_indexes),
+    Migration(3, "chat conversation summaries", _conversation_summary),
+    Migration(4, "background jobs", _jobs),
+    Migration(5, "activity history index and archive", _activity_history),
+    Migration(6, "LLM usage accounting and project token budgets", _llm_usage),
+    Migration(7, "incremental project validation", _incremental_validation),
+    Migration(8, "project hierarchy versions", _hierarchy_version),
+    Migration(9, "near-duplicate index for features and stories", _similarity_index),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+# Runner ---------------------------------------------------------------
+
+
+def current_version(conn: Connection) -> int:
+    """Return the recorded schema version, or 0 for an unversioned database."""
+    try:
+        version = conn.execute(select(schema_version.c.version)).scalar()
+    except (OperationalError, ProgrammingError):
+        conn.rollback()
+        return 0
+    return version or 0
+
+
+def _set_version(conn: Connection, version: int) -> None:
+    updated = conn.execute(schema_version.update().values(version=version))
+    if not updated.rowcount:
+        conn.execute(schema_version.insert().values(id=1, version=version))
+
+
+def migrate(engine: Engine) -> list[int]:
+    """Bring the database up to ``LATEST_VERSION``.
+
+    Returns the versions applied by this call (empty when already current).
+    """
+    with engine.connect() as conn:
+        if current_version(conn) == LATEST_VERSION:
+            return []
+
+    applied: list[int] = []
+    for migration in MIGRATIONS:
+        with engine.begin() as conn:
+            if conn.dialect.name == "postgresql":
+                conn.execute(text("SELECT pg_advisory_xact_lock(:k)"), {"k": _PG_LOCK_KEY})
+            schema_metadata.create_all(conn)
+            # Re-read under the lock: another worker may have migrated already.
+            if current_version(conn) >= migration.version:
+                continue
+            migration.apply(conn)
+            _set_version(conn, migration.version)
+            applied.append(migration.version)
+    return applied
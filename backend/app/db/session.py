@@ -1,9 +1,44 @@
-from sqlmodel import SQLModel, create_engine, Session
+from typing import Any
 
-from app.core.config import get_settings
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import StaticPool
+from sqlmodel import create_engine, Session
 
-settings = get_settings()
-engine = create_engine(settings.sqlite_url, connect_args={"check_same_thread": False})
+from app.core.config import Settings, get_settings
+
+
+def engine_options(url: str, settings: Settings) -> dict[str, Any]:
+    """Return ``create_engine`` keyword arguments tuned for the URL's dialect.
+
+    SQLite keeps its single-file defaults (and a shared connection for
+    in-memory databases); server databases such as PostgreSQL get a sized
+    ``QueuePool`` with pre-ping and recycling so stale connections are dropped
+    instead of surfacing as request errors.
+    """
+    backend = make_url(url).get_backend_name()
+    options: dict[str, Any] = {"echo": settings.db_echo}
+    if backend == "sqlite":
+        options["connect_args"] = {"check_same_thread": False}
+        if make_url(url).database in (None, "", ":memory:"):
+            options["poolclass"] = StaticPool
+        return options
+    options.update(
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=True,
+    )
+    return options
+
+
+def _create_engine():
+    settings = get_settings()
+    url = settings.sqlalchemy_database_url
+    return create_engine(url, **engine_options(url, settings))
+
+
+engine = _create_engine()
 
 
 def get_session():
@@ -12,13 +47,7 @@ def get_session():
 
 
 def init_db() -> None:
-    # Import all models here before calling create_all
-    # to ensure their metadata is registered.
-    print("init DB !")
-    import app.models.user  # noqa: F401
-    import app.models.project  # noqa: F401
-    import app.models.requirements  # noqa: F401
-    import app.models.item  # noqa: F401
-
-    # Add other model modules if they exist, e.g., app.models.activity
-    SQLModel.metadata.create_all(engine)
+    """Apply pending schema migrations; a no-op when the schema is current."""
+    from app.db.migrations import migrate
+
+    migrate(engine)
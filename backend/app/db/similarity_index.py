@@ -0,0 +1,163 @@
+"""Maintenance of the near-duplicate index (``SimilarityBucket``).
+
+Features and user stories are indexed. That covers both the requirement
+tables and agent ``Item`` rows of those types. Each node is indexed by the
+LSH band keys of the MinHash signature of its normalised title and
+description (``app.services.minhash``). A session ``after_flush`` hook writes
+the rows in the same transaction as the node, so every worker sees the same
+index. Core bulk inserts report their rows through ``index_inserted``.
+Inactive nodes, and nodes without any terms, are not indexed.
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Iterable, Mapping, Optional, Sequence
+
+from sqlalchemy import Connection, delete, event, insert, inspect, select
+from sqlalchemy.orm import Session
+
+from app.models.item import Item, ItemType
+from app.models.requirements import Feature, UserStory
+from app.models.similarity import SimilarityBucket
+from app.services.minhash import MinHasher, band_keys, normalize
+
+
+@dataclass(frozen=True)
+class IndexedKind:
+    model: type
+    item_type: Optional[ItemType] = None  # for Item rows
+
+
+INDEXED_KINDS: dict[str, IndexedKind] = {
+    "feature": IndexedKind(Feature),
+    "user_story": IndexedKind(UserStory),
+    "item_feature": IndexedKind(Item, ItemType.FEATURE),
+    "item_user_story": IndexedKind(Item, ItemType.US),
+}
+_KINDS_OF_MODEL: dict[type, list[str]] = defaultdict(list)
+for _kind, _spec in INDEXED_KINDS.items():
+    _KINDS_OF_MODEL[_spec.model].append(_kind)
+
+BANDS = 16
+# Band keys are stored, so the permutations must not change between runs.
+HASHER = MinHasher(num_perm=64, seed=1)
+# A change to any of these re-indexes the node.
+_INDEXED_FIELDS = ("title", "description", "is_active", "type", "project_id")
+_CHUNK = 500
+
+
+def node_terms(title: Optional[str], description: Optional[str]) -> set[str]:
+    return normalize(f"{title or ''} {description or ''}")
+
+
+def bucket_keys(signature: tuple[int, ...]) -> list[int]:
+    return band_keys(signature, BANDS)
+
+
+def kind_of(model: type, values: Mapping[str, Any]) -> Optional[str]:
+    for kind in _KINDS_OF_MODEL.get(model, ()):
+        item_type = INDEXED_KINDS[kind].item_type
+        if item_type is None or values.get("type") == item_type:
+            return kind
+    return None
+
+
+def bucket_rows(model: type, values: Mapping[str, Any], node_id: int) -> list[dict[str, Any]]:
+    """The ``SimilarityBucket`` rows of one node, given its column values."""
+    kind = kind_of(model, values)
+    if kind is None or not values.get("is_active", True):
+        return []
+    terms = node_terms(values.get("title"), values.get("description"))
+    if not terms:
+        return []
+    project_id = values["project_id"]
+    return [
+        {"project_id": project_id, "kind": kind, "node_id": node_id, "bucket": key}
+        for key in bucket_keys(HASHER.signature(terms))
+    ]
+
+
+def _chunks(ids: Iterable[int]) -> Iterable[list[int]]:
+    ids = list(ids)
+    for i in range(0, len(ids), _CHUNK):
+        yield ids[i:i + _CHUNK]
+
+
+def _write(conn: Connection, stale: Mapping[type, set[int]], rows: list[dict[str, Any]]) -> None:
+    table = SimilarityBucket.__table__
+    for model, ids in stale.items():
+        for chunk in _chunks(ids):
+            conn.execute(
+                delete(table).where(
+                    table.c.kind.in_(_KINDS_OF_MODEL[model]), table.c.node_id.in_(chunk)
+                )
+            )
+    if rows:
+        conn.execute(insert(table), rows)
+
+
+def _values(obj: Any) -> dict[str, Any]:
+    return {field: getattr(obj, field) for field in _INDEXED_FIELDS if hasattr(obj, field)}
+
+
+@event.listens_for(Session, "after_flush")
+def _index_flush(session: Session, flush_context: Any) -> None:
+    stale: dict[type, set[int]] = defaultdict(set)
+    rows: list[dict[str, Any]] = []
+    for obj in session.new:
+        if type(obj) in _KINDS_OF_MODEL:
+            rows += bucket_rows(type(obj), _values(obj), obj.id)
+    for obj in session.deleted:
+        if type(obj) in _KINDS_OF_MODEL:
+            stale[type(obj)].add(obj.id)
+    for obj in session.dirty:
+        if type(obj) not in _KINDS_OF_MODEL:
+            continue
+        attrs = inspect(obj).attrs
+        if any(
+            field in attrs.keys() and attrs[field].history.has_changes()
+            for field in _INDEXED_FIELDS
+        ):
+            stale[type(obj)].add(obj.id)
+            rows += bucket_rows(type(obj), _values(obj), obj.id)
+    if stale or rows:
+        _write(session.connection(), stale, rows)
+
+
+def index_inserted(
+    db: Session, model: type, rows: Sequence[dict[str, Any]], ids: Sequence[int]
+) -> None:
+    """Index rows inserted with Core statements, which the flush hook does not see."""
+    if model not in _KINDS_OF_MODEL:
+        return
+    buckets = [
+        bucket for row, node_id in zip(rows, ids) for bucket in bucket_rows(model, row, node_id)
+    ]
+    if buckets:
+        _write(db.connection(), {}, buckets)
+
+
+def reindex(conn: Connection, project_id: Optional[int] = None) -> int:
+    """Rebuild the index from the node tables; returns the number of nodes indexed."""
+    indexed = 0
+    for model, kinds in _KINDS_OF_MODEL.items():
+        table = model.__table__
+        columns = [table.c.id] + [table.c[f] for f in _INDEXED_FIELDS if f in table.c]
+        statement = select(*columns)
+        bucket_table = SimilarityBucket.__table__
+        clear = delete(bucket_table).where(bucket_table.c.kind.in_(kinds))
+        if project_id is not None:
+            statement = statement.where(table.c.project_id == project_id)
+            clear = clear.where(bucket_table.c.project_id == project_id)
+        conn.execute(clear)
+        batch: list[dict[str, Any]] = []
+        for row in conn.execute(statement).mappings():
+            buckets = bucket_rows(model, row, row["id"])
+            indexed += bool(buckets)
+            batch += buckets
+            if len(batch) >= 10 * _CHUNK:
+                _write(conn, {}, batch)
+                batch = []
+        _write(conn, {}, batch)
+    return indexed
@@ -0,0 +1,162 @@
+"""Write-behind buffering for append-only rows such as activity logs.
+
+``WriteBehindBuffer.add`` queues a row in memory and returns at once; rows
+are inserted with one ``executemany`` and one commit per flush, whenever
+``batch_size`` rows are waiting or ``flush_interval`` seconds have passed
+(the flusher runs as an asyncio task, like the job workers, with the
+database work in a thread). Rows keep the order they were added in.
+
+The queue is bounded: once ``max_pending`` rows are waiting, ``add`` called
+from a worker thread flushes in the caller, so an overloaded database slows
+writers down instead of growing memory. On the event loop ``add`` never
+touches the database; it wakes the flusher instead. A flush that fails puts
+its rows back, up to that same bound; anything beyond it is dropped and
+counted. ``add`` itself never raises, so an unreachable database costs log
+rows, not requests. ``stop`` flushes what
+is left, so a clean shutdown loses nothing.
+
+Readers that must see their own writes call ``flush`` first. ``on_flush``
+runs in the flush's transaction, e.g. to keep aggregates of the rows in step
+with them.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+from time import perf_counter
+from typing import Any, Callable, Optional
+
+from sqlalchemy import insert
+from sqlmodel import Session, SQLModel
+
+from app.core.metrics import write_behind_flush_duration, write_behind_pending, write_behind_rows
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    def __init__(
+        self,
+        model: type[SQLModel],
+        session_factory: Callable[[], Session],
+        batch_size: int = 100,
+        flush_interval: float = 0.5,
+        max_pending: int = 10_000,
+        on_flush: Optional[Callable[[Session, list[dict[str, Any]]], None]] = None,
+    ):
+        self.model = model
+        self.name = model.__tablename__
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.on_flush = on_flush  # extra writes made in each flush's transaction
+        self._pending: list[dict[str, Any]] = []
+        self._lock = threading.Lock()  # guards _pending
+        self._flush_lock = threading.Lock()  # one flush at a time keeps rows in order
+        self._wake: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def pending(self, **match: Any) -> int:
+        """Number of queued rows, optionally only those whose columns equal ``match``."""
+        with self._lock:
+            return sum(all(row.get(k) == v for k, v in match.items()) for row in self._pending)
+
+    def add(self, **row: Any) -> None:
+        with self._lock:
+            self._pending.append(row)
+            size = len(self._pending)
+        write_behind_pending.set(size, self.name)
+        if size >= self.max_pending:
+            self._backpressure()
+        elif size >= self.batch_size:
+            self._signal()
+
+    def _backpressure(self) -> None:
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            # Blocking I/O would stall the whole event loop: hand the work to
+            # the flusher and keep the queue bounded meanwhile.
+            self._signal()
+            self._requeue([])
+            return
+        try:
+            self.flush()  # the calling thread pays for the write
+        except Exception:
+            pass  # logged and requeued (within the bound) by flush
+
+    def _signal(self) -> None:
+        if self._loop is not None and self._wake is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def flush(self) -> int:
+        """Write every queued row in one transaction; returns how many were written."""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._pending = self._pending, []
+            if not rows:
+                return 0
+            start = perf_counter()
+            try:
+                with self.session_factory() as db:
+                    db.execute(insert(self.model.__table__), rows)
+                    if self.on_flush is not None:
+                        self.on_flush(db, rows)
+                    db.commit()
+            except Exception:
+                logger.exception("Flushing %d %s rows failed", len(rows), self.name)
+                self._requeue(rows)
+                raise
+            finally:
+                write_behind_flush_duration.observe(perf_counter() - start, self.name)
+            write_behind_rows.inc(self.name, "written", amount=len(rows))
+            with self._lock:
+                write_behind_pending.set(len(self._pending), self.name)
+            return len(rows)
+
+    def _requeue(self, rows: list[dict[str, Any]]) -> None:
+        with self._lock:
+            merged = rows + self._pending
+            dropped = max(0, len(merged) - self.max_pending)
+            self._pending = merged[dropped:]
+            write_behind_pending.set(len(self._pending), self.name)
+        if dropped:
+            write_behind_rows.inc(self.name, "dropped", amount=dropped)
+            logger.error("Dropped %d %s rows: write-behind queue is full", dropped, self.name)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception:
+                pass  # logged and requeued by flush; retried next round
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self._loop = self._wake = None
+        try:
+            await asyncio.to_thread(self.flush)
+        except Exception:
+            pass  # already logged; nothing more can be done at shutdown
@@ -1,14 +1,47 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.api import auth, users, projects, chat
+from app.api import activity, auth, users, projects, chat, jobs, metrics, usage
 from app.api import requirements as project_requirements
-from app.db.session import init_db
+from app.core.clients import close_clients, start_clients
 from app.core.config import get_settings
+from app.core.metrics import MetricsMiddleware
+from app.db.instrumentation import QueryTimingMiddleware
+from app.db.session import init_db
+from app.services.activity import start_activity_writer, stop_activity_writer
+from app.services.activity_history import start_activity_retention, stop_activity_retention
+from app.services.jobs import start_job_runner, stop_job_runner
+from app.services.llm_providers import llm_configured
+from app.services.usage import start_usage_recorder, stop_usage_recorder
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    settings = get_settings()
+    if not llm_configured():
+        raise ValueError("OPENAI_API_KEY is missing")
+    if settings.secret_key == "CHANGE_ME":
+        raise RuntimeError("Please set SECRET_KEY in backend/.env")
+    init_db()
+    start_clients()
+    start_activity_writer()
+    start_activity_retention()
+    start_usage_recorder()
+    start_job_runner()
+    yield
+    # Interrupted jobs go back to the queue before the clients they use close.
+    await stop_job_runner()
+    await stop_activity_retention()
+    await stop_activity_writer()
+    await stop_usage_recorder()
+    await close_clients()
+
 
 settings = get_settings()
 
-app = FastAPI(title=settings.app_name)
+app = FastAPI(title=settings.app_name, lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -16,21 +49,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
-
-@app.on_event("startup")
-def on_startup():
-    print("startup function")
-    if not settings.openai_api_key:
-        raise ValueError("OPENAI_API_KEY is missing")
-    else:
-        print("OPENAI_API_KEY set !")
-    if settings.secret_key == "CHANGE_ME":
-        raise RuntimeError("Please set SECRET_KEY in backend/.env")
-    else:
-        print("SECRET set")
-    init_db()
+if settings.sql_instrumentation:
+    app.add_middleware(QueryTimingMiddleware)
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
 
 
 app.include_router(auth.router)
@@ -38,3 +63,8 @@ app.include_router(users.router)
 app.include_router(projects.router)
 app.include_router(chat.router)
 app.include_router(project_requirements.router, prefix="/api/v1")
+app.include_router(jobs.router, prefix="/api/v1")
+app.include_router(activity.router, prefix="/api/v1")
+app.include_router(usage.router, prefix="/api/v1")
+if settings.metrics_enabled:
+    app.include_router(metrics.router)
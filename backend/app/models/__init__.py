@@ -1,13 +1,19 @@
 from .user import User
 from .project import Project
-from .activity import Activity
+from .activity import Activity, ActivityArchive
 from .requirements import Requirement, Epic, Feature, UserStory, UseCase
 from .item import Item, ItemType
+from .conversation import ConversationSummary
+from .job import Job
+from .usage import LLMUsage, UsageRollup
+from .validation import HierarchyChange, ValidationIssue, ValidationState
+from .similarity import SimilarityBucket
 
 __all__ = [
     "User",
     "Project",
     "Activity",
+    "ActivityArchive",
     "Requirement",
     "Epic",
     "Feature",
@@ -15,4 +21,12 @@ __all__ = [
     "UseCase",
     "Item",
     "ItemType",
+    "ConversationSummary",
+    "Job",
+    "LLMUsage",
+    "UsageRollup",
+    "HierarchyChange",
+    "ValidationIssue",
+    "ValidationState",
+    "SimilarityBucket",
 ]
@@ -1,10 +1,36 @@
 from datetime import datetime
 from typing import Optional
+from sqlalchemy import Column, Index, LargeBinary
 from sqlmodel import SQLModel, Field
 
 class Activity(SQLModel, table=True):
+    # Project history is read newest first: (project_id, timestamp, id) serves
+    # both the filter and the keyset order without a sort.
+    __table_args__ = (
+        Index("ix_activity_project_id_timestamp", "project_id", "timestamp", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
-    project_id: int = Field(foreign_key="project.id")
+    project_id: int = Field(foreign_key="project.id", index=True)
     type: str
     content: str
     timestamp: datetime = Field(default_factory=datetime.utcnow)
+
+
+class ActivityArchive(SQLModel, table=True):
+    """A compressed segment of activity moved out of the hot table by retention.
+
+    ``data`` holds the rows as zlib-compressed JSON lines, oldest first; the
+    other columns describe the segment so reads can skip it without
+    decompressing.
+    """
+    id: Optional[int] = Field(default=None, primary_key=True)
+    project_id: int = Field(foreign_key="project.id", index=True)
+    first_timestamp: datetime
+    last_timestamp: datetime
+    first_activity_id: int
+    last_activity_id: int
+    row_count: int
+    types: str  # JSON list of the activity types in the segment
+    data: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+    created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -0,0 +1,10 @@
+from datetime import datetime
+from sqlmodel import SQLModel, Field
+
+class ConversationSummary(SQLModel, table=True):
+    """Running summary of a project's chat turns older than the prompt window."""
+    project_id: int = Field(foreign_key="project.id", primary_key=True)
+    summary: str = ""
+    # Last chat activity folded into ``summary``.
+    through_activity_id: int = 0
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
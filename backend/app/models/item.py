@@ -16,9 +16,9 @@ class ItemType(str, Enum):
 
 class Item(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    project_id: int = Field(foreign_key="project.id")
+    project_id: int = Field(foreign_key="project.id", index=True)
     type: ItemType
     title: str
     description: Optional[str] = None
     status: str = "draft"
-    parent_id: Optional[int] = Field(default=None, foreign_key="item.id")
+    parent_id: Optional[int] = Field(default=None, foreign_key="item.id", index=True)
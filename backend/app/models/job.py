@@ -0,0 +1,22 @@
+from datetime import datetime
+from typing import Optional
+from sqlmodel import SQLModel, Field
+
+class Job(SQLModel, table=True):
+    """A unit of background work; the table doubles as the work queue."""
+    id: Optional[int] = Field(default=None, primary_key=True)
+    project_id: int = Field(foreign_key="project.id", index=True)
+    owner_id: int = Field(foreign_key="user.id")
+    kind: str
+    # queued -> running -> succeeded | failed | cancelled
+    status: str = Field(default="queued", index=True)
+    params: str = "{}"  # JSON
+    result: Optional[str] = None  # JSON
+    error: Optional[str] = None
+    cancel_requested: bool = False
+    attempts: int = 0
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    # Refreshed while running; a stale heartbeat means the worker died.
+    heartbeat_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
@@ -6,5 +6,10 @@ class Project(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
     description: Optional[str] = None
-    owner_id: int = Field(foreign_key="user.id")
+    owner_id: int = Field(foreign_key="user.id", index=True)
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    # Prompt + completion tokens allowed per calendar month (UTC); None is unlimited.
+    token_budget: Optional[int] = None
+    # Bumped by every transaction that writes the project's requirement
+    # hierarchy (app.db.change_tracking); keys the rendered Markdown cache.
+    hierarchy_version: int = 0
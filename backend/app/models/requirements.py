@@ -6,7 +6,7 @@ class Requirement(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     title: str
     description: Optional[str] = None
-    project_id: int = Field(foreign_key="project.id")
+    project_id: int = Field(foreign_key="project.id", index=True)
     is_active: bool = True
 
 
@@ -14,8 +14,8 @@ class Epic(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     title: str
     description: Optional[str] = None
-    project_id: int = Field(foreign_key="project.id")
-    parent_req_id: int = Field(foreign_key="requirement.id")
+    project_id: int = Field(foreign_key="project.id", index=True)
+    parent_req_id: int = Field(foreign_key="requirement.id", index=True)
     is_active: bool = True
 
 
@@ -23,8 +23,8 @@ class Feature(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     title: str
     description: Optional[str] = None
-    project_id: int = Field(foreign_key="project.id")
-    parent_epic_id: int = Field(foreign_key="epic.id")
+    project_id: int = Field(foreign_key="project.id", index=True)
+    parent_epic_id: int = Field(foreign_key="epic.id", index=True)
     is_active: bool = True
 
 
@@ -32,8 +32,8 @@ class UserStory(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     title: str
     description: Optional[str] = None
-    project_id: int = Field(foreign_key="project.id")
-    parent_feature_id: int = Field(foreign_key="feature.id")
+    project_id: int = Field(foreign_key="project.id", index=True)
+    parent_feature_id: int = Field(foreign_key="feature.id", index=True)
     acceptance_criteria: Optional[str] = None
     is_active: bool = True
 
@@ -42,7 +42,7 @@ class UseCase(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     title: str
     description: Optional[str] = None
-    project_id: int = Field(foreign_key="project.id")
-    parent_story_id: int = Field(foreign_key="userstory.id")
+    project_id: int = Field(foreign_key="project.id", index=True)
+    parent_story_id: int = Field(foreign_key="userstory.id", index=True)
     steps: Optional[str] = None
     is_active: bool = True
@@ -0,0 +1,22 @@
+from typing import Optional
+from sqlalchemy import BigInteger, Column, Index
+from sqlmodel import SQLModel, Field
+
+
+class SimilarityBucket(SQLModel, table=True):
+    """One LSH band of a feature's or user story's MinHash signature.
+
+    Nodes sharing a ``bucket`` agree on a whole band and are candidate near
+    duplicates (``app.services.similarity``). No foreign keys: ``kind`` picks
+    the node table, and rows of deleted nodes are ignored by lookups.
+    """
+    __table_args__ = (
+        Index("ix_similaritybucket_project_id_kind_bucket", "project_id", "kind", "bucket"),
+        Index("ix_similaritybucket_kind_node_id", "kind", "node_id"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    project_id: int
+    kind: str  # an app.db.similarity_index.INDEXED_KINDS key
+    node_id: int
+    bucket: int = Field(sa_column=Column(BigInteger, nullable=False))
@@ -0,0 +1,46 @@
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import Index, UniqueConstraint
+from sqlmodel import SQLModel, Field
+
+# Usage rows carry no foreign keys: the accounting outlives deleted projects
+# and users, and calls made outside any project are recorded with ids 0.
+
+
+class LLMUsage(SQLModel, table=True):
+    """One LLM call, as issued through ``app.services.llm``."""
+    __table_args__ = (Index("ix_llmusage_project_id_created_at", "project_id", "created_at"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    project_id: int = 0
+    user_id: int = 0
+    endpoint: str
+    model: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    latency: float  # seconds, including queueing and retries
+    cache_hit: bool = False  # answered by the response cache or a coalesced call
+    error: Optional[str] = None  # exception class name for failed calls
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class UsageRollup(SQLModel, table=True):
+    """Hourly totals per project, user, endpoint and model, updated with each usage flush."""
+    __table_args__ = (
+        UniqueConstraint("project_id", "user_id", "bucket", "endpoint", "model", name="uq_usagerollup_key"),
+        Index("ix_usagerollup_user_id_bucket", "user_id", "bucket"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    project_id: int
+    user_id: int
+    bucket: datetime  # start of the hour (UTC)
+    endpoint: str
+    model: str
+    calls: int = 0
+    cache_hits: int = 0
+    errors: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    latency_total: float = 0.0
+    latency_max: float = 0.0
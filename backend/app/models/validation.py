@@ -0,0 +1,43 @@
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import Index
+from sqlmodel import SQLModel, Field
+
+# No foreign keys to the hierarchy tables: changes and issues must survive
+# (and describe) the deletion of the nodes they refer to.
+
+
+class HierarchyChange(SQLModel, table=True):
+    """A requirement-hierarchy node written since its project was last validated.
+
+    ``parent_id`` is the node's parent at the time of the change; a node moved
+    to another parent gets one row per parent.
+    """
+    __table_args__ = (Index("ix_hierarchychange_project_id_id", "project_id", "id"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    project_id: int
+    kind: str  # an app.services.items.ITEM_KINDS key
+    node_id: int
+    parent_id: Optional[int] = None
+
+
+class ValidationState(SQLModel, table=True):
+    """Per project: the last change folded into its stored validation issues."""
+    project_id: int = Field(primary_key=True)
+    last_change_id: int = 0
+    issue_counts: str = "{}"  # JSON object: rule -> number of stored issues
+    validated_at: Optional[datetime] = None
+
+
+class ValidationIssue(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_validationissue_project_id_kind_node_id", "project_id", "kind", "node_id"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    project_id: int
+    kind: str
+    node_id: int
+    rule: str
+    message: str
@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import List, Optional
 from pydantic import BaseModel
 
 class ActivityRead(BaseModel):
@@ -10,3 +11,16 @@ class ActivityRead(BaseModel):
 
     class Config:
         orm_mode = True
+
+class ActivityPageRead(BaseModel):
+    items: List[ActivityRead]
+    # Pass back as ?cursor= for the next (older) page; None on the last page.
+    next_cursor: Optional[str] = None
+
+    class Config:
+        orm_mode = True
+
+class ActivityArchiveStats(BaseModel):
+    hot_rows: int
+    archived_rows: int
+    archive_segments: int
@@ -0,0 +1,28 @@
+from datetime import datetime
+from typing import Any, List, Optional
+from sqlmodel import SQLModel
+
+# Job Schemas
+class JobRead(SQLModel):
+    id: int
+    project_id: int
+    kind: str
+    status: str
+    error: Optional[str] = None
+    cancel_requested: bool
+    attempts: int
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+class JobResult(SQLModel):
+    id: int
+    status: str
+    result: Optional[Any] = None
+
+class SpecGenerationJobCreate(SQLModel):
+    project_goals: List[str] = []
+    requirement_title: Optional[str] = "AI Generated Specifications"
+    requirement_description: Optional[str] = "Functional specifications generated by the AI assistant."
+    use_cache: bool = True # False regenerates even if identical inputs were seen
+    fan_out: bool = True # Outline first, then every epic in parallel
@@ -15,6 +15,7 @@ class ProjectRead(ProjectBase):
     id: int
     owner_id: int
     created_at: datetime
+    token_budget: int | None = None
 
     class Config:
         orm_mode = True
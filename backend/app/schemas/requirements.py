@@ -132,6 +132,10 @@ class AISpecFeature(PydanticBaseModel):
     description: Optional[str] = None
     user_stories: List[str]
 
+class AISpecEpicOutline(PydanticBaseModel):
+    title: str
+    description: Optional[str] = None
+
 class AISpecEpic(PydanticBaseModel):
     title: str
     description: Optional[str] = None
@@ -141,3 +145,11 @@ class AISpecImportRequest(PydanticBaseModel):
     epics: List[AISpecEpic]
     requirement_title: Optional[str] = "AI Generated Specifications"
     requirement_description: Optional[str] = "Functional specifications generated by the AI assistant."
+    # Skip features and stories that near-duplicate existing ones in the project.
+    dedup: bool = False
+
+class AISpecGenerateRequest(PydanticBaseModel):
+    project_goals: List[str] = []
+    requirement_title: Optional[str] = "AI Generated Specifications"
+    requirement_description: Optional[str] = "Functional specifications generated by the AI assistant."
+    use_cache: bool = True
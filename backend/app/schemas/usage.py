@@ -0,0 +1,32 @@
+from datetime import datetime
+from typing import List, Literal, Optional
+from sqlmodel import SQLModel, Field
+
+# Usage Schemas
+class UsagePoint(SQLModel):
+    bucket_start: datetime
+    group: Optional[str] = None # project/user id, endpoint or model when grouped
+    calls: int
+    cache_hits: int
+    errors: int
+    prompt_tokens: int
+    completion_tokens: int
+    total_tokens: int
+    latency_avg: float # seconds
+    latency_max: float
+
+class UsageReport(SQLModel):
+    bucket: Literal["hour", "day", "month"]
+    start: datetime
+    end: datetime
+    group_by: Optional[str] = None
+    points: List[UsagePoint]
+
+class TokenBudgetUpdate(SQLModel):
+    token_budget: Optional[int] = Field(default=None, ge=1) # None removes the budget
+
+class TokenBudgetStatus(SQLModel):
+    token_budget: Optional[int] = None
+    period_start: datetime
+    spent: int
+    remaining: Optional[int] = None
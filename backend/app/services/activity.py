@@ -0,0 +1,74 @@
+"""Project activity log.
+
+While the application runs, entries go through a write-behind buffer
+(``app.db.write_behind``) so requests never commit just to log: they are
+inserted in batches every ``activity_flush_interval`` seconds or
+``activity_flush_batch`` entries. Without a running writer (scripts, tests,
+``ACTIVITY_WRITE_BEHIND=false``) entries are written through the caller's
+session as before.
+
+Queued entries are not visible to queries until flushed; readers that need
+them (conversation memory, ``/ai-activity/sessions?fresh=true``) call
+``flush_activities`` first. That covers writes made by this process only.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy.engine import Engine
+from sqlmodel import Session
+
+from app.core.config import get_settings
+from app.db.write_behind import WriteBehindBuffer
+from app.models.activity import Activity
+
+_writer: Optional[WriteBehindBuffer] = None
+
+
+def log_activity(db: Session, project_id: int, type_: str, content: str, commit: bool = True) -> None:
+    """Record an activity entry.
+
+    With the write-behind writer running the entry is queued and ``db`` is
+    not touched; otherwise it is added to ``db`` and, if ``commit``,
+    committed.
+    """
+    if _writer is not None:
+        _writer.add(project_id=project_id, type=type_, content=content, timestamp=datetime.utcnow())
+        return
+    db.add(Activity(project_id=project_id, type=type_, content=content))
+    if commit:
+        db.commit()
+
+
+def flush_activities(project_id: Optional[int] = None) -> None:
+    """Write queued entries (if any for ``project_id``) so queries see them."""
+    if _writer is None:
+        return
+    if project_id is None or _writer.pending(project_id=project_id):
+        _writer.flush()
+
+
+def start_activity_writer(engine: Optional[Engine] = None) -> Optional[WriteBehindBuffer]:
+    global _writer
+    settings = get_settings()
+    if not settings.activity_write_behind:
+        return None
+    if engine is None:
+        from app.db.session import engine
+    _writer = WriteBehindBuffer(
+        Activity,
+        lambda: Session(engine),
+        batch_size=settings.activity_flush_batch,
+        flush_interval=settings.activity_flush_interval,
+        max_pending=settings.activity_max_pending,
+    )
+    _writer.start()
+    return _writer
+
+
+async def stop_activity_writer() -> None:
+    global _writer
+    if _writer is not None:
+        writer, _writer = _writer, None  # later entries are written directly
+        await writer.stop()
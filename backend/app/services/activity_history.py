@@ -0,0 +1,281 @@
+"""Reading and retaining project activity history.
+
+History is read newest first with keyset pagination: the opaque cursor
+encodes the ``(timestamp, id)`` of the last row returned, and the next page
+continues strictly below it, so pages stay stable while entries are added and
+each page is a range scan on ``ix_activity_project_id_timestamp``.
+
+Retention moves entries older than ``activity_retention_days`` out of the hot
+``activity`` table into ``ActivityArchive`` segments: up to
+``activity_archive_segment_rows`` rows per project, stored as zlib-compressed
+JSON lines. Each segment is written and its rows deleted in one transaction,
+and the transaction is rolled back if another process archived any of those
+rows first, so concurrent workers never archive a row twice. Archived history
+is read through the same cursor API (``archived=True``), decompressing only
+the segments a page needs.
+"""
+from __future__ import annotations
+
+import asyncio
+import base64
+import json
+import logging
+import zlib
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import and_, delete, func, or_
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select
+
+from app.core.config import get_settings
+from app.core.metrics import activity_archived_rows
+from app.models.activity import Activity, ActivityArchive
+from app.models.project import Project
+
+logger = logging.getLogger(__name__)
+
+MAX_PAGE_SIZE = 200
+
+
+@dataclass
+class ActivityPage:
+    items: list[Activity] = field(default_factory=list)
+    next_cursor: Optional[str] = None
+
+
+# Cursors -----------------------------------------------------------------
+
+
+def encode_cursor(activity: Activity) -> str:
+    raw = json.dumps([activity.timestamp.isoformat(), activity.id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, activity_id = json.loads(raw)
+        return datetime.fromisoformat(timestamp), int(activity_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _page(rows: list[Activity], limit: int) -> ActivityPage:
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return ActivityPage(rows, encode_cursor(rows[-1]))
+    return ActivityPage(rows)
+
+
+# Hot table ----------------------------------------------------------------
+
+
+def list_activity(
+    db: Session,
+    *,
+    project_id: Optional[int] = None,
+    owner_id: Optional[int] = None,
+    types: Optional[Iterable[str]] = None,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+) -> ActivityPage:
+    """One page of activity, newest first, for a project and/or an owner's projects."""
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    statement = select(Activity)
+    if project_id is not None:
+        statement = statement.where(Activity.project_id == project_id)
+    if owner_id is not None:
+        owned = select(Project.id).where(Project.owner_id == owner_id)
+        statement = statement.where(Activity.project_id.in_(owned))
+    if types:
+        statement = statement.where(Activity.type.in_(list(types)))
+    if cursor:
+        timestamp, activity_id = decode_cursor(cursor)
+        statement = statement.where(
+            or_(
+                Activity.timestamp < timestamp,
+                and_(Activity.timestamp == timestamp, Activity.id < activity_id),
+            )
+        )
+    statement = statement.order_by(Activity.timestamp.desc(), Activity.id.desc()).limit(limit + 1)
+    return _page(list(db.exec(statement).all()), limit)
+
+
+# Archive ------------------------------------------------------------------
+
+
+def _compress(rows: list[Activity]) -> bytes:
+    lines = (
+        json.dumps(
+            {"id": r.id, "type": r.type, "content": r.content, "timestamp": r.timestamp.isoformat()},
+            ensure_ascii=False,
+        )
+        for r in rows
+    )
+    return zlib.compress("\n".join(lines).encode(), 6)
+
+
+def _key(row: Activity) -> tuple[datetime, int]:
+    return row.timestamp, row.id
+
+
+def _decompress(segment: ActivityArchive) -> list[Activity]:
+    rows = []
+    for line in zlib.decompress(segment.data).decode().splitlines():
+        data = json.loads(line)
+        data["timestamp"] = datetime.fromisoformat(data["timestamp"])
+        rows.append(Activity(project_id=segment.project_id, **data))
+    return rows
+
+
+def list_archived_activity(
+    db: Session,
+    project_id: int,
+    *,
+    types: Optional[Iterable[str]] = None,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+) -> ActivityPage:
+    """Like ``list_activity`` for one project, reading its archive segments."""
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    wanted = set(types) if types else None
+    position = decode_cursor(cursor) if cursor else None
+    statement = select(ActivityArchive).where(ActivityArchive.project_id == project_id)
+    if position is not None:
+        statement = statement.where(ActivityArchive.first_timestamp <= position[0])
+    statement = statement.order_by(
+        ActivityArchive.last_timestamp.desc(), ActivityArchive.last_activity_id.desc()
+    )
+
+    rows: list[Activity] = []
+    for segment in db.exec(statement):
+        if len(rows) > limit:
+            # Segments can overlap in time (late entries), so stop only once
+            # this one, and with it every later one, is older than the page.
+            rows.sort(key=_key, reverse=True)
+            del rows[limit + 1:]
+            if segment.last_timestamp < rows[limit].timestamp:
+                break
+        if wanted is not None and not wanted & set(json.loads(segment.types)):
+            continue
+        for row in _decompress(segment):
+            if position is not None and _key(row) >= position:
+                continue
+            if wanted is not None and row.type not in wanted:
+                continue
+            rows.append(row)
+    rows.sort(key=_key, reverse=True)
+    return _page(rows, limit)
+
+
+def archive_segment(db: Session, project_id: int, cutoff: datetime, segment_rows: int) -> int:
+    """Archive the project's oldest rows before ``cutoff`` as one segment and commit.
+
+    Returns the number of rows archived (0 when another process got there first).
+    """
+    rows = list(
+        db.exec(
+            select(Activity)
+            .where(Activity.project_id == project_id, Activity.timestamp < cutoff)
+            .order_by(Activity.timestamp, Activity.id)
+            .limit(segment_rows)
+        ).all()
+    )
+    if not rows:
+        return 0
+    db.add(
+        ActivityArchive(
+            project_id=project_id,
+            first_timestamp=rows[0].timestamp,
+            last_timestamp=rows[-1].timestamp,
+            first_activity_id=rows[0].id,
+            last_activity_id=rows[-1].id,
+            row_count=len(rows),
+            types=json.dumps(sorted({r.type for r in rows})),
+            data=_compress(rows),
+        )
+    )
+    deleted = db.execute(delete(Activity).where(Activity.id.in_([r.id for r in rows])))
+    if deleted.rowcount != len(rows):
+        db.rollback()  # another process archived some of these rows meanwhile
+        return 0
+    db.commit()
+    return len(rows)
+
+
+def archive_activity(
+    engine: Engine,
+    older_than: Optional[datetime] = None,
+    segment_rows: Optional[int] = None,
+) -> int:
+    """Move activity older than the retention window into archive segments.
+
+    Returns the number of rows archived.
+    """
+    settings = get_settings()
+    if older_than is None:
+        older_than = datetime.utcnow() - timedelta(days=settings.activity_retention_days)
+    segment_rows = segment_rows or settings.activity_archive_segment_rows
+    with Session(engine) as db:
+        project_ids = db.exec(
+            select(Activity.project_id).where(Activity.timestamp < older_than).distinct()
+        ).all()
+
+    archived = 0
+    for project_id in project_ids:
+        with Session(engine) as db:
+            while count := archive_segment(db, project_id, older_than, segment_rows):
+                archived += count
+                if count < segment_rows:
+                    break
+    if archived:
+        activity_archived_rows.inc(amount=archived)
+        logger.info("Archived %d activity rows from %d projects", archived, len(project_ids))
+    return archived
+
+
+def archive_stats(db: Session, project_id: int) -> dict:
+    hot = db.exec(select(func.count(Activity.id)).where(Activity.project_id == project_id)).one()
+    segments, archived = db.exec(
+        select(func.count(ActivityArchive.id), func.coalesce(func.sum(ActivityArchive.row_count), 0)).where(
+            ActivityArchive.project_id == project_id
+        )
+    ).one()
+    return {"hot_rows": hot, "archived_rows": archived, "archive_segments": segments}
+
+
+# Periodic retention ------------------------------------------------------
+
+_retention_task: Optional[asyncio.Task] = None
+
+
+async def _retention_loop(engine: Engine, interval: float) -> None:
+    while True:
+        try:
+            await asyncio.to_thread(archive_activity, engine)
+        except Exception:
+            logger.exception("Archiving old activity failed")
+        await asyncio.sleep(interval)
+
+
+def start_activity_retention(engine: Optional[Engine] = None) -> None:
+    global _retention_task
+    settings = get_settings()
+    if settings.activity_retention_days <= 0:
+        return
+    if engine is None:
+        from app.db.session import engine
+    _retention_task = asyncio.create_task(
+        _retention_loop(engine, settings.activity_retention_interval)
+    )
+
+
+async def stop_activity_retention() -> None:
+    global _retention_task
+    if _retention_task is not None:
+        _retention_task.cancel()
+        await asyncio.gather(_retention_task, return_exceptions=True)
+        _retention_task = None
@@ -0,0 +1,186 @@
+"""Admission control for upstream LLM calls.
+
+Two independent limits protect the OpenAI quota:
+
+- a token bucket per user (``llm_user_rate`` requests per second, bursts of
+  ``llm_user_burst``), charged once per request by the ``llm_rate_limit``
+  dependency; an empty bucket answers 429 with ``Retry-After`` set to when
+  the next token arrives;
+- a global cap of ``llm_max_concurrency`` upstream calls. Calls beyond it
+  wait in a priority queue, interactive chat ahead of bulk generation and
+  FIFO within a priority. A call that cannot start within
+  ``llm_queue_timeout`` seconds, or that finds ``llm_max_queue_depth``
+  callers already waiting, fails with 503 and a ``Retry-After`` derived from
+  recent call durations.
+
+A finishing call hands its slot directly to the next waiter, so a newcomer
+cannot overtake the queue.
+"""
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import math
+import threading
+import time
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import AsyncIterator, Hashable, Optional
+
+from fastapi import HTTPException
+
+from app.core.config import get_settings
+from app.core.metrics import (
+    llm_admission_active,
+    llm_admission_queue_depth,
+    llm_admission_rejected,
+    llm_admission_wait,
+)
+
+PRIORITIES = {"interactive": 0, "bulk": 1}
+
+
+def _retry_after(seconds: float) -> str:
+    return str(max(1, math.ceil(seconds)))
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, now: Optional[float] = None) -> float:
+        """Take a token. Returns 0 on success, else seconds until one is available."""
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        user_rate: float = 0.5,
+        user_burst: float = 5,
+        queue_timeout: float = 10.0,
+        max_queue_depth: int = 100,
+    ):
+        self.max_concurrency = max_concurrency
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.queue_timeout = queue_timeout
+        self.max_queue_depth = max_queue_depth
+        self.active = 0
+        self._buckets: dict[Hashable, TokenBucket] = {}
+        # charge runs in threadpool threads (sync dependency), not on the loop.
+        self._buckets_lock = threading.Lock()
+        # (priority, seq, future); cancelled futures are skipped when popped.
+        self._queue: list[tuple[int, int, asyncio.Future]] = []
+        self._waiting = {name: 0 for name in PRIORITIES}
+        self._seq = itertools.count()
+        self._avg_call = 1.0  # EWMA of slot hold time, seconds
+
+    # Per-user rate ------------------------------------------------------
+
+    def charge(self, user_key: Hashable) -> None:
+        """Take one request from ``user_key``'s bucket or raise 429."""
+        if self.user_rate <= 0:
+            return
+        with self._buckets_lock:
+            bucket = self._buckets.get(user_key)
+            if bucket is None:
+                bucket = self._buckets[user_key] = TokenBucket(self.user_rate, self.user_burst)
+            wait = bucket.take()
+        if wait:
+            llm_admission_rejected.inc("user_rate")
+            raise HTTPException(
+                status_code=429,
+                detail="Too many AI requests, please slow down.",
+                headers={"Retry-After": _retry_after(wait)},
+            )
+
+    # Global concurrency ---------------------------------------------------
+
+    def _overloaded(self, reason: str) -> HTTPException:
+        llm_admission_rejected.inc(reason)
+        waiting = sum(self._waiting.values())
+        estimate = self._avg_call * (waiting + 1) / max(1, self.max_concurrency)
+        return HTTPException(
+            status_code=503,
+            detail="AI service is busy, please retry shortly.",
+            headers={"Retry-After": _retry_after(estimate)},
+        )
+
+    def _set_depth(self, priority: str, delta: int) -> None:
+        self._waiting[priority] += delta
+        llm_admission_queue_depth.set(self._waiting[priority], priority)
+
+    def has_free_slot(self) -> bool:
+        return self.active < self.max_concurrency and not self._queue
+
+    def _release(self) -> None:
+        while self._queue:
+            _, _, future = heapq.heappop(self._queue)
+            if not future.done():
+                future.set_result(None)  # the slot passes to this waiter
+                return
+        self.active -= 1
+        llm_admission_active.set(self.active)
+
+    async def _acquire(self, priority: str) -> None:
+        rank = PRIORITIES[priority]
+        start = time.monotonic()
+        if self.active < self.max_concurrency and not self._queue:
+            self.active += 1
+            llm_admission_active.set(self.active)
+            llm_admission_wait.observe(0.0, priority)
+            return
+        if sum(self._waiting.values()) >= self.max_queue_depth:
+            raise self._overloaded("queue_full")
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (rank, next(self._seq), future))
+        self._set_depth(priority, 1)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+            if future.done() and not future.cancelled():
+                self._release()  # granted just as we gave up: pass it on
+            else:
+                future.cancel()
+            if isinstance(exc, asyncio.TimeoutError):
+                raise self._overloaded("queue_timeout") from None
+            raise
+        finally:
+            self._set_depth(priority, -1)
+            llm_admission_wait.observe(time.monotonic() - start, priority)
+
+    @asynccontextmanager
+    async def slot(self, priority: str = "interactive") -> AsyncIterator[None]:
+        """Hold one of the global upstream slots for the duration of the block."""
+        await self._acquire(priority)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._avg_call = 0.8 * self._avg_call + 0.2 * (time.monotonic() - start)
+            self._release()
+
+
+@lru_cache
+def get_admission_controller() -> AdmissionController:
+    settings = get_settings()
+    return AdmissionController(
+        max_concurrency=settings.llm_max_concurrency,
+        user_rate=settings.llm_user_rate,
+        user_burst=settings.llm_user_burst,
+        queue_timeout=settings.llm_queue_timeout,
+        max_queue_depth=settings.llm_max_queue_depth,
+    )
@@ -1,15 +1,21 @@
-import openai
+import asyncio
 import json
+from typing import AsyncIterator
 from app.core.config import get_settings
+from app.schemas.requirements import AISpecEpic, AISpecEpicOutline, AISpecFeature
+from app.services.json_stream import JSONArrayStream, JSONStreamError
+from app.services.llm import create_chat_completion, stream_chat_completion
+from app.services.llm_providers import llm_configured
 from fastapi import HTTPException # Added for use within FastAPI app
 
-settings = get_settings()
-# Ensure OPENAI_API_KEY is loaded and set for the openai library
-if not settings.openai_api_key:
-    # This check is important. If the key is missing, the service cannot function.
-    # Consider logging this error prominently if a logging system is in place.
-    raise ValueError("OPENAI_API_KEY is not set in the environment variables or .env file. The AI Spec service cannot start.")
-openai.api_key = settings.openai_api_key
+class AIResponseFormatError(HTTPException):
+    """The completion arrived but was empty or not the JSON asked for; a new one may be fine."""
+
+    def __init__(self, detail: str):
+        super().__init__(status_code=500, detail=detail)
+
+
+SYSTEM_MESSAGE = "You are an expert AI assistant specialized in generating functional specifications for software projects. Your goal is to help users define clear, concise, and comprehensive epics, features, and user stories. Output the specifications in JSON format as requested."
 
 class AISpecService:
     def __init__(self, model_name: str = "gpt-3.5-turbo"):
@@ -19,27 +25,157 @@ class AISpecService:
             print(f"Warning: Specified model_name '{self.model_name}' may not support JSON mode or ChatCompletion.acreate. Using 'gpt-3.5-turbo' as default or ensure compatibility.")
             # Potentially default to a known good model or raise an error
 
-    async def generate_specifications(self, project_name: str, project_description: str, project_goals: list[str]) -> dict:
+    async def generate_specifications(self, project_name: str, project_description: str, project_goals: list[str], use_cache: bool = True) -> dict:
+        self._require_api_key()
         prompt = self._build_prompt(project_name, project_description, project_goals)
+        specifications = await self._request_json("generate_specifications", prompt, use_cache)
+
+        # Basic validation of the expected structure
+        if not isinstance(specifications, dict) or "epics" not in specifications:
+            error_detail = f"Generated JSON is not a dictionary or does not contain the 'epics' root key. Received type: {type(specifications)}. Keys: {list(specifications.keys()) if isinstance(specifications, dict) else 'N/A'}"
+            print(error_detail) # Replace with logging
+            # print(f"Problematic JSON: {str(specifications)[:500]}") # Replace with logging
+            raise HTTPException(status_code=500, detail=f"AI generated unexpected JSON structure. {error_detail}")
+
+        # print("Successfully generated and parsed specifications.") # Replace with logging
+        return specifications
+
+    async def generate_specifications_parallel(
+        self,
+        project_name: str,
+        project_description: str,
+        project_goals: list[str],
+        use_cache: bool = True,
+        max_parallel: int | None = None,
+        max_attempts: int | None = None,
+    ) -> dict:
+        """Two-phase generation: an epic outline, then each epic's features concurrently.
+
+        Every epic branch is a separate, smaller completion validated on its
+        own, so wall-clock time is roughly outline + longest branch (with
+        ``max_parallel`` branches in flight) instead of the whole tree, and a
+        malformed branch is retried alone, bypassing the response cache.
+        Upstream errors are not retried here (``create_chat_completion``
+        already did), and the first branch to fail cancels the others.
+        Returns the same ``{"epics": [...]}`` shape as ``generate_specifications``.
+        """
+        settings = get_settings()
+        max_parallel = max_parallel or settings.spec_fanout_parallelism
+        max_attempts = max_attempts or settings.spec_epic_max_attempts
+        self._require_api_key()
 
+        outline_prompt = self._build_outline_prompt(project_name, project_description, project_goals)
+        outline = await self._request_json("generate_spec_outline", outline_prompt, use_cache)
+        try:
+            epics = [AISpecEpicOutline(**epic) for epic in outline["epics"]]
+        except Exception as e:
+            print(f"Invalid epic outline: {e}") # Replace with logging
+            raise HTTPException(status_code=500, detail=f"AI generated an invalid epic outline: {str(e)[:200]}")
+
+        semaphore = asyncio.Semaphore(max_parallel)
+
+        async def expand(epic: AISpecEpicOutline) -> dict:
+            prompt = self._build_epic_prompt(project_name, project_description, project_goals, epics, epic)
+            last_error = None
+            for attempt in range(max_attempts):
+                async with semaphore:
+                    try:
+                        branch = await self._request_json(
+                            "generate_spec_epic", prompt, use_cache and attempt == 0
+                        )
+                        features = [AISpecFeature(**f).model_dump() for f in branch["features"]]
+                        return {**epic.model_dump(), "features": features}
+                    except AIResponseFormatError as e:
+                        last_error = e.detail
+                    except HTTPException:
+                        # Upstream, admission and budget errors: create_chat_completion
+                        # already retried what a retry can fix.
+                        raise
+                    except Exception as e: # Missing keys or invalid feature objects
+                        last_error = f"{type(e).__name__}: {e}"
+                print(f"Epic '{epic.title}' attempt {attempt + 1}/{max_attempts} failed: {str(last_error)[:200]}") # Replace with logging
+            raise HTTPException(
+                status_code=502,
+                detail=f"Generating features for epic '{epic.title}' failed after {max_attempts} attempts: {str(last_error)[:200]}",
+            )
+
+        branches = [asyncio.ensure_future(expand(epic)) for epic in epics]
+        try:
+            return {"epics": list(await asyncio.gather(*branches))}
+        except BaseException:
+            # One failed branch fails the generation: stop the others spending tokens.
+            for branch in branches:
+                branch.cancel()
+            await asyncio.gather(*branches, return_exceptions=True)
+            raise
+
+    async def stream_specifications(self, project_name: str, project_description: str, project_goals: list[str], use_cache: bool = True) -> AsyncIterator[AISpecEpic]:
+        """Yield each epic of a single-call generation as soon as the model has written it.
+
+        The completion is streamed into an incremental JSON parser; every
+        element of the ``"epics"`` array is validated and yielded when its
+        closing brace arrives, while the rest is still being generated.
+        Failures raise HTTPException after the epics already yielded.
+        """
+        self._require_api_key()
+        prompt = self._build_prompt(project_name, project_description, project_goals)
+        parser = JSONArrayStream("epics")
+        try:
+            async for delta in stream_chat_completion(
+                endpoint="generate_specifications_stream",
+                model=self.model_name,
+                messages=[
+                    {"role": "system", "content": SYSTEM_MESSAGE},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.7,
+                response_format={ "type": "json_object" },
+                cache=use_cache,
+                priority="bulk",
+            ):
+                for item in parser.feed(delta):
+                    try:
+                        epic = AISpecEpic(**item)
+                    except Exception as e:
+                        raise HTTPException(status_code=500, detail=f"AI generated an invalid epic: {str(e)[:200]}")
+                    yield epic
+            parser.close()
+        except HTTPException:
+            raise
+        except JSONStreamError as e:
+            print(f"Streamed specifications were malformed: {e}") # Replace with logging
+            raise HTTPException(status_code=500, detail=f"AI response format error: {e}")
+        except Exception as e:
+            raise self._as_http_error(e)
+
+    def _require_api_key(self) -> None:
+        if not llm_configured():
+            # The service cannot function without a key; fail the call, not the import.
+            raise HTTPException(status_code=500, detail="OpenAI API key not configured")
+
+    async def _request_json(self, endpoint: str, prompt: str, use_cache: bool) -> dict:
+        """Run one JSON-mode completion and parse it, mapping failures to HTTPException."""
         try:
             # Log the attempt to call OpenAI API
-            # print(f"Attempting to generate specs for project: {project_name} using model: {self.model_name}") # Replace with logging
+            # print(f"Calling {endpoint} using model: {self.model_name}") # Replace with logging
 
-            response = await openai.ChatCompletion.acreate(
+            response = await create_chat_completion(
+                endpoint=endpoint,
                 model=self.model_name,
                 messages=[
-                    {"role": "system", "content": "You are an expert AI assistant specialized in generating functional specifications for software projects. Your goal is to help users define clear, concise, and comprehensive epics, features, and user stories. Output the specifications in JSON format as requested."},
+                    {"role": "system", "content": SYSTEM_MESSAGE},
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.7, # A balance between creativity and predictability
-                response_format={ "type": "json_object" } # Request JSON output
+                response_format={ "type": "json_object" }, # Request JSON output
+                cache=use_cache, # Same project inputs reuse the cached specs
+                priority="bulk", # Queued behind interactive chat when saturated
             )
 
             response_content = response.choices[0].message.content
             if not response_content:
                 print("OpenAI API returned an empty response content.") # Replace with proper logging
-                raise HTTPException(status_code=500, detail="AI service received an empty response from OpenAI.")
+                raise AIResponseFormatError("AI service received an empty response from OpenAI.")
 
             # print(f"Raw response from OpenAI: {response_content[:500]}...") # Replace with logging, be careful with sensitive data
 
@@ -56,44 +192,43 @@ class AISpecService:
                         # print("Successfully extracted and parsed JSON from markdown.") # Replace with logging
                     except json.JSONDecodeError as md_json_err:
                         print(f"Failed to decode JSON from markdown block. Error: {md_json_err}. Content: {json_str[:500]}") # Replace with logging
-                        raise HTTPException(status_code=500, detail=f"AI response format error after attempting markdown extraction. Malformed JSON. Preview: {response_content[:200]}")
+                        raise AIResponseFormatError(f"AI response format error after attempting markdown extraction. Malformed JSON. Preview: {response_content[:200]}")
                     except Exception as e:
                         print(f"Unexpected error during markdown JSON extraction: {e}") # Replace with logging
-                        raise HTTPException(status_code=500, detail=f"Unexpected error processing AI response. Preview: {response_content[:200]}")
+                        raise AIResponseFormatError(f"Unexpected error processing AI response. Preview: {response_content[:200]}")
                 else:
-                    raise HTTPException(status_code=500, detail=f"AI response was not valid JSON and not in expected markdown format. Preview: {response_content[:200]}")
-
-            # Basic validation of the expected structure
-            if not isinstance(specifications, dict) or "epics" not in specifications:
-                error_detail = f"Generated JSON is not a dictionary or does not contain the 'epics' root key. Received type: {type(specifications)}. Keys: {list(specifications.keys()) if isinstance(specifications, dict) else 'N/A'}"
-                print(error_detail) # Replace with logging
-                # print(f"Problematic JSON: {str(specifications)[:500]}") # Replace with logging
-                raise HTTPException(status_code=500, detail=f"AI generated unexpected JSON structure. {error_detail}")
+                    raise AIResponseFormatError(f"AI response was not valid JSON and not in expected markdown format. Preview: {response_content[:200]}")
 
-            # print("Successfully generated and parsed specifications.") # Replace with logging
             return specifications
 
-        except openai.APIError as e: # Catch general API errors (networking, server-side issues from OpenAI)
-            print(f"OpenAI API error: {e.status_code} - {e.message if e.message else str(e)}") # Replace with logging
-            raise HTTPException(status_code=getattr(e, 'status_code', 502), detail=f"AI service API error: {e.message if e.message else str(e)}")
-        except openai.APITimeoutError as e:
+        except HTTPException: # Re-raise HTTPExceptions that were already handled (like JSON parsing issues)
+            raise
+        except Exception as e:
+            raise self._as_http_error(e)
+
+    def _as_http_error(self, e: Exception) -> HTTPException:
+        """Map an upstream failure to the HTTPException the API reports."""
+        import openai
+
+        if isinstance(e, openai.APITimeoutError):
             print(f"OpenAI API timeout: {str(e)}") # Replace with logging
-            raise HTTPException(status_code=504, detail="AI service request timed out.")
-        except openai.RateLimitError as e:
+            return HTTPException(status_code=504, detail="AI service request timed out.")
+        if isinstance(e, openai.RateLimitError):
             print(f"OpenAI API rate limit exceeded: {e.message if e.message else str(e)}") # Replace with logging
-            raise HTTPException(status_code=429, detail=f"AI service rate limit hit. Please try again later.")
-        except openai.AuthenticationError as e: # Catch authentication errors
+            return HTTPException(status_code=429, detail=f"AI service rate limit hit. Please try again later.")
+        if isinstance(e, openai.AuthenticationError): # Catch authentication errors
             print(f"OpenAI API Authentication Error: {e.message if e.message else str(e)}") # Replace with logging
-            raise HTTPException(status_code=401, detail=f"AI service authentication failed. Check API key. Error: {e.message if e.message else str(e)}")
-        except openai.InvalidRequestError as e: # Catch errors like malformed requests, invalid model
-             print(f"OpenAI API Invalid Request Error: {e.message if e.message else str(e)} (Param: {e.param if e.param else 'N/A'})") # Replace with logging
-             raise HTTPException(status_code=400, detail=f"AI service invalid request to OpenAI. Error: {e.message if e.message else str(e)} (Param: {e.param if e.param else 'N/A'})")
-        except HTTPException: # Re-raise HTTPExceptions that were already handled (like JSON parsing issues)
-            raise
-        except Exception as e: # Catch any other unexpected errors
-            print(f"An unexpected error occurred in AISpecService: {type(e).__name__} - {e}") # Replace with logging
-            # Consider logging traceback for unexpected errors
-            raise HTTPException(status_code=500, detail=f"Unexpected error in AI service: {type(e).__name__} - {str(e)}")
+            return HTTPException(status_code=401, detail=f"AI service authentication failed. Check API key. Error: {e.message if e.message else str(e)}")
+        if isinstance(e, openai.BadRequestError): # Catch errors like malformed requests, invalid model
+            print(f"OpenAI API Invalid Request Error: {e.message if e.message else str(e)} (Param: {e.param if e.param else 'N/A'})") # Replace with logging
+            return HTTPException(status_code=400, detail=f"AI service invalid request to OpenAI. Error: {e.message if e.message else str(e)} (Param: {e.param if e.param else 'N/A'})")
+        if isinstance(e, openai.APIError): # Catch general API errors (networking, server-side issues from OpenAI)
+            print(f"OpenAI API error: {getattr(e, 'status_code', None)} - {e.message if e.message else str(e)}") # Replace with logging
+            return HTTPException(status_code=getattr(e, 'status_code', 502), detail=f"AI service API error: {e.message if e.message else str(e)}")
+        # Any other unexpected error
+        print(f"An unexpected error occurred in AISpecService: {type(e).__name__} - {e}") # Replace with logging
+        # Consider logging traceback for unexpected errors
+        return HTTPException(status_code=500, detail=f"Unexpected error in AI service: {type(e).__name__} - {str(e)}")
 
 
     def _build_prompt(self, project_name: str, project_description: str, project_goals: list[str]) -> str:
@@ -177,3 +312,56 @@ class AISpecService:
         Focus on creating meaningful and actionable specifications based on the project details.
         """
         return prompt
+
+    def _project_context(self, project_name: str, project_description: str, project_goals: list[str]) -> str:
+        valid_goals = [goal.strip() for goal in project_goals if goal and goal.strip()]
+        goals = "".join(f"\n- {goal}" for goal in valid_goals)
+        context = f"Project Name: {project_name}\n\nProject Description:\n{project_description}"
+        if goals:
+            context += f"\n\nKey Project Goals:{goals}"
+        return context
+
+    def _build_outline_prompt(self, project_name: str, project_description: str, project_goals: list[str]) -> str:
+        return f"""
+        You are planning the functional specifications of a software project.
+
+        {self._project_context(project_name, project_description, project_goals)}
+
+        List the project's epics only; their features and user stories are written later, one epic at a time.
+
+        Output Format Instructions:
+        - The entire output MUST be a single, valid JSON object.
+        - The root key is "epics", an array of objects with "title" and "description" strings.
+        - Epics must not overlap; together they must cover the whole project.
+
+        Example: {{"epics": [{{"title": "User Account Management", "description": "Registration, login and profile management."}}]}}
+        """
+
+    def _build_epic_prompt(
+        self,
+        project_name: str,
+        project_description: str,
+        project_goals: list[str],
+        outline: list["AISpecEpicOutline"],
+        epic: "AISpecEpicOutline",
+    ) -> str:
+        other_epics = "\n".join(f"- {e.title}" for e in outline if e is not epic) or "- (none)"
+        return f"""
+        You are writing the functional specifications of one epic of a software project.
+
+        {self._project_context(project_name, project_description, project_goals)}
+
+        Epic to detail: {epic.title}
+        {epic.description or ""}
+
+        Other epics, covered separately (do not repeat their scope):
+        {other_epics}
+
+        Output Format Instructions:
+        - The entire output MUST be a single, valid JSON object.
+        - The root key is "features", an array of feature objects for this epic only.
+        - Each feature has "title", "description" and "user_stories", an array of strings.
+        - Each user story string must follow the format: "As a [type of user], I want [an action] so that [a benefit/value]."
+
+        Example: {{"features": [{{"title": "User Login", "description": "Allows existing users to log in.", "user_stories": ["As an existing user, I want to log in with my credentials so that I can access my content."]}}]}}
+        """
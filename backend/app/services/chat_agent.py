@@ -0,0 +1,223 @@
+"""Native function calling for ``/chat``.
+
+The model is offered ``agents.tools.HANDLERS`` as OpenAI function tools, with
+parameters generated from each handler's Pydantic input model
+(``agents.tools.tool_definitions``). Every tool call of a model turn runs in a
+worker thread, ``chat_agent_parallel_tools`` at a time, and the results go
+back to the model as ``tool`` messages until it answers in text, so a
+multi-step edit finishes within one request.
+
+Two limits bound a run:
+
+- ``chat_agent_max_steps`` model turns; the last one is asked to answer
+  without tools (``tool_choice="none"``);
+- ``chat_agent_time_limit`` seconds of wall clock; a model turn still
+  running at the deadline is cancelled and the reply summarises the tool
+  calls made so far. Tool calls that have started are not interrupted.
+
+Tool calls are confined to the chat's project: a ``project_id`` argument must
+name it and item ids (``id``, ``parent_id``, ``new_parent_id``) must belong
+to it, otherwise the call is rejected and the model is told why.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Awaitable, Callable, Optional
+
+from pydantic import BaseModel, ValidationError
+from sqlmodel import Session, select
+
+from agents.tools import HANDLERS, INPUT_MODELS, SessionFactory, default_session, tool_definitions
+from app.core.config import get_settings
+from app.core.metrics import chat_agent_stopped, chat_agent_steps, chat_tool_calls
+from app.models.item import Item
+
+logger = logging.getLogger(__name__)
+
+ITEM_ID_ARGS = ("id", "parent_id", "new_parent_id")
+
+
+@dataclass
+class ToolCallRecord:
+    name: str
+    arguments: dict[str, Any]
+    result: dict[str, Any]
+
+    def as_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass
+class AgentReply:
+    text: str = ""
+    tool_calls: list[ToolCallRecord] = field(default_factory=list)
+    steps: int = 0
+    stopped: Optional[str] = None  # "max_steps" or "time_limit" when cut short
+
+
+def scope_note(project_id: int) -> str:
+    return (
+        f"You are working on project {project_id}. Use the tools to read and change its "
+        "items; calls that touch other projects are rejected. Make independent calls in "
+        "the same turn, and answer in text once the work is done."
+    )
+
+
+def _out_of_scope(db: Session, project_id: int, data: BaseModel) -> Optional[str]:
+    requested = getattr(data, "project_id", None)
+    if requested is not None and requested != project_id:
+        return f"tools can only act on project {project_id}"
+    ids = {getattr(data, name) for name in ITEM_ID_ARGS if getattr(data, name, None) is not None}
+    if not ids:
+        return None
+    owned = set(db.exec(select(Item.id).where(Item.id.in_(ids), Item.project_id == project_id)).all())
+    missing = ids - owned
+    return f"item {min(missing)} not found in project {project_id}" if missing else None
+
+
+def run_tool(
+    name: str, arguments: str, project_id: int, session_factory: SessionFactory = default_session
+) -> ToolCallRecord:
+    """Validate, scope-check and run one tool call; failures become error results."""
+
+    def done(args: dict[str, Any], result: dict[str, Any], outcome: str) -> ToolCallRecord:
+        chat_tool_calls.inc(name if name in HANDLERS else "unknown", outcome)
+        return ToolCallRecord(name, args, result)
+
+    try:
+        args = json.loads(arguments or "{}")
+    except json.JSONDecodeError:
+        return done({}, {"ok": False, "error": "arguments are not valid JSON"}, "rejected")
+    if not isinstance(args, dict):
+        return done({}, {"ok": False, "error": "arguments must be a JSON object"}, "rejected")
+    if name not in HANDLERS:
+        return done(args, {"ok": False, "error": f"unknown tool {name!r}"}, "rejected")
+    try:
+        data = INPUT_MODELS[name].model_validate(args)
+    except ValidationError as e:
+        return done(args, {"ok": False, "error": str(e)}, "rejected")
+    with session_factory() as db:
+        problem = _out_of_scope(db, project_id, data)
+    if problem:
+        return done(args, {"ok": False, "error": problem}, "rejected")
+    try:
+        result = HANDLERS[name](args, session_factory=session_factory)
+    except Exception as e:
+        logger.exception("Tool %s failed", name)
+        result = {"ok": False, "error": f"{type(e).__name__}: {str(e)[:200]}"}
+    return done(args, result, "ok" if result.get("ok") else "error")
+
+
+def _assistant_message(message: Any) -> dict[str, Any]:
+    return {
+        "role": "assistant",
+        "content": message.content,
+        "tool_calls": [
+            {
+                "id": call.id,
+                "type": "function",
+                "function": {"name": call.function.name, "arguments": call.function.arguments},
+            }
+            for call in message.tool_calls
+        ],
+    }
+
+
+def _stopped_text(reply: AgentReply) -> str:
+    reason = "time limit" if reply.stopped == "time_limit" else "step limit"
+    done = ", ".join(call.name for call in reply.tool_calls) or "none"
+    return f"I stopped before finishing (reached the {reason}). Tool calls made: {done}."
+
+
+async def run_chat_agent(
+    *,
+    complete: Callable[..., Awaitable[Any]],
+    endpoint: str,
+    model: str,
+    messages: list[dict[str, Any]],
+    project_id: int,
+    user_id: Optional[int] = None,
+    cache: bool = True,
+    session_factory: SessionFactory = default_session,
+) -> AgentReply:
+    """Answer ``messages``, letting the model call tools on ``project_id``.
+
+    ``complete`` is ``app.services.llm.create_chat_completion`` or a stand-in
+    with its signature. With ``chat_agent_enabled`` off this is one plain
+    completion.
+    """
+    settings = get_settings()
+    tools_enabled = settings.chat_agent_enabled
+    max_steps = max(1, settings.chat_agent_max_steps) if tools_enabled else 1
+    messages = list(messages)
+    if tools_enabled:
+        # Appended to the system prompt, which keeps its cacheable prefix.
+        system = messages[0]
+        messages[0] = {**system, "content": f"{system['content']}\n{scope_note(project_id)}"}
+        tools = tool_definitions()
+    slots = asyncio.Semaphore(max(1, settings.chat_agent_parallel_tools))
+    deadline = time.monotonic() + settings.chat_agent_time_limit
+    reply = AgentReply()
+
+    async def call_tool(call: Any) -> ToolCallRecord:
+        async with slots:
+            return await asyncio.to_thread(
+                run_tool, call.function.name, call.function.arguments, project_id, session_factory
+            )
+
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            reply.stopped = "time_limit"
+            break
+        params: dict[str, Any] = {}
+        if tools_enabled:
+            params["tools"] = tools
+            if reply.steps == max_steps - 1:
+                params["tool_choice"] = "none"
+        reply.steps += 1
+        scope = asyncio.timeout(remaining)
+        try:
+            async with scope:
+                completion = await complete(
+                    endpoint=endpoint, model=model, messages=messages, cache=cache,
+                    project_id=project_id, user_id=user_id, **params,
+                )
+        except TimeoutError:
+            if not scope.expired():
+                raise
+            reply.stopped = "time_limit"
+            break
+        message = completion.choices[0].message if completion.choices else None
+        calls = getattr(message, "tool_calls", None) or []
+        if not calls or reply.steps >= max_steps:
+            reply.text = ((message.content if message else None) or "").strip()
+            if calls:
+                reply.stopped = "max_steps"
+            break
+        messages.append(_assistant_message(message))
+        records = await asyncio.gather(*(call_tool(call) for call in calls))
+        for call, record in zip(calls, records):
+            messages.append(
+                {
+                    "role": "tool",
+                    "tool_call_id": call.id,
+                    "content": json.dumps(record.result, default=str),
+                }
+            )
+        reply.tool_calls.extend(records)
+
+    chat_agent_steps.observe(reply.steps)
+    if reply.stopped:
+        chat_agent_stopped.inc(reply.stopped)
+        logger.warning(
+            "Chat agent for project %s stopped at its %s after %d steps",
+            project_id, reply.stopped, reply.steps,
+        )
+        if not reply.text:
+            reply.text = _stopped_text(reply)
+    return reply
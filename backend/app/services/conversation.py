@@ -0,0 +1,194 @@
+"""Token-budgeted conversation memory for ``/chat``.
+
+The prompt replays a project's recent ``chat_message_user`` /
+``chat_message_ai`` activities, newest first, until
+``chat_memory_token_budget`` is spent. Turns older than that window are not
+replayed; they are folded into a running summary (``ConversationSummary``)
+that travels with the prompt instead. Compaction is incremental: the stored
+summary is updated with just the turns that left the window since the last
+run, once they add up to ``chat_summary_batch_tokens``, so each turn is
+summarised once and the prompt size stays bounded however long the
+conversation gets.
+"""
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from app.core.config import get_settings
+from app.models.activity import Activity
+from app.models.conversation import ConversationSummary
+from app.services.activity import flush_activities
+from app.services.llm import create_chat_completion
+from app.services.tokens import MESSAGE_OVERHEAD, count_tokens, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+TURN_ROLES = {"chat_message_user": "user", "chat_message_ai": "assistant"}
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a conversation between a business analyst "
+    "and an assistant that manages a project's requirements, epics, features, user "
+    "stories and use cases. Update the summary with the new turns. Keep decisions, "
+    "created items with their ids, constraints and open questions; drop pleasantries. "
+    "Answer with the updated summary only, in at most {words} words."
+)
+
+
+@dataclass
+class Turn:
+    id: int
+    role: str
+    content: str
+    tokens: int
+
+    def as_message(self) -> dict:
+        return {"role": self.role, "content": self.content}
+
+
+@dataclass
+class ConversationMemory:
+    summary: str = ""
+    through_activity_id: int = 0
+    # Replayed turns, oldest first.
+    window: list[Turn] = field(default_factory=list)
+
+    def messages(self) -> list[dict]:
+        messages = [_summary_message(self.summary)] if self.summary else []
+        messages.extend(turn.as_message() for turn in self.window)
+        return messages
+
+
+def _summary_message(summary: str) -> dict:
+    return {"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"}
+
+
+def _turn(activity: Activity) -> Turn:
+    return Turn(
+        id=activity.id,
+        role=TURN_ROLES[activity.type],
+        content=activity.content,
+        tokens=count_tokens(activity.content) + MESSAGE_OVERHEAD,
+    )
+
+
+def load_memory(db: Session, project_id: int) -> ConversationMemory:
+    """Return the summary and the newest turns that fit the token budget."""
+    settings = get_settings()
+    flush_activities(project_id)  # turns logged moments ago must be replayed
+    row = db.get(ConversationSummary, project_id)
+    memory = ConversationMemory()
+    if row is not None:
+        memory.summary = row.summary
+        memory.through_activity_id = row.through_activity_id
+
+    remaining = settings.chat_memory_token_budget
+    if memory.summary:
+        remaining -= count_tokens(_summary_message(memory.summary)["content"]) + MESSAGE_OVERHEAD
+    recent = db.exec(
+        select(Activity)
+        .where(
+            Activity.project_id == project_id,
+            Activity.type.in_(TURN_ROLES),
+            Activity.id > memory.through_activity_id,
+        )
+        .order_by(Activity.id.desc())
+        .limit(settings.chat_memory_max_turns)
+    ).all()
+    for activity in recent:
+        turn = _turn(activity)
+        if turn.tokens > remaining:
+            break
+        memory.window.append(turn)
+        remaining -= turn.tokens
+    memory.window.reverse()
+    return memory
+
+
+def pending_turns(db: Session, project_id: int, memory: ConversationMemory) -> list[Turn]:
+    """Turns that left the window but are not in the summary yet, oldest first."""
+    query = (
+        select(Activity)
+        .where(
+            Activity.project_id == project_id,
+            Activity.type.in_(TURN_ROLES),
+            Activity.id > memory.through_activity_id,
+        )
+        .order_by(Activity.id)
+        .limit(get_settings().chat_memory_max_turns)
+    )
+    if memory.window:
+        query = query.where(Activity.id < memory.window[0].id)
+    return [_turn(activity) for activity in db.exec(query).all()]
+
+
+async def compact_conversation(db: Session, project_id: int, model: str) -> bool:
+    """Fold pending turns into the running summary. Returns True if it changed."""
+    settings = get_settings()
+    memory = load_memory(db, project_id)
+    pending = pending_turns(db, project_id, memory)
+    if not pending or sum(t.tokens for t in pending) < settings.chat_summary_batch_tokens:
+        return False
+
+    transcript = "\n".join(
+        f"{'Analyst' if t.role == 'user' else 'Assistant'}: {t.content}" for t in pending
+    )
+    completion = await create_chat_completion(
+        endpoint="chat_summary",
+        model=model,
+        messages=[
+            {
+                "role": "system",
+                "content": SUMMARY_PROMPT.format(words=settings.chat_summary_max_tokens * 3 // 4),
+            },
+            {
+                "role": "user",
+                "content": f"Current summary:\n{memory.summary or '(none)'}\n\nNew turns:\n{transcript}",
+            },
+        ],
+        temperature=0,
+        priority="bulk",
+        project_id=project_id,
+    )
+    summary = (completion.choices[0].message.content or "").strip()
+    summary = truncate_to_tokens(summary, settings.chat_summary_max_tokens)
+
+    # Conditional write, like JobRunner._claim: a compaction that got further
+    # while we waited for the model is not overwritten, so through_activity_id
+    # never moves backwards.
+    through = pending[-1].id
+    values = {"summary": summary, "through_activity_id": through, "updated_at": datetime.utcnow()}
+    updated = db.execute(
+        update(ConversationSummary)
+        .where(
+            ConversationSummary.project_id == project_id,
+            ConversationSummary.through_activity_id < through,
+        )
+        .values(**values)
+    )
+    if updated.rowcount == 0:
+        try:
+            with db.begin_nested():
+                db.execute(insert(ConversationSummary).values(project_id=project_id, **values))
+        except IntegrityError:
+            db.rollback()
+            return False  # another worker got as far or further first
+    db.commit()
+    return True
+
+
+async def compact_conversation_task(project_id: int, model: str) -> None:
+    """Background-task wrapper running ``compact_conversation`` in its own session."""
+    from app.db.session import engine
+
+    try:
+        with Session(engine) as db:
+            await compact_conversation(db, project_id, model)
+    except Exception:
+        logger.exception("Conversation compaction failed for project %s", project_id)
@@ -0,0 +1,71 @@
+"""Creation of requirement hierarchy items, shared by the CRUD API and the chat assistant.
+
+Items are created inside the caller's session. With ``commit=False`` the new
+row is only flushed (so its id is known) and the caller decides when the
+transaction ends, which lets the chat endpoint commit the item together with
+its activity log entry.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Optional, Type
+
+from fastapi import HTTPException
+from sqlmodel import Session, SQLModel
+
+from app.models.requirements import Epic, Feature, Requirement, UseCase, UserStory
+
+
+@dataclass(frozen=True)
+class ItemKind:
+    model: Type[SQLModel]
+    parent_model: Optional[Type[SQLModel]] = None
+    parent_field: Optional[str] = None
+
+
+ITEM_KINDS: dict[str, ItemKind] = {
+    "requirement": ItemKind(Requirement),
+    "epic": ItemKind(Epic, Requirement, "parent_req_id"),
+    "feature": ItemKind(Feature, Epic, "parent_epic_id"),
+    "user_story": ItemKind(UserStory, Feature, "parent_feature_id"),
+    "use_case": ItemKind(UseCase, UserStory, "parent_story_id"),
+}
+
+
+def create_item(
+    db: Session,
+    project_id: int,
+    kind: str,
+    data: dict[str, Any],
+    parent_id: Optional[int] = None,
+    commit: bool = True,
+) -> SQLModel:
+    """Create an item of ``kind`` under ``parent_id`` in ``project_id``.
+
+    Raises ``HTTPException`` (400 for an unknown kind or missing parent id,
+    404 when the parent does not exist in the project).
+    """
+    spec = ITEM_KINDS.get(kind)
+    if spec is None:
+        raise HTTPException(status_code=400, detail=f"Unknown item type '{kind}'")
+
+    values = {k: v for k, v in data.items() if k in spec.model.model_fields}
+    values["project_id"] = project_id
+    if spec.parent_model is not None:
+        if parent_id is None:
+            raise HTTPException(status_code=400, detail=f"A parent id is required to create a {kind}")
+        parent = db.get(spec.parent_model, parent_id)
+        if not parent or parent.project_id != project_id:
+            raise HTTPException(
+                status_code=404, detail=f"{spec.parent_model.__name__} not found"
+            )
+        values[spec.parent_field] = parent_id
+
+    item = spec.model(**values)
+    db.add(item)
+    if commit:
+        db.commit()
+        db.refresh(item)
+    else:
+        db.flush()
+    return item
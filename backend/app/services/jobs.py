@@ -0,0 +1,348 @@
+"""Persistent background jobs executed by a pool of asyncio workers.
+
+The ``job`` table is the queue. ``submit_job`` inserts a ``queued`` row;
+each worker claims the oldest queued row with a conditional ``UPDATE`` (so
+several processes can share the table without running a job twice), runs the
+handler registered for the job's ``kind`` and stores its JSON result or
+error. While a job runs, a watcher refreshes its heartbeat and checks
+``cancel_requested``, which lets a cancel issued through any process reach
+the worker that owns the job.
+
+Jobs survive restarts: shutdown puts the jobs it interrupts back in the
+queue, and a janitor requeues ``running`` jobs whose heartbeat went stale
+because their process died (failing them after ``job_max_attempts`` runs).
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import update
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select
+
+from app.core.config import get_settings
+from app.models.job import Job
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = frozenset({"succeeded", "failed", "cancelled"})
+
+JobHandler = Callable[[Job], Awaitable[Any]]
+HANDLERS: dict[str, JobHandler] = {}
+
+
+def job_handler(kind: str) -> Callable[[JobHandler], JobHandler]:
+    """Register the coroutine that runs jobs of ``kind``; it returns a JSON-able result."""
+
+    def register(fn: JobHandler) -> JobHandler:
+        HANDLERS[kind] = fn
+        return fn
+
+    return register
+
+
+# Submission and cancellation (request side) ------------------------------
+
+
+def submit_job(db: Session, project_id: int, owner_id: int, kind: str, params: dict) -> Job:
+    if kind not in HANDLERS:
+        raise HTTPException(status_code=400, detail=f"Unknown job type '{kind}'")
+    job = Job(project_id=project_id, owner_id=owner_id, kind=kind, params=json.dumps(params))
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    if _runner is not None:
+        _runner.wake()
+    return job
+
+
+def request_cancel(db: Session, job: Job) -> Job:
+    """Cancel a queued job at once, or ask the worker running it to stop."""
+    if job.status == "queued":
+        job.status = "cancelled"
+        job.finished_at = datetime.utcnow()
+    elif job.status == "running":
+        job.cancel_requested = True
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    if _runner is not None and job.status == "running":
+        _runner.cancel_local(job.id)
+    return job
+
+
+async def run_uninterrupted(fn: Callable[[], Any]) -> Any:
+    """Run blocking ``fn`` in a thread and return its result, even if cancelled.
+
+    A thread cannot be stopped, so once ``fn`` has started (typically a
+    transaction that commits) cancelling the job waits for it instead, and
+    the job records what ``fn`` actually did rather than "cancelled" or a
+    requeue that would run it twice.
+    """
+    running = asyncio.ensure_future(asyncio.to_thread(fn))
+    while True:
+        try:
+            return await asyncio.shield(running)
+        except asyncio.CancelledError:
+            if running.done():
+                return running.result()
+
+
+# Worker pool ----------------------------------------------------------------
+
+
+class JobRunner:
+    def __init__(
+        self,
+        engine: Engine,
+        workers: int = 2,
+        poll_interval: float = 1.0,
+        stale_after: float = 30.0,
+        max_attempts: int = 3,
+    ):
+        self.engine = engine
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.max_attempts = max_attempts
+        self._wake = asyncio.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: list[asyncio.Task] = []
+        self._running: dict[int, asyncio.Task] = {}
+        self._stopping = False
+
+    # Database helpers (run in threads) --------------------------------
+
+    def _claim(self) -> Optional[Job]:
+        with Session(self.engine) as db:
+            candidates = db.exec(
+                select(Job.id).where(Job.status == "queued").order_by(Job.id).limit(5)
+            ).all()
+            for job_id in candidates:
+                now = datetime.utcnow()
+                claimed = db.execute(
+                    update(Job)
+                    .where(Job.id == job_id, Job.status == "queued")
+                    .values(
+                        status="running",
+                        started_at=now,
+                        heartbeat_at=now,
+                        attempts=Job.attempts + 1,
+                    )
+                )
+                db.commit()
+                if claimed.rowcount == 1:
+                    job = db.get(Job, job_id)
+                    db.expunge(job)
+                    return job
+        return None
+
+    def _finish(self, job_id: int, status: str, result: Any = None, error: Optional[str] = None) -> None:
+        values: dict[str, Any] = {"status": status, "error": error}
+        if status == "queued":
+            values.update(started_at=None, heartbeat_at=None)
+        else:
+            values.update(finished_at=datetime.utcnow())
+            if result is not None:
+                values["result"] = json.dumps(result)
+        with Session(self.engine) as db:
+            db.execute(update(Job).where(Job.id == job_id, Job.status == "running").values(**values))
+            db.commit()
+
+    def _heartbeat(self, job_id: int) -> bool:
+        """Refresh the heartbeat; returns whether a cancel was requested."""
+        with Session(self.engine) as db:
+            db.execute(
+                update(Job).where(Job.id == job_id).values(heartbeat_at=datetime.utcnow())
+            )
+            db.commit()
+            return bool(db.exec(select(Job.cancel_requested).where(Job.id == job_id)).first())
+
+    def requeue_stale(self) -> int:
+        """Requeue running jobs whose worker stopped heartbeating. Returns how many."""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stale_after)
+        stale = (Job.status == "running") & (Job.heartbeat_at < cutoff)
+        with Session(self.engine) as db:
+            db.execute(
+                update(Job)
+                .where(stale, Job.attempts >= self.max_attempts)
+                .values(
+                    status="failed",
+                    error="Interrupted too many times",
+                    finished_at=datetime.utcnow(),
+                )
+            )
+            requeued = db.execute(
+                update(Job)
+                .where(stale)
+                .values(status="queued", started_at=None, heartbeat_at=None)
+            )
+            db.commit()
+            return requeued.rowcount
+
+    # Event loop side --------------------------------------------------
+
+    # wake and cancel_local are also called from sync endpoints, which run in
+    # threadpool threads: hand the work to the loop thread-safely.
+
+    def wake(self) -> None:
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def cancel_local(self, job_id: int) -> None:
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._cancel_running, job_id)
+
+    def _cancel_running(self, job_id: int) -> None:
+        task = self._running.get(job_id)
+        if task is not None:
+            task.cancel()
+
+    async def _watch(self, job_id: int, task: asyncio.Task) -> None:
+        while not task.done():
+            await asyncio.sleep(self.poll_interval)
+            if await asyncio.to_thread(self._heartbeat, job_id):
+                task.cancel()
+
+    async def _run(self, job: Job) -> None:
+        handler = HANDLERS.get(job.kind)
+        if handler is None:
+            await asyncio.to_thread(self._finish, job.id, "failed", None, f"Unknown job type '{job.kind}'")
+            return
+        task = asyncio.create_task(handler(job))
+        self._running[job.id] = task
+        watcher = asyncio.create_task(self._watch(job.id, task))
+        try:
+            result = await task
+        except asyncio.CancelledError:
+            # Shutdown puts the job back in the queue; otherwise it was cancelled.
+            status = "queued" if self._stopping else "cancelled"
+            await asyncio.to_thread(self._finish, job.id, status)
+            if self._stopping:
+                raise
+        except HTTPException as exc:
+            await asyncio.to_thread(self._finish, job.id, "failed", None, str(exc.detail))
+        except Exception as exc:
+            logger.exception("Job %s (%s) failed", job.id, job.kind)
+            await asyncio.to_thread(self._finish, job.id, "failed", None, f"{type(exc).__name__}: {exc}")
+        else:
+            await asyncio.to_thread(self._finish, job.id, "succeeded", result)
+        finally:
+            watcher.cancel()
+            self._running.pop(job.id, None)
+
+    async def _worker(self) -> None:
+        # A handler may finish its work despite a shutdown cancel
+        # (run_uninterrupted); stop claiming jobs then.
+        while not self._stopping:
+            job = await asyncio.to_thread(self._claim)
+            if job is None:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    async def _janitor(self) -> None:
+        while True:
+            try:
+                if await asyncio.to_thread(self.requeue_stale):
+                    self.wake()
+            except Exception:
+                logger.exception("Requeueing stale jobs failed")
+            await asyncio.sleep(self.stale_after / 2)
+
+    def start(self) -> None:
+        self._stopping = False
+        self._loop = asyncio.get_running_loop()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._janitor()))
+
+    async def stop(self) -> None:
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._loop = None
+
+
+_runner: Optional[JobRunner] = None
+
+
+def start_job_runner(engine: Optional[Engine] = None) -> JobRunner:
+    global _runner
+    if engine is None:
+        from app.db.session import engine
+    settings = get_settings()
+    _runner = JobRunner(
+        engine,
+        workers=settings.job_workers,
+        poll_interval=settings.job_poll_interval,
+        stale_after=settings.job_stale_after,
+        max_attempts=settings.job_max_attempts,
+    )
+    _runner.start()
+    return _runner
+
+
+async def stop_job_runner() -> None:
+    global _runner
+    if _runner is not None:
+        await _runner.stop()
+        _runner = None
+
+
+# Handlers -------------------------------------------------------------------
+
+
+@job_handler("generate_specifications")
+async def generate_specifications_job(job: Job) -> dict:
+    """Generate specifications for the job's project and import them."""
+    from app.db.session import engine
+    from app.models.project import Project
+    from app.schemas.requirements import AISpecImportRequest
+    from app.services.ai_spec_service import AISpecService
+    from app.services.spec_import import import_specifications
+    from app.services.usage import usage_scope
+
+    params = json.loads(job.params)
+    with Session(engine) as db:
+        project = db.get(Project, job.project_id)
+        if project is None:
+            raise HTTPException(status_code=404, detail="Project not found")
+        name, description = project.name, project.description or ""
+
+    service = AISpecService()
+    generate = (
+        service.generate_specifications_parallel
+        if params.get("fan_out", True)
+        else service.generate_specifications
+    )
+    with usage_scope(job.project_id, job.owner_id):
+        specifications = await generate(
+            name, description, params.get("project_goals", []), use_cache=params.get("use_cache", True)
+        )
+    specs_in = AISpecImportRequest(
+        epics=specifications["epics"],
+        requirement_title=params.get("requirement_title") or "AI Generated Specifications",
+        requirement_description=params.get("requirement_description"),
+    )
+
+    def run_import() -> dict:
+        with Session(engine) as db:
+            try:
+                return import_specifications(db, job.project_id, specs_in)
+            except Exception:
+                db.rollback()
+                raise
+
+    imported = await run_uninterrupted(run_import)
+    return {"specifications": specifications, "import": imported}
@@ -0,0 +1,103 @@
+"""Incremental extraction of array items from a JSON document being streamed.
+
+``JSONArrayStream("epics")`` is fed the model's output chunk by chunk and
+returns each object in the top-level ``"epics"`` array as soon as its
+closing bracket arrives, parsed with ``json.loads``. The scanner only tracks
+nesting, strings and escapes, so each character is examined once and only
+the element currently open is buffered. Text before the root object (such as
+a Markdown fence) is skipped.
+"""
+from __future__ import annotations
+
+import json
+from typing import Any
+
+
+class JSONStreamError(ValueError):
+    pass
+
+
+class JSONArrayStream:
+    def __init__(self, key: str):
+        self.key = key
+        self.items_seen = 0
+        self._stack: list[str] = []  # open containers, "{" or "["
+        self._in_string = False
+        self._escape = False
+        self._expect_key = False  # next string in the root object is a key
+        self._key_chars: list[str] | None = None
+        self._last_key: str | None = None
+        self._target_depth: int | None = None  # depth of the watched array's elements
+        self._item: list[str] | None = None  # text of the element being read
+        self._done = False
+
+    @property
+    def complete(self) -> bool:
+        """Whether the root object has been closed."""
+        return self._done
+
+    def feed(self, chunk: str) -> list[Any]:
+        """Consume ``chunk``; returns the array elements it completed."""
+        items: list[Any] = []
+        start = 0  # where the pending slice of ``chunk`` begins, for ``_item``
+        for i, char in enumerate(chunk):
+            if self._done:
+                break
+            if self._in_string:
+                if self._key_chars is not None and not (char == '"' and not self._escape):
+                    self._key_chars.append(char)
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._key_chars is not None:
+                        self._last_key = json.loads(f'"{"".join(self._key_chars)}"')
+                        self._key_chars = None
+                continue
+            if not self._stack and char != "{":
+                continue  # before the root object
+            if char == '"':
+                self._in_string = True
+                if len(self._stack) == 1 and self._expect_key:
+                    self._key_chars = []
+                    self._expect_key = False
+            elif char in "{[":
+                if self._item is None and len(self._stack) == self._target_depth:
+                    self._item = []
+                    start = i
+                elif char == "[" and len(self._stack) == 1 and self._last_key == self.key:
+                    self._target_depth = 2
+                self._stack.append(char)
+                if len(self._stack) == 1:
+                    self._expect_key = True
+            elif char in "}]":
+                if not self._stack or self._stack.pop() != ("{" if char == "}" else "["):
+                    raise JSONStreamError(f"Unbalanced '{char}' in streamed JSON")
+                depth = len(self._stack)
+                if self._item is not None and depth == self._target_depth:
+                    self._item.append(chunk[start:i + 1])
+                    items.append(self._parse_item("".join(self._item)))
+                    self._item = None
+                elif self._target_depth is not None and depth == self._target_depth - 1:
+                    self._target_depth = None  # the watched array closed
+                if not self._stack:
+                    self._done = True
+            elif char == "," and len(self._stack) == 1:
+                self._expect_key = True
+        if self._item is not None:
+            self._item.append(chunk[start:])
+        return items
+
+    def _parse_item(self, text: str) -> Any:
+        self.items_seen += 1
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError as exc:
+            raise JSONStreamError(f"Malformed item {self.items_seen} in '{self.key}': {exc}") from None
+
+    def close(self) -> None:
+        """Raise unless a whole root object was read."""
+        if not self._done:
+            raise JSONStreamError("Streamed JSON ended before the document was complete")
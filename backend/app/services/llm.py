@@ -0,0 +1,251 @@
+"""Single entry point for upstream LLM calls.
+
+Every chat completion the app issues goes through ``create_chat_completion``
+so latency, token usage and failures are recorded the same way for ``/chat``
+and ``AISpecService``. Both helpers consult the response cache first
+(``app.services.llm_cache``); pass ``cache=False`` to force an upstream call.
+Concurrent identical non-streaming calls are coalesced into one upstream
+request (``app.services.singleflight``), and every upstream request holds a
+slot from the admission controller (``app.services.admission``) at
+``priority`` ("interactive" or "bulk"). Upstream means the provider chosen
+by ``LLM_PROVIDER`` (``app.services.llm_providers``): OpenAI, or a local
+mock for offline work and load tests. Upstream requests are retried,
+hedged and bounded by a latency budget (``app.services.llm_resilience``).
+Every call, cached or not, is accounted per project and user, and projects
+over their token budget are refused before going upstream
+(``app.services.usage``).
+"""
+from __future__ import annotations
+
+import asyncio
+from time import perf_counter
+from typing import Any, AsyncIterator, Optional
+
+from app.core.metrics import (
+    llm_cache_lookups,
+    llm_coalesced,
+    llm_errors,
+    llm_request_duration,
+    llm_time_to_first_token,
+    llm_tokens,
+)
+from app.services.admission import get_admission_controller
+from app.services.llm_cache import cache_key, get_response_cache
+from app.services.llm_providers import get_llm_provider
+from app.services.llm_resilience import CallPolicy
+from app.services.singleflight import SingleFlight
+from app.services.usage import check_token_budget, record_llm_call, resolve_scope
+
+_in_flight = SingleFlight()
+
+
+def record_usage(endpoint: str, model: str, usage: Any) -> None:
+    if usage is None:
+        return
+    llm_tokens.inc(endpoint, model, "prompt", amount=usage.prompt_tokens or 0)
+    llm_tokens.inc(endpoint, model, "completion", amount=usage.completion_tokens or 0)
+
+
+def _lookup_cache(endpoint: str, cache: bool):
+    response_cache = get_response_cache() if cache else None
+    if response_cache is None:
+        llm_cache_lookups.inc(endpoint, "bypass")
+    return response_cache
+
+
+async def create_chat_completion(
+    *,
+    endpoint: str,
+    model: str,
+    messages: list[dict[str, Any]],
+    cache: bool = True,
+    priority: str = "interactive",
+    project_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    **params: Any,
+):
+    """Call ``chat.completions.create`` and record telemetry under ``endpoint``.
+
+    The call is accounted to ``project_id`` and ``user_id``, or to the
+    enclosing ``usage_scope`` (``app.services.usage``).
+    """
+    started = perf_counter()
+    scope = resolve_scope(project_id, user_id)
+
+    def account(**kwargs: Any) -> None:
+        record_llm_call(
+            endpoint=endpoint, model=model, latency=perf_counter() - started,
+            project_id=scope.project_id, user_id=scope.user_id, **kwargs,
+        )
+
+    key = cache_key(model, messages, params)
+    response_cache = _lookup_cache(endpoint, cache)
+    if response_cache is not None:
+        cached, tier = await response_cache.aget(key)
+        if cached is not None:
+            from openai.types.chat import ChatCompletion
+
+            llm_cache_lookups.inc(endpoint, f"{tier}_hit")
+            account(cache_hit=True)
+            return ChatCompletion.model_validate_json(cached)
+        llm_cache_lookups.inc(endpoint, "miss")
+
+    await check_token_budget(scope.project_id)
+    admission = get_admission_controller()
+
+    async def attempt():
+        async with admission.slot(priority):
+            start = perf_counter()
+            try:
+                return await get_llm_provider().complete(
+                    model=model, messages=messages, **params
+                )
+            except Exception as exc:
+                llm_errors.inc(endpoint, model, type(exc).__name__)
+                raise
+            finally:
+                llm_request_duration.observe(perf_counter() - start, endpoint, model)
+
+    async def call():
+        try:
+            # A hedge that would have to queue for a slot cannot win; skip it.
+            completion = await CallPolicy(endpoint, model).run(attempt, admission.has_free_slot)
+        except Exception as exc:
+            account(error=exc)
+            raise
+        usage = getattr(completion, "usage", None)
+        record_usage(endpoint, model, usage)
+        account(usage=usage)
+        if response_cache is not None and getattr(completion, "choices", None):
+            await response_cache.aset(key, completion.model_dump_json().encode())
+        return completion
+
+    completion, shared = await _in_flight.do(key, call)
+    if shared:
+        llm_coalesced.inc(endpoint)
+        account(cache_hit=True)  # the caller that started it was charged
+    return completion
+
+
+async def stream_chat_completion(
+    *,
+    endpoint: str,
+    model: str,
+    messages: list[dict[str, Any]],
+    cache: bool = True,
+    priority: str = "interactive",
+    project_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    **params: Any,
+) -> AsyncIterator[str]:
+    """Stream the reply's content deltas as the upstream API produces them.
+
+    A cached reply is yielded as a single delta. Accounting is as for
+    ``create_chat_completion``.
+    """
+    started = perf_counter()
+    scope = resolve_scope(project_id, user_id)
+    response_cache = _lookup_cache(endpoint, cache)
+    key = cache_key(model, messages, {**params, "stream": True})
+    if response_cache is not None:
+        cached, tier = await response_cache.aget(key)
+        if cached is not None:
+            llm_cache_lookups.inc(endpoint, f"{tier}_hit")
+            record_llm_call(
+                endpoint=endpoint, model=model, latency=perf_counter() - started, cache_hit=True,
+                project_id=scope.project_id, user_id=scope.user_id,
+            )
+            yield cached.decode()
+            return
+        llm_cache_lookups.inc(endpoint, "miss")
+
+    await check_token_budget(scope.project_id)
+    stats: dict[str, Any] = {}
+    error = None
+    try:
+        parts = []
+        async for delta in _stream_upstream(endpoint, model, messages, priority, params, stats):
+            parts.append(delta)
+            yield delta
+        if response_cache is not None and parts:
+            await response_cache.aset(key, "".join(parts).encode())
+    except Exception as exc:
+        error = exc
+        raise
+    finally:
+        record_llm_call(
+            endpoint=endpoint, model=model, usage=stats.get("usage"),
+            latency=perf_counter() - started, error=error,
+            project_id=scope.project_id, user_id=scope.user_id,
+        )
+
+
+async def _stream_upstream(
+    endpoint: str, model: str, messages: list[dict[str, Any]], priority: str, params: dict, stats: dict
+) -> AsyncIterator[str]:
+    """Stream from upstream, retrying while no delta has been produced yet."""
+    # Retries are only possible until the first delta reaches the caller;
+    # the latency budget covers the wait for it, not the whole reply.
+    policy = CallPolicy(endpoint, model)
+    while True:
+        deltas = _stream_once(endpoint, model, messages, priority, params, stats)
+        deadline = asyncio.timeout(policy.remaining())
+        try:
+            async with deadline:
+                first = await anext(deltas)
+        except StopAsyncIteration:
+            return
+        except Exception as exc:
+            await deltas.aclose()
+            if deadline.expired():
+                raise policy.budget_exceeded() from None
+            delay = policy.retry_delay(exc)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+            continue
+        break
+
+    try:
+        yield first
+        async for delta in deltas:
+            yield delta
+    finally:
+        await deltas.aclose()  # releases the slot if the caller stops early
+
+
+async def _stream_once(
+    endpoint: str, model: str, messages: list[dict[str, Any]], priority: str, params: dict, stats: dict
+) -> AsyncIterator[str]:
+    """One upstream streaming request, yielding its content deltas.
+
+    The usage block, when the API sends one, is left in ``stats["usage"]``.
+    """
+    async with get_admission_controller().slot(priority):
+        start = perf_counter()
+        usage = None
+        first_token = True
+        try:
+            stream = get_llm_provider().stream(
+                model=model,
+                messages=messages,
+                stream_options={"include_usage": True},
+                **params,
+            )
+            async for chunk in stream:
+                if getattr(chunk, "usage", None):
+                    usage = stats["usage"] = chunk.usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    if first_token:
+                        first_token = False
+                        llm_time_to_first_token.observe(perf_counter() - start, endpoint, model)
+                    yield delta
+        except Exception as exc:
+            llm_errors.inc(endpoint, model, type(exc).__name__)
+            raise
+        finally:
+            llm_request_duration.observe(perf_counter() - start, endpoint, model)
+    record_usage(endpoint, model, usage)
@@ -0,0 +1,213 @@
+"""Content-addressed cache for LLM responses.
+
+Entries are keyed by a SHA-256 of the model, messages and call parameters and
+live in two tiers:
+
+- an in-process LRU (``llm_cache_memory_entries``) answering repeated calls
+  without leaving the event loop;
+- when ``llm_cache_path`` is set, a SQLite file shared by every worker
+  process. SQLite's WAL mode and busy timeout serialise writers across
+  processes, so no extra locking is needed.
+
+Both tiers honour ``llm_cache_ttl``; the disk tier is also trimmed to
+``llm_cache_max_bytes`` by evicting the least recently read entries. Values
+are opaque bytes (zlib-compressed on disk), so the caller decides how a
+response is encoded.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Optional
+
+from app.core.config import get_settings
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+)
+"""
+# Check the disk size budget every this many writes rather than on each one.
+_EVICT_EVERY = 32
+
+
+def cache_key(model: str, messages: list[dict[str, Any]], params: dict[str, Any]) -> str:
+    payload = json.dumps(
+        {"model": model, "messages": messages, "params": params},
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        path: Optional[str],
+        ttl: float,
+        memory_entries: int = 256,
+        max_bytes: int = 64 * 1024 * 1024,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.memory_entries = memory_entries
+        self.max_bytes = max_bytes
+        self._memory: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._writes = 0
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+
+    # Memory tier ------------------------------------------------------
+
+    def _memory_get(self, key: str, now: float) -> Optional[bytes]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= now:
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            return entry[1]
+
+    def _memory_set(self, key: str, value: bytes, expires_at: float) -> None:
+        if self.memory_entries <= 0:
+            return
+        with self._lock:
+            self._memory[key] = (expires_at, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def memory_size(self) -> int:
+        return len(self._memory)
+
+    # Disk tier --------------------------------------------------------
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _disk_get(self, key: str, now: float) -> Optional[tuple[bytes, float]]:
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[1] <= now:
+            conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            return None
+        conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return zlib.decompress(row[0]), row[1]
+
+    def _disk_set(self, key: str, value: bytes, now: float, expires_at: float) -> None:
+        blob = zlib.compress(value)
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO llm_cache (key, value, size, expires_at, accessed_at)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (key, blob, len(blob), expires_at, now),
+        )
+        self._writes += 1
+        if self._writes % _EVICT_EVERY == 1:
+            self.evict(now)
+
+    def evict(self, now: Optional[float] = None) -> None:
+        """Drop expired disk entries, then the least recently read ones over budget."""
+        if not self.path:
+            return
+        now = time.time() if now is None else now
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+            conn.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                " SELECT key FROM (SELECT key, SUM(size) OVER"
+                " (ORDER BY accessed_at DESC, rowid DESC) AS running FROM llm_cache)"
+                " WHERE running > ?)",
+                (self.max_bytes,),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    # Public API -------------------------------------------------------
+
+    def get(self, key: str) -> tuple[Optional[bytes], Optional[str]]:
+        """Return ``(value, tier)`` where tier is ``"memory"``, ``"disk"`` or None."""
+        now = time.time()
+        value = self._memory_get(key, now)
+        if value is not None:
+            return value, "memory"
+        if self.path:
+            found = self._disk_get(key, now)
+            if found is not None:
+                self._memory_set(key, found[0], found[1])
+                return found[0], "disk"
+        return None, None
+
+    def set(self, key: str, value: bytes) -> None:
+        now = time.time()
+        expires_at = now + self.ttl
+        self._memory_set(key, value, expires_at)
+        if self.path:
+            self._disk_set(key, value, now, expires_at)
+
+    async def aget(self, key: str) -> tuple[Optional[bytes], Optional[str]]:
+        value = self._memory_get(key, time.time())
+        if value is not None:
+            return value, "memory"
+        if not self.path:
+            return None, None
+        # Disk reads may wait on another process's write lock.
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value: bytes) -> None:
+        if self.path:
+            await asyncio.to_thread(self.set, key, value)
+        else:
+            self.set(key, value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+        if self.path:
+            self._connection().execute("DELETE FROM llm_cache")
+
+
+@lru_cache
+def get_response_cache() -> Optional[ResponseCache]:
+    """Process-wide cache built from settings, or None when caching is disabled."""
+    settings = get_settings()
+    if not settings.llm_cache_enabled:
+        return None
+    return ResponseCache(
+        settings.llm_cache_path,
+        ttl=settings.llm_cache_ttl,
+        memory_entries=settings.llm_cache_memory_entries,
+        max_bytes=settings.llm_cache_max_bytes,
+    )
@@ -0,0 +1,129 @@
+"""Backends that serve the chat completions issued through ``app.services.llm``.
+
+``LLM_PROVIDER`` selects one:
+
+- ``openai`` (default): the pooled OpenAI SDK client; ``OPENAI_BASE_URL``
+  can point it at any OpenAI-compatible server, such as
+  ``benchmarks/mock_openai.py``;
+- ``mock``: ``MockLLM`` in-process, for offline development and load tests
+  (``LLM_MOCK_*`` settings shape its latency, token rate and errors).
+
+Providers return the SDK's own types and raise the SDK's own exceptions, so
+callers handle every backend the same way.
+"""
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, AsyncIterator, Protocol
+
+from app.core.clients import get_openai_client
+from app.core.config import get_settings
+from app.services.mock_llm import MockLLM, MockLLMConfig, MockLLMError
+
+if TYPE_CHECKING:
+    from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+PROVIDERS = ("openai", "mock")
+
+
+class LLMProvider(Protocol):
+    name: str
+
+    async def complete(
+        self, *, model: str, messages: list[dict[str, Any]], **params: Any
+    ) -> "ChatCompletion": ...
+
+    def stream(
+        self, *, model: str, messages: list[dict[str, Any]], **params: Any
+    ) -> AsyncIterator["ChatCompletionChunk"]: ...
+
+
+class OpenAIProvider:
+    name = "openai"
+
+    async def complete(self, *, model, messages, **params):
+        return await get_openai_client().chat.completions.create(
+            model=model, messages=messages, **params
+        )
+
+    async def stream(self, *, model, messages, **params):
+        stream = await get_openai_client().chat.completions.create(
+            model=model, messages=messages, stream=True, **params
+        )
+        async for chunk in stream:
+            yield chunk
+
+
+def _status_error(status: int) -> Exception:
+    """Build the exception the OpenAI SDK raises for an HTTP ``status``."""
+    import httpx
+    import openai
+
+    classes = {
+        400: openai.BadRequestError,
+        401: openai.AuthenticationError,
+        403: openai.PermissionDeniedError,
+        404: openai.NotFoundError,
+        429: openai.RateLimitError,
+    }
+    cls = classes.get(status) or (
+        openai.InternalServerError if status >= 500 else openai.APIStatusError
+    )
+    response = httpx.Response(
+        status, request=httpx.Request("POST", "http://mock-llm/v1/chat/completions")
+    )
+    return cls(f"Injected mock LLM error (HTTP {status})", response=response, body=None)
+
+
+class MockProvider:
+    name = "mock"
+
+    def __init__(self, mock: MockLLM):
+        self.mock = mock
+
+    async def complete(self, *, model, messages, **params):
+        from openai.types.chat import ChatCompletion
+
+        try:
+            payload = await self.mock.complete(model, messages, **params)
+        except MockLLMError as exc:
+            raise _status_error(exc.status) from None
+        return ChatCompletion.model_validate(payload)
+
+    async def stream(self, *, model, messages, **params):
+        from openai.types.chat import ChatCompletionChunk
+
+        try:
+            async for payload in self.mock.stream(model, messages, **params):
+                yield ChatCompletionChunk.model_validate(payload)
+        except MockLLMError as exc:
+            raise _status_error(exc.status) from None
+
+
+def mock_config_from_settings() -> MockLLMConfig:
+    settings = get_settings()
+    return MockLLMConfig(
+        latency=settings.llm_mock_latency,
+        latency_distribution=settings.llm_mock_latency_distribution,
+        tokens_per_second=settings.llm_mock_tokens_per_second,
+        reply_tokens=settings.llm_mock_reply_tokens,
+        error_rate=settings.llm_mock_error_rate,
+        error_status=settings.llm_mock_error_status,
+        seed=settings.llm_mock_seed,
+    )
+
+
+@lru_cache
+def get_llm_provider() -> LLMProvider:
+    name = get_settings().llm_provider
+    if name == "mock":
+        return MockProvider(MockLLM(mock_config_from_settings()))
+    if name == "openai":
+        return OpenAIProvider()
+    raise ValueError(f"LLM_PROVIDER must be one of {', '.join(PROVIDERS)}, not '{name}'")
+
+
+def llm_configured() -> bool:
+    """Whether the selected provider can serve requests (OpenAI needs a key)."""
+    settings = get_settings()
+    return settings.llm_provider != "openai" or bool(settings.openai_api_key)
@@ -0,0 +1,226 @@
+"""Retries, hedging and latency budgets for upstream LLM calls.
+
+``app.services.llm`` runs every upstream request through a ``CallPolicy``:
+
+- transient failures (timeouts, connection errors, 408/409/429 and 5xx) are
+  retried up to ``llm_retry_max_attempts`` times, sleeping an exponential
+  backoff with full jitter, or at least the ``Retry-After`` the API asked
+  for;
+- every call has a latency budget (``llm_latency_budgets[endpoint]``, else
+  ``llm_latency_budget``) covering queueing, attempts and backoff; once it is
+  spent the call fails with ``openai.APITimeoutError``, and a retry that could
+  not start before the deadline is not attempted;
+- non-streaming calls to the endpoints in ``llm_hedge_endpoints`` are hedged:
+  if an attempt has not answered after that endpoint's recent
+  ``llm_hedge_quantile`` latency, a second identical request is sent and the
+  first answer wins; the other is cancelled.
+
+The OpenAI SDK's own retries are off by default (``openai_max_retries``) so
+that attempts are counted once and stay within the budget.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from app.core.config import get_settings
+from app.core.metrics import llm_budget_exhausted, llm_hedges, llm_retries
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+RETRYABLE_STATUSES = {408, 409, 429}
+
+
+def is_retryable(exc: BaseException) -> bool:
+    import openai
+
+    if isinstance(exc, openai.APIConnectionError):  # includes APITimeoutError
+        return True
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code in RETRYABLE_STATUSES or exc.status_code >= 500
+    return False
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    """Seconds the API asked us to wait (``Retry-After``/``retry-after-ms``), if any."""
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if (ms := headers.get("retry-after-ms")) is not None:
+            return max(0.0, float(ms) / 1000)
+        value = headers.get("retry-after")
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class RetryPolicy:
+    max_attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 8.0
+
+    def backoff(self, failures: int) -> float:
+        """Full-jitter exponential backoff after ``failures`` failed attempts."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (failures - 1)))
+
+    def delay(self, failures: int, exc: BaseException) -> float:
+        hint = retry_after(exc)
+        backoff = self.backoff(failures)
+        return backoff if hint is None else max(hint, backoff)
+
+
+class LatencyTracker:
+    """Recent successful attempt latencies per key, for hedge delays."""
+
+    def __init__(self, window: int = 200):
+        self._samples: dict[str, deque[float]] = defaultdict(lambda: deque(maxlen=window))
+
+    def observe(self, key: str, seconds: float) -> None:
+        self._samples[key].append(seconds)
+
+    def quantile(self, key: str, q: float, min_samples: int) -> Optional[float]:
+        samples = self._samples.get(key)
+        if not samples or len(samples) < min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def clear(self) -> None:
+        self._samples.clear()
+
+
+latencies = LatencyTracker()
+
+
+def budget_for(endpoint: str) -> float:
+    settings = get_settings()
+    return settings.llm_latency_budgets.get(endpoint, settings.llm_latency_budget)
+
+
+def _budget_error(endpoint: str, budget: float) -> Exception:
+    import httpx
+    import openai
+
+    llm_budget_exhausted.inc(endpoint)
+    logger.warning("LLM call for %s exceeded its %.1fs latency budget", endpoint, budget)
+    return openai.APITimeoutError(
+        request=httpx.Request("POST", f"llm://{endpoint}/chat/completions")
+    )
+
+
+class CallPolicy:
+    """Retry and deadline state for one logical LLM call."""
+
+    def __init__(self, endpoint: str, model: str):
+        settings = get_settings()
+        self.endpoint = endpoint
+        self.model = model
+        self.retry = RetryPolicy(
+            max_attempts=settings.llm_retry_max_attempts,
+            base_delay=settings.llm_retry_base_delay,
+            max_delay=settings.llm_retry_max_delay,
+        )
+        self.budget = budget_for(endpoint)
+        self.deadline = time.monotonic() + self.budget
+        self.failures = 0
+
+    def remaining(self) -> float:
+        return max(0.0, self.deadline - time.monotonic())
+
+    def budget_exceeded(self) -> Exception:
+        return _budget_error(self.endpoint, self.budget)
+
+    def retry_delay(self, exc: BaseException) -> Optional[float]:
+        """How long to wait before retrying after ``exc``; None to give up."""
+        self.failures += 1
+        if self.failures >= self.retry.max_attempts or not is_retryable(exc):
+            return None
+        delay = self.retry.delay(self.failures, exc)
+        if delay >= self.remaining():
+            llm_budget_exhausted.inc(self.endpoint)
+            return None
+        llm_retries.inc(self.endpoint, type(exc).__name__)
+        logger.warning(
+            "LLM call for %s failed (%s), retry %d/%d in %.2fs",
+            self.endpoint, type(exc).__name__, self.failures, self.retry.max_attempts - 1, delay,
+        )
+        return delay
+
+    def hedge_delay(self) -> Optional[float]:
+        settings = get_settings()
+        if self.endpoint not in settings.llm_hedge_endpoints:
+            return None
+        quantile = latencies.quantile(
+            f"{self.endpoint}:{self.model}", settings.llm_hedge_quantile, settings.llm_hedge_min_samples
+        )
+        return None if quantile is None else max(quantile, settings.llm_hedge_min_delay)
+
+    async def _timed(self, attempt: Callable[[], Awaitable[T]]) -> T:
+        start = time.monotonic()
+        result = await attempt()
+        latencies.observe(f"{self.endpoint}:{self.model}", time.monotonic() - start)
+        return result
+
+    async def _hedged(
+        self, attempt: Callable[[], Awaitable[T]], can_hedge: Callable[[], bool]
+    ) -> T:
+        delay = self.hedge_delay()
+        if delay is None:
+            return await self._timed(attempt)
+        first = asyncio.ensure_future(self._timed(attempt))
+        tasks = [first]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done or not can_hedge():
+                return await first
+            llm_hedges.inc(self.endpoint, "fired")
+            tasks.append(asyncio.ensure_future(self._timed(attempt)))
+            pending, errors = set(tasks), []
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            llm_hedges.inc(self.endpoint, "won")
+                        return task.result()
+                    errors.append(task.exception())
+            raise errors[0]
+        finally:
+            # The loser, or both on cancellation (budget spent, client gone).
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def run(
+        self,
+        attempt: Callable[[], Awaitable[T]],
+        can_hedge: Callable[[], bool] = lambda: True,
+    ) -> T:
+        """Await ``attempt()`` with retries, hedging and the latency budget."""
+        while True:
+            scope = asyncio.timeout(self.remaining())
+            try:
+                async with scope:
+                    return await self._hedged(attempt, can_hedge)
+            except Exception as exc:
+                if scope.expired():
+                    raise self.budget_exceeded() from None
+                delay = self.retry_delay(exc)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
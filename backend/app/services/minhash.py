@@ -0,0 +1,219 @@
+"""Local near-duplicate detection for short texts: normalisation, MinHash, LSH.
+
+Texts are reduced to a set of normalised terms (lower-cased, stop words
+dropped, common synonyms such as "add"/"make"/"new" folded onto "create",
+crude plural stripping). The Jaccard similarity of two term sets is estimated
+by MinHash signatures, and an LSH index over signature bands finds candidate
+pairs without comparing against every stored entry. Candidates are confirmed
+with the exact Jaccard of the term sets, so the index never returns a match
+below the caller's threshold.
+
+Everything is computed in-process; no embedding service is involved.
+"""
+from __future__ import annotations
+
+import hashlib
+import random
+import re
+import struct
+from collections import defaultdict
+from functools import lru_cache
+from typing import Generic, Hashable, Iterable, Optional, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_WORD = re.compile(r"[a-z0-9]+")
+
+STOP_WORDS = frozenset(
+    """
+    a an the and or of for to in on at by with from into as is are be been was were
+    this that these those it its i we you they me us my our your please can could
+    would should will shall do does just some any all need needs want wants
+    """.split()
+)
+
+# Words folded onto one canonical term before comparison.
+SYNONYMS = {
+    "add": "create",
+    "adding": "create",
+    "make": "create",
+    "new": "create",
+    "write": "create",
+    "draft": "create",
+    "generate": "create",
+    "creating": "create",
+    "remove": "delete",
+    "drop": "delete",
+    "edit": "update",
+    "change": "update",
+    "modify": "update",
+    "signin": "login",
+    "logon": "login",
+    "log": "login",
+    "sign": "login",
+    "req": "requirement",
+    "reqs": "requirement",
+    "story": "user_story",
+    "stories": "user_story",
+    "usecase": "use_case",
+    "customer": "user",
+    "customers": "user",
+}
+
+
+def _stem(word: str) -> str:
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+@lru_cache(maxsize=1 << 16)
+def _term(word: str) -> Optional[str]:
+    if word in STOP_WORDS:
+        return None
+    word = _stem(SYNONYMS.get(word, word))
+    return SYNONYMS.get(word, word)
+
+
+def normalize(text: str) -> set[str]:
+    """Return the set of normalised terms of ``text``."""
+    terms = set(map(_term, _WORD.findall(text.lower())))
+    terms.discard(None)
+    return terms
+
+
+def jaccard(a: set[str], b: set[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def _term_hash(term: str) -> int:
+    return struct.unpack("<Q", hashlib.blake2b(term.encode(), digest_size=8).digest())[0]
+
+
+class MinHasher:
+    """Computes ``num_perm``-value MinHash signatures of term sets.
+
+    The permuted hash values of each term are memoised (up to
+    ``max_cached_terms`` terms): vocabularies repeat, so a signature is
+    mostly an element-wise minimum over cached vectors.
+    """
+
+    def __init__(self, num_perm: int = 64, seed: int = 1, max_cached_terms: int = 100_000):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self._perms = [
+            (rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+            for _ in range(num_perm)
+        ]
+        self.max_cached_terms = max_cached_terms
+        self._vectors: dict[str, tuple[int, ...]] = {}
+
+    def _vector(self, term: str) -> tuple[int, ...]:
+        vector = self._vectors.get(term)
+        if vector is None:
+            h = _term_hash(term)
+            vector = tuple(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for a, b in self._perms)
+            if len(self._vectors) >= self.max_cached_terms:
+                self._vectors.clear()
+            self._vectors[term] = vector
+        return vector
+
+    def signature(self, terms: Iterable[str]) -> tuple[int, ...]:
+        vectors = [self._vector(t) for t in terms]
+        if not vectors:
+            return (_MAX_HASH,) * self.num_perm
+        if len(vectors) == 1:
+            return vectors[0]
+        return tuple(map(min, *vectors))
+
+
+def band_keys(signature: tuple[int, ...], bands: int = 16) -> list[int]:
+    """One 63-bit key per LSH band of ``signature``.
+
+    For band indexes kept outside ``MinHashLSH`` (a database table): two
+    signatures share a key exactly when they agree on that whole band.
+    """
+    rows = len(signature) // bands
+    keys = []
+    for i in range(bands):
+        band = struct.pack(f"<{rows + 1}Q", i, *signature[i * rows:(i + 1) * rows])
+        keys.append(struct.unpack("<Q", hashlib.blake2b(band, digest_size=8).digest())[0] >> 1)
+    return keys
+
+
+def estimate_jaccard(a: tuple[int, ...], b: tuple[int, ...]) -> float:
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+class MinHashLSH(Generic[K]):
+    """Banded LSH index mapping keys to their term sets.
+
+    With ``bands`` bands of ``num_perm // bands`` rows, two sets with Jaccard
+    ``s`` collide in at least one band with probability ``1 - (1 - s**r)**b``;
+    the defaults (16 bands of 4 rows) catch pairs above ~0.5 almost always.
+    """
+
+    def __init__(self, hasher: Optional[MinHasher] = None, bands: int = 16):
+        self.hasher = hasher or MinHasher()
+        if self.hasher.num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.bands = bands
+        self.rows = self.hasher.num_perm // bands
+        self._buckets: list[dict[tuple[int, ...], set[K]]] = [
+            defaultdict(set) for _ in range(bands)
+        ]
+        self._entries: dict[K, tuple[set[str], tuple[int, ...]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self._entries
+
+    def _bands(self, signature: tuple[int, ...]):
+        for i in range(self.bands):
+            yield i, signature[i * self.rows:(i + 1) * self.rows]
+
+    def add(self, key: K, terms: set[str], signature: Optional[tuple[int, ...]] = None) -> None:
+        if key in self._entries:
+            self.remove(key)
+        signature = signature or self.hasher.signature(terms)
+        self._entries[key] = (terms, signature)
+        for i, band in self._bands(signature):
+            self._buckets[i][band].add(key)
+
+    def remove(self, key: K) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for i, band in self._bands(entry[1]):
+            bucket = self._buckets[i].get(band)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[i][band]
+
+    def query(
+        self, terms: set[str], threshold: float, signature: Optional[tuple[int, ...]] = None
+    ) -> list[tuple[K, float]]:
+        """Keys whose exact Jaccard with ``terms`` is at least ``threshold``, best first.
+
+        ``signature`` may be passed when the caller already computed it.
+        """
+        signature = signature or self.hasher.signature(terms)
+        candidates: set[K] = set()
+        for i, band in self._bands(signature):
+            candidates.update(self._buckets[i].get(band, ()))
+        matches = []
+        for key in candidates:
+            score = jaccard(terms, self._entries[key][0])
+            if score >= threshold:
+                matches.append((key, score))
+        matches.sort(key=lambda m: m[1], reverse=True)
+        return matches
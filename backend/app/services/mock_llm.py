@@ -0,0 +1,186 @@
+"""Simulated chat completions for offline development and load tests.
+
+``MockLLM`` answers OpenAI-shaped requests without leaving the process: it
+waits for a sampled time-to-first-token, produces the reply at
+``tokens_per_second`` and fails a configurable share of requests with an
+HTTP status. Replies are filler text, or, in JSON mode, a small
+specification tree that ``AISpecService`` accepts (a ``features`` list when
+the prompt asks for one epic's features).
+
+It backs two things: ``MockProvider`` (``LLM_PROVIDER=mock``), which runs it
+in-process behind the provider interface, and ``benchmarks/mock_openai.py``,
+which serves it over HTTP so the real OpenAI SDK can be pointed at it.
+"""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import math
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Optional
+
+from app.services.tokens import count_message_tokens, count_tokens
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+
+_WORDS = (
+    "the user needs a clear requirement with acceptance criteria so that the team "
+    "can plan delivery of each feature and validate the expected business value"
+).split()
+
+
+@dataclass
+class MockLLMConfig:
+    latency: float = 0.3  # mean time to first token, seconds
+    latency_distribution: str = "lognormal"
+    latency_sigma: float = 0.5  # spread of the lognormal distribution
+    tokens_per_second: float = 50.0  # 0 produces the whole reply at once
+    reply_tokens: int = 60
+    error_rate: float = 0.0
+    error_status: int = 500
+    seed: Optional[int] = None
+
+    def __post_init__(self):
+        if self.latency_distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(
+                f"latency_distribution must be one of {', '.join(LATENCY_DISTRIBUTIONS)}"
+            )
+
+
+class MockLLMError(Exception):
+    """An injected failure; ``status`` is the HTTP status the API would return."""
+
+    def __init__(self, status: int):
+        super().__init__(f"Injected mock LLM error (HTTP {status})")
+        self.status = status
+
+
+class MockLLM:
+    def __init__(self, config: Optional[MockLLMConfig] = None):
+        self.config = config or MockLLMConfig()
+        self.rng = random.Random(self.config.seed)
+        self._ids = itertools.count(1)
+
+    # Behaviour ------------------------------------------------------------
+
+    def sample_latency(self) -> float:
+        mean, kind = self.config.latency, self.config.latency_distribution
+        if mean <= 0:
+            return 0.0
+        if kind == "fixed":
+            return mean
+        if kind == "uniform":
+            return self.rng.uniform(0, 2 * mean)
+        if kind == "exponential":
+            return self.rng.expovariate(1 / mean)
+        sigma = self.config.latency_sigma
+        return self.rng.lognormvariate(math.log(mean) - sigma * sigma / 2, sigma)
+
+    def sample_error(self) -> Optional[int]:
+        if self.config.error_rate > 0 and self.rng.random() < self.config.error_rate:
+            return self.config.error_status
+        return None
+
+    def reply(self, messages: list[dict[str, Any]], params: dict[str, Any]) -> str:
+        if (params.get("response_format") or {}).get("type") == "json_object":
+            return json.dumps(self._spec_payload(messages[-1]["content"]))
+        words = [self.rng.choice(_WORDS) for _ in range(self.config.reply_tokens)]
+        return " ".join(words).capitalize() + "."
+
+    def _spec_payload(self, prompt: str) -> dict:
+        def feature(n: int) -> dict:
+            return {
+                "title": f"Feature {n}",
+                "description": f"Mock feature {n}.",
+                "user_stories": [
+                    f"As a user, I want mock capability {n}.{s} so that I can test the flow."
+                    for s in (1, 2)
+                ],
+            }
+
+        if 'root key is "features"' in prompt:
+            return {"features": [feature(n) for n in (1, 2)]}
+        return {
+            "epics": [
+                {
+                    "title": f"Epic {e}",
+                    "description": f"Mock epic {e}.",
+                    "features": [feature(n) for n in (1, 2)],
+                }
+                for e in (1, 2, 3)
+            ]
+        }
+
+    @staticmethod
+    def pieces(content: str) -> list[str]:
+        """Split a reply into roughly token-sized pieces (about four characters)."""
+        return [content[i:i + 4] for i in range(0, len(content), 4)]
+
+    async def _pace(self, pieces: int) -> None:
+        if self.config.tokens_per_second > 0 and pieces:
+            await asyncio.sleep(pieces / self.config.tokens_per_second)
+
+    # OpenAI-shaped payloads -------------------------------------------------
+
+    def _usage(self, messages: list[dict[str, Any]], content: str) -> dict:
+        prompt_tokens = count_message_tokens(messages)
+        completion_tokens = count_tokens(content)
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+    async def complete(self, model: str, messages: list[dict[str, Any]], **params: Any) -> dict:
+        """Return a ``chat.completion`` object once the whole reply is "generated"."""
+        await asyncio.sleep(self.sample_latency())
+        status = self.sample_error()
+        if status is not None:
+            raise MockLLMError(status)
+        content = self.reply(messages, params)
+        await self._pace(len(self.pieces(content)))
+        return {
+            "id": f"chatcmpl-mock-{next(self._ids)}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": self._usage(messages, content),
+        }
+
+    async def stream(
+        self, model: str, messages: list[dict[str, Any]], **params: Any
+    ) -> AsyncIterator[dict]:
+        """Yield ``chat.completion.chunk`` objects at the configured token rate.
+
+        A final chunk without choices carries the usage when
+        ``stream_options={"include_usage": True}`` is passed, as upstream does.
+        """
+        await asyncio.sleep(self.sample_latency())
+        status = self.sample_error()
+        if status is not None:
+            raise MockLLMError(status)
+        content = self.reply(messages, params)
+        base = {
+            "id": f"chatcmpl-mock-{next(self._ids)}",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+        }
+        for i, piece in enumerate(self.pieces(content)):
+            if i:
+                await self._pace(1)
+            delta = {"role": "assistant", "content": piece} if i == 0 else {"content": piece}
+            yield {**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+        yield {**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+        if (params.get("stream_options") or {}).get("include_usage"):
+            yield {**base, "choices": [], "usage": self._usage(messages, content)}
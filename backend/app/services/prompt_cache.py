@@ -0,0 +1,105 @@
+"""Opt-in near-duplicate cache of chat replies, scoped per project.
+
+Where ``llm_cache`` only answers byte-identical requests, this cache also
+answers rewordings ("create a login requirement" / "add requirement for user
+login"): prompts are normalised into term sets and matched through a MinHash
+LSH index (``app.services.minhash``), and a stored reply is returned when the
+exact Jaccard similarity reaches ``chat_similarity_threshold``.
+
+Entries live in process memory, bounded per project (least recently used
+first out) and expire after ``llm_cache_ttl``.
+"""
+from __future__ import annotations
+
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Optional
+
+from app.core.config import get_settings
+from app.services.minhash import MinHasher, MinHashLSH, normalize
+
+
+@dataclass
+class _ProjectIndex:
+    lsh: MinHashLSH[int]
+    # entry id -> (expires_at, reply), in least recently used order
+    replies: OrderedDict[int, tuple[float, str]] = field(default_factory=OrderedDict)
+
+
+class SimilarPromptCache:
+    def __init__(self, threshold: float = 0.7, max_entries: int = 500, ttl: float = 3600):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._hasher = MinHasher()
+        self._projects: dict[int, _ProjectIndex] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def _index(self, project_id: int) -> _ProjectIndex:
+        index = self._projects.get(project_id)
+        if index is None:
+            index = self._projects[project_id] = _ProjectIndex(MinHashLSH(self._hasher))
+        return index
+
+    def _drop(self, index: _ProjectIndex, entry_id: int) -> None:
+        index.replies.pop(entry_id, None)
+        index.lsh.remove(entry_id)
+
+    def lookup(self, project_id: int, prompt: str) -> Optional[str]:
+        """Return the reply to the most similar live prompt, if any."""
+        terms = normalize(prompt)
+        if not terms:
+            return None
+        now = time.time()
+        with self._lock:
+            index = self._projects.get(project_id)
+            if index is None:
+                return None
+            for entry_id, _score in index.lsh.query(terms, self.threshold):
+                expires_at, reply = index.replies[entry_id]
+                if expires_at <= now:
+                    self._drop(index, entry_id)
+                    continue
+                index.replies.move_to_end(entry_id)
+                return reply
+        return None
+
+    def store(self, project_id: int, prompt: str, reply: str) -> None:
+        terms = normalize(prompt)
+        if not terms:
+            return
+        with self._lock:
+            index = self._index(project_id)
+            # An equivalent prompt replaces its older entry.
+            for entry_id, score in index.lsh.query(terms, 1.0):
+                self._drop(index, entry_id)
+            entry_id = next(self._ids)
+            index.lsh.add(entry_id, terms)
+            index.replies[entry_id] = (time.time() + self.ttl, reply)
+            while len(index.replies) > self.max_entries:
+                self._drop(index, next(iter(index.replies)))
+
+    def clear(self, project_id: Optional[int] = None) -> None:
+        with self._lock:
+            if project_id is None:
+                self._projects.clear()
+            else:
+                self._projects.pop(project_id, None)
+
+
+@lru_cache
+def get_similar_prompt_cache() -> Optional[SimilarPromptCache]:
+    """Process-wide cache built from settings, or None unless enabled."""
+    settings = get_settings()
+    if not settings.chat_similarity_cache_enabled:
+        return None
+    return SimilarPromptCache(
+        threshold=settings.chat_similarity_threshold,
+        max_entries=settings.chat_similarity_cache_entries,
+        ttl=settings.llm_cache_ttl,
+    )
@@ -0,0 +1,175 @@
+"""Near-duplicate lookups for features and user stories.
+
+Texts are compared as sets of normalised terms (``app.services.minhash``).
+Candidates come from the ``SimilarityBucket`` band index
+(``app.db.similarity_index``): one indexed ``IN`` lookup per batch of band
+keys, so the cost depends on the number of near matches, not on the size of
+the project. Each candidate is then confirmed with the exact Jaccard
+similarity of its current title and description. A result is therefore
+never below ``threshold``, and nodes deleted since they were indexed are
+dropped.
+
+``find_similar`` backs ``GET /api/v1/projects/{id}/similar``.
+``find_duplicates`` backs the ``dedup`` mode of specification imports and
+of the ``bulk_create_features`` tool.
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Optional, Sequence
+
+from sqlmodel import Session, select
+
+from app.core.config import get_settings
+from app.db.similarity_index import BANDS, HASHER, INDEXED_KINDS, bucket_keys, node_terms
+from app.models.similarity import SimilarityBucket
+from app.services.minhash import MinHashLSH, jaccard
+
+_CHUNK = 500  # values per IN (...) list, well under SQLite's parameter limit
+
+
+def _chunks(values: Iterable) -> Iterator[list]:
+    values = list(values)
+    for i in range(0, len(values), _CHUNK):
+        yield values[i:i + _CHUNK]
+
+
+@dataclass
+class SimilarNode:
+    kind: str
+    id: int
+    title: str
+    score: float
+
+
+@dataclass
+class Duplicate:
+    """What a new text duplicates: an existing node, or an earlier text of the batch."""
+
+    score: float
+    node_id: Optional[int] = None
+    batch_index: Optional[int] = None
+
+
+def _candidates(
+    db: Session, project_id: int, kinds: Sequence[str], keys: list[list[int]]
+) -> list[set[tuple[str, int]]]:
+    """Per text, the (kind, node id) pairs sharing at least one band key with it."""
+    by_key: dict[int, set[tuple[str, int]]] = defaultdict(set)
+    for chunk in _chunks({key for text_keys in keys for key in text_keys}):
+        rows = db.exec(
+            select(SimilarityBucket.bucket, SimilarityBucket.kind, SimilarityBucket.node_id).where(
+                SimilarityBucket.project_id == project_id,
+                SimilarityBucket.kind.in_(kinds),
+                SimilarityBucket.bucket.in_(chunk),
+            )
+        )
+        for key, kind, node_id in rows:
+            by_key[key].add((kind, node_id))
+    return [set().union(*(by_key.get(key, ()) for key in text_keys)) for text_keys in keys]
+
+
+def _load(
+    db: Session, project_id: int, nodes: set[tuple[str, int]]
+) -> dict[tuple[str, int], tuple[str, set[str]]]:
+    """Current title and terms of the candidates that still qualify."""
+    by_kind: dict[str, list[int]] = defaultdict(list)
+    for kind, node_id in nodes:
+        by_kind[kind].append(node_id)
+    loaded = {}
+    for kind, ids in by_kind.items():
+        spec = INDEXED_KINDS[kind]
+        model = spec.model
+        for chunk in _chunks(ids):
+            statement = select(model.id, model.title, model.description).where(
+                model.id.in_(chunk), model.project_id == project_id
+            )
+            if spec.item_type is not None:
+                statement = statement.where(model.type == spec.item_type)
+            if "is_active" in model.model_fields:
+                statement = statement.where(model.is_active == True)  # noqa: E712
+            for node_id, title, description in db.exec(statement):
+                loaded[(kind, node_id)] = (title, node_terms(title, description))
+    return loaded
+
+
+def _matches(
+    db: Session,
+    project_id: int,
+    kinds: Sequence[str],
+    terms: list[set[str]],
+    signatures: list[tuple[int, ...]],
+    threshold: float,
+) -> list[list[SimilarNode]]:
+    keys = [bucket_keys(sig) if t else [] for t, sig in zip(terms, signatures)]
+    candidates = _candidates(db, project_id, kinds, keys)
+    loaded = _load(db, project_id, set().union(*candidates))
+    results = []
+    for text_terms, text_candidates in zip(terms, candidates):
+        matches = []
+        for node in text_candidates:
+            if node not in loaded:
+                continue
+            title, node_terms_ = loaded[node]
+            # Jaccard is at most the ratio of the set sizes: skip the set operations.
+            small, large = sorted((len(text_terms), len(node_terms_)))
+            if small < threshold * large:
+                continue
+            score = jaccard(text_terms, node_terms_)
+            if score >= threshold:
+                matches.append(SimilarNode(node[0], node[1], title, round(score, 3)))
+        matches.sort(key=lambda m: (-m.score, m.kind, m.id))
+        results.append(matches)
+    return results
+
+
+def find_similar(
+    db: Session,
+    project_id: int,
+    text: str,
+    kinds: Sequence[str] = ("feature", "user_story"),
+    threshold: Optional[float] = None,
+    limit: int = 10,
+) -> list[SimilarNode]:
+    """Indexed nodes of ``kinds`` whose terms overlap ``text``'s by at least ``threshold``."""
+    if threshold is None:
+        threshold = get_settings().similarity_threshold
+    terms = node_terms(text, None)
+    if not terms:
+        return []
+    signature = HASHER.signature(terms)
+    return _matches(db, project_id, kinds, [terms], [signature], threshold)[0][:limit]
+
+
+def find_duplicates(
+    db: Session,
+    project_id: int,
+    kind: str,
+    texts: Sequence[tuple[str, Optional[str]]],
+    threshold: Optional[float] = None,
+) -> list[Optional[Duplicate]]:
+    """For each (title, description), the best existing node or earlier text it duplicates.
+
+    Existing nodes take precedence over earlier texts of the same batch.
+    """
+    if threshold is None:
+        threshold = get_settings().similarity_threshold
+    terms = [node_terms(title, description) for title, description in texts]
+    signatures = [HASHER.signature(t) for t in terms]
+    existing = _matches(db, project_id, [kind], terms, signatures, threshold)
+    batch: MinHashLSH[int] = MinHashLSH(HASHER, BANDS)
+    duplicates: list[Optional[Duplicate]] = []
+    for index, (text_terms, signature, matches) in enumerate(zip(terms, signatures, existing)):
+        if matches:
+            duplicates.append(Duplicate(matches[0].score, node_id=matches[0].id))
+            continue
+        earlier = batch.query(text_terms, threshold, signature) if text_terms else []
+        if earlier:
+            first, score = earlier[0]
+            duplicates.append(Duplicate(round(score, 3), batch_index=first))
+            continue
+        duplicates.append(None)
+        if text_terms:
+            batch.add(index, text_terms, signature)
+    return duplicates
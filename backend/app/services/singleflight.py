@@ -0,0 +1,56 @@
+"""Coalescing of concurrent identical async calls ("singleflight").
+
+The first caller for a key starts the work as a task; callers arriving while
+it runs await the same task and receive the same result or exception.
+Callers are reference-counted: cancelling one caller (a client that went
+away) only detaches it, and the underlying call is cancelled once no caller
+is left waiting for it. Results are not kept after the call finishes; that
+is the response cache's job.
+"""
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Hashable
+
+
+@dataclass
+class _Flight:
+    task: asyncio.Future
+    waiters: int = 0
+
+
+class SingleFlight:
+    def __init__(self) -> None:
+        self._flights: dict[Hashable, _Flight] = {}
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._flights
+
+    def _forget(self, key: Hashable, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> tuple[Any, bool]:
+        """Run ``fn`` unless a call for ``key`` is already in flight.
+
+        Returns ``(result, shared)``, where ``shared`` is True when this
+        caller joined a call started by another one.
+        """
+        flight = self._flights.get(key)
+        shared = flight is not None
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _, key=key, flight=flight: self._forget(key, flight))
+        flight.waiters += 1
+        try:
+            # shield: cancelling this caller must not cancel the shared task.
+            return await asyncio.shield(flight.task), shared
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+                # Forget it now, not when the cancellation lands: a caller
+                # arriving in between must start a new call, not join this one.
+                self._forget(key, flight)
@@ -0,0 +1,161 @@
+"""Import of AI-generated specifications into the requirement hierarchy."""
+from __future__ import annotations
+
+import datetime
+from typing import Sequence
+
+from sqlmodel import Session
+
+from app.db.bulk import bulk_insert
+from app.models.requirements import Epic, Feature, Requirement, UserStory
+from app.schemas.requirements import AISpecEpic, AISpecImportRequest
+from app.services.similarity import find_duplicates
+
+
+def create_spec_requirement(
+    db: Session, project_id: int, title: str, description: str | None
+) -> int:
+    """Insert the requirement that generated specifications hang off; not committed."""
+    timestamp = datetime.datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S UTC")
+    [requirement_id] = bulk_insert(
+        db,
+        Requirement,
+        [
+            {
+                "title": f"{title} - {timestamp}",
+                "description": description,
+                "project_id": project_id,
+                "is_active": True,
+            }
+        ],
+    )
+    return requirement_id
+
+
+def insert_epics(
+    db: Session,
+    project_id: int,
+    requirement_id: int,
+    epics: Sequence[AISpecEpic],
+    dedup: bool = False,
+) -> dict:
+    """Insert ``epics`` with their features and stories; not committed.
+
+    With ``dedup``, features and stories that are near duplicates of
+    existing ones in the project (or of earlier ones in ``epics``) are not
+    created (``app.services.similarity``). The stories of a skipped feature
+    go to the feature it duplicates.
+
+    Returns the created counts, the skipped duplicate counts and the new
+    epic ids, in order.
+    """
+    # Insert level by level so each tier is one batched statement instead
+    # of one flush per row.
+    epic_ids = bulk_insert(
+        db,
+        Epic,
+        [
+            {
+                "title": epic_data.title,
+                "description": epic_data.description,
+                "project_id": project_id,
+                "parent_req_id": requirement_id,
+                "is_active": True,
+            }
+            for epic_data in epics
+        ],
+    )
+
+    features = [
+        (epic_id, feature_data)
+        for epic_id, epic_data in zip(epic_ids, epics)
+        for feature_data in epic_data.features
+    ]
+    feature_duplicates = (
+        find_duplicates(db, project_id, "feature", [(f.title, f.description) for _, f in features])
+        if dedup
+        else [None] * len(features)
+    )
+    new_features = [i for i, duplicate in enumerate(feature_duplicates) if duplicate is None]
+    created_ids = bulk_insert(
+        db,
+        Feature,
+        [
+            {
+                "title": features[i][1].title,
+                "description": features[i][1].description,
+                "project_id": project_id,
+                "parent_epic_id": features[i][0],
+                "is_active": True,
+            }
+            for i in new_features
+        ],
+    )
+    # Every imported feature's id: its own, or that of the feature it duplicates.
+    feature_ids: list[int] = [0] * len(features)
+    for i, feature_id in zip(new_features, created_ids):
+        feature_ids[i] = feature_id
+    for i, duplicate in enumerate(feature_duplicates):
+        if duplicate is not None:
+            feature_ids[i] = (
+                duplicate.node_id if duplicate.node_id is not None
+                else feature_ids[duplicate.batch_index]
+            )
+
+    stories = [
+        (feature_id, story_text)
+        for feature_id, (_, feature_data) in zip(feature_ids, features)
+        for story_text in feature_data.user_stories
+    ]
+    if dedup:
+        story_duplicates = find_duplicates(
+            db, project_id, "user_story", [(text[:255], text) for _, text in stories]
+        )
+        stories = [s for s, duplicate in zip(stories, story_duplicates) if duplicate is None]
+    story_ids = bulk_insert(
+        db,
+        UserStory,
+        [
+            {
+                "title": story_text[:255],
+                "description": story_text,
+                "project_id": project_id,
+                "parent_feature_id": feature_id,
+                "is_active": True,
+            }
+            for feature_id, story_text in stories
+        ],
+    )
+    return {
+        "epic_ids": epic_ids,
+        "counts": {
+            "epics": len(epic_ids),
+            "features": len(created_ids),
+            "user_stories": len(story_ids),
+        },
+        "skipped_duplicates": {
+            "features": len(features) - len(created_ids),
+            "user_stories": sum(len(f.user_stories) for _, f in features) - len(story_ids),
+        },
+    }
+
+
+def import_specifications(db: Session, project_id: int, specs_in: AISpecImportRequest) -> dict:
+    """Create a requirement holding ``specs_in``'s epics, features and stories.
+
+    Everything is inserted in one transaction, committed on success; the
+    caller rolls back on error.
+    """
+    requirement_id = create_spec_requirement(
+        db, project_id, specs_in.requirement_title, specs_in.requirement_description
+    )
+    inserted = insert_epics(
+        db, project_id, requirement_id, specs_in.epics, dedup=specs_in.dedup
+    )
+    db.commit()
+    return {
+        "message": "Specifications imported successfully",
+        "created_counts": {"requirements": 1, **inserted["counts"]},
+        "skipped_duplicates": inserted["skipped_duplicates"],
+        "parent_requirement_id": requirement_id,
+    }
@@ -0,0 +1,239 @@
+"""Markdown rendering of a project's requirement hierarchy.
+
+``render_markdown`` walks Requirement -> Epic -> Feature -> UserStory ->
+UseCase (active nodes, ordered by id) and yields the document piece by
+piece, so ``/projects/{id}/generate`` can stream it.
+
+Two caches, both in process memory:
+
+- documents, keyed by ``Project.hierarchy_version`` (bumped by every
+  transaction that writes the hierarchy, see ``app.db.change_tracking``): an
+  unchanged project is served from memory after a single query;
+- fragments, the rendered text of every requirement, epic and feature
+  subtree, keyed by a digest of that subtree's content. After an edit the
+  tree is reloaded and re-hashed, but only the fragments along the edited
+  node's path are rendered again; everything else is reused.
+
+Fragments are bounded by ``spec_markdown_cache_bytes`` (least recently used
+first out).
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import lru_cache
+from typing import Iterator, Optional
+
+from sqlalchemy import null
+from sqlmodel import Session, select
+
+from app.core.config import get_settings
+from app.core.metrics import spec_markdown_cache_lookups
+from app.db.change_tracking import has_uncommitted_writes
+from app.models.project import Project
+from app.services.items import ITEM_KINDS
+from app.services.validation import DETAIL_FIELD
+
+KINDS = list(ITEM_KINDS)  # root first
+HEADINGS = {
+    "requirement": "Requirement",
+    "epic": "Epic",
+    "feature": "Feature",
+    "user_story": "User story",
+    "use_case": "Use case",
+}
+DETAIL_HEADINGS = {"user_story": "Acceptance criteria", "use_case": "Steps"}
+# Kinds whose subtrees are cached; stories and use cases are cheap to render.
+CACHED_KINDS = {"requirement", "epic", "feature"}
+
+
+@dataclass(slots=True)
+class _Node:
+    kind: str
+    id: int
+    title: str
+    description: Optional[str]
+    detail: Optional[str]
+    children: list[_Node] = field(default_factory=list)
+    digest: bytes = b""
+
+
+class MarkdownCache:
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_documents: int = 100):
+        self.max_bytes = max_bytes
+        self.max_documents = max_documents
+        self._fragments: OrderedDict[bytes, str] = OrderedDict()
+        self._bytes = 0
+        # project id -> ((created_at, version), rendered requirements)
+        self._documents: OrderedDict[int, tuple[tuple[datetime, int], list[str]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def document(self, project_id: int, version: tuple[datetime, int]) -> Optional[list[str]]:
+        with self._lock:
+            cached = self._documents.get(project_id)
+            if cached is None or cached[0] != version:
+                return None
+            self._documents.move_to_end(project_id)
+            return cached[1]
+
+    def store_document(
+        self, project_id: int, version: tuple[datetime, int], pieces: list[str]
+    ) -> None:
+        with self._lock:
+            self._documents[project_id] = (version, pieces)
+            self._documents.move_to_end(project_id)
+            while len(self._documents) > self.max_documents:
+                self._documents.popitem(last=False)
+
+    def fragment(self, digest: bytes) -> Optional[str]:
+        with self._lock:
+            text = self._fragments.get(digest)
+            if text is not None:
+                self._fragments.move_to_end(digest)
+            return text
+
+    def store_fragment(self, digest: bytes, text: str) -> None:
+        with self._lock:
+            if digest in self._fragments:
+                return
+            self._fragments[digest] = text
+            self._bytes += len(text)
+            while self._bytes > self.max_bytes and self._fragments:
+                _, dropped = self._fragments.popitem(last=False)
+                self._bytes -= len(dropped)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._fragments.clear()
+            self._documents.clear()
+            self._bytes = 0
+
+
+@lru_cache
+def get_markdown_cache() -> MarkdownCache:
+    return MarkdownCache(get_settings().spec_markdown_cache_bytes)
+
+
+# Loading ------------------------------------------------------------------
+
+
+def _load_tree(db: Session, project_id: int) -> list[_Node]:
+    """The project's active requirements, with their active descendants."""
+    nodes: dict[str, dict[int, _Node]] = {}
+    for kind in KINDS:
+        spec = ITEM_KINDS[kind]
+        model = spec.model
+        parent = getattr(model, spec.parent_field) if spec.parent_field else null()
+        detail = getattr(model, DETAIL_FIELD[kind]) if kind in DETAIL_FIELD else null()
+        statement = (
+            select(model.id, parent, model.title, model.description, detail)
+            .where(model.project_id == project_id, model.is_active == True)  # noqa: E712
+            .order_by(model.id)
+        )
+        by_id = nodes[kind] = {}
+        parents = nodes.get(KINDS[KINDS.index(kind) - 1]) if spec.parent_field else None
+        # Plain rows, without the ORM's result processing: this is the hot loop.
+        rows = db.connection().execute(statement).all()
+        for node_id, parent_id, title, description, detail_text in rows:
+            node = _Node(kind, node_id, title, description, detail_text)
+            if parents is None:
+                by_id[node_id] = node
+            elif parent_id in parents:  # children of inactive or missing parents are skipped
+                parents[parent_id].children.append(node)
+                by_id[node_id] = node
+    roots = list(nodes["requirement"].values())
+    for kind in reversed(KINDS):
+        for node in nodes[kind].values():
+            _digest(node)
+    return roots
+
+
+def _digest(node: _Node) -> None:
+    # Children are digested first (see _load_tree), so a change anywhere in a
+    # subtree changes the digest of every ancestor.
+    own = "\x1f".join(
+        "\x00" if part is None else part
+        for part in (node.kind, str(node.id), node.title, node.description, node.detail)
+    )
+    node.digest = hashlib.blake2b(
+        own.encode() + b"".join(child.digest for child in node.children), digest_size=16
+    ).digest()
+
+
+# Rendering ----------------------------------------------------------------
+
+
+def _heading_text(title: str) -> str:
+    return " ".join(title.split()) or "(untitled)"
+
+
+def _block(node: _Node) -> str:
+    level = "#" * (KINDS.index(node.kind) + 2)
+    parts = [f"{level} {HEADINGS[node.kind]}: {_heading_text(node.title)}\n\n"]
+    if node.description and node.description.strip():
+        parts.append(node.description.strip() + "\n\n")
+    if node.detail and node.detail.strip():
+        parts.append(f"**{DETAIL_HEADINGS[node.kind]}**\n\n{node.detail.strip()}\n\n")
+    return "".join(parts)
+
+
+def _walk(node: _Node, cache: MarkdownCache) -> Iterator[str]:
+    if node.kind not in CACHED_KINDS:
+        yield _block(node)
+        for child in node.children:
+            yield from _walk(child, cache)
+        return
+    cached = cache.fragment(node.digest)
+    spec_markdown_cache_lookups.inc("fragment", "hit" if cached is not None else "miss")
+    if cached is not None:
+        yield cached
+        return
+    pieces = [_block(node)]
+    yield pieces[0]
+    for child in node.children:
+        for piece in _walk(child, cache):
+            pieces.append(piece)
+            yield piece
+    cache.store_fragment(node.digest, "".join(pieces))
+
+
+def _header(project: Project) -> str:
+    text = f"# {_heading_text(project.name)}\n\n"
+    if project.description and project.description.strip():
+        text += project.description.strip() + "\n\n"
+    return text
+
+
+def render_markdown(db: Session, project: Project) -> Iterator[str]:
+    """Yield the project's specification as Markdown, in document order."""
+    cache = get_markdown_cache()
+    # Read the version before the tree: a write committed in between leaves a
+    # newer tree under an older version, which the next render replaces.
+    version = (project.created_at, db.exec(
+        select(Project.hierarchy_version).where(Project.id == project.id)
+    ).one())
+    # The header is not cached: renaming a project does not bump its version.
+    yield _header(project)
+    pieces = cache.document(project.id, version)
+    spec_markdown_cache_lookups.inc("document", "hit" if pieces is not None else "miss")
+    if pieces is not None:
+        yield from pieces
+        return
+
+    pieces = []
+    roots = _load_tree(db, project.id)
+    if not roots:
+        pieces.append("_No requirements yet._\n")
+        yield pieces[-1]
+    for root in roots:
+        streamed = []
+        for piece in _walk(root, cache):
+            streamed.append(piece)
+            yield piece
+        pieces.append(cache.fragment(root.digest) or "".join(streamed))
+    # This session's own uncommitted writes are not part of any version yet.
+    if not has_uncommitted_writes(db, project.id):
+        cache.store_document(project.id, version, pieces)
@@ -0,0 +1,56 @@
+"""Local token counting for prompt budgeting.
+
+Uses ``tiktoken`` when it is installed and its encoding is available
+offline; otherwise falls back to an estimate (roughly four characters per
+token for words, one token per punctuation mark) that slightly overcounts
+English text, which is the safe direction for a budget.
+"""
+from __future__ import annotations
+
+import math
+import re
+from functools import lru_cache
+from typing import Any
+
+# Per-message framing tokens added by the chat format.
+MESSAGE_OVERHEAD = 4
+
+_PIECE = re.compile(r"\w+|[^\w\s]")
+
+
+@lru_cache
+def _encoder():
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:  # not installed, or the encoding cannot be fetched
+        return None
+
+
+def count_tokens(text: str) -> int:
+    encoder = _encoder()
+    if encoder is not None:
+        return len(encoder.encode(text))
+    return sum(
+        math.ceil(len(piece) / 4) if piece[0].isalnum() or piece[0] == "_" else 1
+        for piece in _PIECE.findall(text)
+    )
+
+
+def count_message_tokens(messages: list[dict[str, Any]]) -> int:
+    return sum(count_tokens(m["content"]) + MESSAGE_OVERHEAD for m in messages)
+
+
+def truncate_to_tokens(text: str, limit: int) -> str:
+    """Cut ``text`` so that it fits in ``limit`` tokens, keeping the start."""
+    if count_tokens(text) <= limit:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if count_tokens(text[:mid]) <= limit:
+            low = mid
+        else:
+            high = mid - 1
+    return text[:low]
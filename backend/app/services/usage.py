@@ -0,0 +1,407 @@
+"""Per-project LLM usage accounting and token budgets.
+
+``app.services.llm`` reports every call to ``record_llm_call``: tokens,
+model, latency (including queueing and retries), whether the response cache
+or a coalesced call answered it, and the error if it failed. Calls are
+attributed to the project and user passed to the LLM helpers, or else to the
+enclosing ``usage_scope`` (used where the call sits deep inside a service,
+such as specification generation).
+
+Records go through a write-behind buffer (``app.db.write_behind``); each
+flush inserts the raw ``LLMUsage`` rows and, in the same transaction, adds
+their totals to the hourly ``UsageRollup`` rows with one upsert per key (an
+UPDATE, then an INSERT if no row matched, on databases without ``ON
+CONFLICT``), so the rollups never disagree with the records and queries never
+scan raw rows.
+Without a running recorder (scripts, tests) calls are not persisted.
+
+Projects with a ``token_budget`` are limited to that many tokens per calendar
+month: ``check_token_budget`` rejects calls with 429 before they reach the
+upstream API. Spending is read from the rollups at most every
+``usage_budget_refresh_interval`` seconds and topped up with this process's
+calls since, so a budget can be overshot by what other workers spend within
+one interval.
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Iterator, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import case, func, insert, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from app.core.config import get_settings
+from app.db.write_behind import WriteBehindBuffer
+from app.models.project import Project
+from app.models.usage import LLMUsage, UsageRollup
+
+
+@dataclass(frozen=True)
+class UsageScope:
+    project_id: int = 0
+    user_id: int = 0
+
+
+_scope: ContextVar[UsageScope] = ContextVar("llm_usage_scope", default=UsageScope())
+
+
+@contextmanager
+def usage_scope(project_id: Optional[int], user_id: Optional[int] = None) -> Iterator[UsageScope]:
+    """Attribute the LLM calls made in this context to a project and user."""
+    scope = UsageScope(project_id or 0, user_id or 0)
+    token = _scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _scope.reset(token)
+
+
+def resolve_scope(project_id: Optional[int] = None, user_id: Optional[int] = None) -> UsageScope:
+    current = _scope.get()
+    return UsageScope(project_id or current.project_id, user_id or current.user_id)
+
+
+def hour_bucket(moment: datetime) -> datetime:
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def month_start(moment: datetime) -> datetime:
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+# Rollups --------------------------------------------------------------------
+
+_ROLLUP_KEY = ("project_id", "user_id", "bucket", "endpoint", "model")
+_ROLLUP_SUMS = ("calls", "cache_hits", "errors", "prompt_tokens", "completion_tokens", "latency_total")
+
+
+def rollup_deltas(rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Aggregate usage rows into one delta per rollup key."""
+    deltas: dict[tuple, dict[str, Any]] = {}
+    for row in rows:
+        bucket = hour_bucket(row["created_at"])
+        key = (row["project_id"], row["user_id"], bucket, row["endpoint"], row["model"])
+        delta = deltas.get(key)
+        if delta is None:
+            delta = deltas[key] = dict(zip(_ROLLUP_KEY, key), latency_max=0.0, **dict.fromkeys(_ROLLUP_SUMS, 0))
+        delta["calls"] += 1
+        delta["cache_hits"] += int(row["cache_hit"])
+        delta["errors"] += int(row["error"] is not None)
+        delta["prompt_tokens"] += row["prompt_tokens"]
+        delta["completion_tokens"] += row["completion_tokens"]
+        delta["latency_total"] += row["latency"]
+        delta["latency_max"] = max(delta["latency_max"], row["latency"])
+    return list(deltas.values())
+
+
+def _upsert_insert(dialect: str) -> Optional[Callable]:
+    """The dialect's ``insert`` construct if it supports ``ON CONFLICT DO UPDATE``."""
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    return insert
+
+
+def _increment(table: Any, delta: dict[str, Any]) -> Any:
+    return (
+        update(table)
+        .where(*(table.c[name] == delta[name] for name in _ROLLUP_KEY))
+        .values(
+            **{name: table.c[name] + delta[name] for name in _ROLLUP_SUMS},
+            latency_max=case(
+                (table.c.latency_max < delta["latency_max"], delta["latency_max"]),
+                else_=table.c.latency_max,
+            ),
+        )
+    )
+
+
+def _apply_portably(db: Session, deltas: list[dict[str, Any]]) -> None:
+    """Increment each rollup, inserting it when missing; for dialects without an upsert."""
+    table = UsageRollup.__table__
+    for delta in deltas:
+        if db.execute(_increment(table, delta)).rowcount:
+            continue
+        try:
+            with db.begin_nested():
+                db.execute(insert(table).values(**delta))
+        except IntegrityError:
+            # Another worker inserted the key in between: add to its row instead.
+            db.execute(_increment(table, delta))
+
+
+def apply_rollups(db: Session, rows: list[dict[str, Any]]) -> None:
+    """Add ``rows`` to their hourly rollups (insert or increment)."""
+    deltas = rollup_deltas(rows)
+    if not deltas:
+        return
+    insert_ = _upsert_insert(db.get_bind().dialect.name)
+    if insert_ is None:
+        _apply_portably(db, deltas)
+        return
+    table = UsageRollup.__table__
+    statement = insert_(table)
+    excluded = statement.excluded
+    statement = statement.on_conflict_do_update(
+        index_elements=list(_ROLLUP_KEY),
+        set_={
+            **{name: table.c[name] + excluded[name] for name in _ROLLUP_SUMS},
+            "latency_max": case(
+                (excluded.latency_max > table.c.latency_max, excluded.latency_max),
+                else_=table.c.latency_max,
+            ),
+        },
+    )
+    for delta in deltas:
+        db.execute(statement.values(**delta))
+
+
+# Recording -------------------------------------------------------------------
+
+_recorder: Optional[WriteBehindBuffer] = None
+
+
+class _LocalSpend:
+    """Tokens spent per project by this process since the budget cache last read the database."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._tokens: dict[int, int] = defaultdict(int)
+
+    def add(self, project_id: int, tokens: int) -> None:
+        with self._lock:
+            self._tokens[project_id] += tokens
+
+    def take(self, project_id: int) -> int:
+        with self._lock:
+            return self._tokens.pop(project_id, 0)
+
+    def get(self, project_id: int) -> int:
+        with self._lock:
+            return self._tokens.get(project_id, 0)
+
+
+_local_spend = _LocalSpend()
+
+
+def record_llm_call(
+    *,
+    endpoint: str,
+    model: str,
+    usage: Any = None,
+    latency: float,
+    cache_hit: bool = False,
+    error: Optional[BaseException] = None,
+    project_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+) -> None:
+    scope = resolve_scope(project_id, user_id)
+    prompt_tokens = (getattr(usage, "prompt_tokens", None) or 0) if usage is not None else 0
+    completion_tokens = (getattr(usage, "completion_tokens", None) or 0) if usage is not None else 0
+    if scope.project_id:
+        _local_spend.add(scope.project_id, prompt_tokens + completion_tokens)
+    if _recorder is None:
+        return
+    _recorder.add(
+        project_id=scope.project_id,
+        user_id=scope.user_id,
+        endpoint=endpoint,
+        model=model,
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        latency=latency,
+        cache_hit=cache_hit,
+        error=type(error).__name__ if error is not None else None,
+        created_at=datetime.utcnow(),
+    )
+
+
+def flush_usage() -> None:
+    """Write pending usage records so queries include them."""
+    if _recorder is not None:
+        _recorder.flush()
+
+
+def start_usage_recorder(engine: Optional[Engine] = None) -> Optional[WriteBehindBuffer]:
+    global _recorder
+    settings = get_settings()
+    if not settings.usage_tracking:
+        return None
+    if engine is None:
+        from app.db.session import engine
+    _recorder = WriteBehindBuffer(
+        LLMUsage,
+        lambda: Session(engine),
+        flush_interval=settings.usage_flush_interval,
+        on_flush=apply_rollups,
+    )
+    _recorder.start()
+    _budgets.session_factory = lambda: Session(engine)
+    return _recorder
+
+
+async def stop_usage_recorder() -> None:
+    global _recorder
+    if _recorder is not None:
+        recorder, _recorder = _recorder, None
+        _budgets.session_factory = None
+        _budgets.clear()
+        await recorder.stop()
+
+
+# Budgets ----------------------------------------------------------------------
+
+
+def month_tokens(db: Session, project_id: int, since: datetime) -> int:
+    total = db.exec(
+        select(
+            func.coalesce(func.sum(UsageRollup.prompt_tokens + UsageRollup.completion_tokens), 0)
+        ).where(UsageRollup.project_id == project_id, UsageRollup.bucket >= since)
+    ).one()
+    return int(total)
+
+
+@dataclass
+class _BudgetEntry:
+    budget: Optional[int]
+    spent: int
+    period: datetime
+    loaded_at: float
+
+
+class BudgetCache:
+    def __init__(self, session_factory: Optional[Callable[[], Session]] = None):
+        self.session_factory = session_factory
+        self._entries: dict[int, _BudgetEntry] = {}
+
+    def _load(self, project_id: int, period: datetime) -> _BudgetEntry:
+        # Restart the local tally, then flush so the rollups hold everything
+        # it had counted (a call recorded in between may count twice, never zero times).
+        _local_spend.take(project_id)
+        flush_usage()
+        with self.session_factory() as db:
+            budget = db.exec(select(Project.token_budget).where(Project.id == project_id)).first()
+            spent = month_tokens(db, project_id, period) if budget is not None else 0
+        return _BudgetEntry(budget, spent, period, time.monotonic())
+
+    def status(self, project_id: int) -> _BudgetEntry:
+        """Budget and tokens spent this month; may lag by one refresh interval."""
+        period = month_start(datetime.utcnow())
+        entry = self._entries.get(project_id)
+        refresh = get_settings().usage_budget_refresh_interval
+        if entry is None or entry.period != period or time.monotonic() - entry.loaded_at >= refresh:
+            entry = self._entries[project_id] = self._load(project_id, period)
+        return _BudgetEntry(
+            entry.budget, entry.spent + _local_spend.get(project_id), entry.period, entry.loaded_at
+        )
+
+    def invalidate(self, project_id: int) -> None:
+        self._entries.pop(project_id, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+_budgets = BudgetCache()
+
+
+def invalidate_budget(project_id: int) -> None:
+    _budgets.invalidate(project_id)
+
+
+async def check_token_budget(project_id: Optional[int] = None) -> None:
+    """Raise 429 if the call's project has spent its monthly token budget."""
+    scope = resolve_scope(project_id)
+    if not scope.project_id or _budgets.session_factory is None:
+        return
+    entry = await asyncio.to_thread(_budgets.status, scope.project_id)
+    if entry.budget is not None and entry.spent >= entry.budget:
+        period = entry.period
+        next_period = period.replace(year=period.year + period.month // 12, month=period.month % 12 + 1)
+        raise HTTPException(
+            status_code=429,
+            detail=f"Project token budget of {entry.budget} tokens for this month is spent",
+            headers={"Retry-After": str(int((next_period - datetime.utcnow()).total_seconds()) + 1)},
+        )
+
+
+def budget_status(db: Session, project: Project) -> dict:
+    """The project's budget and this month's spending, read from the rollups."""
+    period = month_start(datetime.utcnow())
+    spent = month_tokens(db, project.id, period)
+    budget = project.token_budget
+    return {
+        "token_budget": budget,
+        "period_start": period,
+        "spent": spent,
+        "remaining": None if budget is None else max(0, budget - spent),
+    }
+
+
+# Reports ----------------------------------------------------------------------
+
+BUCKETS = ("hour", "day", "month")
+GROUPS = ("project", "user", "endpoint", "model")
+
+
+def _truncate(moment: datetime, bucket: str) -> datetime:
+    if bucket == "month":
+        return month_start(moment)
+    if bucket == "day":
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return hour_bucket(moment)
+
+
+def usage_series(
+    db: Session,
+    *,
+    start: datetime,
+    end: datetime,
+    bucket: str = "day",
+    project_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    group_by: Optional[str] = None,
+) -> list[dict[str, Any]]:
+    """Usage between ``start`` and ``end`` from the hourly rollups, per ``bucket`` (and group)."""
+    statement = select(UsageRollup).where(
+        UsageRollup.bucket >= hour_bucket(start), UsageRollup.bucket < end
+    )
+    if project_id is not None:
+        statement = statement.where(UsageRollup.project_id == project_id)
+    if user_id is not None:
+        statement = statement.where(UsageRollup.user_id == user_id)
+
+    series: dict[tuple, dict[str, Any]] = {}
+    for row in db.exec(statement):
+        group = getattr(row, f"{group_by}_id" if group_by in ("project", "user") else group_by) if group_by else None
+        key = (_truncate(row.bucket, bucket), group)
+        point = series.get(key)
+        if point is None:
+            point = series[key] = {
+                "bucket_start": key[0],
+                "group": None if group is None else str(group),
+                "latency_max": 0.0,
+                **dict.fromkeys(_ROLLUP_SUMS, 0),
+            }
+        for name in _ROLLUP_SUMS:
+            point[name] += getattr(row, name)
+        point["latency_max"] = max(point["latency_max"], row.latency_max)
+
+    points = sorted(series.values(), key=lambda p: (p["bucket_start"], p["group"] or ""))
+    for point in points:
+        point["total_tokens"] = point["prompt_tokens"] + point["completion_tokens"]
+        point["latency_avg"] = point.pop("latency_total") / point["calls"] if point["calls"] else 0.0
+    return points
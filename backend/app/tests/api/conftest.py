@@ -0,0 +1,121 @@
+from fastapi.testclient import TestClient
+from sqlmodel import Session, SQLModel, select
+import pytest
+
+from app.main import app  # Main FastAPI application
+from app.api.deps import get_db, get_current_user
+from app.models.user import User
+from app.models.project import Project
+from app.db.session import engine
+from app.services.admission import get_admission_controller
+
+
+# Test database setup
+@pytest.fixture(scope="session", autouse=True)
+def create_test_database_tables():
+    # Ensures all tables defined in SQLModel are created.
+    # init_db() from session.py should do this by importing all model files.
+    # For tests, explicitly calling create_all here is also fine.
+    SQLModel.metadata.create_all(engine)
+    yield
+    SQLModel.metadata.drop_all(engine)
+
+
+@pytest.fixture(autouse=True)
+def fresh_admission_controller():
+    # Per-user LLM rate buckets must not leak between tests.
+    get_admission_controller.cache_clear()
+    yield
+    get_admission_controller.cache_clear()
+
+
+@pytest.fixture(scope="function")
+def db_session():
+    connection = engine.connect()
+    transaction = connection.begin()
+    session = Session(bind=connection)
+    yield session
+    session.close()
+    transaction.rollback()
+    connection.close()
+
+
+@pytest.fixture(scope="function")
+def client(db_session: Session):
+    """Create a test client using the same DB session as the tests."""
+
+    def override_get_current_user_for_tests():
+        return User(
+            id=1,
+            username="testuser",
+            email="testuser@example.com",
+            is_active=True,
+            is_superuser=False,
+        )
+
+    def override_get_db():
+        yield db_session
+
+    app.dependency_overrides[get_current_user] = override_get_current_user_for_tests
+    app.dependency_overrides[get_db] = override_get_db
+    client = TestClient(app)
+    yield client
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture(
+    scope="function"
+)  # Changed to function scope for cleaner test user handling
+def test_user(db_session: Session):
+    user = db_session.exec(
+        select(User).where(User.email == "testuser@example.com")
+    ).first()
+    if not user:
+        # Ensure the ID is 1 to match the override_get_current_user_for_tests if it returns a user with ID 1
+        # This is a simplification; ideally, the override would fetch the user from this fixture,
+        # or the fixture would create a user with a dynamic ID and the override would use that.
+        user = User(
+            id=1,
+            username="testuser",
+            email="testuser@example.com",
+            hashed_password="fakehashedpassword",
+            is_active=True,
+            is_superuser=False,
+        )
+        db_session.add(user)
+        db_session.commit()
+        db_session.refresh(user)
+    elif (
+        user.id != 1
+    ):  # If user exists but ID is not 1, this is problematic for consistency with override
+        # This scenario indicates a need for better test data management or a more dynamic override.
+        # For this example, we'll proceed, but it's a point of fragility.
+        # One option: delete and recreate, or update ID if possible (not typically recommended for PKs).
+        # Simplest for now: assume this test_user fixture is the source of truth for the user with ID=1.
+        # If the override always returns user ID 1, this fixture must ensure user ID 1 is this "testuser".
+        pass  # User exists, and we assume it's the one we need (ID=1) or tests will be inconsistent.
+
+    return user
+
+
+@pytest.fixture(scope="function")
+def test_project(db_session: Session, test_user: User):
+    # Attempt to get project if it exists, otherwise create it.
+    # Using a fixed ID (1) for the project to simplify tests.
+    project = db_session.get(Project, 1)
+    if not project:
+        project = Project(
+            id=1,
+            name="Test Project",
+            description="A project for testing",
+            owner_id=test_user.id,
+        )
+        db_session.add(project)
+        db_session.commit()
+        db_session.refresh(project)
+    elif project.owner_id != test_user.id:
+        # If project 1 exists but has a different owner, this could be an issue.
+        # For robust tests, clear project table or use dynamic IDs.
+        # For now, assume this is fine or tests will fail indicating data inconsistency.
+        pass
+    return project
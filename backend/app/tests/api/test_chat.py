@@ -0,0 +1,287 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from app.api import chat
+from app.core.config import get_settings
+from app.db.write_behind import WriteBehindBuffer
+from app.models.activity import Activity
+from app.models.item import Item, ItemType
+from app.models.project import Project
+from app.models.requirements import Epic, Requirement
+from app.services import activity
+from app.services.admission import get_admission_controller
+from app.services.prompt_cache import SimilarPromptCache
+
+
+@pytest.fixture(autouse=True)
+def openai_key(monkeypatch):
+    monkeypatch.setattr(get_settings(), "openai_api_key", "test-key")
+
+
+def _parse_sse(body: str) -> list[tuple[str, object]]:
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+REPLY_CHUNKS = [
+    "Sure, here it is.\n``",
+    "`js",
+    'on\n{"action": "create_requirement", "data": {"title": "Login",',
+    ' "description": "Users log in."}}\n`',
+    "``\n",
+    "Anything else?",
+]
+
+
+def test_action_block_detector_handles_split_fences():
+    detector = chat.ActionBlockDetector()
+    results = [detector.feed(chunk) for chunk in REPLY_CHUNKS]
+    # The action is available on the chunk that closes the block, not at the end.
+    assert results[:4] == [None] * 4
+    assert results[4] is not None and detector.block_closed
+    assert results[5] is None
+    assert detector.action.data.title == "Login"
+    assert detector.text == "".join(REPLY_CHUNKS)
+
+
+def test_chat_stream_emits_tokens_then_created_item(
+    client: TestClient, db_session: Session, test_project: Project, monkeypatch
+):
+    async def fake_stream(**kwargs):
+        for chunk in REPLY_CHUNKS:
+            yield chunk
+
+    monkeypatch.setattr(chat, "stream_chat_completion", fake_stream)
+
+    response = client.post(
+        "/chat/stream", params={"project_id": test_project.id, "message": "add login"}
+    )
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = _parse_sse(response.text)
+    names = [name for name, _ in events]
+    assert names == ["token"] * len(REPLY_CHUNKS) + ["created_item", "done"]
+    assert "".join(data["delta"] for name, data in events if name == "token") == "".join(REPLY_CHUNKS)
+    created = events[-2][1]
+    assert created["type"] == "requirement"
+    assert created["data"]["title"] == "Login"
+    requirement = db_session.get(Requirement, created["data"]["id"])
+    assert requirement.project_id == test_project.id
+    assert requirement.description == "Users log in."
+    assert events[-1][1]["reply"] == "".join(REPLY_CHUNKS).strip()
+
+
+def test_chat_stream_reports_upstream_errors(
+    client: TestClient, test_project: Project, monkeypatch
+):
+    async def failing_stream(**kwargs):
+        yield "partial"
+        raise RuntimeError("upstream went away")
+
+    monkeypatch.setattr(chat, "stream_chat_completion", failing_stream)
+    response = client.post(
+        "/chat/stream", params={"project_id": test_project.id, "message": "hi"}
+    )
+    events = _parse_sse(response.text)
+    assert [name for name, _ in events] == ["token", "error"]
+    assert "upstream went away" in events[-1][1]["detail"]
+
+
+def _fake_completion(monkeypatch, reply: str):
+    async def fake_create_chat_completion(**kwargs):
+        message = SimpleNamespace(content=reply)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    monkeypatch.setattr(chat, "create_chat_completion", fake_create_chat_completion)
+
+
+def test_chat_creates_child_items_in_process(
+    client: TestClient, db_session: Session, test_project: Project, monkeypatch
+):
+    requirement = Requirement(title="Parent", project_id=test_project.id)
+    db_session.add(requirement)
+    db_session.commit()
+    _fake_completion(
+        monkeypatch,
+        '```json\n{"action": "create_epic", "data": {"title": "Onboarding",'
+        f' "parent_id": {requirement.id}}}}}\n```',
+    )
+
+    response = client.post("/chat", params={"project_id": test_project.id, "message": "epic"})
+    assert response.status_code == 200, response.text
+    created = response.json()["created_item"]
+    assert created["type"] == "epic"
+    epic = db_session.get(Epic, created["data"]["id"])
+    assert epic.parent_req_id == requirement.id and epic.title == "Onboarding"
+
+
+def test_chat_logs_failed_creation_for_unknown_parent(
+    client: TestClient, db_session: Session, test_project: Project, monkeypatch
+):
+    _fake_completion(
+        monkeypatch,
+        '```json\n{"action": "create_feature", "data": {"title": "Orphan", "parent_id": 999999}}\n```',
+    )
+    response = client.post("/chat", params={"project_id": test_project.id, "message": "feature"})
+    assert response.status_code == 200, response.text
+    assert response.json()["created_item"] is None
+    failures = db_session.exec(
+        select(Activity).where(Activity.type == "ai_create_feature_failed")
+    ).all()
+    assert failures and "Epic not found" in failures[-1].content
+
+
+def test_chat_reuses_reply_for_reworded_prompt(
+    client: TestClient, test_project: Project, monkeypatch
+):
+    calls = []
+
+    async def fake_create_chat_completion(**kwargs):
+        calls.append(kwargs)
+        message = SimpleNamespace(content=f"reply {len(calls)}")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    monkeypatch.setattr(chat, "create_chat_completion", fake_create_chat_completion)
+    similar = SimilarPromptCache(threshold=0.7)
+    monkeypatch.setattr(chat, "get_similar_prompt_cache", lambda: similar)
+    # Without memory every prompt is sent without history.
+    monkeypatch.setattr(get_settings(), "chat_memory_enabled", False)
+
+    def ask(message, **params):
+        response = client.post(
+            "/chat", params={"project_id": test_project.id, "message": message, **params}
+        )
+        assert response.status_code == 200, response.text
+        return response.json()["reply"]
+
+    assert ask("create a login requirement") == "reply 1"
+    assert ask("add requirement for user login") == "reply 1"
+    assert ask("add requirement for user login", cache=False) == "reply 2"
+    assert ask("export the backlog to csv") == "reply 3"
+    assert len(calls) == 3
+
+    # Once the conversation has history, the reply may depend on it.
+    monkeypatch.setattr(get_settings(), "chat_memory_enabled", True)
+    monkeypatch.setattr(chat, "compact_conversation_task", lambda *args: None)
+    assert ask("add requirement for user login") == "reply 4"
+
+
+def test_replies_with_an_action_are_not_reused(
+    client: TestClient, db_session: Session, test_project: Project, monkeypatch
+):
+    async def fake_stream(**kwargs):
+        for chunk in REPLY_CHUNKS:
+            yield chunk
+
+    monkeypatch.setattr(chat, "stream_chat_completion", fake_stream)
+    similar = SimilarPromptCache(threshold=0.7)
+    monkeypatch.setattr(chat, "get_similar_prompt_cache", lambda: similar)
+    monkeypatch.setattr(get_settings(), "chat_memory_enabled", False)
+
+    for message in ["create a login requirement", "add a requirement for login"]:
+        response = client.post(
+            "/chat/stream", params={"project_id": test_project.id, "message": message}
+        )
+        assert [e for e, _ in _parse_sse(response.text)][-2:] == ["created_item", "done"]
+    assert similar.lookup(test_project.id, "create a login requirement") is None
+    logins = db_session.exec(select(Requirement).where(Requirement.title == "Login")).all()
+    assert len(logins) == 2  # one per request, none replayed from the cache
+
+
+def test_chat_rate_limit_answers_429(client: TestClient, test_project: Project, monkeypatch):
+    _fake_completion(monkeypatch, "hello")
+    monkeypatch.setattr(get_admission_controller(), "user_burst", 1)
+    monkeypatch.setattr(get_admission_controller(), "user_rate", 0.01)
+
+    params = {"project_id": test_project.id, "message": "hi"}
+    assert client.post("/chat", params=params).status_code == 200
+    response = client.post("/chat", params=params)
+    assert response.status_code == 429
+    assert int(response.headers["retry-after"]) >= 1
+
+
+def test_chat_activity_is_written_behind(
+    client: TestClient, db_session: Session, test_project: Project, monkeypatch
+):
+    writer = WriteBehindBuffer(Activity, lambda: Session(bind=db_session.connection()))
+    monkeypatch.setattr(activity, "_writer", writer)
+    _fake_completion(monkeypatch, "hello")
+    # Compaction reloads memory, which flushes; keep the entries queued here.
+    monkeypatch.setattr(chat, "compact_conversation_task", lambda *args: None)
+    commits = []
+    monkeypatch.setattr(db_session, "commit", lambda: commits.append(1))
+
+    response = client.post("/chat", params={"project_id": test_project.id, "message": "hi"})
+    assert response.status_code == 200, response.text
+    assert commits == []  # logging no longer commits per request
+    assert writer.pending(project_id=test_project.id) == 2
+
+    def logged():
+        return [
+            a.type for a in db_session.exec(
+                select(Activity).where(Activity.project_id == test_project.id)
+            ).all()
+        ]
+
+    assert logged() == []
+    response = client.get("/ai-activity/sessions", params={"fresh": True})
+    assert {"chat_message_ai", "chat_message_user"} <= {a["type"] for a in response.json()}
+    assert writer.pending() == 0
+    assert sorted(logged()) == ["chat_message_ai", "chat_message_user"]
+
+
+def test_chat_runs_tool_calls_in_one_request(
+    client: TestClient, db_session: Session, test_project: Project, monkeypatch
+):
+    # Tool sessions share the test connection here, so run them one at a time.
+    monkeypatch.setattr(get_settings(), "chat_agent_parallel_tools", 1)
+    epic = Item(project_id=test_project.id, type=ItemType.EPIC, title="Checkout")
+    db_session.add(epic)
+    db_session.commit()
+
+    def tool_call(call_id, name, **arguments):
+        function = SimpleNamespace(name=name, arguments=json.dumps(arguments))
+        return SimpleNamespace(id=call_id, function=function)
+
+    turns = [
+        [tool_call("c1", "bulk_create_features", project_id=test_project.id,
+                   parent_id=epic.id, items=[{"title": "Pay by card"}, {"title": "Invoices"}])],
+        [tool_call("c2", "list_items", project_id=test_project.id, type="Feature"),
+         tool_call("c3", "delete_item", id=epic.id + 1000)],
+        None,
+    ]
+
+    async def fake_create_chat_completion(**kwargs):
+        calls = turns.pop(0)
+        message = SimpleNamespace(content=None if calls else "Features added.", tool_calls=calls)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    monkeypatch.setattr(chat, "create_chat_completion", fake_create_chat_completion)
+    response = client.post("/chat", params={"project_id": test_project.id, "message": "add features"})
+    assert response.status_code == 200, response.text
+
+    body = response.json()
+    assert body["reply"] == "Features added." and turns == []
+    assert [c["name"] for c in body["tool_calls"]] == ["bulk_create_features", "list_items", "delete_item"]
+    assert [f["title"] for f in body["tool_calls"][1]["result"]["result"]] == ["Pay by card", "Invoices"]
+    assert not body["tool_calls"][2]["result"]["ok"]
+    features = db_session.exec(select(Item).where(Item.parent_id == epic.id)).all()
+    assert len(features) == 2
+    logged = db_session.exec(
+        select(Activity.type).where(Activity.project_id == test_project.id).order_by(Activity.id)
+    ).all()
+    assert logged == [
+        "chat_message_user",
+        "ai_tool_bulk_create_features",
+        "ai_tool_list_items",
+        "ai_tool_delete_item",
+        "chat_message_ai",
+    ]
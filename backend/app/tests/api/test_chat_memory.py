@@ -0,0 +1,171 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlmodel import Session, SQLModel
+
+from app.api import chat
+from app.core.config import get_settings
+from app.models.activity import Activity
+from app.models.conversation import ConversationSummary
+from app.models.project import Project
+from app.models.user import User
+from app.services import conversation
+from app.services.conversation import compact_conversation, load_memory
+from app.services.tokens import count_message_tokens, count_tokens, truncate_to_tokens
+
+
+@pytest.fixture
+def settings(monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "chat_memory_token_budget", 120)
+    monkeypatch.setattr(settings, "chat_summary_batch_tokens", 50)
+    monkeypatch.setattr(settings, "chat_summary_max_tokens", 40)
+    monkeypatch.setattr(settings, "openai_api_key", "test-key")
+    return settings
+
+
+def _add_turns(db: Session, project_id: int, n: int, start: int = 0) -> list[Activity]:
+    activities = []
+    for i in range(start, start + n):
+        kind = "chat_message_user" if i % 2 == 0 else "chat_message_ai"
+        activities.append(
+            Activity(project_id=project_id, type=kind, content=f"turn {i} " + "word " * 10)
+        )
+    db.add_all(activities)
+    db.commit()
+    return activities
+
+
+def test_truncate_to_tokens_respects_limit():
+    text = "alpha beta gamma delta " * 50
+    cut = truncate_to_tokens(text, 20)
+    assert count_tokens(cut) <= 20 and text.startswith(cut) and cut
+
+
+def test_window_keeps_newest_turns_within_budget(db_session: Session, test_project: Project, settings):
+    activities = _add_turns(db_session, test_project.id, 20)
+    memory = load_memory(db_session, test_project.id)
+    assert memory.window and len(memory.window) < 20
+    assert memory.window[-1].id == activities[-1].id
+    assert [t.role for t in memory.window[-2:]] == ["user", "assistant"]
+    assert count_message_tokens(memory.messages()) <= settings.chat_memory_token_budget
+
+
+def test_compaction_folds_older_turns_into_summary(
+    db_session: Session, test_project: Project, settings, monkeypatch
+):
+    prompts = []
+
+    async def fake_completion(**kwargs):
+        prompts.append(kwargs["messages"][1]["content"])
+        message = SimpleNamespace(content=f"summary {len(prompts)}")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    monkeypatch.setattr(conversation, "create_chat_completion", fake_completion)
+    activities = _add_turns(db_session, test_project.id, 20)
+
+    assert asyncio.run(compact_conversation(db_session, test_project.id, "m"))
+    row = db_session.get(ConversationSummary, test_project.id)
+    assert row.summary == "summary 1"
+    assert "turn 0 " in prompts[0]
+    memory = load_memory(db_session, test_project.id)
+    assert memory.messages()[0]["content"].endswith("summary 1")
+    assert memory.window[0].id > row.through_activity_id
+    assert count_message_tokens(memory.messages()) <= settings.chat_memory_token_budget
+    # Nothing new left the window, so there is nothing to fold.
+    assert not asyncio.run(compact_conversation(db_session, test_project.id, "m"))
+
+    _add_turns(db_session, test_project.id, 10, start=20)
+    assert asyncio.run(compact_conversation(db_session, test_project.id, "m"))
+    # Only the turns since the last run are sent, alongside the old summary.
+    assert "summary 1" in prompts[1] and "turn 0 " not in prompts[1].split("New turns:")[1]
+    assert db_session.get(ConversationSummary, test_project.id).through_activity_id > activities[-1].id
+
+
+def test_overlapping_compactions_keep_the_furthest_summary(tmp_path, settings, monkeypatch):
+    calls = []
+    release_first = asyncio.Event()
+
+    async def fake_completion(**kwargs):
+        calls.append(kwargs)
+        name = f"summary {len(calls)}"
+        if len(calls) == 2:
+            await release_first.wait()  # the first compaction stalls on the model
+        message = SimpleNamespace(content=name)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    monkeypatch.setattr(conversation, "create_chat_completion", fake_completion)
+    # Separate sessions on their own database, as in two workers.
+    engine = create_engine(f"sqlite:///{tmp_path / 'chat.db'}")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as db:
+        db.add(User(id=1, username="u", email="u@example.com", hashed_password="x"))
+        db.add(Project(id=1, name="P", owner_id=1))
+        db.commit()
+        _add_turns(db, 1, 20)
+        assert asyncio.run(compact_conversation(db, 1, "m"))
+        _add_turns(db, 1, 10, start=20)
+
+    async def overlap():
+        with Session(engine) as slow, Session(engine) as fast:
+            # A session already holding the row gets it back as first loaded.
+            held = slow.get(ConversationSummary, 1)  # noqa: F841
+            first = asyncio.create_task(compact_conversation(slow, 1, "m"))
+            await asyncio.sleep(0)  # it read the summary row and waits on the model
+            with Session(engine) as db:
+                _add_turns(db, 1, 10, start=30)
+            assert await compact_conversation(fast, 1, "m")
+            release_first.set()
+            compacted = await first
+            return compacted
+
+    assert not asyncio.run(overlap())
+    with Session(engine) as db:
+        row = db.get(ConversationSummary, 1)
+        # The later compaction went further; the stalled one must not undo it.
+        assert (row.summary, row.through_activity_id) == ("summary 3", 34)
+    engine.dispose()
+
+
+def test_compaction_without_pending_turns_is_a_no_op(
+    db_session: Session, test_project: Project, settings, monkeypatch
+):
+    async def unexpected_completion(**kwargs):
+        raise AssertionError("nothing to summarise")
+
+    monkeypatch.setattr(conversation, "create_chat_completion", unexpected_completion)
+    monkeypatch.setattr(settings, "chat_summary_batch_tokens", 0)
+    assert not asyncio.run(compact_conversation(db_session, test_project.id, "m"))
+    _add_turns(db_session, test_project.id, 2)  # all within the window
+    assert not asyncio.run(compact_conversation(db_session, test_project.id, "m"))
+
+
+def test_chat_replays_history(
+    client: TestClient, db_session: Session, test_project: Project, settings, monkeypatch
+):
+    seen = []
+
+    async def fake_create_chat_completion(**kwargs):
+        seen.append(kwargs["messages"])
+        message = SimpleNamespace(content="ok")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    async def no_compaction(project_id, model):
+        return None
+
+    monkeypatch.setattr(chat, "create_chat_completion", fake_create_chat_completion)
+    monkeypatch.setattr(chat, "compact_conversation_task", no_compaction)
+
+    for text in ("first question", "second question"):
+        response = client.post("/chat", params={"project_id": test_project.id, "message": text})
+        assert response.status_code == 200, response.text
+
+    roles = [(m["role"], m["content"]) for m in seen[1]]
+    assert roles[1:] == [
+        ("user", "first question"),
+        ("assistant", "ok"),
+        ("user", "second question"),
+    ]
@@ -0,0 +1,39 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app.models.project import Project
+from app.models.requirements import Epic, Requirement
+from app.services.spec_markdown import get_markdown_cache
+
+
+@pytest.fixture(autouse=True)
+def empty_markdown_cache():
+    get_markdown_cache().clear()
+    yield
+    get_markdown_cache().clear()
+
+
+def test_generate_renders_and_refreshes_after_edits(
+    client: TestClient, db_session: Session, test_project: Project
+):
+    requirement = Requirement(title="Checkout", project_id=test_project.id)
+    db_session.add(requirement)
+    db_session.commit()
+    url = f"/projects/{test_project.id}/generate"
+
+    first = client.post(url).json()["markdown"]
+    assert "## Requirement: Checkout" in first and "Epic" not in first
+
+    db_session.add(Epic(title="Payments", project_id=test_project.id, parent_req_id=requirement.id))
+    db_session.commit()
+    second = client.post(url).json()["markdown"]
+    assert second.endswith("## Requirement: Checkout\n\n### Epic: Payments\n\n")
+
+    streamed = client.post(url, params={"stream": True})
+    assert streamed.headers["content-type"].startswith("text/markdown")
+    assert streamed.text == second
+
+
+def test_generate_requires_project_ownership(client: TestClient, test_project: Project):
+    assert client.post("/projects/999999/generate").status_code == 404
@@ -0,0 +1,39 @@
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from app.models.activity import Activity
+from app.models.project import Project
+from app.models.requirements import Epic, Feature, Requirement
+
+
+def test_validate_reports_and_rechecks_changed_nodes(
+    client: TestClient, db_session: Session, test_project: Project
+):
+    requirement = Requirement(title="Checkout", project_id=test_project.id)
+    db_session.add(requirement)
+    db_session.commit()
+    epic = Epic(title="Payments", project_id=test_project.id, parent_req_id=requirement.id)
+    db_session.add(epic)
+    db_session.commit()
+
+    url = f"/projects/{test_project.id}/validate"
+    first = client.post(url).json()
+    assert first["full"] and not first["complete"]
+    assert first["errors"] == [
+        {"kind": "epic", "id": epic.id, "rule": "empty_epic", "message": "epic has no features"}
+    ]
+
+    db_session.add(Feature(title="Card", project_id=test_project.id, parent_epic_id=epic.id))
+    db_session.commit()
+    second = client.post(url).json()
+    assert not second["full"] and second["checked"] == 2  # the feature and its epic
+    assert second["complete"] and second["counts"] == {} and second["errors"] == []
+
+    logged = db_session.exec(
+        select(Activity).where(Activity.type == "validate_project").order_by(Activity.id)
+    ).all()
+    assert [a.content for a in logged][-1] == '{"issues": 0, "checked": 2, "full": false}'
+
+
+def test_validate_requires_project_ownership(client: TestClient, test_project: Project):
+    assert client.post("/projects/999999/validate").status_code == 404
@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app.models.activity import Activity
+from app.models.project import Project
+from app.models.user import User
+from app.services.activity_history import archive_segment
+
+NOW = datetime(2026, 10, 1, 12, 0, 0)
+
+
+def _log(db: Session, project: Project, entries: list[tuple[str, datetime]]) -> list[Activity]:
+    rows = [Activity(project_id=project.id, type=t, content=t, timestamp=ts) for t, ts in entries]
+    db.add_all(rows)
+    db.commit()
+    return rows
+
+
+def _pages(client: TestClient, url: str, **params) -> list[list[int]]:
+    pages, cursor = [], None
+    while True:
+        response = client.get(url, params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200, response.text
+        body = response.json()
+        pages.append([a["id"] for a in body["items"]])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+def test_project_activity_pages_newest_first_with_type_filter(
+    client: TestClient, db_session: Session, test_project: Project
+):
+    # Two entries share a timestamp: the id breaks the tie.
+    times = [NOW - timedelta(minutes=m) for m in (5, 4, 3, 3, 2, 1, 0)]
+    types = ["chat_message_user", "chat_message_ai"] * 3 + ["ai_created_epic"]
+    rows = _log(db_session, test_project, list(zip(types, times)))
+    newest_first = [r.id for r in sorted(rows, key=lambda r: (r.timestamp, r.id), reverse=True)]
+
+    url = f"/api/v1/projects/{test_project.id}/activity"
+    pages = _pages(client, url, limit=3)
+    assert [len(p) for p in pages] == [3, 3, 1]
+    assert sum(pages, []) == newest_first
+
+    chat_only = _pages(client, url, limit=2, type=["chat_message_user", "chat_message_ai"])
+    assert sum(chat_only, []) == [i for i in newest_first if i != rows[-1].id]
+
+    assert client.get(url, params={"cursor": "not-a-cursor"}).status_code == 400
+    assert client.get("/api/v1/projects/999999/activity").status_code == 404
+
+
+def test_user_activity_only_covers_owned_projects(
+    client: TestClient, db_session: Session, test_project: Project
+):
+    other = User(id=2, email="other@example.com", hashed_password="x")
+    db_session.add(other)
+    db_session.commit()
+    foreign = Project(id=2, name="Foreign", owner_id=other.id)
+    db_session.add(foreign)
+    db_session.commit()
+    mine = _log(db_session, test_project, [("chat_message_user", NOW)])
+    _log(db_session, foreign, [("chat_message_user", NOW)])
+
+    ids = sum(_pages(client, "/api/v1/activity"), [])
+    assert ids == [mine[0].id]
+    legacy = client.get("/ai-activity/sessions").json()
+    assert [a["id"] for a in legacy] == [mine[0].id]
+
+
+def test_archived_activity_is_readable_through_the_same_api(
+    client: TestClient, db_session: Session, test_project: Project
+):
+    old = _log(
+        db_session,
+        test_project,
+        [("chat_message_user" if i % 2 else "spec_generate_stub", NOW - timedelta(days=60, minutes=i))
+         for i in range(5)],
+    )
+    old_ids = [r.id for r in sorted(old, key=lambda r: (r.timestamp, r.id), reverse=True)]
+    recent = _log(db_session, test_project, [("chat_message_user", NOW)])
+
+    cutoff = NOW - timedelta(days=30)
+    archived = [archive_segment(db_session, test_project.id, cutoff, 2) for _ in range(4)]
+    assert archived == [2, 2, 1, 0]
+
+    url = f"/api/v1/projects/{test_project.id}/activity"
+    assert sum(_pages(client, url), []) == [recent[0].id]
+    assert sum(_pages(client, url, archived=True, limit=2), []) == old_ids
+    stubs = sum(_pages(client, url, archived=True, type="spec_generate_stub"), [])
+    assert len(stubs) == 3
+
+    stats = client.get(f"{url}/archive").json()
+    assert stats == {"hot_rows": 1, "archived_rows": 5, "archive_segments": 3}
@@ -0,0 +1,150 @@
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlmodel import Session
+
+from app.api.deps import get_current_user, get_db
+from app.db.migrations import migrate
+from app.main import app
+from app.models.job import Job
+from app.models.project import Project
+from app.models.user import User
+from app.services import jobs
+from app.services.admission import get_admission_controller
+from app.services.jobs import JobRunner
+
+
+def _parse_sse(body: str) -> list[tuple[str, dict]]:
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_submit_poll_and_cancel_generation_job(
+    client: TestClient, db_session: Session, test_project: Project
+):
+    base = f"/api/v1/projects/{test_project.id}/jobs"
+    response = client.post(
+        f"{base}/generate-specifications", json={"project_goals": ["Faster onboarding"]}
+    )
+    assert response.status_code == 202, response.text
+    job = response.json()
+    assert job["status"] == "queued" and job["kind"] == "generate_specifications"
+    params = json.loads(db_session.get(Job, job["id"]).params)
+    assert params["project_goals"] == ["Faster onboarding"]
+
+    assert client.get(f"{base}/{job['id']}").json()["status"] == "queued"
+    assert [j["id"] for j in client.get(f"{base}/").json()] == [job["id"]]
+    assert client.get(f"{base}/{job['id']}/result").status_code == 409
+
+    cancelled = client.post(f"{base}/{job['id']}/cancel")
+    assert cancelled.status_code == 200 and cancelled.json()["status"] == "cancelled"
+    assert client.post(f"{base}/{job['id']}/cancel").status_code == 409
+
+    events = _parse_sse(client.get(f"{base}/{job['id']}/events").text)
+    assert [(e, d["status"]) for e, d in events] == [("status", "cancelled")]
+
+
+def test_job_result_and_scoping(client: TestClient, db_session: Session, test_project: Project):
+    job = Job(
+        project_id=test_project.id,
+        owner_id=test_project.owner_id,
+        kind="generate_specifications",
+        status="succeeded",
+        result=json.dumps({"import": {"parent_requirement_id": 7}}),
+    )
+    db_session.add(job)
+    db_session.commit()
+
+    base = f"/api/v1/projects/{test_project.id}/jobs"
+    result = client.get(f"{base}/{job.id}/result")
+    assert result.status_code == 200
+    assert result.json()["result"] == {"import": {"parent_requirement_id": 7}}
+    assert client.get(f"/api/v1/projects/{test_project.id + 1000}/jobs/{job.id}").status_code == 404
+
+
+def test_submitting_generation_is_rate_limited(
+    client: TestClient, test_project: Project, monkeypatch
+):
+    monkeypatch.setattr(get_admission_controller(), "user_burst", 1)
+    monkeypatch.setattr(get_admission_controller(), "user_rate", 0.01)
+
+    url = f"/api/v1/projects/{test_project.id}/jobs/generate-specifications"
+    body = {"project_goals": ["Faster onboarding"]}
+    assert client.post(url, json=body).status_code == 202
+    response = client.post(url, json=body)
+    assert response.status_code == 429
+    assert int(response.headers["retry-after"]) >= 1
+
+
+def test_submit_and_cancel_reach_the_running_runner(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    migrate(engine)
+    with Session(engine) as db:
+        db.add(User(id=1, username="u", email="u@example.com", hashed_password="x"))
+        db.add(Project(id=1, name="P", owner_id=1))
+        db.commit()
+
+    async def slow(job):
+        await asyncio.sleep(30)
+
+    def override_get_db():
+        with Session(engine) as db:
+            yield db
+
+    monkeypatch.setitem(jobs.HANDLERS, "generate_specifications", slow)
+    monkeypatch.setitem(app.dependency_overrides, get_db, override_get_db)
+    monkeypatch.setitem(app.dependency_overrides, get_current_user, lambda: User(id=1))
+    client = TestClient(app)
+    base = "/api/v1/projects/1/jobs"
+
+    def status(job_id):
+        with Session(engine) as db:
+            return db.get(Job, job_id).status
+
+    async def until(job_id, expected):
+        for _ in range(200):
+            if status(job_id) == expected:
+                return
+            await asyncio.sleep(0.01)
+        raise AssertionError(f"job {job_id} is {status(job_id)}, expected {expected}")
+
+    async def run():
+        # Polling and heartbeats are far slower than the test: only the
+        # endpoints' wake and local cancel can move the job along.
+        runner = JobRunner(engine, workers=1, poll_interval=60)
+        monkeypatch.setattr(jobs, "_runner", runner)
+        runner.start()
+        try:
+            await asyncio.sleep(0.05)  # the worker found nothing and sleeps
+            # The endpoints run in the client's threads, off the runner's loop.
+            submitted = await asyncio.to_thread(
+                client.post, f"{base}/generate-specifications", json={"project_goals": []}
+            )
+            assert submitted.status_code == 202, submitted.text
+            job_id = submitted.json()["id"]
+            await until(job_id, "running")
+            cancelled = await asyncio.to_thread(client.post, f"{base}/{job_id}/cancel")
+            assert cancelled.status_code == 200, cancelled.text
+            await until(job_id, "cancelled")
+        finally:
+            # A loop call made from the wrong thread can strand the worker,
+            # and then stopping never finishes.
+            stopping = asyncio.ensure_future(runner.stop())
+            done, _ = await asyncio.wait({stopping}, timeout=5)
+            assert done, "the runner did not stop"
+
+    # Debug mode rejects loop calls made from other threads. The loop is
+    # closed without cancelling leftover tasks, so a stranded one fails the
+    # test instead of hanging it.
+    loop = asyncio.new_event_loop()
+    loop.set_debug(True)
+    try:
+        loop.run_until_complete(run())
+    finally:
+        loop.close()
+        engine.dispose()
@@ -1,122 +1,12 @@
+import json
+
 from fastapi.testclient import TestClient
-from sqlmodel import Session, SQLModel, select
-import pytest
-
-from app.main import app  # Main FastAPI application
-from app.api.deps import get_db, get_current_user
-from app.models.user import User
-from app.models.project import Project  # Import Project
-from app.models.requirements import Requirement
-from app.schemas.requirements import (
-    RequirementCreate,
-    RequirementRead,
-)  # RequirementUpdate not used in this simplified version of tests directly
-from app.db.session import (
-    engine,
-)  # Use the same engine for consistency in this basic setup
-
-
-# Test database setup
-@pytest.fixture(scope="session", autouse=True)
-def create_test_database_tables():
-    # Ensures all tables defined in SQLModel are created.
-    # init_db() from session.py should do this by importing all model files.
-    # For tests, explicitly calling create_all here is also fine.
-    SQLModel.metadata.create_all(engine)
-    yield
-    SQLModel.metadata.drop_all(engine)
-
-
-@pytest.fixture(scope="function")
-def db_session():
-    connection = engine.connect()
-    transaction = connection.begin()
-    session = Session(bind=connection)
-    yield session
-    session.close()
-    transaction.rollback()
-    connection.close()
-
-
-@pytest.fixture(scope="function")
-def client(db_session: Session):
-    """Create a test client using the same DB session as the tests."""
-
-    def override_get_current_user_for_tests():
-        return User(
-            id=1,
-            username="testuser",
-            email="testuser@example.com",
-            is_active=True,
-            is_superuser=False,
-        )
+from sqlmodel import Session, select
 
-    def override_get_db():
-        yield db_session
-
-    app.dependency_overrides[get_current_user] = override_get_current_user_for_tests
-    app.dependency_overrides[get_db] = override_get_db
-    client = TestClient(app)
-    yield client
-    app.dependency_overrides.clear()
-
-
-@pytest.fixture(
-    scope="function"
-)  # Changed to function scope for cleaner test user handling
-def test_user(db_session: Session):
-    user = db_session.exec(
-        select(User).where(User.email == "testuser@example.com")
-    ).first()
-    if not user:
-        # Ensure the ID is 1 to match the override_get_current_user_for_tests if it returns a user with ID 1
-        # This is a simplification; ideally, the override would fetch the user from this fixture,
-        # or the fixture would create a user with a dynamic ID and the override would use that.
-        user = User(
-            id=1,
-            username="testuser",
-            email="testuser@example.com",
-            hashed_password="fakehashedpassword",
-            is_active=True,
-            is_superuser=False,
-        )
-        db_session.add(user)
-        db_session.commit()
-        db_session.refresh(user)
-    elif (
-        user.id != 1
-    ):  # If user exists but ID is not 1, this is problematic for consistency with override
-        # This scenario indicates a need for better test data management or a more dynamic override.
-        # For this example, we'll proceed, but it's a point of fragility.
-        # One option: delete and recreate, or update ID if possible (not typically recommended for PKs).
-        # Simplest for now: assume this test_user fixture is the source of truth for the user with ID=1.
-        # If the override always returns user ID 1, this fixture must ensure user ID 1 is this "testuser".
-        pass  # User exists, and we assume it's the one we need (ID=1) or tests will be inconsistent.
-
-    return user
-
-
-@pytest.fixture(scope="function")
-def test_project(db_session: Session, test_user: User):
-    # Attempt to get project if it exists, otherwise create it.
-    # Using a fixed ID (1) for the project to simplify tests.
-    project = db_session.get(Project, 1)
-    if not project:
-        project = Project(
-            id=1,
-            name="Test Project",
-            description="A project for testing",
-            owner_id=test_user.id,
-        )
-        db_session.add(project)
-        db_session.commit()
-        db_session.refresh(project)
-    elif project.owner_id != test_user.id:
-        # If project 1 exists but has a different owner, this could be an issue.
-        # For robust tests, clear project table or use dynamic IDs.
-        # For now, assume this is fine or tests will fail indicating data inconsistency.
-        pass
-    return project
+from app.core.config import get_settings
+from app.models.project import Project
+from app.models.requirements import Requirement, Epic, Feature, UserStory
+from app.db.instrumentation import assert_max_queries
 
 
 def test_create_requirement(
@@ -248,3 +138,156 @@ def test_delete_requirement(
 
     db_req = db_session.get(Requirement, req.id)
     assert db_req is None
+
+
+def test_import_specifications(
+    client: TestClient, db_session: Session, test_project: Project
+):
+    payload = {
+        "epics": [
+            {
+                "title": "Accounts",
+                "features": [
+                    {"title": "Signup", "user_stories": ["As a user, I sign up."]},
+                    {
+                        "title": "Login",
+                        "user_stories": ["As a user, I log in.", "As a user, I log out."],
+                    },
+                ],
+            },
+            {
+                "title": "Catalog",
+                "features": [{"title": "Listing", "user_stories": []}],
+            },
+        ]
+    }
+    response = client.post(
+        f"/api/v1/projects/{test_project.id}/import-specifications", json=payload
+    )
+    assert response.status_code == 201, response.text
+    data = response.json()
+    assert data["created_counts"] == {
+        "requirements": 1,
+        "epics": 2,
+        "features": 3,
+        "user_stories": 3,
+    }
+
+    epics = db_session.exec(
+        select(Epic).where(Epic.parent_req_id == data["parent_requirement_id"])
+    ).all()
+    assert {e.title for e in epics} == {"Accounts", "Catalog"}
+    accounts = next(e for e in epics if e.title == "Accounts")
+    features = db_session.exec(
+        select(Feature).where(Feature.parent_epic_id == accounts.id)
+    ).all()
+    assert {f.title for f in features} == {"Signup", "Login"}
+    login = next(f for f in features if f.title == "Login")
+    stories = db_session.exec(
+        select(UserStory).where(UserStory.parent_feature_id == login.id)
+    ).all()
+    assert sorted(s.title for s in stories) == ["As a user, I log in.", "As a user, I log out."]
+
+
+def test_import_specifications_query_budget(
+    client: TestClient, test_project: Project
+):
+    payload = {
+        "epics": [
+            {
+                "title": f"Epic {e}",
+                "features": [
+                    {"title": f"F{e}.{f}", "user_stories": [f"S{e}.{f}.{s}" for s in range(5)]}
+                    for f in range(5)
+                ],
+            }
+            for e in range(5)
+        ]
+    }
+    # One lookup for the project, one batched insert per tier, one
+    # change-tracking lookup, one hierarchy version bump, one near-duplicate
+    # index insert each for features and stories, the commit: independent of
+    # how many epics, features and stories are imported.
+    with assert_max_queries(12):
+        response = client.post(
+            f"/api/v1/projects/{test_project.id}/import-specifications", json=payload
+        )
+    assert response.status_code == 201, response.text
+    assert response.json()["created_counts"]["user_stories"] == 125
+    assert response.headers["server-timing"].startswith("db;dur=")
+
+
+def _sse_events(body: str) -> list[tuple[str, dict]]:
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def _streamed_specs(monkeypatch, text: str, fail_after: bool = False):
+    from app.services import ai_spec_service
+    from app.services.llm_providers import _status_error
+
+    monkeypatch.setattr(get_settings(), "openai_api_key", "test-key")
+
+    async def fake_stream(**kwargs):
+        for i in range(0, len(text), 16):
+            yield text[i:i + 16]
+        if fail_after:
+            raise _status_error(503)
+
+    monkeypatch.setattr(ai_spec_service, "stream_chat_completion", fake_stream)
+
+
+SPEC_EPICS = [
+    {"title": "Accounts", "description": "Sign-up and login", "features": [
+        {"title": "Signup", "user_stories": ["As a visitor, I sign up."]},
+        {"title": "Login", "user_stories": ["As a user, I log in.", "As a user, I log out."]},
+    ]},
+    {"title": "Catalog", "features": [{"title": "Browse", "user_stories": ["As a user, I browse."]}]},
+]
+
+
+def test_stream_generated_specifications_imports_each_epic(
+    client: TestClient, db_session: Session, test_project: Project, monkeypatch
+):
+    _streamed_specs(monkeypatch, json.dumps({"epics": SPEC_EPICS}))
+    response = client.post(
+        f"/api/v1/projects/{test_project.id}/generate-specifications/stream",
+        json={"project_goals": ["Sell online"], "use_cache": False},
+    )
+    assert response.status_code == 200, response.text
+    events = _sse_events(response.text)
+    assert [name for name, _ in events] == ["requirement", "epic", "epic", "done"]
+    requirement_id = events[0][1]["id"]
+    assert [data["epic"]["title"] for name, data in events if name == "epic"] == ["Accounts", "Catalog"]
+    assert events[1][1]["created_counts"] == {
+        "requirements": 1, "epics": 1, "features": 2, "user_stories": 3,
+    }
+    assert events[-1][1] == {
+        "parent_requirement_id": requirement_id,
+        "created_counts": {"requirements": 1, "epics": 2, "features": 3, "user_stories": 4},
+    }
+    epics = db_session.exec(select(Epic).where(Epic.parent_req_id == requirement_id)).all()
+    assert sorted(e.title for e in epics) == ["Accounts", "Catalog"]
+
+
+def test_stream_generated_specifications_keeps_epics_before_a_failure(
+    client: TestClient, db_session: Session, test_project: Project, monkeypatch
+):
+    # The reply breaks off inside the second epic.
+    text = json.dumps({"epics": SPEC_EPICS})
+    _streamed_specs(monkeypatch, text[: text.index('"Catalog"')], fail_after=True)
+    response = client.post(
+        f"/api/v1/projects/{test_project.id}/generate-specifications/stream", json={}
+    )
+    events = _sse_events(response.text)
+    assert [name for name, _ in events] == ["requirement", "epic", "error"]
+    error = events[-1][1]
+    assert error["status_code"] == 503
+    assert error["created_counts"]["epics"] == 1
+    epics = db_session.exec(
+        select(Epic).where(Epic.parent_req_id == error["parent_requirement_id"])
+    ).all()
+    assert [e.title for e in epics] == ["Accounts"]
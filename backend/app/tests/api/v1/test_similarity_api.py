@@ -0,0 +1,60 @@
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app.models.project import Project
+from app.models.requirements import Epic, Feature, Requirement
+
+
+def _feature(db_session: Session, project: Project, title: str) -> Feature:
+    requirement = Requirement(title="Reports", project_id=project.id)
+    db_session.add(requirement)
+    db_session.flush()
+    epic = Epic(title="Exports", project_id=project.id, parent_req_id=requirement.id)
+    db_session.add(epic)
+    db_session.flush()
+    feature = Feature(title=title, project_id=project.id, parent_epic_id=epic.id)
+    db_session.add(feature)
+    db_session.commit()
+    return feature
+
+
+def test_find_similar(client: TestClient, db_session: Session, test_project: Project):
+    feature = _feature(db_session, test_project, "Export report to PDF")
+    url = f"/api/v1/projects/{test_project.id}/similar"
+
+    response = client.get(url, params={"text": "export the reports as PDF"})
+    assert response.status_code == 200, response.text
+    assert response.json() == [
+        {"kind": "feature", "id": feature.id, "title": "Export report to PDF", "score": 1.0}
+    ]
+    assert client.get(url, params={"text": "export PDF", "kind": "user_story"}).json() == []
+    assert client.get(url, params={"text": "x", "kind": "epic"}).status_code == 400
+    assert client.get("/api/v1/projects/999999/similar", params={"text": "x"}).status_code == 404
+
+
+def test_import_with_dedup(client: TestClient, db_session: Session, test_project: Project):
+    _feature(db_session, test_project, "Export report to PDF")
+    payload = {
+        "dedup": True,
+        "epics": [
+            {
+                "title": "Reporting",
+                "features": [
+                    {"title": "PDF export of reports", "user_stories": ["As a user, I download a PDF."]},
+                    {"title": "Scheduled reports", "user_stories": []},
+                ],
+            }
+        ],
+    }
+    response = client.post(
+        f"/api/v1/projects/{test_project.id}/import-specifications", json=payload
+    )
+    assert response.status_code == 201, response.text
+    data = response.json()
+    assert data["created_counts"] == {
+        "requirements": 1,
+        "epics": 1,
+        "features": 1,
+        "user_stories": 1,
+    }
+    assert data["skipped_duplicates"] == {"features": 1, "user_stories": 0}
@@ -0,0 +1,82 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app.core.config import get_settings
+from app.db.write_behind import WriteBehindBuffer
+from app.models.project import Project
+from app.models.usage import LLMUsage
+from app.services import llm, usage
+from app.services.usage import apply_rollups
+
+
+class TokenProvider:
+    async def complete(self, **kwargs):
+        message = SimpleNamespace(content="hello")
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=message)],
+            usage=SimpleNamespace(prompt_tokens=30, completion_tokens=10),
+        )
+
+
+@pytest.fixture
+def recorder(db_session: Session, monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "openai_api_key", "test-key")
+    monkeypatch.setattr(settings, "llm_user_burst", 10)
+    monkeypatch.setattr(llm, "get_llm_provider", lambda: TokenProvider())
+    session_factory = lambda: Session(bind=db_session.connection())  # noqa: E731
+    buffer = WriteBehindBuffer(LLMUsage, session_factory, on_flush=apply_rollups)
+    monkeypatch.setattr(usage, "_recorder", buffer)
+    monkeypatch.setattr(usage._budgets, "session_factory", session_factory)
+    usage._budgets.clear()
+    yield buffer
+    usage._budgets.clear()
+
+
+def _chat(client: TestClient, project: Project):
+    return client.post("/chat", params={"project_id": project.id, "message": "hi", "cache": False})
+
+
+def test_chat_usage_is_reported_per_project_and_user(
+    client: TestClient, test_project: Project, recorder
+):
+    assert _chat(client, test_project).status_code == 200
+    assert _chat(client, test_project).status_code == 200
+    assert recorder.pending(project_id=test_project.id) == 2
+
+    report = client.get(f"/api/v1/projects/{test_project.id}/usage", params={"fresh": True}).json()
+    assert report["bucket"] == "day"
+    [point] = report["points"]
+    assert (point["calls"], point["prompt_tokens"], point["total_tokens"]) == (2, 60, 80)
+
+    by_endpoint = client.get(
+        f"/api/v1/projects/{test_project.id}/usage", params={"group_by": "endpoint", "bucket": "hour"}
+    ).json()
+    assert [p["group"] for p in by_endpoint["points"]] == ["chat"]
+
+    mine = client.get("/api/v1/usage", params={"group_by": "project"}).json()
+    assert [(p["group"], p["total_tokens"]) for p in mine["points"]] == [(str(test_project.id), 80)]
+    assert client.get("/api/v1/projects/999999/usage").status_code == 404
+
+
+def test_project_token_budget_stops_calls_before_upstream(
+    client: TestClient, test_project: Project, recorder
+):
+    url = f"/api/v1/projects/{test_project.id}/usage/budget"
+    status = client.put(url, json={"token_budget": 50}).json()
+    assert status["token_budget"] == 50 and status["remaining"] == 50
+
+    assert _chat(client, test_project).status_code == 200  # 40 tokens
+    assert _chat(client, test_project).status_code == 200  # 80: now over budget
+    response = _chat(client, test_project)
+    assert response.status_code == 429
+    assert "budget" in response.json()["detail"]
+
+    status = client.get(url).json()
+    assert status["spent"] == 80 and status["remaining"] == 0
+    assert client.put(url, json={"token_budget": None}).json()["token_budget"] is None
+    assert _chat(client, test_project).status_code == 200
+    assert client.put(url, json={"token_budget": 0}).status_code == 422
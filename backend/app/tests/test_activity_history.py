@@ -0,0 +1,32 @@
+from datetime import datetime, timedelta
+
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.models.activity import Activity, ActivityArchive
+from app.services.activity_history import archive_activity, list_archived_activity
+
+
+def test_archive_activity_moves_only_expired_rows_into_segments(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'history.db'}")
+    SQLModel.metadata.create_all(engine)
+    now = datetime.utcnow()
+    with Session(engine) as db:
+        for project_id in (1, 2):
+            for i in range(4):
+                db.add(Activity(project_id=project_id, type="t", content="é" * 50 + str(i),
+                                timestamp=now - timedelta(days=40, minutes=i)))
+        db.add(Activity(project_id=1, type="t", content="recent", timestamp=now))
+        db.commit()
+
+    assert archive_activity(engine, older_than=now - timedelta(days=30), segment_rows=3) == 8
+    assert archive_activity(engine, older_than=now - timedelta(days=30), segment_rows=3) == 0
+
+    with Session(engine) as db:
+        assert [a.content for a in db.exec(select(Activity)).all()] == ["recent"]
+        segments = db.exec(select(ActivityArchive).order_by(ActivityArchive.id)).all()
+        assert [(s.project_id, s.row_count) for s in segments] == [(1, 3), (1, 1), (2, 3), (2, 1)]
+        assert all(len(s.data) < 4 * 100 for s in segments)  # compressed
+        page = list_archived_activity(db, 1, limit=10)
+        assert [a.content[-1] for a in page.items] == ["0", "1", "2", "3"]
+        assert page.next_cursor is None
+    engine.dispose()
@@ -0,0 +1,104 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.metrics import llm_admission_queue_depth, llm_admission_rejected
+from app.services.admission import AdmissionController, TokenBucket
+
+
+def test_token_bucket_bursts_then_reports_wait():
+    bucket = TokenBucket(rate=2.0, burst=2)
+    now = bucket.updated
+    assert bucket.take(now) == 0 and bucket.take(now) == 0
+    assert bucket.take(now) == pytest.approx(0.5)
+    assert bucket.take(now + 0.5) == 0
+
+
+def test_charge_raises_429_with_retry_after():
+    controller = AdmissionController(user_rate=0.1, user_burst=1)
+    controller.charge("alice")
+    controller.charge("bob")  # buckets are per user
+    with pytest.raises(HTTPException) as excinfo:
+        controller.charge("alice")
+    assert excinfo.value.status_code == 429
+    assert excinfo.value.headers["Retry-After"] == "10"
+
+
+def test_concurrent_charges_never_overdraw_the_bucket():
+    controller = AdmissionController(user_rate=0.001, user_burst=50)
+
+    def charge(_):
+        try:
+            controller.charge("alice")
+            return True
+        except HTTPException:
+            return False
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        admitted = sum(pool.map(charge, range(400)))
+    assert admitted == 50
+
+
+def test_interactive_calls_jump_ahead_of_bulk():
+    order = []
+
+    async def run():
+        controller = AdmissionController(max_concurrency=1, queue_timeout=5)
+
+        async def call(name, priority):
+            async with controller.slot(priority):
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+        async with controller.slot("interactive"):
+            tasks = [
+                asyncio.create_task(call("bulk-1", "bulk")),
+                asyncio.create_task(call("bulk-2", "bulk")),
+            ]
+            await asyncio.sleep(0)
+            tasks.append(asyncio.create_task(call("chat", "interactive")))
+            await asyncio.sleep(0)
+            assert llm_admission_queue_depth.value("bulk") == 2
+        await asyncio.gather(*tasks)
+        assert controller.active == 0
+
+    asyncio.run(run())
+    assert order == ["chat", "bulk-1", "bulk-2"]
+
+
+def test_queue_timeout_and_depth_limit_answer_503():
+    async def run():
+        controller = AdmissionController(max_concurrency=1, queue_timeout=0.02, max_queue_depth=1)
+        async with controller.slot():
+            waiter = asyncio.create_task(controller._acquire("bulk"))
+            await asyncio.sleep(0)
+            with pytest.raises(HTTPException) as full:
+                await controller._acquire("interactive")
+            with pytest.raises(HTTPException) as timed_out:
+                await waiter
+        assert controller.active == 0
+        return full.value, timed_out.value
+
+    before = llm_admission_rejected.value("queue_timeout")
+    full, timed_out = asyncio.run(run())
+    assert full.status_code == timed_out.status_code == 503
+    assert int(timed_out.headers["Retry-After"]) >= 1
+    assert llm_admission_rejected.value("queue_timeout") == before + 1
+
+
+def test_cancelled_waiter_does_not_leak_its_slot():
+    async def run():
+        controller = AdmissionController(max_concurrency=1, queue_timeout=5)
+        async with controller.slot():
+            waiter = asyncio.create_task(controller._acquire("interactive"))
+            await asyncio.sleep(0)
+            waiter.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiter
+        assert controller.active == 0
+        async with controller.slot():
+            assert controller.active == 1
+
+    asyncio.run(run())
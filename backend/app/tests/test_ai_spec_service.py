@@ -0,0 +1,122 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.config import get_settings
+from app.services import ai_spec_service
+from app.services.ai_spec_service import AISpecService
+
+EPICS = [f"Epic {i}" for i in range(6)]
+
+
+def _reply(payload) -> SimpleNamespace:
+    content = payload if isinstance(payload, str) else json.dumps(payload)
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    monkeypatch.setattr(get_settings(), "openai_api_key", "test-key")
+    state = {"active": 0, "peak": 0, "calls": [], "failures": {}, "errors": {}, "delays": {}, "cancelled": 0}
+
+    async def fake_completion(*, endpoint, messages, cache, **kwargs):
+        prompt = messages[1]["content"]
+        epic = next((e for e in EPICS if f"Epic to detail: {e}\n" in prompt), None)
+        state["calls"].append((endpoint, epic, cache))
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        try:
+            await asyncio.sleep(state["delays"].get(epic, 0.05))
+        except asyncio.CancelledError:
+            state["cancelled"] += 1
+            raise
+        finally:
+            state["active"] -= 1
+        if epic in state["errors"]:
+            raise state["errors"][epic]
+        if endpoint == "generate_spec_outline":
+            return _reply({"epics": [{"title": e, "description": f"About {e}"} for e in EPICS]})
+        if state["failures"].get(epic, 0) > 0:
+            state["failures"][epic] -= 1
+            return _reply("not json at all")
+        return _reply(
+            {"features": [{"title": f"{epic} feature", "user_stories": [f"As a user, I want {epic}"]}]}
+        )
+
+    monkeypatch.setattr(ai_spec_service, "create_chat_completion", fake_completion)
+    return state
+
+
+def test_parallel_generation_fans_out_and_retries_one_branch(fake_llm):
+    fake_llm["failures"]["Epic 2"] = 1
+    specs = asyncio.run(
+        AISpecService().generate_specifications_parallel("Shop", "An online shop", ["Sell"], max_parallel=3)
+    )
+
+    assert [e["title"] for e in specs["epics"]] == EPICS
+    assert specs["epics"][2]["features"][0]["title"] == "Epic 2 feature"
+    assert specs["epics"][0]["description"] == "About Epic 0"
+    epic_calls = [c for c in fake_llm["calls"] if c[0] == "generate_spec_epic"]
+    assert len(epic_calls) == 7
+    # Only the failed branch was retried, and the retry skipped the cache.
+    assert [c for c in epic_calls if c[1] == "Epic 2"] == [
+        ("generate_spec_epic", "Epic 2", True),
+        ("generate_spec_epic", "Epic 2", False),
+    ]
+    # Branches overlap, but never more than max_parallel at once.
+    assert fake_llm["peak"] == 3
+
+
+def test_branch_failing_every_attempt_fails_the_generation(fake_llm):
+    fake_llm["failures"]["Epic 4"] = 5
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(
+            AISpecService().generate_specifications_parallel("Shop", "", [], max_attempts=2)
+        )
+    assert excinfo.value.status_code == 502
+    assert "Epic 4" in excinfo.value.detail
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_upstream_errors_fail_fast_and_cancel_the_other_branches(fake_llm, status):
+    fake_llm["errors"]["Epic 1"] = HTTPException(status_code=status, detail="upstream")
+    fake_llm["delays"] = {e: 10 for e in EPICS if e != "Epic 1"}
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(AISpecService().generate_specifications_parallel("Shop", "", [], max_parallel=6))
+
+    assert excinfo.value.status_code == status
+    epic_calls = [c[1] for c in fake_llm["calls"] if c[0] == "generate_spec_epic"]
+    # create_chat_completion already retried: the branch is not retried again.
+    assert epic_calls.count("Epic 1") == 1
+    # The branches still waiting on the model were cancelled, not awaited.
+    assert fake_llm["cancelled"] == 5
+
+
+def test_streamed_generation_yields_each_epic_before_the_reply_ends(monkeypatch):
+    monkeypatch.setattr(get_settings(), "openai_api_key", "test-key")
+    text = json.dumps({"epics": [
+        {"title": e, "description": None, "features": [{"title": "F", "user_stories": ["As a user"]}]}
+        for e in EPICS[:3]
+    ]})
+    sent = []
+
+    async def fake_stream(**kwargs):
+        for i in range(0, len(text), 10):
+            sent.append(i)
+            yield text[i:i + 10]
+
+    monkeypatch.setattr(ai_spec_service, "stream_chat_completion", fake_stream)
+
+    async def collect():
+        seen = []
+        async for epic in AISpecService().stream_specifications("Shop", "", []):
+            seen.append((epic.title, len(sent)))
+        return seen
+
+    seen = asyncio.run(collect())
+    assert [title for title, _ in seen] == EPICS[:3]
+    # The first epic arrived while most of the reply was still to come.
+    assert seen[0][1] < len(range(0, len(text), 10)) / 2
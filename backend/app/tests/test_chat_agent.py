@@ -0,0 +1,162 @@
+import asyncio
+import json
+import threading
+from types import SimpleNamespace
+
+import pytest
+from sqlmodel import Session, SQLModel
+
+from agents import tools
+from app.core.config import get_settings
+from app.db.session import engine
+from app.models import Item, ItemType, Project, User
+from app.services.chat_agent import run_chat_agent, run_tool
+
+
+@pytest.fixture(autouse=True)
+def setup_db():
+    SQLModel.metadata.drop_all(engine)
+    SQLModel.metadata.create_all(engine)
+    yield
+    SQLModel.metadata.drop_all(engine)
+
+
+@pytest.fixture
+def projects():
+    with Session(engine) as session:
+        user = User(username="tester", email="t@example.com", hashed_password="x")
+        session.add(user)
+        session.flush()
+        mine = Project(name="Mine", owner_id=user.id)
+        other = Project(name="Other", owner_id=user.id)
+        session.add_all([mine, other])
+        session.flush()
+        epic = Item(project_id=mine.id, type=ItemType.EPIC, title="Epic")
+        foreign = Item(project_id=other.id, type=ItemType.EPIC, title="Foreign")
+        session.add_all([epic, foreign])
+        session.commit()
+        return SimpleNamespace(mine=mine.id, other=other.id, epic=epic.id, foreign=foreign.id)
+
+
+def _call(call_id, name, **arguments):
+    return SimpleNamespace(
+        id=call_id, function=SimpleNamespace(name=name, arguments=json.dumps(arguments))
+    )
+
+
+def _completion(content=None, tool_calls=None):
+    message = SimpleNamespace(content=content, tool_calls=tool_calls)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+class ScriptedModel:
+    """Answers each turn with the next scripted completion and records the requests."""
+
+    def __init__(self, *turns, delay=0.0):
+        self.turns = list(turns)
+        self.delay = delay
+        self.requests = []
+
+    async def __call__(self, **kwargs):
+        self.requests.append({**kwargs, "messages": list(kwargs["messages"])})
+        await asyncio.sleep(self.delay)
+        return self.turns[min(len(self.requests), len(self.turns)) - 1]
+
+
+def _run(model, project_id, **kwargs):
+    return asyncio.run(
+        run_chat_agent(
+            complete=model, endpoint="chat", model="gpt-test",
+            messages=[{"role": "system", "content": "sys"}, {"role": "user", "content": "go"}],
+            project_id=project_id, **kwargs,
+        )
+    )
+
+
+def test_tool_definitions_cover_handlers():
+    definitions = {t["function"]["name"]: t["function"] for t in tools.tool_definitions()}
+    assert set(definitions) == set(tools.HANDLERS)
+    bulk = definitions["bulk_create_features"]
+    assert bulk["description"].startswith("Create features")
+    assert bulk["parameters"]["required"] == ["project_id", "parent_id", "items"]
+
+
+def test_agent_runs_tools_until_the_model_answers(projects):
+    model = ScriptedModel(
+        _completion(tool_calls=[
+            _call("c1", "bulk_create_features", project_id=projects.mine,
+                  parent_id=projects.epic, items=[{"title": "Search"}, {"title": "Export"}]),
+            _call("c2", "summarize_project", project_id=projects.mine),
+        ]),
+        _completion(content="Added two features."),
+    )
+    reply = _run(model, projects.mine)
+
+    assert reply.text == "Added two features." and reply.steps == 2 and reply.stopped is None
+    assert [c.name for c in reply.tool_calls] == ["bulk_create_features", "summarize_project"]
+    assert [f["title"] for f in reply.tool_calls[0].result["result"]] == ["Search", "Export"]
+    first, second = model.requests
+    assert {t["function"]["name"] for t in first["tools"]} == set(tools.HANDLERS)
+    assert f"project {projects.mine}" in first["messages"][0]["content"]
+    tool_messages = [m for m in second["messages"] if m["role"] == "tool"]
+    assert [m["tool_call_id"] for m in tool_messages] == ["c1", "c2"]
+    assert json.loads(tool_messages[1]["content"])["result"]["counts"]["Epic"] == 1
+
+
+def test_tool_calls_of_one_turn_run_in_parallel(projects, monkeypatch):
+    barrier = threading.Barrier(2, timeout=5)
+
+    def slow_list(payload, run_id=0, session_factory=None):
+        barrier.wait()  # only returns once both calls are running
+        return {"ok": True, "result": []}
+
+    monkeypatch.setitem(tools.HANDLERS, "list_items", slow_list)
+    model = ScriptedModel(
+        _completion(tool_calls=[
+            _call("a", "list_items", project_id=projects.mine),
+            _call("b", "list_items", project_id=projects.mine, type="Epic"),
+        ]),
+        _completion(content="done"),
+    )
+    reply = _run(model, projects.mine)
+    assert [c.result["ok"] for c in reply.tool_calls] == [True, True]
+
+
+def test_tool_calls_are_confined_to_the_project(projects):
+    outside = run_tool("list_items", json.dumps({"project_id": projects.other}), projects.mine)
+    assert not outside.result["ok"] and "only act on project" in outside.result["error"]
+    foreign = run_tool("delete_item", json.dumps({"id": projects.foreign}), projects.mine)
+    assert not foreign.result["ok"] and "not found in project" in foreign.result["error"]
+    with Session(engine) as session:
+        assert session.get(Item, projects.foreign) is not None
+    assert run_tool("drop_tables", "{}", projects.mine).result["error"] == "unknown tool 'drop_tables'"
+    assert "valid JSON" in run_tool("list_items", "{", projects.mine).result["error"]
+
+
+def test_agent_stops_at_the_step_limit(projects, monkeypatch):
+    monkeypatch.setattr(get_settings(), "chat_agent_max_steps", 2)
+    looping = _completion(tool_calls=[_call("c", "list_items", project_id=projects.mine)])
+    model = ScriptedModel(looping)
+    reply = _run(model, projects.mine)
+
+    assert reply.steps == 2 and reply.stopped == "max_steps"
+    assert "tool_choice" not in model.requests[0]
+    assert model.requests[1]["tool_choice"] == "none"
+    assert [c.name for c in reply.tool_calls] == ["list_items"]
+    assert "step limit" in reply.text
+
+
+def test_agent_stops_at_the_time_limit(projects, monkeypatch):
+    monkeypatch.setattr(get_settings(), "chat_agent_time_limit", 0.2)
+    model = ScriptedModel(_completion(content="too late"), delay=5)
+    reply = _run(model, projects.mine)
+    assert reply.stopped == "time_limit" and reply.steps == 1
+    assert "time limit" in reply.text
+
+
+def test_agent_disabled_makes_one_plain_call(projects, monkeypatch):
+    monkeypatch.setattr(get_settings(), "chat_agent_enabled", False)
+    model = ScriptedModel(_completion(content="hello"))
+    reply = _run(model, projects.mine)
+    assert reply.text == "hello" and "tools" not in model.requests[0]
+    assert model.requests[0]["messages"][0]["content"] == "sys"
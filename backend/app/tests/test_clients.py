@@ -0,0 +1,24 @@
+import asyncio
+
+from app.core import clients
+from app.core.config import get_settings
+
+
+def test_openai_client_shares_pooled_http_client(monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "openai_api_key", "test-key")
+    monkeypatch.setattr(settings, "http_max_keepalive_connections", 7)
+
+    async def scenario():
+        http = clients.get_http_client()
+        openai_client = clients.get_openai_client()
+        assert clients.get_http_client() is http
+        assert clients.get_openai_client() is openai_client
+        assert openai_client._client is http
+        pool = http._transport._pool
+        assert pool._max_keepalive_connections == 7
+        await clients.close_clients()
+        assert http.is_closed
+        assert clients._openai_client is None and clients._http_client is None
+
+    asyncio.run(scenario())
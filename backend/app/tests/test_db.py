@@ -0,0 +1,87 @@
+from unittest import mock
+
+import pytest
+from sqlmodel import Session, SQLModel, select
+
+from app.core.config import Settings
+from app.db import bulk
+from app.db.bulk import bulk_insert
+from app.db.instrumentation import capture_queries
+from app.db.session import engine, engine_options
+from app.models import Project, Requirement, User
+
+
+@pytest.fixture
+def project_id():
+    SQLModel.metadata.drop_all(engine)
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        user = User(email="bulk@example.com", hashed_password="x")
+        session.add(user)
+        session.commit()
+        project = Project(name="Bulk", owner_id=user.id)
+        session.add(project)
+        session.commit()
+        yield project.id
+    SQLModel.metadata.drop_all(engine)
+
+
+def test_engine_options_per_dialect():
+    settings = Settings(db_pool_size=3, db_max_overflow=4)
+    sqlite_opts = engine_options("sqlite:///file.db", settings)
+    assert sqlite_opts["connect_args"] == {"check_same_thread": False}
+    assert "pool_size" not in sqlite_opts
+    assert "poolclass" in engine_options("sqlite://", settings)
+
+    pg_opts = engine_options("postgresql+psycopg2://u:p@localhost/db", settings)
+    assert pg_opts["pool_size"] == 3
+    assert pg_opts["max_overflow"] == 4
+    assert pg_opts["pool_pre_ping"] is True
+
+
+@pytest.mark.parametrize("strategy", [None, "orm"])
+def test_bulk_insert_returns_ids_in_order(project_id, strategy):
+    rows = [{"title": f"R{i}", "project_id": project_id} for i in range(25)]
+    with Session(engine) as session:
+        session.add(Requirement(title="existing", project_id=project_id))
+        session.flush()
+        with mock.patch.object(
+            bulk, "insert_strategy", return_value=strategy or bulk.insert_strategy(session)
+        ):
+            ids = bulk_insert(session, Requirement, rows)
+        session.commit()
+        assert len(ids) == 25
+        titles = {r.id: r.title for r in session.exec(select(Requirement)).all()}
+    assert [titles[i] for i in ids] == [r["title"] for r in rows]
+
+
+def test_bulk_insert_returns_explicit_ids(project_id):
+    rows = [{"id": 100 - i, "title": f"R{i}", "project_id": project_id} for i in range(3)]
+    with Session(engine) as session:
+        assert bulk_insert(session, Requirement, rows) == [100, 99, 98]
+        session.commit()
+        assert session.get(Requirement, 99).title == "R1"
+
+
+@pytest.mark.skipif(engine.dialect.name != "sqlite", reason="SQLite rowid allocation")
+def test_bulk_insert_refuses_non_contiguous_sqlite_ids(project_id):
+    with Session(engine) as session:
+        # Past the largest rowid SQLite allocates new ones at random.
+        session.add(Requirement(id=2**63 - 1, title="last", project_id=project_id))
+        session.flush()
+        rows = [{"title": f"R{i}", "project_id": project_id} for i in range(5)]
+        with pytest.raises(RuntimeError, match="contiguous"):
+            bulk_insert(session, Requirement, rows)
+
+
+def test_capture_queries_flags_repeated_statements(project_id):
+    with capture_queries() as stats:
+        with Session(engine) as session:
+            for _ in range(6):
+                session.exec(select(Project).where(Project.id == project_id)).all()
+            session.exec(select(User)).all()
+    assert stats.count == 7
+    [(statement, n)] = stats.n_plus_one_suspects(threshold=5)
+    assert n == 6 and "FROM project" in statement
+    assert stats.n_plus_one_suspects(threshold=0) == []
+    assert stats.server_timing().endswith('desc="7 queries"')
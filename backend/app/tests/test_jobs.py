@@ -0,0 +1,188 @@
+import asyncio
+import json
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlmodel import Session
+
+from app.db.migrations import migrate
+from app.models.job import Job
+from app.services import jobs
+from app.services.jobs import (
+    JobRunner,
+    job_handler,
+    request_cancel,
+    run_uninterrupted,
+    submit_job,
+)
+
+
+
+@job_handler("test_echo")
+async def _echo(job):
+    return {"echo": json.loads(job.params)}
+
+
+@job_handler("test_fail")
+async def _fail(job):
+    raise ValueError("boom")
+
+
+@job_handler("test_slow")
+async def _slow(job):
+    await asyncio.sleep(30)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    migrate(engine)
+    return engine
+
+
+def _submit(engine, kind, params=None) -> int:
+    with Session(engine) as db:
+        return submit_job(db, 1, 1, kind, params or {}).id
+
+
+def _job(engine, job_id) -> Job:
+    with Session(engine) as db:
+        return db.get(Job, job_id)
+
+
+async def _until(engine, job_id, *statuses, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while _job(engine, job_id).status not in statuses:
+        assert asyncio.get_running_loop().time() < deadline, _job(engine, job_id)
+        await asyncio.sleep(0.01)
+    return _job(engine, job_id)
+
+
+def test_workers_record_results_and_errors(engine):
+    ok = _submit(engine, "test_echo", {"n": 1})
+    bad = _submit(engine, "test_fail")
+
+    async def run():
+        runner = JobRunner(engine, workers=2, poll_interval=0.01)
+        runner.start()
+        try:
+            done = await _until(engine, ok, "succeeded")
+            failed = await _until(engine, bad, "failed")
+        finally:
+            await runner.stop()
+        return done, failed
+
+    done, failed = asyncio.run(run())
+    assert json.loads(done.result) == {"echo": {"n": 1}}
+    assert done.attempts == 1 and done.finished_at is not None
+    assert failed.error == "ValueError: boom"
+
+
+def test_cancel_queued_and_running_jobs(engine):
+    async def run():
+        runner = JobRunner(engine, workers=1, poll_interval=0.01)
+        slow = _submit(engine, "test_slow")
+        runner.start()
+        try:
+            await _until(engine, slow, "running")
+            queued = _submit(engine, "test_echo")
+            with Session(engine) as db:
+                assert request_cancel(db, db.get(Job, queued)).status == "cancelled"
+                # Only the heartbeat watcher can see this request: the runner
+                # is not registered as the process-wide one.
+                assert request_cancel(db, db.get(Job, slow)).cancel_requested
+            return await _until(engine, slow, "cancelled"), _job(engine, queued)
+        finally:
+            await runner.stop()
+
+    slow, queued = asyncio.run(run())
+    assert slow.finished_at is not None
+    assert queued.status == "cancelled" and queued.started_at is None
+
+
+def test_shutdown_requeues_running_jobs_for_the_next_start(engine, monkeypatch):
+    calls = []
+
+    async def flaky(job):
+        calls.append(job.attempts)
+        if len(calls) == 1:
+            await asyncio.sleep(30)
+        return "finished"
+
+    monkeypatch.setitem(jobs.HANDLERS, "test_flaky", flaky)
+    job_id = _submit(engine, "test_flaky")
+
+    async def first_process():
+        runner = JobRunner(engine, workers=1, poll_interval=0.01)
+        runner.start()
+        while not calls:  # the handler is running
+            await asyncio.sleep(0.01)
+        await runner.stop()
+
+    asyncio.run(first_process())
+    assert _job(engine, job_id).status == "queued"
+
+    async def second_process():
+        runner = JobRunner(engine, workers=1, poll_interval=0.01)
+        runner.start()
+        try:
+            return await _until(engine, job_id, "succeeded")
+        finally:
+            await runner.stop()
+
+    job = asyncio.run(second_process())
+    assert calls == [1, 2] and json.loads(job.result) == "finished"
+
+
+@pytest.mark.parametrize("interrupt", ["cancel", "shutdown"])
+def test_interrupting_a_started_import_records_its_outcome(engine, monkeypatch, interrupt):
+    started, release, imports = threading.Event(), threading.Event(), []
+
+    def commit_import():
+        started.set()
+        release.wait(5)
+        imports.append("committed")
+        return {"epics": 2}
+
+    async def importing(job):
+        return await run_uninterrupted(commit_import)
+
+    monkeypatch.setitem(jobs.HANDLERS, "test_import", importing)
+    job_id = _submit(engine, "test_import")
+
+    async def run():
+        runner = JobRunner(engine, workers=1, poll_interval=0.01)
+        runner.start()
+        try:
+            await asyncio.to_thread(started.wait, 5)
+            if interrupt == "cancel":
+                with Session(engine) as db:
+                    request_cancel(db, db.get(Job, job_id))
+                await asyncio.sleep(0.05)  # the watcher cancels the handler
+                release.set()
+                return await _until(engine, job_id, "succeeded", "cancelled")
+            asyncio.get_running_loop().call_later(0.05, release.set)
+        finally:
+            await runner.stop()
+        return _job(engine, job_id)
+
+    job = asyncio.run(run())
+    assert imports == ["committed"]
+    assert job.status == "succeeded" and json.loads(job.result) == {"epics": 2}
+
+
+def test_stale_running_jobs_are_requeued_then_failed(engine):
+    old = datetime.utcnow() - timedelta(minutes=5)
+    with Session(engine) as db:
+        retry = Job(project_id=1, owner_id=1, kind="test_echo", status="running", attempts=1, heartbeat_at=old)
+        exhausted = Job(project_id=1, owner_id=1, kind="test_echo", status="running", attempts=3, heartbeat_at=old)
+        fresh = Job(project_id=1, owner_id=1, kind="test_echo", status="running", attempts=1, heartbeat_at=datetime.utcnow())
+        db.add_all([retry, exhausted, fresh])
+        db.commit()
+        ids = retry.id, exhausted.id, fresh.id
+
+    runner = JobRunner(engine, stale_after=30, max_attempts=3)
+    assert runner.requeue_stale() == 1
+    assert [_job(engine, i).status for i in ids] == ["queued", "failed", "running"]
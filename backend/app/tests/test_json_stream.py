@@ -0,0 +1,57 @@
+import json
+import random
+
+import pytest
+
+from app.services.json_stream import JSONArrayStream, JSONStreamError
+
+DOC = {
+    "note": 'braces {in} "strings" [are] ignored \\ too',
+    "epics": [
+        {"title": 'E1 "quoted" }', "features": [{"title": "F]", "user_stories": ["As a {user}"]}]},
+        {"title": "E2", "features": []},
+    ],
+    "after": [{"not": "an epic"}],
+}
+
+
+def _feed_in_chunks(parser: JSONArrayStream, text: str, rng: random.Random) -> list:
+    items, i = [], 0
+    while i < len(text):
+        size = rng.randint(1, 9)
+        items += parser.feed(text[i:i + size])
+        i += size
+    return items
+
+
+def test_items_are_emitted_whatever_the_chunking():
+    text = "```json\n" + json.dumps(DOC, indent=2) + "\n```"
+    rng = random.Random(3)
+    for _ in range(50):
+        parser = JSONArrayStream("epics")
+        assert _feed_in_chunks(parser, text, rng) == DOC["epics"]
+        assert parser.complete
+        parser.close()
+
+
+def test_each_item_is_emitted_when_it_closes():
+    text = json.dumps({"epics": [{"title": "E1"}, {"title": "E2"}]})
+    parser = JSONArrayStream("epics")
+    first_end = text.index("}") + 1
+    assert parser.feed(text[:first_end - 1]) == []
+    assert parser.feed(text[first_end - 1:first_end]) == [{"title": "E1"}]
+    assert parser.feed(text[first_end:]) == [{"title": "E2"}]
+
+
+def test_key_must_be_at_the_root():
+    text = json.dumps({"meta": {"epics": [{"title": "nested"}]}, "epics": [{"title": "root"}]})
+    assert JSONArrayStream("epics").feed(text) == [{"title": "root"}]
+
+
+def test_truncated_and_unbalanced_documents_are_reported():
+    parser = JSONArrayStream("epics")
+    assert parser.feed('{"epics": [{"title": "E1"}, {"title": "E2"') == [{"title": "E1"}]
+    with pytest.raises(JSONStreamError):
+        parser.close()
+    with pytest.raises(JSONStreamError):
+        JSONArrayStream("epics").feed('{"epics": [{"title": "E1"]}')
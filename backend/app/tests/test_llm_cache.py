@@ -0,0 +1,149 @@
+import asyncio
+import multiprocessing
+from types import SimpleNamespace
+from unittest import mock
+
+from openai.types.chat import ChatCompletion
+
+from app.core.metrics import llm_cache_lookups
+from app.services import llm, llm_cache, llm_providers
+from app.services.llm_cache import ResponseCache, cache_key
+
+
+def test_cache_key_ignores_param_order_but_not_content():
+    messages = [{"role": "user", "content": "hi"}]
+    a = cache_key("m", messages, {"temperature": 0.7, "top_p": 1})
+    b = cache_key("m", messages, {"top_p": 1, "temperature": 0.7})
+    assert a == b
+    assert a != cache_key("m", messages, {"temperature": 0.2, "top_p": 1})
+    assert a != cache_key("other", messages, {"temperature": 0.7, "top_p": 1})
+
+
+def test_memory_tier_is_lru_with_ttl():
+    cache = ResponseCache(None, ttl=10, memory_entries=2)
+    cache.set("a", b"1")
+    cache.set("b", b"2")
+    cache.get("a")  # "b" is now least recently used
+    cache.set("c", b"3")
+    assert cache.get("b") == (None, None)
+    assert cache.get("a") == (b"1", "memory")
+
+    with mock.patch.object(llm_cache.time, "time", return_value=llm_cache.time.time() + 11):
+        assert cache.get("a") == (None, None)
+
+
+def test_disk_tier_is_shared_and_trimmed(tmp_path):
+    path = str(tmp_path / "cache.db")
+    writer = ResponseCache(path, ttl=60, memory_entries=0)
+    writer.set("k", b"payload")
+    # A second instance stands in for another worker process.
+    reader = ResponseCache(path, ttl=60)
+    assert reader.get("k") == (b"payload", "disk")
+    assert reader.get("k") == (b"payload", "memory")
+
+    small = ResponseCache(str(tmp_path / "small.db"), ttl=60, memory_entries=0, max_bytes=60)
+    for i in range(10):
+        small.set(f"k{i}", bytes([i]) * 1000)  # ~20 bytes once compressed
+    small.evict()
+    kept = [i for i in range(10) if small.get(f"k{i}")[0] is not None]
+    assert kept and kept[-1] == 9 and len(kept) < 10
+
+
+def _write_entries(path, worker):
+    cache = ResponseCache(path, ttl=60, memory_entries=0)
+    for i in range(50):
+        cache.set(f"{worker}-{i}", f"{worker}:{i}".encode())
+
+
+def test_disk_tier_handles_concurrent_processes(tmp_path):
+    path = str(tmp_path / "shared.db")
+    ResponseCache(path, ttl=60).evict()  # create the schema up front
+    # Spawned, not forked: SQLite connections must not cross a fork, and
+    # earlier tests leave some open in this process.
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=_write_entries, args=(path, w)) for w in range(3)]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join(30)
+        assert p.exitcode == 0
+    reader = ResponseCache(path, ttl=60)
+    assert all(reader.get(f"{w}-{i}")[0] == f"{w}:{i}".encode() for w in range(3) for i in range(50))
+
+
+def _completion(content):
+    return ChatCompletion.model_validate(
+        {
+            "id": "c1",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "m",
+            "choices": [
+                {
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": content},
+                }
+            ],
+            "usage": {"prompt_tokens": 3, "completion_tokens": 2, "total_tokens": 5},
+        }
+    )
+
+
+def test_create_chat_completion_serves_repeats_from_cache(tmp_path):
+    calls = []
+
+    async def create(**kwargs):
+        calls.append(kwargs)
+        return _completion("cached answer")
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    cache = ResponseCache(str(tmp_path / "llm.db"), ttl=60)
+    messages = [{"role": "user", "content": "same prompt"}]
+    hits = llm_cache_lookups.value("cache_test", "memory_hit")
+
+    async def run():
+        with mock.patch.object(llm_providers, "get_openai_client", return_value=client), \
+                mock.patch.object(llm, "get_response_cache", return_value=cache):
+            first = await llm.create_chat_completion(endpoint="cache_test", model="m", messages=messages)
+            second = await llm.create_chat_completion(endpoint="cache_test", model="m", messages=messages)
+            await llm.create_chat_completion(
+                endpoint="cache_test", model="m", messages=messages, cache=False
+            )
+            return first, second
+
+    first, second = asyncio.run(run())
+    assert len(calls) == 2
+    assert second.choices[0].message.content == first.choices[0].message.content
+    assert llm_cache_lookups.value("cache_test", "memory_hit") == hits + 1
+    assert llm_cache_lookups.value("cache_test", "bypass") >= 1
+
+
+def test_stream_chat_completion_replays_cached_reply(tmp_path):
+    calls = 0
+
+    async def create(**kwargs):
+        nonlocal calls
+        calls += 1
+
+        async def chunks():
+            for text in ("Hel", "lo"):
+                delta = SimpleNamespace(content=text)
+                yield SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=delta)])
+
+        return chunks()
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    cache = ResponseCache(None, ttl=60)
+    messages = [{"role": "user", "content": "stream me"}]
+
+    async def collect():
+        with mock.patch.object(llm_providers, "get_openai_client", return_value=client), \
+                mock.patch.object(llm, "get_response_cache", return_value=cache):
+            first = [d async for d in llm.stream_chat_completion(endpoint="t", model="m", messages=messages)]
+            second = [d async for d in llm.stream_chat_completion(endpoint="t", model="m", messages=messages)]
+            return first, second
+
+    first, second = asyncio.run(collect())
+    assert first == ["Hel", "lo"] and second == ["Hello"]
+    assert calls == 1
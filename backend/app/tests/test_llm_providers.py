@@ -0,0 +1,116 @@
+import asyncio
+import json
+import statistics
+
+import openai
+import pytest
+
+from app.core.config import get_settings
+from app.services import llm
+from app.services.ai_spec_service import AISpecService
+from app.services.llm_providers import MockProvider, get_llm_provider
+from app.services.mock_llm import MockLLM, MockLLMConfig
+from benchmarks.mock_openai import MockOpenAIServer
+
+MESSAGES = [{"role": "user", "content": "Suggest a requirement"}]
+
+
+def _instant(**overrides) -> MockLLM:
+    return MockLLM(MockLLMConfig(latency=0, tokens_per_second=0, seed=1, **overrides))
+
+
+@pytest.fixture
+def mock_provider_settings(monkeypatch):
+    settings = get_settings()
+    for name, value in {
+        "llm_provider": "mock",
+        "llm_mock_latency": 0.0,
+        "llm_mock_tokens_per_second": 0.0,
+        "openai_api_key": None,
+    }.items():
+        monkeypatch.setattr(settings, name, value)
+    get_llm_provider.cache_clear()
+    yield
+    get_llm_provider.cache_clear()
+
+
+def test_latency_distributions_keep_the_configured_mean():
+    assert MockLLM(MockLLMConfig(latency=0.2, latency_distribution="fixed")).sample_latency() == 0.2
+    for kind in ("uniform", "exponential", "lognormal"):
+        mock = MockLLM(MockLLMConfig(latency=0.2, latency_distribution=kind, seed=7))
+        samples = [mock.sample_latency() for _ in range(4000)]
+        assert statistics.mean(samples) == pytest.approx(0.2, rel=0.1), kind
+    with pytest.raises(ValueError):
+        MockLLMConfig(latency_distribution="normal")
+
+
+def test_mock_provider_completion_and_stream_agree():
+    # Same seed, so both calls generate the same reply.
+    completion = asyncio.run(
+        MockProvider(_instant(reply_tokens=12)).complete(model="gpt-3.5-turbo", messages=MESSAGES)
+    )
+    content = completion.choices[0].message.content
+    assert len(content.split()) == 12
+    assert completion.usage.completion_tokens > 0
+
+    async def collect():
+        return [
+            chunk
+            async for chunk in MockProvider(_instant(reply_tokens=12)).stream(
+                model="gpt-3.5-turbo", messages=MESSAGES, stream_options={"include_usage": True}
+            )
+        ]
+
+    chunks = asyncio.run(collect())
+    assert "".join(c.choices[0].delta.content or "" for c in chunks if c.choices) == content
+    assert chunks[-1].choices == [] and chunks[-1].usage.total_tokens > 0
+
+
+def test_mock_provider_raises_sdk_errors():
+    with pytest.raises(openai.RateLimitError):
+        asyncio.run(MockProvider(_instant(error_rate=1, error_status=429)).complete(
+            model="m", messages=MESSAGES
+        ))
+    with pytest.raises(openai.InternalServerError):
+        asyncio.run(MockProvider(_instant(error_rate=1, error_status=503)).complete(
+            model="m", messages=MESSAGES
+        ))
+
+
+def test_configured_mock_provider_serves_llm_calls_and_spec_generation(mock_provider_settings):
+    completion = asyncio.run(llm.create_chat_completion(
+        endpoint="chat", model="gpt-3.5-turbo", messages=MESSAGES, cache=False
+    ))
+    assert completion.choices[0].message.content
+
+    specs = asyncio.run(AISpecService().generate_specifications_parallel(
+        "Shop", "An online shop", ["Sell"], use_cache=False
+    ))
+    assert len(specs["epics"]) == 3
+    assert all(len(epic["features"]) == 2 for epic in specs["epics"])
+
+
+def test_mock_server_speaks_the_openai_protocol():
+    async def scenario():
+        mock = _instant(reply_tokens=8)
+        async with MockOpenAIServer(mock) as server:
+            client = openai.AsyncOpenAI(api_key="mock", base_url=server.base_url, max_retries=0)
+            completion = await client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=MESSAGES,
+                response_format={"type": "json_object"},
+            )
+            stream = await client.chat.completions.create(
+                model="gpt-3.5-turbo", messages=MESSAGES, stream=True
+            )
+            streamed = "".join([c.choices[0].delta.content or "" async for c in stream if c.choices])
+            mock.config.error_rate, mock.config.error_status = 1, 429
+            with pytest.raises(openai.RateLimitError):
+                await client.chat.completions.create(model="gpt-3.5-turbo", messages=MESSAGES)
+            await client.close()
+            return completion, streamed, server.requests
+
+    completion, streamed, requests = asyncio.run(scenario())
+    assert "epics" in json.loads(completion.choices[0].message.content)
+    assert len(streamed.split()) == 8
+    assert requests == 3
@@ -0,0 +1,182 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+from app.core.config import get_settings
+from app.core.metrics import llm_hedges, llm_retries
+from app.services import llm, llm_providers
+from app.services.llm_providers import OpenAIProvider, _status_error
+from app.services.llm_resilience import is_retryable, latencies, retry_after
+from app.services.mock_llm import MockLLM, MockLLMConfig
+from benchmarks.mock_openai import MockOpenAIServer
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "llm_retry_base_delay", 0.01)
+    monkeypatch.setattr(settings, "llm_retry_max_attempts", 3)
+    monkeypatch.setattr(settings, "llm_latency_budgets", {})
+    monkeypatch.setattr(settings, "llm_hedge_endpoints", [])
+    latencies.clear()
+    yield
+    latencies.clear()
+
+
+def _completion(text: str):
+    message = SimpleNamespace(content=text)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+class ScriptedProvider:
+    """Plays back one step per call: an exception to raise or (delay, reply)."""
+
+    def __init__(self, *steps):
+        self.steps = list(steps)
+        self.calls = 0
+        self.cancelled = 0
+
+    async def _step(self):
+        step = self.steps[min(self.calls, len(self.steps) - 1)]
+        self.calls += 1
+        if isinstance(step, Exception):
+            raise step
+        delay, reply = step
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return reply
+
+    async def complete(self, **kwargs):
+        return _completion(await self._step())
+
+    async def stream(self, **kwargs):
+        reply = await self._step()
+        for word in reply.split(" "):
+            delta = SimpleNamespace(content=word + " ")
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+
+
+def _complete(monkeypatch, provider, endpoint="resilience"):
+    monkeypatch.setattr(llm, "get_llm_provider", lambda: provider)
+    return asyncio.run(llm.create_chat_completion(
+        endpoint=endpoint, model="m", messages=MESSAGES, cache=False
+    ))
+
+
+def _rate_limited(retry_after_header: str) -> openai.RateLimitError:
+    response = httpx.Response(
+        429, headers={"retry-after": retry_after_header},
+        request=httpx.Request("POST", "http://llm/v1/chat/completions"),
+    )
+    return openai.RateLimitError("slow down", response=response, body=None)
+
+
+def test_classifies_errors_and_reads_retry_after():
+    assert is_retryable(_status_error(503)) and is_retryable(_status_error(429))
+    assert not is_retryable(_status_error(400)) and not is_retryable(ValueError())
+    assert retry_after(_rate_limited("2")) == 2.0
+    assert retry_after(_rate_limited("Thu, 01 Jan 1970 00:00:00 GMT")) == 0.0
+    assert retry_after(_status_error(500)) is None
+
+
+def test_transient_errors_are_retried_until_success(monkeypatch):
+    before = llm_retries.value("resilience", "InternalServerError")
+    provider = ScriptedProvider(_status_error(503), _status_error(502), (0, "ok"))
+    assert _complete(monkeypatch, provider).choices[0].message.content == "ok"
+    assert provider.calls == 3
+    assert llm_retries.value("resilience", "InternalServerError") == before + 2
+
+
+def test_permanent_errors_and_exhausted_attempts_are_raised(monkeypatch):
+    provider = ScriptedProvider(_status_error(400))
+    with pytest.raises(openai.BadRequestError):
+        _complete(monkeypatch, provider)
+    assert provider.calls == 1
+
+    provider = ScriptedProvider(_status_error(500))
+    with pytest.raises(openai.InternalServerError):
+        _complete(monkeypatch, provider)
+    assert provider.calls == 3
+
+
+def test_retry_waits_for_retry_after(monkeypatch):
+    provider = ScriptedProvider(_rate_limited("0.3"), (0, "ok"))
+    start = time.monotonic()
+    _complete(monkeypatch, provider)
+    assert time.monotonic() - start >= 0.3
+
+
+def test_latency_budget_caps_the_total_wait(monkeypatch):
+    monkeypatch.setattr(get_settings(), "llm_latency_budgets", {"resilience": 0.2})
+    provider = ScriptedProvider((5, "late"))
+    start = time.monotonic()
+    with pytest.raises(openai.APITimeoutError):
+        _complete(monkeypatch, provider)
+    assert time.monotonic() - start < 1
+    assert provider.cancelled == 1
+
+    # A retry the budget could not cover is not attempted.
+    provider = ScriptedProvider(_rate_limited("5"), (0, "ok"))
+    with pytest.raises(openai.RateLimitError):
+        _complete(monkeypatch, provider)
+    assert provider.calls == 1
+
+
+def test_slow_requests_are_hedged_after_the_p95_latency(monkeypatch):
+    monkeypatch.setattr(get_settings(), "llm_hedge_endpoints", ["hedged"])
+    for _ in range(20):
+        latencies.observe("hedged:m", 0.05)
+    before = llm_hedges.value("hedged", "won")
+    provider = ScriptedProvider((5, "slow"), (0, "fast"))
+    start = time.monotonic()
+    completion = _complete(monkeypatch, provider, endpoint="hedged")
+    assert completion.choices[0].message.content == "fast"
+    assert time.monotonic() - start < 1
+    assert provider.calls == 2 and provider.cancelled == 1
+    assert llm_hedges.value("hedged", "won") == before + 1
+
+
+def test_stream_is_retried_before_the_first_token(monkeypatch):
+    provider = ScriptedProvider(_status_error(503), (0, "hello there"))
+    monkeypatch.setattr(llm, "get_llm_provider", lambda: provider)
+
+    async def collect():
+        return "".join([
+            delta async for delta in llm.stream_chat_completion(
+                endpoint="resilience", model="m", messages=MESSAGES, cache=False
+            )
+        ])
+
+    assert asyncio.run(collect()) == "hello there "
+    assert provider.calls == 2
+
+
+def test_retries_against_the_local_mock_server(monkeypatch):
+    monkeypatch.setattr(get_settings(), "llm_retry_max_attempts", 2)
+    monkeypatch.setattr(llm, "get_llm_provider", lambda: OpenAIProvider())
+
+    async def scenario():
+        mock = MockLLM(MockLLMConfig(latency=0, tokens_per_second=0, error_rate=1, error_status=429))
+        async with MockOpenAIServer(mock) as server:
+            client = openai.AsyncOpenAI(api_key="mock", base_url=server.base_url, max_retries=0)
+            monkeypatch.setattr(llm_providers, "get_openai_client", lambda: client)
+            start = time.monotonic()
+            with pytest.raises(openai.RateLimitError):
+                await llm.create_chat_completion(
+                    endpoint="resilience", model="m", messages=MESSAGES, cache=False
+                )
+            await client.close()
+            return server.requests, time.monotonic() - start
+
+    requests, elapsed = asyncio.run(scenario())
+    assert requests == 2  # retried once, after the server's Retry-After: 1
+    assert elapsed >= 1
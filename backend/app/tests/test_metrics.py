@@ -0,0 +1,60 @@
+import asyncio
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.metrics import Histogram, llm_errors, llm_tokens
+from app.main import app
+from app.services import llm, llm_providers
+
+
+def test_histogram_reuses_preallocated_series():
+    hist = Histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0))
+    hist.observe(0.05, "/a")
+    series = hist._series[("/a",)]
+    hist.observe(0.5, "/a")
+    hist.observe(5.0, "/a")
+    assert hist._series[("/a",)] is series
+    assert hist.count("/a") == 3
+    text = "\n".join(hist.render())
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{route="/a",le="1"} 2' in text
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in text
+    assert 'latency_seconds_count{route="/a"} 3' in text
+
+
+def test_metrics_endpoint_reports_routes_pool_and_threadpool():
+    client = TestClient(app)
+    client.get("/projects/")  # 401, but still a matched route
+    body = client.get("/metrics").text
+    assert 'http_requests_total{method="GET",route="/projects/",status="401"}' in body
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/projects/",le="+Inf"}' in body
+    assert "http_requests_in_flight" in body
+    assert 'threadpool_workers{state="limit"}' in body
+    assert "# TYPE db_pool_connections gauge" in body
+
+
+def _fake_client(create):
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+
+def test_create_chat_completion_records_tokens_and_errors():
+    usage = SimpleNamespace(prompt_tokens=11, completion_tokens=7)
+
+    async def ok(**kwargs):
+        return SimpleNamespace(usage=usage, choices=[])
+
+    async def boom(**kwargs):
+        raise TimeoutError("slow")
+
+    before = llm_tokens.value("test", "m", "prompt")
+    with mock.patch.object(llm_providers, "get_openai_client", return_value=_fake_client(ok)):
+        asyncio.run(llm.create_chat_completion(endpoint="test", model="m", messages=[], cache=False))
+    assert llm_tokens.value("test", "m", "prompt") == before + 11
+
+    with mock.patch.object(llm_providers, "get_openai_client", return_value=_fake_client(boom)):
+        with pytest.raises(TimeoutError):
+            asyncio.run(llm.create_chat_completion(endpoint="test", model="m", messages=[], cache=False))
+    assert llm_errors.value("test", "m", "TimeoutError") >= 1
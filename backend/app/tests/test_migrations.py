@@ -0,0 +1,64 @@
+from sqlalchemy import create_engine, event, inspect, text
+
+from app.db.migrations import LATEST_VERSION, current_version, migrate
+
+
+def _engine(tmp_path):
+    return create_engine(f"sqlite:///{tmp_path / 'migrate.db'}")
+
+
+def test_migrate_fresh_database(tmp_path):
+    engine = _engine(tmp_path)
+    applied = migrate(engine)
+    assert applied == list(range(1, LATEST_VERSION + 1))
+    with engine.connect() as conn:
+        assert current_version(conn) == LATEST_VERSION
+    indexes = {i["name"] for i in inspect(engine).get_indexes("epic")}
+    assert "ix_epic_parent_req_id" in indexes
+    activity_indexes = {
+        i["name"]: i["column_names"] for i in inspect(engine).get_indexes("activity")
+    }
+    assert activity_indexes["ix_activity_project_id_timestamp"] == ["project_id", "timestamp", "id"]
+    assert "token_budget" in {c["name"] for c in inspect(engine).get_columns("project")}
+    assert "ix_hierarchychange_project_id_id" in {
+        i["name"] for i in inspect(engine).get_indexes("hierarchychange")
+    }
+    assert "ix_similaritybucket_project_id_kind_bucket" in {
+        i["name"] for i in inspect(engine).get_indexes("similaritybucket")
+    }
+
+
+def test_current_schema_issues_a_single_query(tmp_path):
+    engine = _engine(tmp_path)
+    migrate(engine)
+
+    statements = []
+    event.listen(
+        engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement),
+    )
+    assert migrate(engine) == []
+    assert len(statements) == 1
+    assert statements[0].lstrip().upper().startswith("SELECT")
+
+
+def test_upgrades_legacy_create_all_database(tmp_path):
+    engine = _engine(tmp_path)
+    # A database created by the old create_all startup: tables, no version
+    # row and no foreign key indexes.
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "CREATE TABLE epic (id INTEGER PRIMARY KEY, title VARCHAR NOT NULL,"
+                " description VARCHAR, project_id INTEGER NOT NULL,"
+                " parent_req_id INTEGER NOT NULL, is_active BOOLEAN NOT NULL)"
+            )
+        )
+        conn.execute(text("INSERT INTO epic VALUES (1, 'Kept', NULL, 1, 1, 1)"))
+
+    assert migrate(engine) == list(range(1, LATEST_VERSION + 1))
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT title FROM epic")).scalar() == "Kept"
+    indexes = {i["name"] for i in inspect(engine).get_indexes("epic")}
+    assert "ix_epic_parent_req_id" in indexes
@@ -0,0 +1,51 @@
+from unittest import mock
+
+from app.services import prompt_cache
+from app.services.minhash import MinHasher, MinHashLSH, estimate_jaccard, jaccard, normalize
+from app.services.prompt_cache import SimilarPromptCache
+
+
+def test_normalize_folds_synonyms_plurals_and_stop_words():
+    assert normalize("Create a login requirement") == {"create", "login", "requirement"}
+    assert normalize("Add requirements for user log in") == {
+        "create", "requirement", "user", "login"
+    }
+    assert normalize("the of and") == set()
+
+
+def test_minhash_estimate_tracks_exact_jaccard():
+    hasher = MinHasher(num_perm=128)
+    a = {f"t{i}" for i in range(40)}
+    b = {f"t{i}" for i in range(10, 50)}
+    estimate = estimate_jaccard(hasher.signature(a), hasher.signature(b))
+    assert abs(estimate - jaccard(a, b)) < 0.15
+
+
+def test_lsh_query_verifies_candidates_and_supports_removal():
+    index = MinHashLSH()
+    index.add("login", normalize("create a login requirement"))
+    index.add("export", normalize("export the backlog to csv"))
+    matches = index.query(normalize("add requirement for user login"), 0.7)
+    assert [key for key, _ in matches] == ["login"]
+    assert index.query(normalize("delete the login requirement"), 0.7) == []
+    index.remove("login")
+    assert "login" not in index and len(index) == 1
+    assert index.query(normalize("create a login requirement"), 0.7) == []
+
+
+def test_similar_prompt_cache_is_scoped_per_project_and_bounded():
+    cache = SimilarPromptCache(threshold=0.7, max_entries=2, ttl=60)
+    cache.store(1, "create a login requirement", "login reply")
+    assert cache.lookup(1, "add requirement for user login") == "login reply"
+    assert cache.lookup(2, "add requirement for user login") is None
+
+    cache.store(1, "export the backlog to csv", "export reply")
+    assert cache.lookup(1, "create login requirement") == "login reply"
+    cache.store(1, "list every epic of the project", "epic reply")
+    # Login was read most recently, so the export entry made way.
+    assert cache.lookup(1, "export backlog to csv") is None
+    assert cache.lookup(1, "create login requirement") == "login reply"
+
+    later = prompt_cache.time.time() + 61
+    with mock.patch.object(prompt_cache.time, "time", return_value=later):
+        assert cache.lookup(1, "create login requirement") is None
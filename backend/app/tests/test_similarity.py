@@ -0,0 +1,157 @@
+import pytest
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.db.instrumentation import assert_max_queries
+from app.db.similarity_index import reindex
+from app.models import Item, ItemType, Project, SimilarityBucket, User
+from app.models.requirements import Epic, Feature, Requirement, UserStory
+from app.schemas.requirements import AISpecEpic
+from app.services.similarity import find_duplicates, find_similar
+from app.services.spec_import import insert_epics
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'similarity.db'}")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as db:
+        db.add(User(id=1, username="u", email="u@example.com", hashed_password="x"))
+        db.add(Project(id=1, name="P", owner_id=1))
+        db.add(Project(id=2, name="Q", owner_id=1))
+        db.commit()
+    yield engine
+    engine.dispose()
+
+
+def _epic(db, project_id=1):
+    req = Requirement(title="Reports", project_id=project_id)
+    db.add(req)
+    db.flush()
+    epic = Epic(title="Exports", project_id=project_id, parent_req_id=req.id)
+    db.add(epic)
+    db.commit()
+    return epic
+
+
+def _buckets(db):
+    return sorted(
+        (b.kind, b.node_id, b.bucket) for b in db.exec(select(SimilarityBucket))
+    )
+
+
+def test_index_follows_writes(engine):
+    with Session(engine) as db:
+        epic = _epic(db)
+        feature = Feature(title="Export report to PDF", project_id=1, parent_epic_id=epic.id)
+        db.add(feature)
+        db.add(Feature(title="Export report to PDF", project_id=2, parent_epic_id=epic.id))
+        db.commit()
+
+        [match] = find_similar(db, 1, "export the reports as PDF")
+        assert (match.kind, match.id, match.score) == ("feature", feature.id, 1.0)
+        assert find_similar(db, 1, "import users from CSV") == []
+
+        feature.title = "Import users from CSV"
+        db.commit()
+        assert find_similar(db, 1, "export the reports as PDF") == []
+        similar = find_similar(db, 1, "import users from a CSV file", threshold=0.5)
+        assert [m.id for m in similar] == [feature.id]
+
+        feature.is_active = False
+        db.commit()
+        assert find_similar(db, 1, "import users from CSV") == []
+        feature.is_active = True
+        db.commit()
+        db.delete(feature)
+        db.commit()
+        assert find_similar(db, 1, "import users from CSV") == []
+        assert {b.project_id for b in db.exec(select(SimilarityBucket))} == {2}
+
+
+def test_reindex_rebuilds_what_writes_maintain(engine):
+    with Session(engine) as db:
+        epic = _epic(db)
+        insert_epics(db, 1, epic.parent_req_id, [
+            AISpecEpic(title="Billing", features=[
+                {"title": "Invoices", "user_stories": ["Download invoices", "Email invoices"]},
+            ]),
+        ])
+        db.add(Item(project_id=1, type=ItemType.FEATURE, title="Search"))
+        db.add(Item(project_id=1, type=ItemType.EPIC, title="Not indexed"))
+        db.commit()
+        maintained = _buckets(db)
+        assert {kind for kind, _, _ in maintained} == {"feature", "user_story", "item_feature"}
+
+        assert reindex(db.connection()) == 4
+        assert _buckets(db) == maintained
+
+
+def test_find_duplicates_checks_the_project_and_the_batch(engine):
+    with Session(engine) as db:
+        epic = _epic(db)
+        existing = Feature(
+            title="Export report", description="Download the report as PDF",
+            project_id=1, parent_epic_id=epic.id,
+        )
+        db.add(existing)
+        db.commit()
+
+        duplicates = find_duplicates(db, 1, "feature", [
+            ("Report export", "Download the PDF report"),
+            ("Team calendar", "Shared calendar for the team"),
+            ("Calendar for teams", "The team's shared calendar"),
+            ("Audit log", None),
+        ])
+        assert duplicates[0].node_id == existing.id
+        assert duplicates[1] is None
+        assert duplicates[2].batch_index == 1 and duplicates[2].node_id is None
+        assert duplicates[3] is None
+
+
+def test_import_dedup_skips_reworded_copies(engine):
+    with Session(engine) as db:
+        epic = _epic(db)
+        first = insert_epics(db, 1, epic.parent_req_id, [
+            AISpecEpic(title="Billing", features=[
+                {"title": "Invoices", "description": "Customer invoices",
+                 "user_stories": ["Download an invoice as PDF"]},
+            ]),
+        ])
+        db.commit()
+        [invoices] = db.exec(select(Feature).where(Feature.title == "Invoices")).all()
+
+        rerun = insert_epics(db, 1, epic.parent_req_id, [
+            AISpecEpic(title="Billing again", features=[
+                {"title": "Invoice", "description": "Invoices for customers",
+                 "user_stories": ["Download invoices as PDF", "Email an invoice"]},
+                {"title": "Refunds", "user_stories": ["Request a refund"]},
+            ]),
+        ], dedup=True)
+        db.commit()
+
+        assert first["counts"]["features"] == 1
+        assert rerun["counts"] == {"epics": 1, "features": 1, "user_stories": 2}
+        assert rerun["skipped_duplicates"] == {"features": 1, "user_stories": 1}
+        emailed = db.exec(select(UserStory).where(UserStory.title == "Email an invoice")).one()
+        assert emailed.parent_feature_id == invoices.id
+
+
+def test_batch_lookup_cost_does_not_grow_with_the_project(engine):
+    with Session(engine) as db:
+        epic = _epic(db)
+        insert_epics(db, 1, epic.parent_req_id, [
+            AISpecEpic(title=f"Epic {e}", features=[
+                {"title": f"Area {e} {f}", "user_stories": [
+                    f"Story {e} {f} {s} about topic{e * 100 + f * 10 + s}" for s in range(10)
+                ]}
+                for f in range(10)
+            ])
+            for e in range(10)
+        ])
+        db.commit()
+        texts = [(f"Story 3 4 {s} about topic{340 + s}", None) for s in range(10)]
+        texts += [(f"Brand new idea {i}", "unrelated") for i in range(200)]
+        # One chunk of band keys per 500, one load of the candidates.
+        with assert_max_queries(10):
+            duplicates = find_duplicates(db, 1, "user_story", texts)
+        assert all(d is not None and d.node_id for d in duplicates[:10])
@@ -0,0 +1,137 @@
+import asyncio
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+
+from app.core.metrics import llm_coalesced
+from app.services import llm, llm_providers
+from app.services.singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def run():
+        group = SingleFlight()
+        results = await asyncio.gather(*(group.do("k", work) for _ in range(5)))
+        assert not group.in_flight("k")
+        # Once the call finished, the next caller starts a new one.
+        await group.do("k", work)
+        return results
+
+    results = asyncio.run(run())
+    assert calls == 2
+    assert [r for r, _ in results] == ["result"] * 5
+    assert sum(shared for _, shared in results) == 4
+
+
+def test_exceptions_reach_every_caller():
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream down")
+
+    async def run():
+        group = SingleFlight()
+        return await asyncio.gather(*(group.do("k", fail) for _ in range(3)), return_exceptions=True)
+
+    assert all(isinstance(r, ValueError) for r in asyncio.run(run()))
+
+
+def test_cancelling_callers_is_refcounted():
+    started = 0
+
+    async def run():
+        group = SingleFlight()
+
+        async def work():
+            nonlocal started
+            started += 1
+            await asyncio.sleep(0.05)
+            return "ok"
+
+        first = asyncio.create_task(group.do("k", work))
+        second = asyncio.create_task(group.do("k", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        # The remaining caller still gets the result.
+        assert (await second) == ("ok", True)
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+        underlying = []
+
+        async def slow():
+            underlying.append(asyncio.current_task())
+            await asyncio.sleep(10)
+
+        only = asyncio.create_task(group.do("other", slow))
+        await asyncio.sleep(0)
+        only.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await only
+        await asyncio.sleep(0)
+        # The last caller leaving cancels the upstream call.
+        assert underlying[0].cancelled()
+        assert not group.in_flight("other")
+
+    asyncio.run(run())
+    assert started == 1
+
+
+def test_caller_after_the_last_cancel_starts_a_new_call():
+    async def run():
+        group = SingleFlight()
+        started = 0
+
+        async def work():
+            nonlocal started
+            started += 1
+            await asyncio.sleep(0.01)
+            return started
+
+        only = asyncio.create_task(group.do("k", work))
+        await asyncio.sleep(0)
+        only.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await only
+        # The cancelled call's done callback has not run yet.
+        assert (await group.do("k", work)) == (2, False)
+
+    asyncio.run(run())
+
+
+def test_create_chat_completion_coalesces_identical_calls():
+    calls = 0
+
+    async def create(**kwargs):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return SimpleNamespace(usage=None, choices=[])
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    before = llm_coalesced.value("coalesce_test")
+    messages = [{"role": "user", "content": "generate specs"}]
+
+    async def run():
+        with mock.patch.object(llm_providers, "get_openai_client", return_value=client):
+            return await asyncio.gather(
+                *(
+                    llm.create_chat_completion(
+                        endpoint="coalesce_test", model="m", messages=messages, cache=False
+                    )
+                    for _ in range(3)
+                )
+            )
+
+    results = asyncio.run(run())
+    assert calls == 1
+    assert results[0] is results[1] is results[2]
+    assert llm_coalesced.value("coalesce_test") == before + 2
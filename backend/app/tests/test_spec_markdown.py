@@ -0,0 +1,137 @@
+import pytest
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.db.instrumentation import assert_max_queries
+from app.models import Project, User
+from app.models.requirements import Epic, Feature, Requirement, UseCase, UserStory
+from app.schemas.requirements import AISpecEpic
+from app.services import spec_markdown
+from app.services.spec_import import insert_epics
+from app.services.spec_markdown import get_markdown_cache, render_markdown
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'markdown.db'}")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as db:
+        db.add(User(id=1, username="u", email="u@example.com", hashed_password="x"))
+        db.add(Project(id=1, name="Shop", description="Online store.", owner_id=1))
+        db.commit()
+    get_markdown_cache().clear()
+    yield engine
+    get_markdown_cache().clear()
+    engine.dispose()
+
+
+@pytest.fixture
+def rendered_blocks(monkeypatch):
+    blocks = []
+    block = spec_markdown._block
+
+    def record(node):
+        blocks.append((node.kind, node.title))
+        return block(node)
+
+    monkeypatch.setattr(spec_markdown, "_block", record)
+    return blocks
+
+
+def _render(db):
+    return "".join(render_markdown(db, db.get(Project, 1)))
+
+
+def test_renders_the_active_hierarchy_in_order(engine):
+    with Session(engine) as db:
+        req = Requirement(title="Checkout", description="Pay for the cart.", project_id=1)
+        db.add(req)
+        db.flush()
+        epic = Epic(title="Payments", project_id=1, parent_req_id=req.id)
+        db.add_all([epic, Epic(title="Gone", project_id=1, parent_req_id=req.id, is_active=False)])
+        db.flush()
+        feature = Feature(title="Card\n  payments", project_id=1, parent_epic_id=epic.id)
+        db.add(feature)
+        db.flush()
+        story = UserStory(
+            title="Pay", project_id=1, parent_feature_id=feature.id, acceptance_criteria="Charged once"
+        )
+        db.add(story)
+        db.flush()
+        db.add(UseCase(title="Enter card", project_id=1, parent_story_id=story.id, steps="1. Type"))
+        db.commit()
+
+        assert _render(db) == (
+            "# Shop\n\nOnline store.\n\n"
+            "## Requirement: Checkout\n\nPay for the cart.\n\n"
+            "### Epic: Payments\n\n"
+            "#### Feature: Card payments\n\n"
+            "##### User story: Pay\n\n**Acceptance criteria**\n\nCharged once\n\n"
+            "###### Use case: Enter card\n\n**Steps**\n\n1. Type\n\n"
+        )
+
+
+def test_unchanged_project_is_served_from_one_query(engine):
+    with Session(engine) as db:
+        db.add(Requirement(title="Checkout", project_id=1))
+        db.commit()
+        first = _render(db)
+        project = db.get(Project, 1)
+        with assert_max_queries(1):
+            assert "".join(render_markdown(db, project)) == first
+
+
+def test_rename_updates_the_cached_document(engine):
+    with Session(engine) as db:
+        db.add(Requirement(title="Checkout", project_id=1))
+        db.commit()
+        _render(db)
+        project = db.get(Project, 1)
+        project.name, project.description = "Store", None
+        db.commit()
+        assert _render(db) == "# Store\n\n## Requirement: Checkout\n\n"
+
+
+def test_edit_rerenders_only_the_affected_subtree(engine, rendered_blocks):
+    epics = [
+        AISpecEpic(
+            title=f"Epic {e}",
+            features=[
+                {"title": f"Feature {e}.{f}", "user_stories": [f"Story {e}.{f}.{s}" for s in range(3)]}
+                for f in range(3)
+            ],
+        )
+        for e in range(3)
+    ]
+    with Session(engine) as db:
+        req = Requirement(title="Big", project_id=1)
+        db.add(req)
+        db.commit()
+        insert_epics(db, 1, req.id, epics)
+        db.commit()
+        _render(db)
+        assert len(rendered_blocks) == 1 + 3 + 9 + 27
+
+        story = db.exec(select(UserStory).where(UserStory.title == "Story 1.2.0")).one()
+        story.title = "Story 1.2.0 (edited)"
+        db.commit()
+        rendered_blocks.clear()
+        edited = _render(db)
+        assert rendered_blocks == [
+            ("requirement", "Big"),
+            ("epic", "Epic 1"),
+            ("feature", "Feature 1.2"),
+            ("user_story", "Story 1.2.0 (edited)"),
+            ("user_story", "Story 1.2.1"),
+            ("user_story", "Story 1.2.2"),
+        ]
+        get_markdown_cache().clear()
+        assert _render(db) == edited
+
+
+def test_uncommitted_writes_are_not_cached(engine):
+    with Session(engine) as db:
+        db.add(Requirement(title="Checkout", project_id=1))
+        db.flush()
+        assert "Checkout" in _render(db)
+        db.rollback()
+        assert "Checkout" not in _render(db)
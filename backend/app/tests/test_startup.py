@@ -0,0 +1,51 @@
+"""Cold-start regression checks for ``import app.main``.
+
+Worker spin-up time gates autoscaling, so heavy client libraries must stay
+out of the import path and the whole import must fit the budget below
+(override with ``COLD_START_BUDGET_MS`` on slow machines).
+"""
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+COLD_START_BUDGET_MS = float(os.environ.get("COLD_START_BUDGET_MS", 1500))
+LAZY_MODULES = ["openai", "httpx", "passlib", "jose", "bcrypt"]
+
+
+def _run(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *args],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def import_time_ms(module: str = "app.main") -> float:
+    """Cumulative import time of ``module`` as reported by ``-X importtime``."""
+    result = _run("-X", "importtime", "-c", f"import {module}")
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and line.rsplit("|", 1)[-1].strip() == module:
+            return int(line.split("|")[1]) / 1000
+    raise AssertionError(f"{module} not found in importtime output")
+
+
+def test_import_does_not_load_heavy_clients():
+    code = (
+        "import json, sys, app.main; "
+        f"print(json.dumps([m for m in {LAZY_MODULES!r} if m in sys.modules]))"
+    )
+    loaded = json.loads(_run("-c", code).stdout.strip().splitlines()[-1])
+    assert loaded == []
+
+
+def test_cold_import_within_budget():
+    # Best of three to keep scheduler noise out of the measurement.
+    elapsed = min(import_time_ms() for _ in range(3))
+    assert elapsed < COLD_START_BUDGET_MS, (
+        f"import app.main took {elapsed:.0f} ms (budget {COLD_START_BUDGET_MS:.0f} ms)"
+    )
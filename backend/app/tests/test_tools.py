@@ -129,3 +129,34 @@ def test_bulk_create_features(project):
     assert res["ok"] and len(res["result"]) == 2
     titles = {f["title"] for f in res["result"]}
     assert titles == {"New1", "New2"}
+
+
+def test_bulk_create_features_dedup_skips_reworded_features(project):
+    with Session(engine) as session:
+        epic = Item(project_id=project.id, type=ItemType.EPIC, title="Epic1")
+        session.add(epic)
+        session.commit()
+        epic_id = epic.id
+        session.add(
+            Item(
+                project_id=project.id,
+                type=ItemType.FEATURE,
+                title="Export reports to PDF",
+                parent_id=epic_id,
+            )
+        )
+        session.commit()
+
+    payload = {
+        "project_id": project.id,
+        "parent_id": epic_id,
+        "items": [
+            {"title": "PDF export of reports"},
+            {"title": "Team calendar"},
+            {"title": "Calendar for the team"},
+        ],
+        "dedup": True,
+    }
+    res = handle_bulk_create_features(payload)
+    assert res["ok"] and [f["title"] for f in res["result"]] == ["Team calendar"]
+    assert res["skipped_duplicates"] == ["PDF export of reports", "Calendar for the team"]
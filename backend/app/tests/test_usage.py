@@ -0,0 +1,119 @@
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.db.write_behind import WriteBehindBuffer
+from app.models.project import Project
+from app.models.usage import LLMUsage, UsageRollup
+from app.services import usage
+from app.services.usage import (
+    apply_rollups,
+    check_token_budget,
+    record_llm_call,
+    usage_scope,
+    usage_series,
+)
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'usage.db'}")
+    SQLModel.metadata.create_all(engine)
+    recorder = WriteBehindBuffer(LLMUsage, lambda: Session(engine), on_flush=apply_rollups)
+    monkeypatch.setattr(usage, "_recorder", recorder)
+    monkeypatch.setattr(usage._budgets, "session_factory", lambda: Session(engine))
+    usage._budgets.clear()
+    yield engine
+    usage._budgets.clear()
+    engine.dispose()
+
+
+def _tokens(prompt, completion):
+    return SimpleNamespace(prompt_tokens=prompt, completion_tokens=completion)
+
+
+def test_records_roll_up_incrementally_per_key(engine):
+    with usage_scope(7, 3):
+        record_llm_call(endpoint="chat", model="m", usage=_tokens(10, 5), latency=0.5)
+        record_llm_call(endpoint="chat", model="m", latency=0.01, cache_hit=True)
+    record_llm_call(endpoint="chat", model="m", latency=2.0, error=TimeoutError(), project_id=7, user_id=3)
+    record_llm_call(endpoint="chat_summary", model="m", usage=_tokens(100, 20), latency=1.0, project_id=7)
+    usage.flush_usage()
+    record_llm_call(endpoint="chat", model="m", usage=_tokens(1, 1), latency=3.0, project_id=7, user_id=3)
+    usage.flush_usage()
+
+    with Session(engine) as db:
+        assert len(db.exec(select(LLMUsage)).all()) == 5
+        rollups = {r.endpoint: r for r in db.exec(select(UsageRollup)).all()}
+        chat = rollups["chat"]
+        assert (chat.project_id, chat.user_id) == (7, 3)
+        assert (chat.calls, chat.cache_hits, chat.errors) == (4, 1, 1)
+        assert (chat.prompt_tokens, chat.completion_tokens) == (11, 6)
+        assert chat.latency_max == 3.0 and chat.latency_total == pytest.approx(5.51)
+        assert (rollups["chat_summary"].user_id, rollups["chat_summary"].prompt_tokens) == (0, 100)
+
+
+def test_rollups_without_an_upsert_update_then_insert(engine, monkeypatch):
+    monkeypatch.setattr(usage, "_upsert_insert", lambda dialect: None)
+    now = datetime.utcnow()
+    row = dict(
+        project_id=1, user_id=1, endpoint="chat", model="m", prompt_tokens=10,
+        completion_tokens=2, latency=1.0, cache_hit=False, error=None, created_at=now,
+    )
+    with Session(engine) as db:
+        apply_rollups(db, [row])
+        apply_rollups(db, [row, {**row, "latency": 4.0, "model": "n"}, {**row, "latency": 3.0}])
+        db.commit()
+        rollups = {r.model: r for r in db.exec(select(UsageRollup)).all()}
+    assert (rollups["m"].calls, rollups["m"].prompt_tokens, rollups["m"].latency_max) == (3, 30, 3.0)
+    assert (rollups["n"].calls, rollups["n"].latency_max) == (1, 4.0)
+
+
+def test_usage_series_buckets_and_groups(engine):
+    now = datetime.utcnow().replace(minute=30)
+    rows = []
+    for hours_ago, model, tokens in [(0, "a", 10), (1, "b", 20), (30, "a", 40)]:
+        rows.append(dict(
+            project_id=1, user_id=1, endpoint="chat", model=model, prompt_tokens=tokens,
+            completion_tokens=0, latency=1.0, cache_hit=False, error=None,
+            created_at=now - timedelta(hours=hours_ago),
+        ))
+    with Session(engine) as db:
+        apply_rollups(db, rows)
+        db.commit()
+        start, end = now - timedelta(days=3), now + timedelta(hours=1)
+        hourly = usage_series(db, start=start, end=end, bucket="hour", project_id=1)
+        assert [p["total_tokens"] for p in hourly] == [40, 20, 10]
+        daily = usage_series(db, start=start, end=end, bucket="day", project_id=1, group_by="model")
+        assert sum(p["total_tokens"] for p in daily) == 70
+        assert sum(p["total_tokens"] for p in daily if p["group"] == "b") == 20
+        assert all(p["bucket_start"].hour == 0 for p in daily)
+        assert usage_series(db, start=start, end=end, project_id=2) == []
+
+
+def test_token_budget_rejects_calls_once_spent(engine):
+    with Session(engine) as db:
+        db.add(Project(id=5, name="Budgeted", owner_id=1, token_budget=100))
+        db.add(Project(id=6, name="Unlimited", owner_id=1))
+        db.commit()
+
+    asyncio.run(check_token_budget(5))
+    record_llm_call(endpoint="chat", model="m", usage=_tokens(60, 40), latency=0.1, project_id=5)
+    record_llm_call(endpoint="chat", model="m", usage=_tokens(600, 400), latency=0.1, project_id=6)
+    # Counted locally until the cache re-reads the rollups.
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(check_token_budget(5))
+    assert exc_info.value.status_code == 429
+    assert int(exc_info.value.headers["Retry-After"]) > 0
+    asyncio.run(check_token_budget(6))
+
+    usage._budgets.clear()  # re-read: the spending is now in the rollups
+    with pytest.raises(HTTPException):
+        asyncio.run(check_token_budget(5))
+    with usage_scope(5):
+        with pytest.raises(HTTPException):
+            asyncio.run(check_token_budget())
@@ -0,0 +1,136 @@
+import pytest
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.db.instrumentation import assert_max_queries
+from app.models import HierarchyChange, Project, User, ValidationIssue
+from app.models.requirements import Epic, Feature, Requirement, UseCase, UserStory
+from app.schemas.requirements import AISpecEpic
+from app.services.spec_import import insert_epics
+from app.services.validation import validate_hierarchy
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'validation.db'}")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as db:
+        db.add(User(id=1, username="u", email="u@example.com", hashed_password="x"))
+        db.add(Project(id=1, name="P", owner_id=1))
+        db.add(Project(id=2, name="Q", owner_id=1))
+        db.commit()
+    yield engine
+    engine.dispose()
+
+
+def _issues(db, project_id=1):
+    return {
+        (i.kind, i.node_id, i.rule)
+        for i in db.exec(select(ValidationIssue).where(ValidationIssue.project_id == project_id))
+    }
+
+
+def _tree(db):
+    req = Requirement(title="Checkout", project_id=1)
+    db.add(req)
+    db.flush()
+    full_epic = Epic(title="Payments", project_id=1, parent_req_id=req.id)
+    empty_epic = Epic(title="Refunds", project_id=1, parent_req_id=req.id)
+    db.add_all([full_epic, empty_epic])
+    db.flush()
+    feature = Feature(title="Card", project_id=1, parent_epic_id=full_epic.id)
+    db.add(feature)
+    db.flush()
+    good = UserStory(title="Pay", project_id=1, parent_feature_id=feature.id, acceptance_criteria="ok")
+    bare = UserStory(title="pay ", project_id=1, parent_feature_id=feature.id)
+    db.add_all([good, bare])
+    db.flush()
+    use_case = UseCase(title="Enter card", project_id=1, parent_story_id=good.id)
+    db.add(use_case)
+    db.commit()
+    return req, full_epic, empty_epic, feature, good, bare, use_case
+
+
+def test_full_validation_applies_every_rule(engine):
+    with Session(engine) as db:
+        req, full_epic, empty_epic, feature, good, bare, use_case = _tree(db)
+        db.add(Epic(title="Stray", project_id=1, parent_req_id=999))
+        db.commit()
+
+        report = validate_hierarchy(db, 1)
+        assert report.full and not report.complete and report.checked == 8
+        assert report.counts == {
+            "empty_epic": 2,
+            "missing_acceptance_criteria": 1,
+            "missing_steps": 1,
+            "duplicate_title": 2,
+            "orphan": 1,
+        }
+        assert ("user_story", bare.id, "duplicate_title") in _issues(db)
+        assert ("epic", empty_epic.id, "empty_epic") in _issues(db)
+        assert report.issue_count == len(report.errors) == 7
+
+
+def test_incremental_validation_matches_a_full_rescan(engine):
+    with Session(engine) as db:
+        req, full_epic, empty_epic, feature, good, bare, use_case = _tree(db)
+        validate_hierarchy(db, 1)
+
+        bare.title, bare.acceptance_criteria = "Refund", "done"
+        use_case.steps = "1. type the number"
+        db.add(Feature(title="Voucher", project_id=1, parent_epic_id=empty_epic.id))
+        db.delete(db.get(Requirement, req.id))  # leaves both epics orphaned
+        db.commit()
+        insert_epics(db, 1, 424242, [AISpecEpic(title="Imported", features=[])])
+        db.commit()
+
+        report = validate_hierarchy(db, 1)
+        assert not report.full and 0 < report.checked < 10
+        incremental = _issues(db)
+        assert ("epic", full_epic.id, "orphan") in incremental
+        assert ("epic", empty_epic.id, "empty_epic") not in incremental
+        assert validate_hierarchy(db, 1).checked == 0  # nothing changed since
+        assert db.exec(select(HierarchyChange)).all() == []
+
+        validate_hierarchy(db, 1, full=True)
+        assert _issues(db) == incremental
+
+
+def test_changes_are_tracked_only_for_validated_projects(engine):
+    with Session(engine) as db:
+        _tree(db)
+        assert db.exec(select(HierarchyChange)).all() == []
+        validate_hierarchy(db, 1)
+        db.add(Requirement(title="Other project", project_id=2))
+        db.add(Requirement(title="Same project", project_id=1))
+        db.commit()
+        assert [c.project_id for c in db.exec(select(HierarchyChange))] == [1]
+
+
+def test_small_edit_in_a_large_project_rechecks_a_few_nodes(engine):
+    epics = [
+        AISpecEpic(
+            title=f"Epic {e}",
+            features=[
+                {"title": f"Feature {e}.{f}", "user_stories": [f"Story {e}.{f}.{s}" for s in range(10)]}
+                for f in range(10)
+            ],
+        )
+        for e in range(40)
+    ]
+    with Session(engine) as db:
+        req = Requirement(title="Big", project_id=1)
+        db.add(req)
+        db.commit()
+        insert_epics(db, 1, req.id, epics)
+        db.commit()
+        full = validate_hierarchy(db, 1, limit=0)
+        assert full.checked == 1 + 40 + 400 + 4000
+        assert full.counts == {"missing_acceptance_criteria": 4000} and full.errors == []
+
+        story = db.exec(select(UserStory).where(UserStory.title == "Story 7.3.5")).one()
+        story.acceptance_criteria = "Given/When/Then"
+        db.commit()
+        with assert_max_queries(20):
+            report = validate_hierarchy(db, 1, limit=0)
+        assert report.checked == 10  # the story and its siblings
+        assert report.counts == {"missing_acceptance_criteria": 3999}
@@ -0,0 +1,124 @@
+import asyncio
+
+import pytest
+from sqlalchemy import event
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.db.write_behind import WriteBehindBuffer
+from app.models.activity import Activity
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'activity.db'}")
+    SQLModel.metadata.create_all(engine, tables=[Activity.__table__])
+    yield engine
+    engine.dispose()
+
+
+def _count_commits(engine) -> list:
+    commits = []
+    event.listen(engine, "commit", lambda conn: commits.append(1))
+    return commits
+
+
+def _rows(engine) -> list[str]:
+    with Session(engine) as db:
+        return [a.content for a in db.exec(select(Activity).order_by(Activity.id)).all()]
+
+
+def test_flush_writes_every_queued_row_in_one_transaction(engine):
+    buffer = WriteBehindBuffer(Activity, lambda: Session(engine))
+    commits = _count_commits(engine)
+    for i in range(25):
+        buffer.add(project_id=1, type="chat_message_user", content=str(i))
+    buffer.add(project_id=2, type="chat_message_user", content="other")
+    assert buffer.pending() == 26 and buffer.pending(project_id=2) == 1
+    assert _rows(engine) == []
+
+    assert buffer.flush() == 26
+    assert len(commits) == 1
+    assert _rows(engine) == [str(i) for i in range(25)] + ["other"]
+    assert buffer.flush() == 0 and len(commits) == 1
+
+
+def test_full_queue_flushes_in_the_caller(engine):
+    buffer = WriteBehindBuffer(Activity, lambda: Session(engine), max_pending=10)
+    for i in range(10):
+        buffer.add(project_id=1, type="t", content=str(i))
+    assert buffer.pending() == 0
+    assert len(_rows(engine)) == 10
+
+
+def test_failed_flush_requeues_up_to_the_bound(engine):
+    healthy = [False]
+
+    def session_factory():
+        if not healthy[0]:
+            raise RuntimeError("database unavailable")
+        return Session(engine)
+
+    buffer = WriteBehindBuffer(Activity, session_factory, max_pending=5)
+    for i in range(4):
+        buffer.add(project_id=1, type="t", content=str(i))
+    with pytest.raises(RuntimeError):
+        buffer.flush()
+    assert buffer.pending() == 4
+    buffer.add(project_id=1, type="t", content="4")  # reaches the bound, flushes, fails
+    buffer.add(project_id=1, type="t", content="5")  # the oldest row is dropped
+    assert buffer.pending() == 5
+
+    healthy[0] = True
+    buffer.flush()
+    assert _rows(engine) == ["1", "2", "3", "4", "5"]
+
+
+def test_full_queue_does_not_flush_on_the_event_loop(engine):
+    buffer = WriteBehindBuffer(Activity, lambda: Session(engine), max_pending=3)
+
+    async def log_from_a_request():
+        for i in range(5):
+            buffer.add(project_id=1, type="t", content=str(i))
+
+    asyncio.run(log_from_a_request())
+    assert _rows(engine) == []
+    assert buffer.pending() == 3
+    buffer.flush()
+    assert _rows(engine) == ["2", "3", "4"]
+
+
+def test_background_flusher_batches_and_stop_drains(engine):
+    commits = _count_commits(engine)
+
+    async def scenario():
+        buffer = WriteBehindBuffer(Activity, lambda: Session(engine), batch_size=5, flush_interval=60)
+        buffer.start()
+        assert buffer.running
+        for i in range(5):
+            buffer.add(project_id=1, type="t", content=str(i))
+        for _ in range(100):  # the batch wakes the flusher long before the interval
+            await asyncio.sleep(0.01)
+            if not buffer.pending():
+                break
+        batched = len(_rows(engine))
+        buffer.add(project_id=1, type="t", content="last")
+        await buffer.stop()
+        return batched, buffer.running
+
+    batched, running = asyncio.run(scenario())
+    assert batched == 5 and not running
+    assert _rows(engine)[-1] == "last"
+    assert len(commits) == 2
+
+
+def test_background_flusher_runs_on_the_interval(engine):
+    async def scenario():
+        buffer = WriteBehindBuffer(Activity, lambda: Session(engine), flush_interval=0.05)
+        buffer.start()
+        buffer.add(project_id=1, type="t", content="tick")
+        await asyncio.sleep(0.3)
+        written = _rows(engine)
+        await buffer.stop()
+        return written
+
+    assert asyncio.run(scenario()) == ["tick"]
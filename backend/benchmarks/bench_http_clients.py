@@ -0,0 +1,97 @@
+"""Per-call latency of a client per request vs. the shared pooled clients.
+
+Runs against a local mock server, so the numbers isolate connection setup
+(TCP, and TLS with ``--tls``) from upstream processing time::
+
+    cd backend
+    python -m benchmarks.bench_http_clients --calls 200 --tls
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+from openai import AsyncOpenAI
+
+from app.core.clients import http_client_options
+from benchmarks.mock_http import MockServer
+
+MESSAGES = [{"role": "user", "content": "ping"}]
+
+
+def _summary(samples: list[float]) -> str:
+    ordered = sorted(samples)
+    p50 = ordered[len(ordered) // 2] * 1000
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000
+    return f"mean {statistics.mean(samples) * 1000:7.2f} ms  p50 {p50:7.2f} ms  p99 {p99:7.2f} ms"
+
+
+async def _timed(calls: int, fn) -> list[float]:
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def run(calls: int, tls: bool) -> None:
+    async with MockServer(tls=tls) as server:
+        verify = server.client_ssl or True
+        url = f"{server.base_url}/chat/completions"
+
+        async def httpx_per_call():
+            async with httpx.AsyncClient(verify=verify) as client:
+                (await client.post(url, json={})).raise_for_status()
+
+        shared_http = httpx.AsyncClient(verify=verify, **http_client_options())
+
+        async def httpx_shared():
+            (await shared_http.post(url, json={})).raise_for_status()
+
+        async def openai_per_call():
+            client = AsyncOpenAI(
+                api_key="mock",
+                base_url=server.base_url,
+                http_client=httpx.AsyncClient(verify=verify),
+            )
+            async with client:
+                await client.chat.completions.create(model="gpt-3.5-turbo", messages=MESSAGES)
+
+        shared_openai = AsyncOpenAI(api_key="mock", base_url=server.base_url, http_client=shared_http)
+
+        async def openai_shared():
+            await shared_openai.chat.completions.create(model="gpt-3.5-turbo", messages=MESSAGES)
+
+        results = {}
+        for name, fn in [
+            ("httpx, client per call", httpx_per_call),
+            ("httpx, shared pool", httpx_shared),
+            ("openai, client per call", openai_per_call),
+            ("openai, shared pool", openai_shared),
+        ]:
+            await fn()  # warm up imports and, for shared clients, the pool
+            results[name] = await _timed(calls, fn)
+            print(f"{name:26s} {_summary(results[name])}")
+        await shared_http.aclose()
+
+    for kind in ("httpx", "openai"):
+        saved = statistics.mean(results[f"{kind}, client per call"]) - statistics.mean(
+            results[f"{kind}, shared pool"]
+        )
+        print(f"{kind}: shared pool saves {saved * 1000:.2f} ms per call")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--tls", action="store_true", help="serve the mock over HTTPS")
+    args = parser.parse_args()
+    asyncio.run(run(args.calls, args.tls))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Precision/recall and lookup latency of the near-duplicate prompt cache.
+
+Precision and recall are measured on hand-labelled prompt pairs at several
+thresholds; latency compares an LSH lookup with a linear scan over a
+project holding ``--entries`` prompts::
+
+    cd backend
+    python -m benchmarks.bench_similar_prompts --entries 5000
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import time
+
+from app.services.minhash import MinHashLSH, jaccard, normalize
+from app.services.prompt_cache import SimilarPromptCache
+
+# (prompt, rewording or unrelated prompt, should share a reply)
+PAIRS = [
+    ("create a login requirement", "add requirement for user login", True),
+    ("create a login requirement", "add a requirement for signin", True),
+    ("add an epic for payments", "create a payments epic", True),
+    ("new feature: export the backlog to csv", "add a feature to export backlog as csv", True),
+    ("write user stories for password reset", "create a user story for password reset", True),
+    ("make a requirement for audit logs", "create requirement: audit logs", True),
+    ("add a use case for checkout", "create the checkout use case", True),
+    ("create a requirement for two factor authentication", "add two factor authentication requirement", True),
+    ("add feature for dark mode", "create a dark mode feature", True),
+    ("generate an epic about onboarding", "create an onboarding epic", True),
+    ("add requirement for gdpr data export", "create a requirement for GDPR data exports", True),
+    ("create a story so customers can track orders", "add a user story: users track orders", True),
+    ("create a login requirement", "delete the login requirement", False),
+    ("create a login requirement", "create a logout requirement", False),
+    ("add an epic for payments", "add an epic for refunds", False),
+    ("export the backlog to csv", "import the backlog from csv", False),
+    ("create a user story for password reset", "create a user story for profile picture", False),
+    ("add feature for dark mode", "add feature for offline mode", False),
+    ("create an onboarding epic", "summarise the onboarding epic", False),
+    ("what is the status of the project", "create a requirement for project status", False),
+    ("add a use case for checkout", "add a use case for wishlist", False),
+    ("create requirement: audit logs", "update requirement: audit logs", False),
+    ("list all epics", "list all features", False),
+    ("create a requirement for two factor authentication", "create a requirement for single sign on", False),
+]
+
+VOCABULARY = (
+    "login logout payment refund export import csv pdf report dashboard epic feature "
+    "story requirement checkout cart wishlist profile avatar password reset audit log "
+    "gdpr consent email notification sms search filter sort admin role permission "
+    "invoice tax currency language theme mobile offline sync backup restore api"
+).split()
+
+
+def _precision_recall(threshold: float) -> tuple[float, float]:
+    tp = fp = fn = 0
+    for a, b, same in PAIRS:
+        cache = SimilarPromptCache(threshold=threshold)
+        cache.store(1, a, "reply")
+        hit = cache.lookup(1, b) is not None
+        tp += hit and same
+        fp += hit and not same
+        fn += same and not hit
+    precision = tp / (tp + fp) if tp + fp else 1.0
+    recall = tp / (tp + fn) if tp + fn else 1.0
+    return precision, recall
+
+
+def _prompts(n: int, rng: random.Random) -> list[set[str]]:
+    return [
+        normalize("create " + " ".join(rng.sample(VOCABULARY, rng.randint(3, 7))))
+        for _ in range(n)
+    ]
+
+
+def _p(samples: list[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1e6
+
+
+def run(entries: int, lookups: int, threshold: float) -> None:
+    print("threshold  precision  recall")
+    for t in (0.5, 0.6, 0.7, 0.8, 0.9):
+        precision, recall = _precision_recall(t)
+        print(f"{t:9.1f}  {precision:9.2f}  {recall:6.2f}")
+
+    rng = random.Random(7)
+    stored = _prompts(entries, rng)
+    queries = _prompts(lookups, rng)
+    index: MinHashLSH[int] = MinHashLSH()
+    start = time.perf_counter()
+    for i, terms in enumerate(stored):
+        index.add(i, terms)
+    build = time.perf_counter() - start
+
+    lsh_samples, scan_samples = [], []
+    for terms in queries:
+        start = time.perf_counter()
+        lsh = {k for k, _ in index.query(terms, threshold)}
+        lsh_samples.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        scan = {i for i, other in enumerate(stored) if jaccard(terms, other) >= threshold}
+        scan_samples.append(time.perf_counter() - start)
+        assert lsh <= scan
+
+    print(f"\n{entries} entries indexed in {build * 1000:.0f} ms")
+    for name, samples in (("lsh lookup", lsh_samples), ("linear scan", scan_samples)):
+        print(
+            f"{name:12s} mean {statistics.mean(samples) * 1e6:8.0f} us"
+            f"  p50 {_p(samples, 0.5):8.0f} us  p99 {_p(samples, 0.99):8.0f} us"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=5000)
+    parser.add_argument("--lookups", type=int, default=500)
+    parser.add_argument("--threshold", type=float, default=0.7)
+    args = parser.parse_args()
+    run(args.entries, args.lookups, args.threshold)
+
+
+if __name__ == "__main__":
+    main()
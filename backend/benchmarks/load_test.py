@@ -0,0 +1,321 @@
+"""Load test of the AI endpoints against a mock LLM, without OpenAI quota.
+
+Starts the app under uvicorn in a subprocess with a throwaway SQLite
+database and the mock provider (``--mock inprocess``), or with the real SDK
+pointed at ``benchmarks/mock_openai.py`` (``--mock http``). Then it signs up a
+user, creates a project and drives one scenario with ``--concurrency``
+clients, reporting throughput, latency percentiles and response statuses::
+
+    cd backend
+    python -m benchmarks.load_test --scenario chat --requests 200 --concurrency 20
+    python -m benchmarks.load_test --scenario chat-stream --tokens-per-second 30
+    python -m benchmarks.load_test --scenario specs --requests 20 --error-rate 0.05
+    python -m benchmarks.load_test --scenario chat --env LLM_MAX_CONCURRENCY=4
+
+Scenarios: ``chat`` (``POST /chat``), ``chat-stream`` (``POST /chat/stream``,
+also reports time to first token) and ``specs`` (a specification generation
+job, timed from submission until it finishes). ``--base-url`` targets a
+server that is already running instead; its LLM settings are its own.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import httpx
+
+from benchmarks.mock_openai import add_mock_arguments
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+SCENARIOS = ("chat", "chat-stream", "specs")
+TERMINAL = {"succeeded", "failed", "cancelled"}
+SECRET_KEY = "load-test"
+
+
+@dataclass
+class Sample:
+    ok: bool
+    status: str
+    latency: float
+    first_token: Optional[float] = None
+
+
+def percentile(ordered: list[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def _latencies(label: str, samples: list[float]) -> str:
+    ordered = sorted(samples)
+    cells = "  ".join(
+        f"{name} {percentile(ordered, q) * 1000:8.1f} ms"
+        for name, q in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99))
+    )
+    return f"{label:12s} {cells}  max {ordered[-1] * 1000:8.1f} ms"
+
+
+# Servers ----------------------------------------------------------------------
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _mock_env(args: argparse.Namespace) -> dict[str, str]:
+    env = {
+        "LLM_MOCK_LATENCY": str(args.latency),
+        "LLM_MOCK_LATENCY_DISTRIBUTION": args.distribution,
+        "LLM_MOCK_TOKENS_PER_SECOND": str(args.tokens_per_second),
+        "LLM_MOCK_REPLY_TOKENS": str(args.reply_tokens),
+        "LLM_MOCK_ERROR_RATE": str(args.error_rate),
+        "LLM_MOCK_ERROR_STATUS": str(args.error_status),
+    }
+    if args.seed is not None:
+        env["LLM_MOCK_SEED"] = str(args.seed)
+    return env
+
+
+def _mock_server_args(args: argparse.Namespace, port: int) -> list[str]:
+    cmd = [
+        sys.executable, "-m", "benchmarks.mock_openai", "--port", str(port),
+        "--latency", str(args.latency), "--distribution", args.distribution,
+        "--tokens-per-second", str(args.tokens_per_second),
+        "--reply-tokens", str(args.reply_tokens),
+        "--error-rate", str(args.error_rate), "--error-status", str(args.error_status),
+    ]
+    if args.seed is not None:
+        cmd += ["--seed", str(args.seed)]
+    return cmd
+
+
+def start_servers(args: argparse.Namespace, database_url: str) -> tuple[str, list[subprocess.Popen]]:
+    """Start the app (and the HTTP mock if requested); returns (base URL, processes)."""
+    env = {
+        **os.environ,
+        "DATABASE_URL": database_url,
+        "SECRET_KEY": SECRET_KEY,
+        "OPENAI_API_KEY": "mock",
+        # The harness measures the service, not the per-user limit or the cache.
+        "LLM_USER_RATE": "0",
+        "LLM_CACHE_ENABLED": "false",
+    }
+    processes = []
+    if args.mock == "http":
+        mock_port = _free_port()
+        processes.append(subprocess.Popen(_mock_server_args(args, mock_port), cwd=BACKEND_DIR))
+        env.update(LLM_PROVIDER="openai", OPENAI_BASE_URL=f"http://127.0.0.1:{mock_port}/v1")
+    else:
+        env.update(LLM_PROVIDER="mock", **_mock_env(args))
+    for override in args.env:
+        key, _, value = override.partition("=")
+        env[key] = value
+
+    port = _free_port()
+    processes.append(subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+    ))
+    return f"http://127.0.0.1:{port}", processes
+
+
+def stop_servers(processes: list[subprocess.Popen]) -> None:
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+async def wait_ready(client: httpx.AsyncClient, processes: list[subprocess.Popen], timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if any(p.poll() is not None for p in processes):
+            raise SystemExit("A server process exited during startup")
+        try:
+            if (await client.get("/openapi.json")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise SystemExit(f"Server not ready after {timeout:.0f} s")
+
+
+# Scenarios --------------------------------------------------------------------
+
+
+def seed_user(database_url: str) -> str:
+    """Insert a user into a spawned server's database; returns a bearer token.
+
+    Skips sign-up (and its password hashing) and outlives the default token
+    expiry, which long runs would hit.
+    """
+    from jose import jwt
+    from sqlmodel import Session, create_engine
+
+    from app.models.user import User
+
+    engine = create_engine(database_url)
+    with Session(engine) as db:
+        user = User(email=f"load-{uuid.uuid4().hex[:8]}@example.com", hashed_password="!")
+        db.add(user)
+        db.commit()
+        user_id = user.id
+    engine.dispose()
+    return jwt.encode({"sub": str(user_id), "exp": time.time() + 24 * 3600}, SECRET_KEY, algorithm="HS256")
+
+
+async def sign_up(client: httpx.AsyncClient) -> str:
+    email, password = f"load-{uuid.uuid4().hex[:8]}@example.com", "load-test-password"
+    (await client.post("/users/", json={"email": email, "password": password})).raise_for_status()
+    token = await client.post("/auth/token", data={"username": email, "password": password})
+    token.raise_for_status()
+    return token.json()["access_token"]
+
+
+async def setup(client: httpx.AsyncClient, token: str) -> int:
+    """Authenticate the client as the token's user and create a project."""
+    client.headers["Authorization"] = f"Bearer {token}"
+    me = (await client.get("/users/me")).json()
+    project = await client.post("/projects/", json={
+        "name": "Load test",
+        "description": "An online shop used to load-test the AI endpoints.",
+        "owner_id": me["id"],
+    })
+    project.raise_for_status()
+    return project.json()["id"]
+
+
+async def chat(client: httpx.AsyncClient, project_id: int, i: int) -> Sample:
+    start = time.perf_counter()
+    response = await client.post("/chat", params={
+        "project_id": project_id, "message": f"Suggest requirement number {i}", "cache": False,
+    })
+    return Sample(response.status_code == 200, str(response.status_code), time.perf_counter() - start)
+
+
+async def chat_stream(client: httpx.AsyncClient, project_id: int, i: int) -> Sample:
+    start = time.perf_counter()
+    first_token, last_event = None, None
+    params = {"project_id": project_id, "message": f"Suggest requirement number {i}", "cache": False}
+    async with client.stream("POST", "/chat/stream", params=params) as response:
+        if response.status_code != 200:
+            await response.aread()
+            return Sample(False, str(response.status_code), time.perf_counter() - start)
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                last_event = line[7:]
+                if last_event == "token" and first_token is None:
+                    first_token = time.perf_counter() - start
+    ok = last_event == "done"
+    return Sample(ok, "200" if ok else f"200 {last_event}", time.perf_counter() - start, first_token)
+
+
+async def spec_job(client: httpx.AsyncClient, project_id: int, i: int) -> Sample:
+    start = time.perf_counter()
+    jobs = f"/api/v1/projects/{project_id}/jobs"
+    response = await client.post(f"{jobs}/generate-specifications", json={
+        "project_goals": [f"Goal {i}"], "requirement_title": f"Load test {i}", "use_cache": False,
+    })
+    if response.status_code != 202:
+        return Sample(False, str(response.status_code), time.perf_counter() - start)
+    job_id = response.json()["id"]
+    while True:
+        await asyncio.sleep(0.1)
+        job = (await client.get(f"{jobs}/{job_id}")).json()
+        if job["status"] in TERMINAL:
+            ok = job["status"] == "succeeded"
+            return Sample(ok, f"job {job['status']}", time.perf_counter() - start)
+
+
+SCENARIO_FUNCTIONS = {"chat": chat, "chat-stream": chat_stream, "specs": spec_job}
+
+
+async def drive(client: httpx.AsyncClient, scenario: str, project_id: int, requests: int, concurrency: int) -> list[Sample]:
+    call = SCENARIO_FUNCTIONS[scenario]
+    counter = itertools.count()
+    samples: list[Sample] = []
+
+    async def worker():
+        while (i := next(counter)) < requests:
+            start = time.perf_counter()
+            try:
+                samples.append(await call(client, project_id, i))
+            except httpx.HTTPError as exc:
+                samples.append(Sample(False, type(exc).__name__, time.perf_counter() - start))
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples
+
+
+def report(scenario: str, samples: list[Sample], elapsed: float, concurrency: int) -> None:
+    ok = [s for s in samples if s.ok]
+    print(f"{scenario}: {len(samples)} requests, concurrency {concurrency}, {elapsed:.2f} s")
+    print(f"{'throughput':12s} {len(samples) / elapsed:8.1f} req/s  ({len(ok) / elapsed:.1f} ok/s)")
+    if ok:
+        print(_latencies("latency", [s.latency for s in ok]))
+    first_tokens = [s.first_token for s in ok if s.first_token is not None]
+    if first_tokens:
+        print(_latencies("first token", first_tokens))
+    statuses = Counter(s.status for s in samples)
+    print(f"{'statuses':12s} " + "  ".join(f"{k}: {v}" for k, v in sorted(statuses.items())))
+
+
+async def run(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as workdir:
+        processes: list[subprocess.Popen] = []
+        base_url = args.base_url
+        database_url = f"sqlite:///{workdir}/load_test.db"
+        if base_url is None:
+            base_url, processes = start_servers(args, database_url)
+        limits = httpx.Limits(max_connections=args.concurrency + 5)
+        try:
+            async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+                await wait_ready(client, processes)
+                token = seed_user(database_url) if processes else await sign_up(client)
+                project_id = await setup(client, token)
+                start = time.perf_counter()
+                samples = await drive(client, args.scenario, project_id, args.requests, args.concurrency)
+                elapsed = time.perf_counter() - start
+        finally:
+            stop_servers(processes)
+    report(args.scenario, samples, elapsed, args.concurrency)
+    if args.json:
+        Path(args.json).write_text(json.dumps([s.__dict__ for s in samples]))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", choices=SCENARIOS, default="chat")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--timeout", type=float, default=120.0, help="per-request client timeout")
+    parser.add_argument("--mock", choices=("inprocess", "http"), default="inprocess",
+                        help="mock provider inside the app, or the SDK against mock_openai")
+    parser.add_argument("--base-url", help="drive an already running server instead")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra environment for the app, e.g. LLM_MAX_CONCURRENCY=4")
+    parser.add_argument("--json", metavar="PATH", help="also write raw samples to PATH")
+    add_mock_arguments(parser)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
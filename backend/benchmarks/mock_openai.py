@@ -0,0 +1,181 @@
+"""OpenAI-compatible mock server backed by ``MockLLM``.
+
+Serves ``POST /v1/chat/completions``, both plain and streamed (Server-Sent
+Events, ``data: [DONE]`` terminator), with the latency distribution, token
+rate and error injection of ``app.services.mock_llm``. Point the app at it to
+exercise the real SDK and connection pool without spending quota::
+
+    cd backend
+    python -m benchmarks.mock_openai --port 8001 --latency 0.3 --error-rate 0.02
+    OPENAI_BASE_URL=http://127.0.0.1:8001/v1 OPENAI_API_KEY=mock uvicorn app.main:app
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+
+from app.services.mock_llm import LATENCY_DISTRIBUTIONS, MockLLM, MockLLMConfig, MockLLMError
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 429: "Too Many Requests"}
+
+
+def _head(status: int, headers: dict[str, str]) -> bytes:
+    lines = [f"HTTP/1.1 {status} {REASONS.get(status, 'Error')}"]
+    lines += [f"{name}: {value}" for name, value in headers.items()]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode()
+
+
+def _json_response(status: int, payload: dict, extra: dict[str, str] | None = None) -> bytes:
+    body = json.dumps(payload).encode()
+    headers = {
+        "Content-Type": "application/json",
+        "Content-Length": str(len(body)),
+        "Connection": "keep-alive",
+        **(extra or {}),
+    }
+    return _head(status, headers) + body
+
+
+def _error_response(status: int, message: str) -> bytes:
+    payload = {"error": {"message": message, "type": "mock_error", "param": None, "code": None}}
+    extra = {"Retry-After": "1"} if status == 429 else None
+    return _json_response(status, payload, extra)
+
+
+def _chunk(data: bytes) -> bytes:
+    return f"{len(data):x}\r\n".encode() + data + b"\r\n"
+
+
+class MockOpenAIServer:
+    def __init__(self, mock: MockLLM, host: str = "127.0.0.1", port: int = 0):
+        self.mock = mock
+        self.host = host
+        self.port = port
+        self.requests = 0
+        self._server: asyncio.base_events.Server | None = None
+        self._connections: dict[asyncio.StreamWriter, asyncio.Task] = {}
+
+    @property
+    def base_url(self) -> str:
+        port = self._server.sockets[0].getsockname()[1]
+        return f"http://{self.host}:{port}/v1"
+
+    async def __aenter__(self) -> "MockOpenAIServer":
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self._server.close()
+        # Idle keep-alive connections see EOF; busy ones get a moment to finish.
+        for writer in self._connections:
+            writer.close()
+        if self._connections:
+            await asyncio.wait(list(self._connections.values()), timeout=1)
+        await self._server.wait_closed()
+
+    async def serve_forever(self) -> None:
+        async with self:
+            await self._server.serve_forever()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._connections[writer] = asyncio.current_task()
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                request_line, *header_lines = head.decode("latin-1").split("\r\n")
+                method, path = request_line.split(" ")[:2]
+                length = 0
+                for line in header_lines:
+                    if line.lower().startswith("content-length:"):
+                        length = int(line.split(":", 1)[1])
+                body = await reader.readexactly(length) if length else b""
+                self.requests += 1
+                await self._respond(writer, method, path, body)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._connections.pop(writer, None)
+            writer.close()
+
+    async def _respond(self, writer: asyncio.StreamWriter, method: str, path: str, body: bytes) -> None:
+        if method != "POST" or not path.rstrip("/").endswith("/chat/completions"):
+            writer.write(_error_response(404, f"No mock route for {method} {path}"))
+            await writer.drain()
+            return
+        try:
+            request = json.loads(body or b"{}")
+            model, messages = request.pop("model"), request.pop("messages")
+        except (ValueError, KeyError):
+            writer.write(_error_response(400, "Expected a JSON body with model and messages"))
+            await writer.drain()
+            return
+        streaming = request.pop("stream", False)
+        try:
+            if not streaming:
+                completion = await self.mock.complete(model, messages, **request)
+                writer.write(_json_response(200, completion))
+                await writer.drain()
+                return
+            events = self.mock.stream(model, messages, **request)
+            first = await anext(events)  # injected errors surface before the headers
+        except MockLLMError as exc:
+            writer.write(_error_response(exc.status, str(exc)))
+            await writer.drain()
+            return
+
+        writer.write(_head(200, {
+            "Content-Type": "text/event-stream",
+            "Transfer-Encoding": "chunked",
+            "Connection": "keep-alive",
+        }))
+        writer.write(_chunk(f"data: {json.dumps(first)}\n\n".encode()))
+        await writer.drain()
+        async for event in events:
+            writer.write(_chunk(f"data: {json.dumps(event)}\n\n".encode()))
+            await writer.drain()
+        writer.write(_chunk(b"data: [DONE]\n\n") + _chunk(b""))
+        await writer.drain()
+
+
+def add_mock_arguments(parser: argparse.ArgumentParser) -> None:
+    defaults = MockLLMConfig()
+    parser.add_argument("--latency", type=float, default=defaults.latency,
+                        help="mean time to first token, seconds")
+    parser.add_argument("--distribution", choices=LATENCY_DISTRIBUTIONS,
+                        default=defaults.latency_distribution)
+    parser.add_argument("--tokens-per-second", type=float, default=defaults.tokens_per_second)
+    parser.add_argument("--reply-tokens", type=int, default=defaults.reply_tokens)
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate)
+    parser.add_argument("--error-status", type=int, default=defaults.error_status)
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def mock_config_from_args(args: argparse.Namespace) -> MockLLMConfig:
+    return MockLLMConfig(
+        latency=args.latency,
+        latency_distribution=args.distribution,
+        tokens_per_second=args.tokens_per_second,
+        reply_tokens=args.reply_tokens,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        seed=args.seed,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+    server = MockOpenAIServer(MockLLM(mock_config_from_args(args)), args.host, args.port)
+    print(f"Mock OpenAI API on http://{args.host}:{args.port}/v1")
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@ import React, { useState } from 'react';
 import type { FormEvent } from 'react';
 
 import fetchWithAuth from '../lib/fetchWithAuth'; // Assuming this handles auth tokens
+import { readSSE } from '../lib/sse';
 
 interface CreatedItem {
   type: string;
@@ -27,6 +28,7 @@ const ChatInterface: React.FC<ChatInterfaceProps> = ({ projectId }) => {
   const [messages, setMessages] = useState<Message[]>([]);
   const [inputMessage, setInputMessage] = useState<string>('');
   const [isLoading, setIsLoading] = useState<boolean>(false);
+  const [awaitingFirstToken, setAwaitingFirstToken] = useState<boolean>(false);
   const [error, setError] = useState<string | null>(null);
 
   // Optional: Load initial messages or welcome message
@@ -46,22 +48,22 @@ const ChatInterface: React.FC<ChatInterfaceProps> = ({ projectId }) => {
     setMessages((prevMessages) => [...prevMessages, userMessage]);
     setInputMessage('');
     setIsLoading(true);
+    setAwaitingFirstToken(true);
     setError(null);
 
     try {
-      // The backend /chat endpoint expects project_id and message as query parameters
+      // The backend /chat/stream endpoint expects project_id and message as query parameters
+      // and answers with Server-Sent Events so the reply renders as it is generated.
       const queryParams = new URLSearchParams({
         project_id: projectId.toString(),
         message: inputMessage,
       });
 
       const response = await fetchWithAuth(
-        `${import.meta.env.VITE_API_BASE}/chat?${queryParams.toString()}`, // Corrected path if router has no prefix
-                                                                            // If chat.py router has prefix /chat, then it's /chat/chat
-                                                                            // The router in chat.py is APIRouter(tags=["Chat"], prefix=""), so /chat is correct
+        `${import.meta.env.VITE_API_BASE}/chat/stream?${queryParams.toString()}`,
         {
-          method: 'POST', // Even with query params, POST is fine. Backend uses message as query param.
-                          // If backend expected JSON body, we'd send it here.
+          method: 'POST',
+          headers: { Accept: 'text/event-stream' },
         }
       );
 
@@ -70,21 +72,38 @@ const ChatInterface: React.FC<ChatInterfaceProps> = ({ projectId }) => {
         throw new Error(errorData.detail || 'Failed to send message');
       }
 
-      const data = await response.json();
-
-      const aiMessage: Message = {
-        id: Date.now().toString() + '-ai',
-        text: data.reply,
-        sender: 'ai',
-        createdItem: data.created_item, // Store created item info
+      const aiMessageId = Date.now().toString() + '-ai';
+      let started = false;
+      const updateAiMessage = (update: (msg: Message) => Message) => {
+        if (!started) {
+          started = true;
+          setAwaitingFirstToken(false);
+          setMessages((prevMessages) => [
+            ...prevMessages,
+            update({ id: aiMessageId, text: '', sender: 'ai' }),
+          ]);
+          return;
+        }
+        setMessages((prevMessages) =>
+          prevMessages.map((msg) => (msg.id === aiMessageId ? update(msg) : msg))
+        );
       };
-      setMessages((prevMessages) => [...prevMessages, aiMessage]);
 
-      // Optional: If an item was created, maybe trigger a refresh of other components
-      if (data.created_item) {
-        console.log('AI created an item:', data.created_item);
-        // Example: dispatch an event or call a callback
-        // props.onItemCreated?.(data.created_item);
+      for await (const { event, data } of readSSE(response)) {
+        if (event === 'token') {
+          const { delta } = data as { delta: string };
+          updateAiMessage((msg) => ({ ...msg, text: msg.text + delta }));
+        } else if (event === 'created_item') {
+          const createdItem = data as CreatedItem;
+          updateAiMessage((msg) => ({ ...msg, createdItem }));
+          // Optional: trigger a refresh of other components
+          console.log('AI created an item:', createdItem);
+        } else if (event === 'done') {
+          const { reply } = data as { reply: string };
+          updateAiMessage((msg) => ({ ...msg, text: reply }));
+        } else if (event === 'error') {
+          throw new Error((data as { detail?: string }).detail || 'Failed to get response from AI');
+        }
       }
 
     } catch (err) {
@@ -95,6 +114,7 @@ const ChatInterface: React.FC<ChatInterfaceProps> = ({ projectId }) => {
       // setMessages((prevMessages) => [...prevMessages, errorMsgEntry]);
     } finally {
       setIsLoading(false);
+      setAwaitingFirstToken(false);
     }
   };
 
@@ -114,7 +134,7 @@ const ChatInterface: React.FC<ChatInterfaceProps> = ({ projectId }) => {
                   : 'bg-gray-200 text-gray-800'
               }`}
             >
-              <p>{msg.text}</p>
+              <p className="whitespace-pre-wrap">{msg.text}</p>
               {msg.createdItem && (
                 <div className="mt-2 p-2 border-t border-gray-300 text-xs">
                   <p className="font-semibold">System Action:</p>
@@ -124,7 +144,7 @@ const ChatInterface: React.FC<ChatInterfaceProps> = ({ projectId }) => {
             </div>
           </div>
         ))}
-        {isLoading && (
+        {awaitingFirstToken && (
           <div className="flex justify-start">
             <div className="px-4 py-2 rounded-lg shadow bg-gray-200 text-gray-800 animate-pulse">
               AI is typing...
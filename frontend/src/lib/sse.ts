@@ -0,0 +1,41 @@
+export interface SSEEvent {
+  event: string
+  data: unknown
+}
+
+/**
+ * Split buffered text/event-stream data into complete events.
+ * Returns the parsed events and the unterminated remainder to keep buffering.
+ */
+export function parseSSE(buffer: string): { events: SSEEvent[]; rest: string } {
+  const events: SSEEvent[] = []
+  const blocks = buffer.split('\n\n')
+  const rest = blocks.pop() ?? ''
+  for (const block of blocks) {
+    let event = 'message'
+    const dataLines: string[] = []
+    for (const line of block.split('\n')) {
+      if (line.startsWith('event:')) event = line.slice(6).trim()
+      else if (line.startsWith('data:')) dataLines.push(line.slice(5).trimStart())
+    }
+    if (dataLines.length === 0) continue
+    events.push({ event, data: JSON.parse(dataLines.join('\n')) })
+  }
+  return { events, rest }
+}
+
+/** Yield Server-Sent Events from a fetch response body as they arrive. */
+export async function* readSSE(response: Response): AsyncGenerator<SSEEvent> {
+  if (!response.body) return
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+  for (;;) {
+    const { done, value } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true })
+    const parsed = parseSSE(buffer)
+    buffer = parsed.rest
+    yield* parsed.events
+  }
+}
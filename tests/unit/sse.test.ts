@@ -0,0 +1,22 @@
+import { describe, expect, it } from 'vitest'
+import { parseSSE } from '../../frontend/src/lib/sse'
+
+describe('parseSSE', () => {
+  it('parses complete events and keeps the partial tail', () => {
+    const { events, rest } = parseSSE(
+      'event: token\ndata: {"delta":"Hel"}\n\nevent: token\ndata: {"delta":"lo"}\n\nevent: do',
+    )
+    expect(events).toEqual([
+      { event: 'token', data: { delta: 'Hel' } },
+      { event: 'token', data: { delta: 'lo' } },
+    ])
+    expect(rest).toBe('event: do')
+  })
+
+  it('waits for the blank line before emitting', () => {
+    const first = parseSSE('event: done\ndata: {"reply":"x"}\n')
+    expect(first.events).toEqual([])
+    const second = parseSSE(first.rest + '\n')
+    expect(second.events).toEqual([{ event: 'done', data: { reply: 'x' } }])
+  })
+})